@@ -41,6 +41,8 @@ global_at_logger = logging.getLogger("GlobalATController")
 try:
     from controllers.unified_controller import UnifiedController
     from controllers.finite_state_machine import DeviceUnderTest, ApricornDeviceFSM, TestSession
+    from controllers.session_journal import SESSION_JOURNAL_ENABLED, SESSION_JOURNAL_FILENAME
+    from controllers.metrics_server import METRICS_SERVER_ENABLED, MetricsServer
     from utils.pin_generator import PINGenerator
     from utils.config.keypad_layouts import KEYPAD_LAYOUTS # Keep for other scripts if needed, or remove
 except ImportError as e_uc_import:
@@ -65,6 +67,7 @@ try:
         enable_instant_replay=True,
         replay_output_dir=RUN_OUTPUT_DIR 
     )
+    at.start_usb_watcher()
 except Exception as e_at_create:
     global_at_logger.critical(f"Failed to create global 'at' (UnifiedController) instance: {e_at_create}", exc_info=True)
 
@@ -93,6 +96,10 @@ session = None
 if at and dut:
     try:
         session = TestSession(at_controller=at, dut_instance=dut)
+        at.add_phidget_detach_listener(session.log_phidget_detach)
+        at.add_led_run_listener(session.log_led_run)
+        if SESSION_JOURNAL_ENABLED:
+            session.open_journal(os.path.join(RUN_OUTPUT_DIR, SESSION_JOURNAL_FILENAME))
         global_at_logger.debug(f"Test Session module initialized.")
     except Exception as e_session_create:
         global_at_logger.critical(f"Failed to create 'session' instance: {e_session_create}", exc_info=True)
@@ -139,11 +146,24 @@ def get_pin_generator():
         raise RuntimeError("Global 'pin_gen' was not successfully initialized.")
     return pin_gen
 
+# --- Optional: Live metrics server ---
+metrics_server = None
+if session and METRICS_SERVER_ENABLED:
+    try:
+        metrics_server = MetricsServer(session.metrics_snapshot, logger_instance=global_at_logger.getChild("MetricsServer")).start()
+    except OSError as e_metrics_start:
+        global_at_logger.error(f"Failed to start the metrics server: {e_metrics_start}")
+        metrics_server = None
+
 if at and dut and fsm and pin_gen and session:
     global_at_logger.info("All modules successfully initialized.")
 
 # --- Optional: Resource cleanup ---
 def _cleanup_global_at():
+    if metrics_server is not None:
+        metrics_server.stop()
+    if session is not None:
+        session.close_journal()
     if at and hasattr(at, 'close'):
         try:
             at.close()
@@ -0,0 +1,208 @@
+# Directory: controllers
+# Filename: checkpoint.py
+#!/usr/bin/env python3
+
+# Crash-safe checkpoints for long stress sessions. A 24-hour run that dies (a
+# segfault, a host reboot, a lost Phidget) used to lose every session counter,
+# the DeviceUnderTest PIN model and the block position, and left the device
+# enrolled with PINs nobody knew. A checkpoint holds the DUT model, the session
+# metrics, the FSM state, the RNG state and the script's position. It is written
+# periodically and whenever a transition changes the DUT model (so an enrolled
+# PIN is never lost), as compact JSON to a temporary file that is fsynced and
+# then renamed over the previous checkpoint: a crash mid-write leaves the old
+# checkpoint intact. A resumed run reloads it, powers the device off and lets
+# the block orientation bring it back up with the known PINs.
+
+import json
+import logging
+import os
+import random
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .clock import get_clock
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .finite_state_machine import ApricornDeviceFSM, DeviceUnderTest, TestSession
+
+module_logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "stress_checkpoint.json")
+
+# Shortest time between two periodic checkpoints; DUT model changes are saved immediately.
+try:
+    CHECKPOINT_INTERVAL_SEC = float(os.environ.get("CHECKPOINT_INTERVAL_SEC", "60"))
+except (TypeError, ValueError):
+    CHECKPOINT_INTERVAL_SEC = 60.0
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """
+    Writes `data` as compact JSON so that `path` always holds either the old or the new content.
+    A value JSON cannot represent raises TypeError before anything is replaced.
+
+    The JSON goes to a temporary file in the same directory, is fsynced, and replaces
+    `path` with os.replace(); the directory is fsynced too where the OS allows it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class SessionCheckpointer:
+    """
+    Saves and restores the state of a stress session.
+
+    The script owns `progress` (block, iteration, completed blocks, ...) and
+    `config` (the answers to its start-up prompts); both are stored verbatim.
+    """
+
+    def __init__(self, fsm: "ApricornDeviceFSM", session: "TestSession", dut: "DeviceUnderTest",
+                 path: Optional[str] = None, interval_sec: float = CHECKPOINT_INTERVAL_SEC,
+                 seed: Optional[int] = None, logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            fsm (ApricornDeviceFSM): The state machine whose state is saved.
+            session (TestSession): The session whose metrics are saved.
+            dut (DeviceUnderTest): The DUT model (PINs, counters, settings).
+            path (Optional[str]): Checkpoint file. Defaults to logs/stress_checkpoint.json.
+            interval_sec (float): Shortest time between periodic saves.
+            seed (Optional[int]): Seed the script's RNG was started with, for the record.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.fsm = fsm
+        self.session = session
+        self.dut = dut
+        self.path = path or DEFAULT_CHECKPOINT_PATH
+        self.interval_sec = max(0.0, float(interval_sec))
+        self.seed = seed
+        self.progress: Dict[str, Any] = {}
+        self.config: Dict[str, Any] = {}
+        self.saves = 0
+        self._last_save: Optional[float] = None
+        self._last_dut: Optional[str] = None
+
+    def attach(self) -> None:
+        """Saves a checkpoint after every successful transition that changed the DUT model."""
+        self.fsm.add_transition_listener(self._after_trigger)
+
+    def _after_trigger(self, event_data: Any) -> None:
+        if event_data.result and self._dut_fingerprint() != self._last_dut:
+            self.save(force=True)
+
+    def _dut_fingerprint(self) -> str:
+        return json.dumps(self.dut.checkpoint_state(), sort_keys=True)
+
+    def capture(self) -> Dict[str, Any]:
+        """The current checkpoint as a JSON-serializable dict."""
+        return {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": get_clock().time(),
+            "fsm_state": self.fsm.state,
+            "dut": self.dut.checkpoint_state(),
+            "session": self.session.checkpoint_state(),
+            "random": {"seed": self.seed, "state": random.getstate()},
+            "progress": self.progress,
+            "config": self.config,
+        }
+
+    def save(self, force: bool = False) -> bool:
+        """
+        Writes a checkpoint unless one was written less than interval_sec ago.
+        A failed write is logged and does not stop the run; state that cannot be
+        serialized (TypeError, ValueError) is a bug and is raised.
+
+        Args:
+            force (bool): Write regardless of the interval.
+
+        Returns:
+            bool: True if a checkpoint was written.
+        """
+        now = get_clock().monotonic()
+        if not force and self._last_save is not None and now - self._last_save < self.interval_sec:
+            return False
+        try:
+            checkpoint = self.capture()
+            atomic_write_json(self.path, checkpoint)
+        except OSError as e:
+            self.logger.warning(f"Checkpoint could not be written to {self.path}: {e}")
+            return False
+        self._last_save = now
+        self._last_dut = json.dumps(checkpoint["dut"], sort_keys=True)
+        self.saves += 1
+        return True
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Reads the checkpoint file.
+
+        Returns:
+            Optional[Dict[str, Any]]: The checkpoint, or None if there is none or it is
+            unreadable or from another checkpoint version.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                checkpoint = json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Checkpoint {self.path} is unreadable: {e}")
+            return None
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            self.logger.error(f"Checkpoint {self.path} has version {checkpoint.get('version')}, expected {CHECKPOINT_VERSION}.")
+            return None
+        return checkpoint
+
+    def restore(self, checkpoint: Dict[str, Any]) -> None:
+        """
+        Loads a checkpoint into the DUT model, the session, the RNG and the FSM, and
+        powers the device off so the resumed block can orient it (see
+        ApricornDeviceFSM.resume_from_checkpoint).
+        """
+        self.dut.restore_checkpoint_state(checkpoint["dut"])
+        self.session.restore_checkpoint_state(checkpoint["session"])
+        rng = checkpoint.get("random") or {}
+        if rng.get("state"):
+            version, internal, gauss = rng["state"]
+            random.setstate((version, tuple(internal), gauss))
+        self.seed = rng.get("seed", self.seed)
+        self.progress = dict(checkpoint.get("progress") or {})
+        self.config = dict(checkpoint.get("config") or {})
+        self.logger.info(
+            f"Restored checkpoint from {self.path}: block {self.progress.get('block')}, "
+            f"iteration {self.progress.get('iteration')}, FSM state {checkpoint['fsm_state']}."
+        )
+        self.fsm.resume_from_checkpoint(checkpoint["fsm_state"])
+        self._last_dut = self._dut_fingerprint()
+
+    def clear(self) -> None:
+        """Removes the checkpoint once the session has finished."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
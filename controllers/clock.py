@@ -0,0 +1,239 @@
+# Directory: controllers
+# Filename: clock.py
+#!/usr/bin/env python3
+
+# Pluggable time source. The FSM, the camera, the Phidget layer and the USB
+# watcher read the time and sleep through get_clock() instead of calling the
+# time module directly. The default Clock forwards to time.time()/time.sleep(),
+# so production behaviour is unchanged. SimulatedClock keeps a virtual time that
+# jumps straight to the next wake-up once every actor thread is sleeping, so a
+# run against the virtual DUT follows the same control flow as a wall-clock run,
+# just without the waiting (SIMULATED_CLOCK_ENABLED=true with a virtual DUT).
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+module_logger = logging.getLogger(__name__)
+
+SIMULATED_CLOCK_ENABLED = os.environ.get("SIMULATED_CLOCK_ENABLED", "false").lower() == "true"
+
+# Default poll interval for condition waits that have no Condition to block on,
+# and the step a simulated clock takes for a loop that polls without sleeping.
+try:
+    CLOCK_POLL_INTERVAL_SEC = float(os.environ.get("CLOCK_POLL_INTERVAL_SEC", "0.01"))
+except (TypeError, ValueError):
+    CLOCK_POLL_INTERVAL_SEC = 0.01
+
+
+class Deadline:
+    """A point in time on a given clock, measured with its monotonic time."""
+
+    def __init__(self, clock: "Clock", timeout: float):
+        self.clock = clock
+        self.timeout = max(0.0, timeout)
+        self.start = clock.monotonic()
+        self.end = self.start + self.timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - self.clock.monotonic())
+
+    def elapsed(self) -> float:
+        return self.clock.monotonic() - self.start
+
+    def expired(self) -> bool:
+        return self.clock.monotonic() >= self.end
+
+
+class Clock:
+    """
+    The real clock. Every call is looked up on the time module at call time, so
+    code (and tests) that patch time.time/time.sleep see the same calls as before.
+    """
+
+    is_simulated = False
+
+    def time(self) -> float:
+        """Wall-clock time in seconds since the epoch (for timestamps)."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Monotonic time in seconds (for measuring intervals)."""
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def idle(self):
+        """Called on each pass of a loop that polls without sleeping. A no-op here."""
+
+    def register_actor(self, thread: Optional[threading.Thread] = None):
+        """Marks a thread whose work must finish before simulated time moves on (no-op here)."""
+
+    def release_actor(self, thread: Optional[threading.Thread] = None):
+        """Undoes register_actor (no-op here)."""
+
+    def deadline(self, timeout: float) -> Deadline:
+        return Deadline(self, timeout)
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float,
+                 poll_interval: Optional[float] = None,
+                 condition: Optional[threading.Condition] = None) -> bool:
+        """
+        Waits until `predicate` is true or `timeout` seconds have passed.
+
+        Args:
+            predicate (Callable[[], bool]): The condition to wait for.
+            timeout (float): Maximum time to wait, in seconds.
+            poll_interval (Optional[float]): Seconds between checks when polling.
+                Defaults to CLOCK_POLL_INTERVAL_SEC.
+            condition (Optional[threading.Condition]): Condition notified whenever the
+                predicate may have changed; the real clock blocks on it instead of polling.
+
+        Returns:
+            bool: The last value of the predicate.
+        """
+        if condition is not None:
+            with condition:
+                return bool(condition.wait_for(predicate, timeout=max(0.0, timeout)))
+        return self._poll(predicate, timeout, poll_interval)
+
+    def _poll(self, predicate: Callable[[], bool], timeout: float, poll_interval: Optional[float],
+              condition: Optional[threading.Condition] = None) -> bool:
+        interval = poll_interval if poll_interval is not None else CLOCK_POLL_INTERVAL_SEC
+        deadline = self.deadline(timeout)
+        while True:
+            if condition is not None:
+                with condition:
+                    result = predicate()
+            else:
+                result = predicate()
+            if result or deadline.expired():
+                return bool(result)
+            self.sleep(min(interval, deadline.remaining()))
+
+
+class SimulatedClock(Clock):
+    """
+    Virtual time shared by a set of actor threads.
+
+    A thread becomes an actor the first time it sleeps (or via register_actor(),
+    which also accepts a thread that has not been started yet) and stops being
+    one when it exits or calls release_actor(). While any actor is
+    running, virtual time stands still; once every live actor is asleep, time
+    jumps to the earliest wake-up. Threads that only read the time are not actors.
+    An actor blocked on something other than the clock (a lock, input(), real I/O)
+    therefore holds virtual time until it returns.
+    """
+
+    is_simulated = True
+
+    def __init__(self, start: Optional[float] = None, logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            start (Optional[float]): Wall-clock time the virtual clock starts at.
+                Defaults to the current time.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self._epoch = time.time() if start is None else float(start)
+        self._now = 0.0
+        self._condition = threading.Condition()
+        self._actors: Set[threading.Thread] = set()
+        self._wake_at: Dict[threading.Thread, float] = {}
+        # Real seconds a sleeper waits between checks for actors that exited without releasing.
+        self._liveness_check_sec = 0.05
+
+    def time(self) -> float:
+        return self._epoch + self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float):
+        """Moves virtual time forward by `seconds`, waking any sleeper that is due."""
+        with self._condition:
+            self._now += max(0.0, seconds)
+            self._condition.notify_all()
+
+    def register_actor(self, thread: Optional[threading.Thread] = None):
+        with self._condition:
+            self._actors.add(thread or threading.current_thread())
+
+    def release_actor(self, thread: Optional[threading.Thread] = None):
+        with self._condition:
+            thread = thread or threading.current_thread()
+            self._actors.discard(thread)
+            self._wake_at.pop(thread, None)
+            self._advance_if_idle()
+
+    def sleep(self, seconds: float):
+        me = threading.current_thread()
+        with self._condition:
+            self._actors.add(me)
+            wake_at = self._now + max(0.0, seconds)
+            self._wake_at[me] = wake_at
+            try:
+                while self._now < wake_at:
+                    if not self._advance_if_idle():
+                        self._condition.wait(self._liveness_check_sec)
+            finally:
+                self._wake_at.pop(me, None)
+
+    def idle(self):
+        # A loop that never sleeps would hold virtual time forever; let one poll interval pass.
+        self.sleep(CLOCK_POLL_INTERVAL_SEC)
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float,
+                 poll_interval: Optional[float] = None,
+                 condition: Optional[threading.Condition] = None) -> bool:
+        # Blocking on the condition would hold virtual time, so always poll on virtual time.
+        return self._poll(predicate, timeout, poll_interval, condition)
+
+    def _advance_if_idle(self) -> bool:
+        """Jumps to the earliest wake-up if every live actor is asleep. Caller holds the condition."""
+        earliest: Optional[float] = None
+        for thread in list(self._actors):
+            wake_at = self._wake_at.get(thread)
+            if wake_at is None:
+                if thread.ident is not None and not thread.is_alive():
+                    self._actors.discard(thread)  # Exited without releasing.
+                    continue
+                return False
+            if wake_at <= self._now:
+                return False
+            earliest = wake_at if earliest is None else min(earliest, wake_at)
+        if earliest is None:
+            return False
+        self._now = earliest
+        # Most jumps only wake the caller (a poll loop stepping ahead of the camera
+        # frame), so the other sleepers are only notified when one of them is due.
+        me = threading.current_thread()
+        if any(thread is not me and wake_at <= earliest for thread, wake_at in self._wake_at.items()):
+            self._condition.notify_all()
+        return True
+
+
+_clock: Clock = Clock()
+
+
+def get_clock() -> Clock:
+    """The clock the controllers and the FSM currently use."""
+    return _clock
+
+
+def set_clock(clock: Optional[Clock]) -> Clock:
+    """
+    Installs `clock` as the shared clock (None restores the real clock).
+
+    Returns:
+        Clock: The previously installed clock.
+    """
+    global _clock
+    previous = _clock
+    _clock = clock if clock is not None else Clock()
+    if _clock.is_simulated:
+        module_logger.warning("Simulated clock installed; time.sleep() waits are skipped for clock-aware code.")
+    return previous
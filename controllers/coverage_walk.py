@@ -0,0 +1,294 @@
+# Directory: controllers
+# Filename: coverage_walk.py
+#!/usr/bin/env python3
+
+# Coverage-guided random walk over the ApricornDeviceFSM transition table. The
+# transition list is the model: every (state, trigger, destination) it allows is
+# a coverage target, and so is every (state, destination) pair. Each step picks
+# the enabled trigger with the most new coverage per expected second (measured
+# trigger durations from the FSM's cost model). When nothing uncovered is enabled
+# here, it heads for the cheapest state that has something uncovered, and once
+# everything reachable is covered it keeps favouring the least-exercised
+# transitions. Every choice comes from one seeded RNG and every step is traced, so
+# a run can be reproduced from its seed (MODEL_WALK_SEED) and replayed from its trace.
+
+import json
+import logging
+import os
+import random
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from transitions import MachineError
+
+from controllers.clock import get_clock
+from controllers.finite_state_machine import TransitionCallbackError
+from controllers.state_navigator import AUTOMATIC_TRIGGERS, StateNavigator
+
+module_logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TRACE_DIR = os.path.join(PROJECT_ROOT, "logs")
+
+try:
+    MODEL_WALK_SEED: Optional[int] = int(os.environ["MODEL_WALK_SEED"])
+except (KeyError, TypeError, ValueError):
+    MODEL_WALK_SEED = None
+
+# A (state, trigger) that failed this many times stops counting as uncovered.
+try:
+    MODEL_WALK_MAX_FAILURES = int(os.environ.get("MODEL_WALK_MAX_FAILURES", "2"))
+except (TypeError, ValueError):
+    MODEL_WALK_MAX_FAILURES = 2
+
+# Weight of a new (state, destination) pair relative to a new transition.
+STATE_PAIR_WEIGHT = 0.5
+
+# Triggers the walk never fires: they spend brute-force attempts, destroy the
+# device or lock out resets, only move the model, need input the walk cannot
+# generate, or are fired by the FSM itself.
+WALK_EXCLUDED_TRIGGERS: Set[str] = {
+    "self_destruct", "fail_unlock", "last_try_login", "admin_recovery_failed",
+    "enable_provision_lock",
+    "enter_diagnostic_mode", "exit_diagnostic_mode",
+    "enroll_counter",
+} | AUTOMATIC_TRIGGERS
+
+# (source, trigger, destination)
+TransitionKey = Tuple[str, str, str]
+
+
+class CoverageWalker:
+    """Drives an ApricornDeviceFSM through the transitions it has exercised least."""
+
+    def __init__(self, fsm: Any, pin_generator: Optional[Any] = None, seed: Optional[int] = None,
+                 usb3: Optional[Callable[[], bool]] = None,
+                 excluded_triggers: Optional[Set[str]] = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            fsm (ApricornDeviceFSM): The machine to drive. Its transition costs weight the choices.
+            pin_generator (Optional[PINGenerator]): Supplies PINs for enroll_pin. Its rng is
+                replaced by one derived from the seed. Without it, PIN enrollment is never completed.
+            seed (Optional[int]): Seed for every random choice. Defaults to MODEL_WALK_SEED,
+                or a fresh random seed (logged, and written to the trace).
+            usb3 (Optional[Callable[[], bool]]): Decides the usb3 argument of each power_on.
+                Defaults to always USB3.
+            excluded_triggers (Optional[Set[str]]): Triggers never fired. Defaults to WALK_EXCLUDED_TRIGGERS.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.fsm = fsm
+        self.pin_generator = pin_generator
+        if seed is None:
+            seed = MODEL_WALK_SEED if MODEL_WALK_SEED is not None else random.SystemRandom().randrange(2 ** 32)
+        self.seed = int(seed)
+        self.rng = random.Random(self.seed)
+        if pin_generator is not None:
+            pin_generator.rng = random.Random(self.seed + 1)
+        self.usb3 = usb3 if usb3 else (lambda: True)
+        self.excluded_triggers = WALK_EXCLUDED_TRIGGERS if excluded_triggers is None else excluded_triggers
+        self.navigator = StateNavigator(fsm.transition_config, fsm.STATES, fsm.transition_costs,
+                                        excluded_triggers=self.excluded_triggers, model=fsm, logger_instance=self.logger)
+
+        self.transition_counts: Dict[TransitionKey, int] = {}
+        self.state_pair_counts: Dict[Tuple[str, str], int] = {}
+        self.failure_counts: Dict[Tuple[str, str], int] = {}
+        self.trace: List[Dict[str, Any]] = []
+        self.logger.info(f"Coverage walk seed: {self.seed}")
+
+    def model_transitions(self) -> Set[TransitionKey]:
+        """Every (source, trigger, destination) the transition table allows for triggers the walk fires."""
+        keys: Set[TransitionKey] = set()
+        automatic_dests: Dict[str, List[str]] = {}
+        for transition in self.fsm.transition_config:
+            if transition["trigger"] in AUTOMATIC_TRIGGERS:
+                automatic_dests.setdefault(transition["source"], []).append(transition["dest"])
+        for transition in self.fsm.transition_config:
+            trigger = transition["trigger"]
+            if trigger in self.excluded_triggers:
+                continue
+            source = transition["source"]
+            sources = self.fsm.STATES if source == "*" else (source if isinstance(source, list) else [source])
+            for state in sources:
+                if state in automatic_dests:
+                    continue  # Only passed through (POST); the walk is never there to fire anything.
+                for dest in automatic_dests.get(transition["dest"], [transition["dest"]]):
+                    if not (source == "*" and dest == state):
+                        keys.add((state, trigger, dest))
+        return keys
+
+    def coverage(self) -> Dict[str, Any]:
+        """Covered vs. modelled transitions and state pairs."""
+        model = self.model_transitions()
+        pairs = {(source, dest) for source, _, dest in model}
+        covered = set(self.transition_counts) & model
+        covered_pairs = set(self.state_pair_counts) & pairs
+        return {
+            "transitions_covered": len(covered),
+            "transitions_total": len(model),
+            "state_pairs_covered": len(covered_pairs),
+            "state_pairs_total": len(pairs),
+            "uncovered_transitions": sorted(model - covered),
+        }
+
+    def _trigger_kwargs(self, trigger: str) -> Optional[Dict[str, Any]]:
+        """Arguments for `trigger`, or None when it cannot be fired right now."""
+        if trigger == "power_on":
+            return {"usb3": bool(self.usb3())}
+        if trigger == "enroll_pin":
+            if self.pin_generator is None:
+                return None
+            return {"new_pin": self.pin_generator.generate_valid_pin(self.fsm.dut.minimum_pin_counter)["sequence"]}
+        if trigger == "unlock_user":
+            enrolled = sorted(slot for slot, pin in self.fsm.dut.user_pin.items() if pin)
+            if not enrolled:
+                return None
+            return {"user_id": self.rng.choice(enrolled)}
+        return {}
+
+    def _is_uncovered(self, state: str, trigger: str, dest: str) -> bool:
+        return ((state, trigger, dest) not in self.transition_counts
+                and self.failure_counts.get((state, trigger), 0) < MODEL_WALK_MAX_FAILURES)
+
+    def _gain(self, state: str, trigger: str, dest: str) -> float:
+        """New coverage a step would add, or its novelty once everything is covered."""
+        if self._is_uncovered(state, trigger, dest):
+            gain = 1.0
+            if (state, dest) not in self.state_pair_counts:
+                gain += STATE_PAIR_WEIGHT
+            return gain
+        visits = self.transition_counts.get((state, trigger, dest), 0) + self.failure_counts.get((state, trigger), 0)
+        return 1.0 / (1.0 + visits)
+
+    def choose(self) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+        """
+        Picks the next step from the current state.
+
+        Returns:
+            Optional[Tuple[str, Dict[str, Any], str, str]]: trigger, its kwargs, the expected
+            destination and why it was chosen ('new', 'route' or 'novelty'); None if nothing can fire.
+        """
+        state = self.fsm.state
+        graph = self.navigator.edges(include_self_loops=True)
+        candidates = [(cost, trigger, dest) for cost, trigger, dest in graph.get(state, [])
+                      if self._trigger_kwargs_available(trigger)]
+        if not candidates:
+            return None
+
+        new = [edge for edge in candidates if self._is_uncovered(state, edge[1], edge[2])]
+        if new:
+            return self._best(state, new, "new")
+
+        # Nothing new here: take the first step towards the cheapest state that has something new.
+        targets = [source for source, edges in graph.items() if source != state and any(
+            self._is_uncovered(source, trigger, dest) and self._trigger_kwargs_available(trigger)
+            for _, trigger, dest in edges)]
+        path = self.navigator.plan(state, targets) if targets else None
+        if path:
+            trigger, dest = path[0]
+            kwargs = self._trigger_kwargs(trigger)
+            if kwargs is not None:
+                return trigger, kwargs, dest, "route"
+
+        return self._best(state, candidates, "novelty")
+
+    def _trigger_kwargs_available(self, trigger: str) -> bool:
+        if trigger == "enroll_pin":
+            return self.pin_generator is not None
+        if trigger == "unlock_user":
+            return any(self.fsm.dut.user_pin.values())
+        return True
+
+    def _best(self, state: str, edges: List[Tuple[float, str, str]], reason: str) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+        scored = [(self._gain(state, trigger, dest) / max(cost, 0.1), trigger, dest) for cost, trigger, dest in edges]
+        top = max(score for score, _, _ in scored)
+        ties = sorted((trigger, dest) for score, trigger, dest in scored if score >= top * (1 - 1e-9))
+        trigger, dest = self.rng.choice(ties)
+        kwargs = self._trigger_kwargs(trigger)
+        if kwargs is None:
+            return None
+        return trigger, kwargs, dest, reason
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """Fires one trigger and records it. Returns the trace entry, or None if nothing could fire."""
+        choice = self.choose()
+        if choice is None:
+            self.logger.warning(f"Coverage walk: no trigger can fire from {self.fsm.state}.")
+            return None
+        trigger, kwargs, expected, reason = choice
+        source = self.fsm.state
+        clock = get_clock()
+        started = clock.monotonic()
+        error = None
+        try:
+            ok = bool(getattr(self.fsm, trigger)(**kwargs))
+        except (MachineError, TransitionCallbackError, RuntimeError) as e:
+            ok = False
+            error = str(e)
+        dest = self.fsm.state
+        entry = {
+            "step": len(self.trace) + 1,
+            "t": round(started, 3),
+            "source": source,
+            "trigger": trigger,
+            "kwargs": kwargs,
+            "expected": expected,
+            "dest": dest,
+            "ok": ok,
+            "duration_s": round(clock.monotonic() - started, 3),
+            "reason": reason,
+            "new_transition": False,
+            "new_pair": False,
+        }
+        if error:
+            entry["error"] = error
+        if ok:
+            key = (source, trigger, dest)
+            entry["new_transition"] = key not in self.transition_counts
+            entry["new_pair"] = (source, dest) not in self.state_pair_counts
+            self.transition_counts[key] = self.transition_counts.get(key, 0) + 1
+            self.state_pair_counts[(source, dest)] = self.state_pair_counts.get((source, dest), 0) + 1
+        else:
+            self.failure_counts[(source, trigger)] = self.failure_counts.get((source, trigger), 0) + 1
+            self.logger.warning(f"Coverage walk step {entry['step']}: '{trigger}' from {source} failed{': ' + error if error else ''}.")
+        self.trace.append(entry)
+        self.logger.info(
+            f"Coverage walk step {entry['step']} ({reason}): {source} --{trigger}--> {dest} "
+            f"in {entry['duration_s']:.1f}s{' [new]' if entry['new_transition'] else ''}")
+        return entry
+
+    def run(self, duration_sec: Optional[float] = None, max_steps: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Walks until `duration_sec` has passed on the shared clock or `max_steps` steps
+        have been taken (at least one limit is required).
+
+        Returns:
+            Dict[str, Any]: The coverage summary (see coverage()).
+        """
+        if duration_sec is None and max_steps is None:
+            raise ValueError("run() needs a duration_sec or a max_steps limit")
+        deadline = get_clock().deadline(duration_sec) if duration_sec is not None else None
+        steps = 0
+        while (deadline is None or not deadline.expired()) and (max_steps is None or steps < max_steps):
+            if self.step() is None:
+                break
+            steps += 1
+        summary = self.coverage()
+        self.logger.info(
+            f"Coverage walk (seed {self.seed}): {steps} steps, "
+            f"{summary['transitions_covered']}/{summary['transitions_total']} transitions, "
+            f"{summary['state_pairs_covered']}/{summary['state_pairs_total']} state pairs covered.")
+        return summary
+
+    def write_trace(self, path: Optional[str] = None) -> str:
+        """Writes the seed, the trace and the coverage summary as JSON. Returns the path."""
+        if path is None:
+            path = os.path.join(DEFAULT_TRACE_DIR, f"coverage_walk_{self.seed}.json")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        coverage = self.coverage()
+        coverage["uncovered_transitions"] = [list(key) for key in coverage["uncovered_transitions"]]
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"seed": self.seed, "steps": self.trace, "coverage": coverage}, handle, indent=2)
+        return path
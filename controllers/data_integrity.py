@@ -0,0 +1,249 @@
+# Directory: controllers
+# Filename: data_integrity.py
+#!/usr/bin/env python3
+
+# Native write/verify data-integrity engine. Fills a region of the DUT with
+# deterministic pseudo-random blocks (derived from a seed and the block index),
+# then re-generates and compares them later, typically after a power cycle or a
+# lock/unlock, to prove data and encryption keys survived. Replaces the standalone
+# disk_tester.exe scripts in utils/disk_reliability_exes for in-FSM use. Where
+# os.pwritev/os.preadv are missing (Windows), each block is a seek plus a plain
+# write or read under a lock shared by the workers.
+
+import logging
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from controllers.direct_io import is_device, is_supported, open_target, parse_size, preallocate
+
+module_logger = logging.getLogger(__name__)
+
+BYTES_PER_MB = 1000 ** 2
+
+# Region written by default, starting DATA_INTEGRITY_OFFSET bytes into the target.
+DATA_INTEGRITY_REGION_SIZE = os.environ.get("DATA_INTEGRITY_REGION_SIZE") or "1G"
+DATA_INTEGRITY_OFFSET = os.environ.get("DATA_INTEGRITY_OFFSET") or "0"
+DATA_INTEGRITY_BLOCK_SIZE = os.environ.get("DATA_INTEGRITY_BLOCK_SIZE") or "4M"
+try:
+    DATA_INTEGRITY_WORKERS = int(os.environ.get("DATA_INTEGRITY_WORKERS", "4"))
+except (TypeError, ValueError):
+    DATA_INTEGRITY_WORKERS = 4
+
+# Cap on individually reported mismatches; the counts always cover every block.
+MAX_REPORTED_MISMATCHES = 64
+
+
+def block_pattern(seed: int, block_index: int, block_size: int) -> np.ndarray:
+    """
+    Returns the expected contents of one block as a uint8 array.
+
+    Each block has its own PCG64 stream keyed by (seed, block_index), so any block
+    can be regenerated independently and a block written to the wrong LBA never
+    matches the pattern expected there.
+    """
+    rng = np.random.Generator(np.random.PCG64([seed, block_index]))
+    return np.frombuffer(rng.bytes(block_size), dtype=np.uint8)
+
+
+class DataIntegrityEngine:
+    """
+    Writes and verifies seeded pseudo-random blocks across a region of a block
+    device or file using aligned direct I/O and a pool of worker threads.
+    """
+
+    def __init__(self, target: str, seed: int, size: Any = DATA_INTEGRITY_REGION_SIZE,
+                 offset: Any = DATA_INTEGRITY_OFFSET, block_size: Any = DATA_INTEGRITY_BLOCK_SIZE,
+                 workers: int = DATA_INTEGRITY_WORKERS, direct: bool = True,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            target (str): Block device or file path. A missing file is created on write.
+            seed (int): Pattern seed; verification must use the seed the data was written with.
+            size (Any): Region length (bytes or fio-style string, e.g. '1G').
+            offset (Any): Region start in bytes; must be block-size aligned.
+            block_size (Any): Bytes per I/O; a multiple of the page size.
+            workers (int): Concurrent I/O workers.
+            direct (bool): Bypass the page cache with O_DIRECT where supported.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+
+        Raises:
+            ValueError: For misaligned or empty regions.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.target = target
+        self.seed = int(seed)
+        self.block_size = parse_size(block_size)
+        self.offset = parse_size(offset)
+        self.size = parse_size(size)
+        self.workers = max(1, int(workers))
+        self.direct = direct
+        # Without positional I/O the workers share the file offset, so seek and transfer must not interleave.
+        self.positional_io = is_supported()
+        self._seek_lock = threading.Lock()
+        if self.block_size <= 0 or self.block_size % mmap.PAGESIZE:
+            raise ValueError(f"Block size {self.block_size} must be a multiple of the page size ({mmap.PAGESIZE}).")
+        if self.offset % self.block_size:
+            raise ValueError(f"Offset {self.offset} is not aligned to the {self.block_size}-byte block size.")
+        self.blocks = self.size // self.block_size
+        if self.blocks <= 0:
+            raise ValueError(f"Region of {self.size} bytes is smaller than one {self.block_size}-byte block.")
+
+    def _run(self, operation: str, io_fn) -> Dict[str, Any]:
+        """Runs io_fn(fd, buffer, block_index) for every block across the worker pool."""
+        writable = operation == "write"
+        fd, direct_active = open_target(self.target, writable, direct=self.direct, logger_instance=self.logger)
+        next_block = iter(range(self.blocks))
+        lock = threading.Lock()
+        try:
+            end = self.offset + self.blocks * self.block_size
+            if writable and not is_device(self.target) and os.lseek(fd, 0, os.SEEK_END) < end:
+                preallocate(fd, end)
+
+            def worker() -> List[Dict[str, Any]]:
+                # mmap allocations are page-aligned, as O_DIRECT requires.
+                buffer = mmap.mmap(-1, self.block_size)
+                findings: List[Dict[str, Any]] = []
+                try:
+                    while True:
+                        with lock:
+                            block_index = next(next_block, None)
+                        if block_index is None:
+                            return findings
+                        finding = io_fn(fd, buffer, block_index)
+                        if finding:
+                            findings.append(finding)
+                finally:
+                    buffer.close()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"integrity-{operation}") as pool:
+                futures = [pool.submit(worker) for _ in range(self.workers)]
+                findings = [finding for future in futures for finding in future.result()]
+            if writable:
+                os.fsync(fd)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.close(fd)
+
+        findings.sort(key=lambda finding: finding["offset"])
+        total_bytes = self.blocks * self.block_size
+        return {
+            "operation": operation,
+            "target": self.target,
+            "seed": self.seed,
+            "offset": self.offset,
+            "bytes": total_bytes,
+            "blocks": self.blocks,
+            "elapsed_s": round(elapsed, 3),
+            "mbps": round(total_bytes / elapsed / BYTES_PER_MB, 2) if elapsed > 0 else 0.0,
+            "direct_io": direct_active,
+            "mismatched_blocks": len(findings),
+            "mismatched_bytes": sum(finding["bytes_mismatched"] for finding in findings),
+            "mismatches": findings[:MAX_REPORTED_MISMATCHES],
+            "passed": not findings,
+        }
+
+    def _block_offset(self, block_index: int) -> int:
+        return self.offset + block_index * self.block_size
+
+    def _write_at(self, fd: int, buffer: mmap.mmap, offset: int) -> int:
+        if self.positional_io:
+            return os.pwritev(fd, [buffer], offset)
+        view = memoryview(buffer)
+        written = 0
+        with self._seek_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while written < len(view):
+                count = os.write(fd, view[written:])
+                if count <= 0:
+                    break
+                written += count
+        return written
+
+    def _read_at(self, fd: int, buffer: mmap.mmap, offset: int) -> int:
+        if self.positional_io:
+            return os.preadv(fd, [buffer], offset)
+        view = memoryview(buffer)
+        read = 0
+        with self._seek_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while read < len(view):
+                if hasattr(os, "readv"):
+                    # Straight into the page-aligned buffer, as O_DIRECT requires.
+                    count = os.readv(fd, [view[read:]])
+                else:
+                    data = os.read(fd, len(view) - read)
+                    count = len(data)
+                    view[read:read + count] = data
+                if count <= 0:
+                    break
+                read += count
+        return read
+
+    def write(self) -> Dict[str, Any]:
+        """
+        Writes the seeded pattern across the region.
+
+        Returns:
+            Dict[str, Any]: bytes, blocks, elapsed_s, mbps and direct_io for the pass.
+
+        Raises:
+            OSError: If the target cannot be opened or a write fails.
+        """
+        def write_block(fd: int, buffer: mmap.mmap, block_index: int) -> None:
+            np.frombuffer(buffer, dtype=np.uint8)[:] = block_pattern(self.seed, block_index, self.block_size)
+            written = self._write_at(fd, buffer, self._block_offset(block_index))
+            if written != self.block_size:
+                raise OSError(f"Short write at offset {self._block_offset(block_index)}: {written} of {self.block_size} bytes.")
+
+        result = self._run("write", write_block)
+        self.logger.info("Integrity pattern written: %s blocks (%s bytes) at %s MB/s, seed %s.",
+                         result["blocks"], result["bytes"], result["mbps"], self.seed)
+        return result
+
+    def verify(self) -> Dict[str, Any]:
+        """
+        Reads the region back and compares every block with its regenerated pattern.
+
+        Returns:
+            Dict[str, Any]: As for write(), plus 'passed', 'mismatched_blocks',
+            'mismatched_bytes' and up to MAX_REPORTED_MISMATCHES 'mismatches'
+            entries (offset of the first bad byte, block offset, bytes mismatched,
+            and the first 16 expected/actual bytes from there in hex).
+
+        Raises:
+            OSError: If the target cannot be opened or a read fails.
+        """
+        def verify_block(fd: int, buffer: mmap.mmap, block_index: int) -> Optional[Dict[str, Any]]:
+            block_offset = self._block_offset(block_index)
+            read = self._read_at(fd, buffer, block_offset)
+            actual = np.frombuffer(buffer, dtype=np.uint8)
+            expected = block_pattern(self.seed, block_index, self.block_size)
+            if read == self.block_size and np.array_equal(actual, expected):
+                return None
+            differing = np.flatnonzero(actual[:read] != expected[:read])
+            bytes_mismatched = int(differing.size) + (self.block_size - read)
+            first = int(differing[0]) if differing.size else read
+            return {
+                "offset": block_offset + first,
+                "block_offset": block_offset,
+                "bytes_mismatched": bytes_mismatched,
+                "expected": expected[first:first + 16].tobytes().hex(),
+                "actual": actual[first:min(first + 16, read)].tobytes().hex(),
+            }
+
+        result = self._run("verify", verify_block)
+        if result["passed"]:
+            self.logger.info("Integrity verify passed: %s blocks (%s bytes) at %s MB/s, seed %s.",
+                             result["blocks"], result["bytes"], result["mbps"], self.seed)
+        else:
+            self.logger.error("Integrity verify FAILED: %s of %s blocks mismatched (%s bytes), first at offset %s.",
+                              result["mismatched_blocks"], result["blocks"], result["mismatched_bytes"],
+                              result["mismatches"][0]["offset"])
+        return result
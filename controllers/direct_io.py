@@ -0,0 +1,285 @@
+# Directory: controllers
+# Filename: direct_io.py
+#!/usr/bin/env python3
+
+# Built-in throughput engine used when no fio binary is available for the host.
+# Opens the target with O_DIRECT, issues page-aligned pwritev/preadv calls from a
+# pool of worker threads (one per outstanding I/O, i.e. the queue depth) and reports
+# per-job FioJobResult objects in the same shape as run_fio_tests.
+
+import logging
+import mmap
+import os
+import random
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from controllers.fio_results import FioDirectionResult, FioJobResult
+
+module_logger = logging.getLogger(__name__)
+
+# Region exercised when the target is an empty regular file and no size is given.
+try:
+    DIRECT_IO_DEFAULT_FILE_SIZE_MB = int(os.environ.get("DIRECT_IO_DEFAULT_FILE_SIZE_MB", "512"))
+except (TypeError, ValueError):
+    DIRECT_IO_DEFAULT_FILE_SIZE_MB = 512
+
+_SIZE_SUFFIXES = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# fio 'rw' value -> (direction, pattern)
+_RW_MODES = {
+    "write": ("write", "seq"),
+    "read": ("read", "seq"),
+    "randwrite": ("write", "rand"),
+    "randread": ("read", "rand"),
+}
+
+
+def parse_size(value: Any) -> int:
+    """
+    Converts an fio-style size ('4k', '1m', '512M', 4096) into bytes.
+
+    Raises:
+        ValueError: If the value cannot be parsed.
+    """
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().lower()
+    if text and text[-1] == "b":
+        text = text[:-1]
+    multiplier = 1
+    if text and text[-1] in _SIZE_SUFFIXES:
+        multiplier = _SIZE_SUFFIXES[text[-1]]
+        text = text[:-1]
+    try:
+        return int(float(text) * multiplier)
+    except ValueError:
+        raise ValueError(f"Invalid size: {value!r}") from None
+
+
+def is_supported() -> bool:
+    """True when the platform provides positional vectored I/O (Linux, macOS)."""
+    return hasattr(os, "pwritev") and hasattr(os, "preadv")
+
+
+def is_device(path: str) -> bool:
+    """True for block and raw (character) disk nodes, and Windows device paths (\\\\.\\PhysicalDrive1)."""
+    if path.startswith("\\\\.\\"):
+        return True
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISBLK(mode) or stat.S_ISCHR(mode)
+
+
+def open_target(path: str, writable: bool, direct: bool = True,
+                logger_instance: Optional[logging.Logger] = None) -> Tuple[int, bool]:
+    """
+    Opens a device or file for unbuffered I/O, creating a missing file.
+
+    Falls back to buffered I/O with the page cache advised away (or F_NOCACHE on
+    macOS) when O_DIRECT is unavailable or rejected, e.g. on tmpfs.
+
+    Returns:
+        Tuple[int, bool]: The file descriptor and whether O_DIRECT is in effect.
+    """
+    logger = logger_instance if logger_instance else module_logger
+    flags = (os.O_RDWR if writable else os.O_RDONLY) | getattr(os, "O_BINARY", 0)
+    if not os.path.exists(path):
+        flags |= os.O_CREAT
+    o_direct = getattr(os, "O_DIRECT", 0)
+    if direct and o_direct:
+        try:
+            return os.open(path, flags | o_direct, 0o644), True
+        except OSError as exc:
+            # tmpfs and some filesystems reject O_DIRECT with EINVAL.
+            logger.warning("O_DIRECT unavailable for %s (%s); using buffered I/O.", path, exc)
+    fd = os.open(path, flags, 0o644)
+    if direct and hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+    elif direct and sys.platform == "darwin":
+        try:
+            import fcntl
+            fcntl.fcntl(fd, getattr(fcntl, "F_NOCACHE", 48), 1)
+        except (ImportError, OSError):
+            pass
+    return fd, False
+
+
+def preallocate(fd: int, size: int) -> None:
+    """Extends a regular file to `size` bytes, allocating blocks where supported."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+class DirectIOBenchmark:
+    """
+    Measures sequential or random read/write throughput against a block device
+    or a preallocated file without an external binary.
+
+    Each job mirrors an fio job definition ({'name', 'rw', 'bs', 'iodepth',
+    optional 'size'}). A job stops after `duration` seconds or after one pass
+    over the region, whichever comes first, like fio without time_based.
+    """
+
+    def __init__(self, target: str, duration: float = 10, size: Optional[Any] = None,
+                 direct: bool = True, seed: Optional[int] = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            target (str): Block device or file path. A missing file is created.
+            duration (float): Maximum runtime per job in seconds.
+            size (Optional[Any]): Region to exercise (bytes or fio-style string).
+                Defaults to the device size, or the file size for a non-empty file.
+            direct (bool): Open with O_DIRECT to bypass the page cache. Falls back
+                to buffered I/O (with fsync after writes) where unsupported.
+            seed (Optional[int]): Seed for random offsets.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        if not is_supported():
+            raise NotImplementedError("Direct I/O benchmarking requires os.pwritev/os.preadv (Linux or macOS).")
+        self.logger = logger_instance if logger_instance else module_logger
+        self.target = target
+        self.duration = float(duration)
+        self.size = parse_size(size) if size is not None else None
+        self.direct = direct
+        self.seed = seed
+        self.direct_active: bool = False
+
+    # --- Target handling ---
+
+    def _open(self, writable: bool) -> int:
+        fd, self.direct_active = open_target(self.target, writable, direct=self.direct, logger_instance=self.logger)
+        return fd
+
+    def _is_block_device(self) -> bool:
+        return is_device(self.target)
+
+    def _region_size(self, fd: int, block_size: int) -> int:
+        current = os.lseek(fd, 0, os.SEEK_END)
+        size = self.size
+        if size is None:
+            size = current if current > 0 else DIRECT_IO_DEFAULT_FILE_SIZE_MB * 1024 * 1024
+        size -= size % block_size
+        if size <= 0:
+            raise ValueError(f"Target {self.target} is smaller than one {block_size}-byte block.")
+        if current < size:
+            self._preallocate(fd, size)
+        return size
+
+    def _preallocate(self, fd: int, size: int) -> None:
+        self.logger.debug("Preallocating %s bytes in %s.", size, self.target)
+        preallocate(fd, size)
+
+    # --- Offset generators ---
+
+    def _offsets(self, pattern: str, region: int, block_size: int) -> Iterator[int]:
+        blocks = region // block_size
+        if pattern == "seq":
+            return (index * block_size for index in range(blocks))
+        rng = random.Random(self.seed)
+        return (rng.randrange(blocks) * block_size for _ in range(blocks))
+
+    # --- Job execution ---
+
+    def run_job(self, rw: str = "read", bs: Any = "1m", iodepth: int = 1,
+                size: Optional[Any] = None) -> FioDirectionResult:
+        """
+        Runs one job and returns its bandwidth, IOPS and completion-latency percentiles.
+
+        Raises:
+            ValueError: For an unknown 'rw' mode or a non page-aligned block size.
+            OSError: If the target cannot be opened or an I/O call fails.
+        """
+        if rw not in _RW_MODES:
+            raise ValueError(f"Unsupported rw mode '{rw}'. Expected one of {sorted(_RW_MODES)}.")
+        direction, pattern = _RW_MODES[rw]
+        block_size = parse_size(bs)
+        if block_size <= 0 or block_size % mmap.PAGESIZE:
+            raise ValueError(f"Block size {block_size} must be a multiple of the page size ({mmap.PAGESIZE}).")
+        queue_depth = max(1, int(iodepth or 1))
+        saved_size = self.size
+        if size is not None:
+            self.size = parse_size(size)
+
+        # Regular files may need preallocating, so they are always opened read/write.
+        fd = self._open(writable=(direction == "write") or not self._is_block_device())
+        try:
+            region = self._region_size(fd, block_size)
+            offsets = self._offsets(pattern, region, block_size)
+            lock = threading.Lock()
+            deadline = time.monotonic() + self.duration
+            pattern_bytes = os.urandom(block_size)
+
+            def worker() -> Tuple[int, List[float]]:
+                # mmap allocations are page-aligned, as O_DIRECT requires.
+                buffer = mmap.mmap(-1, block_size)
+                latencies: List[float] = []
+                try:
+                    if direction == "write":
+                        buffer.write(pattern_bytes)
+                    done = 0
+                    while time.monotonic() < deadline:
+                        with lock:
+                            offset = next(offsets, None)
+                        if offset is None:
+                            break
+                        issued = time.perf_counter()
+                        if direction == "write":
+                            count = os.pwritev(fd, [buffer], offset)
+                        else:
+                            count = os.preadv(fd, [buffer], offset)
+                        latencies.append(time.perf_counter() - issued)
+                        if count <= 0:
+                            break
+                        done += count
+                    return done, latencies
+                finally:
+                    buffer.close()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=queue_depth, thread_name_prefix="direct-io") as pool:
+                futures = [pool.submit(worker) for _ in range(queue_depth)]
+                outcomes = [future.result() for future in futures]
+            if direction == "write":
+                os.fsync(fd)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.close(fd)
+            self.size = saved_size
+
+        total_bytes = sum(done for done, _ in outcomes)
+        latencies = [latency for _, worker_latencies in outcomes for latency in worker_latencies]
+        return FioDirectionResult.from_samples(total_bytes, elapsed, latencies)
+
+    def run(self, tests_to_run: List[Dict[str, Any]]) -> Dict[str, FioJobResult]:
+        """
+        Runs each job in order, matching the per-job shape returned by run_fio_tests.
+
+        Returns:
+            Dict[str, FioJobResult]: Job name -> result for the direction it exercised.
+        """
+        results: Dict[str, FioJobResult] = {}
+        for index, test_params in enumerate(tests_to_run):
+            rw = test_params.get("rw", "read")
+            name = test_params.get("name") or f"job{index}"
+            direction_result = self.run_job(rw=rw, bs=test_params.get("bs", "1m"),
+                                            iodepth=test_params.get("iodepth", 1), size=test_params.get("size"))
+            results[name] = FioJobResult(name=name, runtime_s=direction_result.runtime_s,
+                                         **{_RW_MODES[rw][0]: direction_result})
+            self.logger.debug("--- Direct I/O Test '%s' Result: %s (O_DIRECT=%s)",
+                              name, results[name].summary(), self.direct_active)
+        return results
@@ -2,8 +2,9 @@
 # Filename: finite_state_machine.py
 #!/usr/bin/env python3
 
+import collections
+import copy
 import logging
-import time # For simulating delays if needed
 from typing import List, Dict, Tuple, Any, Optional, Callable, Union # For type hinting
 import os
 from pprint import pprint
@@ -11,7 +12,10 @@ import json
 from utils.led_states import LEDs
 import subprocess
 import statistics
+import sqlite3
 import sys
+import threading
+import weakref
 
 ### For running scripts
 # from transitions import Machine, EventData
@@ -22,16 +26,53 @@ import sys
 # and a heavyweight machine for generating diagrams, without affecting the main code.
 DIAGRAM_MODE = os.environ.get('FSM_DIAGRAM_MODE', 'false').lower() == 'true'
 
+# --- Enumeration Latency Mode ---
+# Key-release -> USB and block device latencies are always recorded (they come for free
+# from the enumeration check). Mount readiness needs an extra wait, so it is only measured
+# when this mode is enabled.
+ENUM_LATENCY_MODE = os.environ.get('ENUM_LATENCY_MODE', 'false').lower() == 'true'
+try:
+    ENUM_LATENCY_MOUNT_TIMEOUT_SEC = float(os.environ.get('ENUM_LATENCY_MOUNT_TIMEOUT_SEC', '10'))
+except (TypeError, ValueError):
+    ENUM_LATENCY_MOUNT_TIMEOUT_SEC = 10.0
+
+# --- Condition Waits ---
+# Callbacks wait for a condition with a deadline instead of sleeping for a fixed time.
+# How long the user-reset keys must be held, measured from the moment all three are down.
+try:
+    USER_RESET_HOLD_SEC = float(os.environ.get('USER_RESET_HOLD_SEC', '10'))
+except (TypeError, ValueError):
+    USER_RESET_HOLD_SEC = 10.0
+
+# --- Live Metrics ---
+# Most recent trigger durations kept per trigger for the latency percentiles of metrics_snapshot().
+try:
+    TRANSITION_LATENCY_WINDOW = int(os.environ.get('TRANSITION_LATENCY_WINDOW', '500'))
+except (TypeError, ValueError):
+    TRANSITION_LATENCY_WINDOW = 500
+
 if DIAGRAM_MODE:
     from transitions.extensions import GraphMachine as Machine
     print("FSM running in DIAGRAM_MODE with GraphMachine.")
 else:
     from transitions import Machine
-from transitions import EventData
+from transitions import EventData, MachineError
 
 
 # from usb_tool import find_apricorn_device
 from .unified_controller import UnifiedController
+from .fio_results import FioJobResult, DIRECTION_METRICS, percentile, summarize_values
+from .speed_baseline import SpeedBaselineStore, SPEED_BASELINE_ENABLED
+from .clock import get_clock
+from .state_navigator import StateNavigator, TransitionCostModel
+from .transition_profiler import get_profiler, PHASE_TRIGGER
+from .session_journal import (
+    SessionJournal, read_journal, JOURNAL_VERSION, RECORD_SESSION_START, RECORD_RESTORE,
+    RECORD_BLOCK_START, RECORD_BLOCK_RESUME, RECORD_BLOCK_END, RECORD_KEY_PRESS, RECORD_TRANSITION,
+    RECORD_LED_RUN, RECORD_ENUMERATION, RECORD_ENUM_LATENCY, RECORD_WAIT, RECORD_PHIDGET_DETACH,
+    RECORD_FAILURE, RECORD_WARNING, RECORD_SPEED_RESULT, RECORD_SPEED_REGRESSION, RECORD_SPEED_TIMESERIES,
+    RECORD_INTEGRITY, RECORD_FORMAT, RECORD_ITERATION,
+)
 
 # --- Custom Exception for Transition Failures ---
 class TransitionCallbackError(Exception):
@@ -93,6 +134,26 @@ class DeviceUnderTest:
     and hardware identifiers. The FSM and its callbacks read from and write
     to an instance of this class to mirror the device's real-world state.
     """
+    # Model state saved by checkpoint_state(), with the type each field must hold. Profile
+    # constants (firmware, IDs, battery) and enumeration details (serial, disk path) are
+    # not saved: the resumed run reads them from the profile and the next enumeration.
+    CHECKPOINT_FIELDS: Dict[str, Any] = {
+        'usb3': bool, 'completed_cmfr': bool, 'basic_disk': bool, 'removable_media': bool,
+        'brute_force_counter': int, 'brute_force_counter_current': int,
+        'led_flicker': bool, 'lock_override': bool, 'manufacturer_reset_enum': bool, 'minimum_pin_counter': int,
+        'provision_lock': bool, 'provision_lock_bricked': bool, 'provision_lock_recovery_counter': int,
+        'read_only_enabled': bool, 'unattended_auto_lock_counter': int, 'needs_block_orientation': bool,
+        'user_forced_enrollment': bool, 'user_forced_enrollment_used': bool,
+        'pending_enrollment_type': (str, type(None)),
+        'admin_pin': list, 'old_admin_pin': list,
+        'recovery_pin': dict, 'old_recovery_pin': dict, 'recovery_pin_used': dict,
+        'self_destruct_enabled': bool, 'self_destruct_pin': list, 'old_self_destruct_pin': list,
+        'self_destruct_enum': bool, 'self_destruct_used': bool,
+        'user_pin': dict, 'old_user_pin': dict, 'user_pin_enum': dict,
+    }
+    # Dicts keyed by PIN slot; JSON turns their integer keys into strings.
+    _SLOT_KEYED_FIELDS = ('recovery_pin', 'old_recovery_pin', 'recovery_pin_used', 'user_pin', 'old_user_pin', 'user_pin_enum')
+
     def __init__(self, 
                  at_controller: 'UnifiedController', 
                  target_device_profile: Optional[str] = None, 
@@ -266,6 +327,47 @@ class DeviceUnderTest:
 
         self.unattended_auto_lock_counter = 0
 
+    def _check_checkpoint_field(self, name: str, value: Any):
+        expected = self.CHECKPOINT_FIELDS[name]
+        expected = expected if isinstance(expected, tuple) else (expected,)
+        # bool is an int subclass, but a counter holding True is as wrong as one holding '3'.
+        if not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected):
+            names = " or ".join(kind.__name__ for kind in expected)
+            raise TypeError(f"DUT checkpoint field '{name}' holds {type(value).__name__} {value!r}, expected {names}.")
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """
+        The CHECKPOINT_FIELDS of the model as a dict.
+
+        Raises:
+            TypeError: A field holds a value of another type.
+        """
+        state = {}
+        for name in self.CHECKPOINT_FIELDS:
+            value = getattr(self, name)
+            self._check_checkpoint_field(name, value)
+            state[name] = value
+        return state
+
+    def restore_checkpoint_state(self, state: Dict[str, Any]):
+        """
+        Loads a checkpoint_state() dict. JSON turns the integer slot keys of the PIN
+        dicts into strings, so those keys are converted back.
+
+        Raises:
+            ValueError: The checkpoint has a field that is not in CHECKPOINT_FIELDS.
+            TypeError: A field has the wrong type. Nothing is restored in either case.
+        """
+        unknown = sorted(set(state) - set(self.CHECKPOINT_FIELDS))
+        if unknown:
+            raise ValueError(f"DUT checkpoint has unknown fields: {unknown}")
+        for name, value in state.items():
+            self._check_checkpoint_field(name, value)
+        for name, value in state.items():
+            if name in self._SLOT_KEYED_FIELDS:
+                value = {int(slot): entry for slot, entry in value.items()}
+            setattr(self, name, value)
+
 class TestSession:
     """
     Tracks and stores information about a single script execution session.
@@ -276,6 +378,22 @@ class TestSession:
     hardware state.
     """    
     __test__ = False
+
+    # Metrics saved by checkpoint_state(). The block-keyed dicts get their integer keys back on restore.
+    CHECKPOINT_FIELDS = (
+        'script_num', 'script_title', 'current_test_block', 'test_blocks',
+        'block_failure_count', 'block_warning_count', 'block_enumeration_totals', 'script_enumeration_totals',
+        'failure_block', 'warning_block', 'warning_description_block', 'key_press_totals',
+        'speed_test_results', 'speed_test_timeseries', 'integrity_seed', 'integrity_results',
+        'speed_regressions', 'format_results', 'usb3_fail_count', 'phidget_detach_events',
+        'enum_latency_samples', 'wait_samples', 'block_iteration_totals',
+    )
+    _BLOCK_KEYED_FIELDS = (
+        'test_blocks', 'block_failure_count', 'block_warning_count', 'block_enumeration_totals',
+        'failure_block', 'warning_block', 'warning_description_block', 'enum_latency_samples',
+        'block_iteration_totals',
+    )
+
     def __init__(self, at_controller: 'UnifiedController', dut_instance: 'DeviceUnderTest'):
         """
         Initializes the session tracker.
@@ -289,6 +407,23 @@ class TestSession:
         self.at = at_controller
         self.dut = dut_instance # Use the provided DUT, don't create a new one.
 
+        # Timing
+        self.script_start_time: float = get_clock().time()
+        self.block_start_time: float = 0.0
+        self.block_end_time: float = 0.0
+
+        # History of speed results per device profile; None disables regression checks.
+        self.speed_baseline: Optional[SpeedBaselineStore] = SpeedBaselineStore() if SPEED_BASELINE_ENABLED else None
+        # Append-only record of every session event (see open_journal()); None keeps the metrics in memory only.
+        self.journal: Optional[SessionJournal] = None
+        # Held while the metrics change (_apply(), rebuild_from_journal()) and while
+        # metrics_snapshot() reads them from the metrics server's thread.
+        self._metrics_lock = threading.Lock()
+
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        """Sets every metric to its initial value (also before a journal is replayed into them)."""
         # Script Identification
         self.script_num: int = 0
         self.script_title: str = "N/A"
@@ -300,11 +435,6 @@ class TestSession:
         self.block_failure_count: dict = {}
         self.block_warning_count: dict = {}
 
-        # Timing
-        self.script_start_time: float = time.time()
-        self.block_start_time: float = 0.0
-        self.block_end_time: float = 0.0
-        
         self.block_enumeration_totals: dict = {}
         self.script_enumeration_totals: dict = {}
 
@@ -316,27 +446,118 @@ class TestSession:
         # Other Metrics
         self.key_press_totals: dict = {}
         self.speed_test_results: list = []
+        # Per speed test: block, fio interval samples and early-abort reason (if any).
+        self.speed_test_timeseries: list = []
+        # Seed of the integrity pattern currently on the DUT, and every write/verify result.
+        self.integrity_seed: Optional[int] = None
+        self.integrity_results: list = []
+        self.speed_regressions: list = []
+        # Per format: block, outcome and per-phase durations (see LinuxFormatPipeline.run).
+        self.format_results: list = []
         self.usb3_fail_count: int = 0
+        # Phidget board detach/reattach events, fed by PhidgetController's detach listener.
+        self.phidget_detach_events: list = []
+        # block_id -> event type -> metric ('usb', 'block', 'mount') -> latencies in seconds
+        self.enum_latency_samples: Dict[int, Dict[str, Dict[str, List[float]]]] = {}
+        # Condition waits that replaced fixed sleeps: block, name, waited_s, max_wait_s and met.
+        self.wait_samples: list = []
+
+        # Live counters for metrics_snapshot(). Every write goes through _apply(), which
+        # holds _metrics_lock, and the metrics server reads them under the same lock.
+        # block_id -> {'passed': n, 'failed': n}; an iteration failed if it logged a failure.
+        self.block_iteration_totals: Dict[int, Dict[str, int]] = {}
+        self._iteration_failure_marks: Dict[int, int] = {}
+        # trigger -> {'ok': n, 'failed': n}, and trigger -> the most recent trigger durations in seconds.
+        self.transition_totals: Dict[str, Dict[str, int]] = {}
+        self.transition_durations: Dict[str, collections.deque] = {}
+
+    def open_journal(self, path: str, **journal_kwargs: Any) -> SessionJournal:
+        """
+        Starts appending every session event to the JSON-lines journal at `path`.
+
+        Args:
+            path (str): The journal file, usually SESSION_JOURNAL_FILENAME in the run directory.
+            **journal_kwargs: Passed on to SessionJournal (flush and fsync intervals, queue size).
+
+        Returns:
+            SessionJournal: The open journal, also kept as self.journal.
+        """
+        self.close_journal()
+        self.journal = SessionJournal(path, logger_instance=self.logger, **journal_kwargs)
+        self._record(RECORD_SESSION_START, version=JOURNAL_VERSION, wall=get_clock().time(), pid=os.getpid(),
+                     device=self.dut.name, bridge_fw=str(self.dut.bridge_fw),
+                     mcu_fw=str(self.dut.mcu_fw_human_readable), serial=self.dut.scanned_serial_number)
+        return self.journal
+
+    def close_journal(self):
+        """Writes out and closes the journal, if one is open."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def rebuild_from_journal(self, path: str) -> int:
+        """
+        Replaces the session metrics with those replayed from a journal.
+
+        The journal is read one line at a time, so rebuilding a multi-day run
+        does not hold its events in memory.
+
+        Args:
+            path (str): A journal written by open_journal().
+
+        Returns:
+            int: The number of records applied.
+        """
+        if self.journal is not None and os.path.abspath(self.journal.path) == os.path.abspath(path):
+            self.journal.flush()
+        applied = 0
+        # A snapshot taken meanwhile sees the old metrics or the rebuilt ones, never a partial replay.
+        with self._metrics_lock:
+            self._reset_metrics()
+            for record in read_journal(path, logger_instance=self.logger):
+                try:
+                    self._update_metrics(record)
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    self.logger.warning(f"Skipping journal record {record.get('seq')} ({record.get('kind')}): {e!r}")
+                    continue
+                applied += 1
+        return applied
+
+    def _record(self, kind: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Applies one session event to the metrics and appends it to the journal.
+
+        Args:
+            kind (str): One of the RECORD_* kinds of controllers/session_journal.py.
+            **fields: The event's data. 'block' defaults to the current block.
+
+        Returns:
+            Dict[str, Any]: The record.
+        """
+        record: Dict[str, Any] = {'kind': kind, 'block': self.current_test_block}
+        record.update(fields)
+        self._apply(record)
+        if self.journal is not None:
+            self.journal.record(record)
+        return record
+
+    def _apply(self, record: Dict[str, Any]):
+        """Updates the metrics from a record. Kinds without an _apply_<kind> method are only journaled."""
+        with self._metrics_lock:
+            self._update_metrics(record)
+
+    def _update_metrics(self, record: Dict[str, Any]):
+        """_apply() for a caller that already holds _metrics_lock."""
+        apply = getattr(self, f"_apply_{record['kind']}", None)
+        if apply is not None:
+            apply(record)
 
     def start_new_block(self, block_name: str, current_test_block: int):
         """Resets counters and timers for the start of a new test block."""
-        self.block_start_time = time.time()
-        self.current_test_block = current_test_block
+        self.block_start_time = get_clock().time()
+        self._record(RECORD_BLOCK_START, block=current_test_block, name=block_name,
+                     script_num=self.script_num, script_title=self.script_title)
         self.dut.needs_block_orientation = True
-        # Track mapping from block id to human-readable name
-        self.test_blocks[self.current_test_block] = block_name
-
-        self.block_enumeration_totals.update({self.current_test_block: {}})
-        self.block_enumeration_totals[self.current_test_block].update({"mfr": 0})
-        self.block_enumeration_totals[self.current_test_block].update({"oob": 0})
-        self.block_enumeration_totals[self.current_test_block].update({"pin": 0})
-        self.block_enumeration_totals[self.current_test_block].update({"spi": 0})
-        
-        self.block_failure_count[self.current_test_block] = 0
-        self.block_warning_count[self.current_test_block] = 0
-        self.failure_block[self.current_test_block] = []
-        self.warning_block[self.current_test_block] = []
-        self.warning_description_block[self.current_test_block] = []
 
         if self.dut.secure_key:
             self.at.on("hold")
@@ -344,48 +565,490 @@ class TestSession:
         self.logger.info(f"__________"*10)
         self.logger.info("")
 
+    def _apply_block_start(self, record: Dict[str, Any]):
+        block = record['block']
+        self.current_test_block = block
+        self.script_num = record.get('script_num', self.script_num)
+        self.script_title = record.get('script_title', self.script_title)
+        # Track mapping from block id to human-readable name
+        self.test_blocks[block] = record['name']
+
+        self.block_enumeration_totals[block] = {"mfr": 0, "oob": 0, "pin": 0, "spi": 0}
+        self.block_failure_count[block] = 0
+        self.block_warning_count[block] = 0
+        self.failure_block[block] = []
+        self.warning_block[block] = []
+        self.warning_description_block[block] = []
+
+    def resume_block(self):
+        """
+        Re-enters the current block after a checkpoint restore: repeats the hardware
+        set-up of start_new_block() but keeps the block's counters and timers.
+        """
+        self._record(RECORD_BLOCK_RESUME)
+        self.dut.needs_block_orientation = True
+        if self.dut.secure_key:
+            self.at.on("hold")
+        self.logger.info(f"__________"*10)
+        self.logger.info(f"Resuming block {self.current_test_block} ({self.test_blocks.get(self.current_test_block, '')}) from checkpoint.")
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """
+        The session metrics as a JSON-serializable dict. Start times are stored as
+        elapsed seconds, so time spent down between a crash and a resume is not counted.
+        """
+        state = {name: getattr(self, name) for name in self.CHECKPOINT_FIELDS}
+        state['speed_test_results'] = [
+            {'block': entry['block'], 'jobs': {name: job.to_dict() for name, job in entry['jobs'].items()}}
+            for entry in self.speed_test_results
+        ]
+        now = get_clock().time()
+        state['script_elapsed_s'] = now - self.script_start_time
+        state['block_elapsed_s'] = now - self.block_start_time if self.block_start_time else 0.0
+        return state
+
+    def restore_checkpoint_state(self, state: Dict[str, Any]):
+        """Loads a checkpoint_state() dict. The journal gets the whole state, so a new journal starts from it."""
+        self._record(RECORD_RESTORE, state=state)
+
+    def _apply_restore(self, record: Dict[str, Any]):
+        # A copy: the journal writer may still be serializing the record's state.
+        state = copy.deepcopy(record['state'])
+        for name in self.CHECKPOINT_FIELDS:
+            if name not in state:
+                continue
+            value = state[name]
+            if name in self._BLOCK_KEYED_FIELDS:
+                value = {int(block): entry for block, entry in value.items()}
+            setattr(self, name, value)
+        self.speed_test_results = [
+            {'block': entry['block'], 'jobs': {name: FioJobResult.from_dict(job) for name, job in entry['jobs'].items()}}
+            for entry in state.get('speed_test_results', [])
+        ]
+        now = get_clock().time()
+        self.script_start_time = now - float(state.get('script_elapsed_s', 0.0))
+        self.block_start_time = now - float(state.get('block_elapsed_s', 0.0))
+        self._iteration_failure_marks = dict(self.block_failure_count)
+
     def end_block(self):
         """Finalizes metrics for the completed test block."""
-        self.block_end_time = time.time()
+        self.block_end_time = get_clock().time()
+        self._record(RECORD_BLOCK_END)
         self.dut.needs_block_orientation = False
 
     def log_key_press(self, key_name: str):
         """Increments the counter for a specific key press."""
-        if key_name not in self.key_press_totals:
-            self.key_press_totals[key_name] = 0
-        self.key_press_totals[key_name] += 1
+        self._record(RECORD_KEY_PRESS, key=key_name)
+
+    def _apply_key_press(self, record: Dict[str, Any]):
+        key_name = record['key']
+        self.key_press_totals[key_name] = self.key_press_totals.get(key_name, 0) + 1
+
+    def log_transition(self, trigger: str, source: str, dest: str, ok: bool, duration_s: Optional[float] = None):
+        """
+        Records one FSM trigger for the live metrics and the journal.
+
+        Args:
+            trigger (str): The trigger that was fired.
+            source (str): The state it was fired in.
+            dest (str): The state the FSM ended up in.
+            ok (bool): Whether the transition happened.
+            duration_s (Optional[float]): How long the trigger took, if it was timed.
+        """
+        self._record(RECORD_TRANSITION, trigger=trigger, source=source, dest=dest, ok=ok, duration_s=duration_s)
+
+    def _apply_transition(self, record: Dict[str, Any]):
+        trigger = record['trigger']
+        totals = self.transition_totals.get(trigger)
+        if totals is None:
+            totals = self.transition_totals[trigger] = {'ok': 0, 'failed': 0}
+            self.transition_durations[trigger] = collections.deque(maxlen=TRANSITION_LATENCY_WINDOW)
+        totals['ok' if record['ok'] else 'failed'] += 1
+        if record.get('duration_s') is not None:
+            self.transition_durations[trigger].append(record['duration_s'])
+
+    def log_iteration(self):
+        """Counts one completed loop iteration of the current block, as failed if it logged a failure."""
+        self._record(RECORD_ITERATION)
+
+    def _apply_iteration(self, record: Dict[str, Any]):
+        block = record['block']
+        failures = self.block_failure_count.get(block, 0)
+        failed = failures > self._iteration_failure_marks.get(block, 0)
+        self._iteration_failure_marks[block] = failures
+        totals = self.block_iteration_totals.setdefault(block, {'passed': 0, 'failed': 0})
+        totals['failed' if failed else 'passed'] += 1
+
+    def log_led_run(self, run: Dict[str, Any]):
+        """
+        Journals one LED state the camera saw and how long it held.
+
+        Args:
+            run (Dict[str, Any]): The event dict from the camera's LED run listener
+                ('state', 'duration_s', 'final').
+        """
+        if self.journal is not None:
+            self._record(RECORD_LED_RUN, **run)
 
     def log_enumeration(self, enum_type: str):
             """
             Increments the counter for a specific type of enumeration.
             Assumes enum_type has already been validated by the caller.
             """
-            self.block_enumeration_totals[self.current_test_block][enum_type] += 1
+            self._record(RECORD_ENUMERATION, enum_type=enum_type)
+
+    def _apply_enumeration(self, record: Dict[str, Any]):
+        self.block_enumeration_totals[record['block']][record['enum_type']] += 1
 
     def log_failure(self, failure_message: str):
         """Logs a failure for a specific test block."""
-        self.block_failure_count[self.current_test_block] += 1
-        self.failure_block[self.current_test_block].append(failure_message)
+        self._record(RECORD_FAILURE, message=failure_message)
         self.logger.error(failure_message)
-        
+
+    def _apply_failure(self, record: Dict[str, Any]):
+        self.block_failure_count[record['block']] += 1
+        self.failure_block[record['block']].append(record['message'])
+
     def log_warning(self, block_name: str, warning_summary: str, warning_details: str = ""):
         """Logs a warning for a specific test block."""
-        self.block_warning_count[self.current_test_block] += 1
-        self.warning_block[self.current_test_block].append(warning_summary)
-        self.warning_description_block[self.current_test_block].append(warning_details)
-        
-    def add_speed_test_result(self, result: Any):
-        """Adds a speed test result to the session."""
-        self.speed_test_results.append(result)
+        self._record(RECORD_WARNING, summary=warning_summary, details=warning_details)
+
+    def _apply_warning(self, record: Dict[str, Any]):
+        self.block_warning_count[record['block']] += 1
+        self.warning_block[record['block']].append(record['summary'])
+        self.warning_description_block[record['block']].append(record['details'])
+
+    def log_phidget_detach(self, event: Dict[str, Any]):
+        """
+        Records a Phidget channel detach/reattach event against the current block.
+
+        Args:
+            event (Dict[str, Any]): The event dict produced by PhidgetController,
+                including 'scripts' and 'duration_s'.
+        """
+        self._record(RECORD_PHIDGET_DETACH, event=dict(event))
+        self.logger.warning(f"Phidget detach on {event.get('scripts')} recovered in {event.get('duration_s', 0.0) * 1000:.1f}ms.")
+
+    def _apply_phidget_detach(self, record: Dict[str, Any]):
+        entry = dict(record['event'])
+        entry['block'] = record['block']
+        self.phidget_detach_events.append(entry)
 
-    def generate_summary_report(self):
+    def log_enum_latency(self, event_type: str, latencies: Dict[str, Optional[float]]):
+        """
+        Records enumeration latencies (seconds after the final key release) for the current block.
+
+        Args:
+            event_type (str): The FSM event that caused the enumeration (e.g. 'unlock_admin').
+            latencies (Dict[str, Optional[float]]): Metric name -> latency. None values
+                (not measured or not observed) are skipped.
+        """
+        self._record(RECORD_ENUM_LATENCY, event_type=event_type, latencies=dict(latencies))
+        measured = ", ".join(f"{metric}: {value:.3f}s" for metric, value in latencies.items() if value is not None)
+        if measured:
+            self.logger.info(f"Enumeration latency ({event_type}): {measured}")
+
+    def _apply_enum_latency(self, record: Dict[str, Any]):
+        per_event = self.enum_latency_samples.setdefault(record['block'], {}).setdefault(record['event_type'], {})
+        for metric, value in record['latencies'].items():
+            if value is not None:
+                per_event.setdefault(metric, []).append(value)
+
+    def log_wait(self, name: str, waited_s: float, max_wait_s: float, met: bool):
+        """
+        Records how long a condition wait took against its deadline.
+
+        Args:
+            name (str): The wait (e.g. 'user_reset_hold').
+            waited_s (float): Time actually spent waiting, in seconds.
+            max_wait_s (float): The deadline, i.e. the fixed sleep the wait replaces.
+            met (bool): Whether the condition was met before the deadline.
+        """
+        self._record(RECORD_WAIT, name=name, waited_s=waited_s, max_wait_s=max_wait_s, met=met)
+        self.logger.debug(f"Wait '{name}': {waited_s:.2f}s of {max_wait_s:.2f}s ({'met' if met else 'deadline'})")
+
+    def _apply_wait(self, record: Dict[str, Any]):
+        self.wait_samples.append({'block': record['block'], 'name': record['name'], 'waited_s': record['waited_s'],
+                                  'max_wait_s': record['max_wait_s'], 'met': record['met']})
+
+    def get_wait_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarizes the recorded condition waits.
+
+        Returns:
+            Dict of wait name -> {'count', 'p50', 'max', 'max_wait', 'saved', 'timeouts'}, where
+            'saved' is the total time not spent compared with the fixed sleeps.
+        """
+        summary: Dict[str, Dict[str, float]] = {}
+        for name in dict.fromkeys(sample['name'] for sample in self.wait_samples):
+            samples = [sample for sample in self.wait_samples if sample['name'] == name]
+            waited = [sample['waited_s'] for sample in samples]
+            summary[name] = {
+                'count': len(samples),
+                'p50': percentile(waited, 50),
+                'max': max(waited),
+                'max_wait': max(sample['max_wait_s'] for sample in samples),
+                'saved': sum(max(0.0, sample['max_wait_s'] - sample['waited_s']) for sample in samples),
+                'timeouts': sum(1 for sample in samples if not sample['met']),
+            }
+        return summary
+
+    def get_enum_latency_summary(self) -> Dict[int, Dict[str, Dict[str, Dict[str, float]]]]:
+        """
+        Summarizes the recorded enumeration latencies.
+
+        Returns:
+            Nested dict block_id -> event type -> metric -> {'count', 'p50', 'p95', 'max'}.
+        """
+        summary: Dict[int, Dict[str, Dict[str, Dict[str, float]]]] = {}
+        for block_id, events in self.enum_latency_samples.items():
+            for event_type, metrics in events.items():
+                for metric, values in metrics.items():
+                    if not values:
+                        continue
+                    summary.setdefault(block_id, {}).setdefault(event_type, {})[metric] = {
+                        'count': len(values),
+                        'p50': percentile(values, 50),
+                        'p95': percentile(values, 95),
+                        'max': max(values),
+                    }
+        return summary
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """
+        The live metrics of the session as a JSON-serializable dict, for the metrics server.
+
+        Runs on the server's thread while the test keeps writing; the counters are
+        read under the lock that _apply() holds while it updates them.
+
+        Returns:
+            Dict with 'time', 'uptime_s', 'script_title', 'current_block', 'iterations',
+            'iterations_per_hour', 'blocks' (per block: name, iterations passed/failed,
+            failures, warnings, enumerations), 'transitions' (per trigger: ok, failed and
+            p50/p95/max of the recent durations), 'enum_latency' (get_enum_latency_summary()),
+            'camera' (frame counters and fps, or None) and 'last_speed_test' (or None).
+        """
+        camera = self.at.camera_stats() if hasattr(self.at, 'camera_stats') else None
+        with self._metrics_lock:
+            snapshot = self._build_metrics_snapshot()
+        snapshot['camera'] = camera if isinstance(camera, dict) else None
+        return snapshot
+
+    def _build_metrics_snapshot(self) -> Dict[str, Any]:
+        now = get_clock().time()
+        uptime_s = max(0.0, now - self.script_start_time)
+        iterations = sum(totals['passed'] + totals['failed'] for totals in self.block_iteration_totals.values())
+        blocks = {}
+        for block, name in self.test_blocks.items():
+            totals = self.block_iteration_totals.get(block, {'passed': 0, 'failed': 0})
+            blocks[block] = {
+                'name': name,
+                'iterations_passed': totals['passed'],
+                'iterations_failed': totals['failed'],
+                'failures': self.block_failure_count.get(block, 0),
+                'warnings': self.block_warning_count.get(block, 0),
+                'enumerations': dict(self.block_enumeration_totals.get(block, {})),
+            }
+        transitions = {}
+        for trigger, totals in self.transition_totals.items():
+            durations = list(self.transition_durations.get(trigger, ()))
+            entry: Dict[str, Any] = dict(totals)
+            if durations:
+                entry.update(count=len(durations), p50=percentile(durations, 50),
+                             p95=percentile(durations, 95), max=max(durations))
+            transitions[trigger] = entry
+        last_speed_test = None
+        if self.speed_test_results:
+            result = self.speed_test_results[-1]
+            last_speed_test = {
+                'block': result['block'],
+                'jobs': {
+                    job_name: {
+                        direction: {'bw_mbps': direction_result.bw_mbps, 'iops': direction_result.iops,
+                                    'clat_p99_ms': direction_result.clat_p99_ms}
+                        for direction, direction_result in job_result.directions.items()
+                    }
+                    for job_name, job_result in result['jobs'].items()
+                },
+            }
+        return {
+            'time': now,
+            'uptime_s': uptime_s,
+            'script_title': self.script_title,
+            'current_block': self.current_test_block,
+            'iterations': iterations,
+            'iterations_per_hour': iterations * 3600.0 / uptime_s if uptime_s > 0 else 0.0,
+            'blocks': blocks,
+            'transitions': transitions,
+            'enum_latency': self.get_enum_latency_summary(),
+            'last_speed_test': last_speed_test,
+        }
+
+    def add_speed_test_result(self, result: Dict[str, FioJobResult]):
+        """
+        Adds a speed test result to the session, tagged with the current block.
+
+        Args:
+            result (Dict[str, FioJobResult]): Per-job results from run_fio_tests.
+        """
+        self._record(RECORD_SPEED_RESULT, jobs={name: job.to_dict() for name, job in result.items()},
+                     usb_mode=self.speed_baseline_profile()[3])
+        self._check_speed_baseline(result)
+
+    def _apply_speed_result(self, record: Dict[str, Any]):
+        self.speed_test_results.append({
+            'block': record['block'],
+            'jobs': {name: FioJobResult.from_dict(job) for name, job in record['jobs'].items()},
+        })
+
+    def speed_baseline_profile(self) -> Tuple[str, str, str, str]:
+        """The (device name, bridge FW, MCU FW, USB mode) key speed baselines are stored under."""
+        return (self.dut.name, str(self.dut.bridge_fw), str(self.dut.mcu_fw_human_readable),
+                "USB3" if self.dut.usb3 else "USB2")
+
+    def _check_speed_baseline(self, result: Dict[str, FioJobResult]):
+        """
+        Compares a speed result with the stored baseline for this device profile,
+        logs a block warning per regressed metric, then adds the result to the baseline.
+        """
+        if self.speed_baseline is None:
+            return
+        profile = self.speed_baseline_profile()
+        try:
+            regressions = self.speed_baseline.check_and_record(profile, result, serial=self.dut.serial_number or None)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Speed baseline unavailable ({self.speed_baseline.db_path}): {e}")
+            return
+        for regression in regressions:
+            self._record(RECORD_SPEED_REGRESSION, regression=dict(regression))
+            z_text = f"robust z {regression['robust_z']}" if regression['robust_z'] is not None else "baseline MAD 0"
+            summary = (f"Speed regression: {regression['job']} {regression['direction']} {regression['metric']} "
+                       f"{regression['value']} vs. median {regression['median']} ({regression['change_pct']:+.1f}%)")
+            details = (f"{z_text}, {regression['samples']} baseline run(s) for "
+                       f"{' / '.join(profile)}")
+            self.log_warning(self.test_blocks.get(self.current_test_block, ""), summary, details)
+            self.logger.warning(f"{summary}; {details}")
+
+    def _apply_speed_regression(self, record: Dict[str, Any]):
+        entry = dict(record['regression'])
+        entry['block'] = record['block']
+        self.speed_regressions.append(entry)
+
+    def add_speed_test_timeseries(self, samples: List[Dict[str, Any]], abort_reason: Optional[str] = None):
+        """
+        Stores the interval samples of one speed test against the current block.
+
+        Args:
+            samples (List[Dict[str, Any]]): Status samples ('t', 'job', 'bw_mbps', 'iops', ...).
+            abort_reason (Optional[str]): Why the run was stopped early, if it was.
+        """
+        self._record(RECORD_SPEED_TIMESERIES, samples=list(samples), aborted=abort_reason)
+        if abort_reason:
+            self.log_failure(f"Speed test aborted early: {abort_reason}")
+
+    def _apply_speed_timeseries(self, record: Dict[str, Any]):
+        self.speed_test_timeseries.append({
+            'block': record['block'],
+            'samples': list(record['samples']),
+            'aborted': record['aborted'],
+        })
+
+    def add_integrity_result(self, result: Dict[str, Any]):
+        """
+        Records a data-integrity write or verify pass against the current block.
+
+        A failed verify is logged as a block failure listing the first bad offset.
+
+        Args:
+            result (Dict[str, Any]): Result dict from DataIntegrityEngine.write()/verify().
+        """
+        self._record(RECORD_INTEGRITY, result=dict(result))
+        if result.get('operation') == 'verify' and not result.get('passed', False):
+            first = result['mismatches'][0]['offset'] if result.get('mismatches') else 'N/A'
+            self.log_failure(
+                f"Data integrity verify failed: {result.get('mismatched_blocks')} block(s), "
+                f"{result.get('mismatched_bytes')} byte(s) mismatched, first at offset {first}"
+            )
+
+    def _apply_integrity(self, record: Dict[str, Any]):
+        entry = dict(record['result'])
+        entry['block'] = record['block']
+        self.integrity_results.append(entry)
+
+    def add_format_result(self, result: Dict[str, Any]):
+        """
+        Records a format attempt and its phase timings against the current block.
+
+        Args:
+            result (Dict[str, Any]): UnifiedController.last_format_result.
+        """
+        self._record(RECORD_FORMAT, result=dict(result, phases=dict(result.get('phases') or {})))
+
+    def _apply_format(self, record: Dict[str, Any]):
+        entry = dict(record['result'])
+        entry['phases'] = dict(entry.get('phases') or {})
+        entry['block'] = record['block']
+        self.format_results.append(entry)
+
+    def get_format_latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarizes the phase durations of successful formats.
+
+        Returns:
+            Dict[str, Dict[str, float]]: phase (plus 'total') -> summarize_values() stats, in seconds.
+        """
+        durations: Dict[str, List[float]] = {}
+        for record in self.format_results:
+            if not record.get('passed'):
+                continue
+            for phase, seconds in record['phases'].items():
+                durations.setdefault(phase, []).append(seconds)
+            durations.setdefault('total', []).append(record.get('total_s', 0.0))
+        return {phase: summarize_values(values) for phase, values in durations.items()}
+
+    def get_speed_test_summary(self) -> Dict[str, Dict[str, Dict[str, Dict[str, float]]]]:
+        """
+        Aggregates every recorded speed test per job and direction.
+
+        Returns:
+            Dict: job name -> direction -> metric (bw_mbps, iops, clat_p50_ms,
+            clat_p99_ms, clat_p999_ms) -> count/min/max/mean/stdev/p50/p99 across
+            iterations. For latency metrics p50/p99 are percentiles of the
+            per-run percentiles. Metrics never measured are omitted.
+        """
+        samples: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+        for result in self.speed_test_results:
+            for job_name, job_result in result.get('jobs', {}).items():
+                for direction, direction_result in job_result.directions.items():
+                    per_direction = samples.setdefault(job_name, {}).setdefault(direction, {})
+                    for metric in DIRECTION_METRICS:
+                        value = getattr(direction_result, metric)
+                        if value is not None:
+                            per_direction.setdefault(metric, []).append(value)
+
+        return {
+            job_name: {
+                direction: {metric: summarize_values(values) for metric, values in metrics.items()}
+                for direction, metrics in directions.items()
+            }
+            for job_name, directions in samples.items()
+        }
+
+    def get_speed_test_error_total(self) -> int:
+        """Total I/O errors reported by fio across all recorded speed tests."""
+        return sum(job.total_errors for result in self.speed_test_results for job in result.get('jobs', {}).values())
+
+    def generate_summary_report(self, journal_path: Optional[str] = None):
         """
         Generates and logs a comprehensive summary of the test session.
         This is a refactor of the original finishScript() function, preserving its output format.
         
         Args:
-            (No arguments needed, uses self.dut and self.logger)
+            journal_path (Optional[str]): Rebuild the metrics from this session journal
+                first (see rebuild_from_journal()). Otherwise the in-memory metrics are used.
         """
+        if journal_path:
+            self.rebuild_from_journal(journal_path)
 
         logger = self.logger
         dut = self.dut
@@ -488,23 +1151,120 @@ class TestSession:
         if self.speed_test_results:
             logger.info("Speed Test Block Results:")
             for result in self.speed_test_results:
-                 logger.info(f"  Block {result.get('block', 'N/A')}: Read: {result.get('read', 'N/A')} MB/s, Write: {result.get('write', 'N/A')} MB/s")
-            
-            all_reads = [r['read'] for r in self.speed_test_results if 'read' in r]
-            all_writes = [r['write'] for r in self.speed_test_results if 'write' in r]
-            
+                logger.info(f"  Block {result.get('block', 'N/A')}:")
+                for job_name, job_result in result.get('jobs', {}).items():
+                    logger.info(f"    {job_name}: {job_result.summary()}")
+
             logger.info("Speedtest Totals:")
-            if all_reads:
-                logger.info("  Read:")
-                logger.info(f"    Min: {min(all_reads):.1f} MB/s, Max: {max(all_reads):.1f} MB/s, Avg: {statistics.mean(all_reads):.1f} MB/s")
-            if all_writes:
-                logger.info("  Write:")
-                logger.info(f"    Min: {min(all_writes):.1f} MB/s, Max: {max(all_writes):.1f} MB/s, Avg: {statistics.mean(all_writes):.1f} MB/s")
+            metric_labels = {
+                'bw_mbps': ("Bandwidth", "MB/s"),
+                'iops': ("IOPS", ""),
+                'clat_p50_ms': ("clat p50", "ms"),
+                'clat_p99_ms': ("clat p99", "ms"),
+                'clat_p999_ms': ("clat p99.9", "ms"),
+            }
+            for job_name, directions in self.get_speed_test_summary().items():
+                for direction, metrics in directions.items():
+                    runs = metrics['bw_mbps']['count'] if 'bw_mbps' in metrics else 0
+                    logger.info(f"  {job_name} ({direction.capitalize()}, {runs} run(s)):")
+                    for metric, stats in metrics.items():
+                        label, unit = metric_labels[metric]
+                        unit = f" {unit}" if unit else ""
+                        logger.info(
+                            f"    {label:<11} Min: {stats['min']:.1f}{unit}, Max: {stats['max']:.1f}{unit}, "
+                            f"Avg: {stats['mean']:.1f}{unit}, Stdev: {stats['stdev']:.1f}{unit}, "
+                            f"p50/p99 of runs: {stats['p50']:.1f}/{stats['p99']:.1f}{unit}"
+                        )
+            for run in self.speed_test_timeseries:
+                bandwidths = [sample['bw_mbps'] for sample in run['samples'] if sample.get('ios')]
+                if bandwidths:
+                    logger.info(
+                        f"  Block {run['block']} time series: {len(run['samples'])} samples, "
+                        f"{min(bandwidths):.1f}-{max(bandwidths):.1f} MB/s while active"
+                        + (f", aborted: {run['aborted']}" if run['aborted'] else "")
+                    )
+            speed_test_errors = self.get_speed_test_error_total()
+            if speed_test_errors:
+                logger.info(f"  I/O errors reported by fio: {speed_test_errors}")
+            if self.speed_regressions:
+                logger.info(f"  Regressions vs. stored baseline: {len(self.speed_regressions)}")
+                for regression in self.speed_regressions:
+                    logger.info(
+                        f"    Block {regression['block']}: {regression['job']} {regression['direction']} "
+                        f"{regression['metric']} {regression['value']} vs. median {regression['median']} "
+                        f"({regression['change_pct']:+.1f}%)"
+                    )
+            self.logger.info("____"*10)
+
+        # --- Format ---
+        if self.format_results:
+            passed = sum(1 for r in self.format_results if r.get('passed'))
+            refused = sum(1 for r in self.format_results if not r.get('passed') and r.get('read_only'))
+            failed = len(self.format_results) - passed - refused
+            logger.info(f"Format: {passed} passed, {refused} refused (read-only), {failed} failed")
+            for phase, stats in self.get_format_latency_summary().items():
+                logger.info(f"  {phase}: p50 {stats['p50']:.3f}s, max {stats['max']:.3f}s, mean {stats['mean']:.3f}s ({stats['count']} run(s))")
+            self.logger.info("____"*10)
+
+        # --- Data Integrity ---
+        verifies = [r for r in self.integrity_results if r.get('operation') == 'verify']
+        if self.integrity_results:
+            writes = [r for r in self.integrity_results if r.get('operation') == 'write']
+            failed = [r for r in verifies if not r.get('passed')]
+            logger.info(f"Data Integrity: {len(writes)} write(s), {len(verifies)} verify pass(es), {len(failed)} failed")
+            for record in failed:
+                offsets = ", ".join(str(m['offset']) for m in record.get('mismatches', [])[:5])
+                logger.info(f"  Block {record['block']}: {record.get('mismatched_blocks')} block(s) mismatched at offset(s) {offsets}")
             self.logger.info("____"*10)
 
         if self.usb3_fail_count > 0:
             logger.info(f"{self.usb3_fail_count} USB3 Failures detected during the session.")
 
+        # --- Enumeration Latency ---
+        latency_summary = self.get_enum_latency_summary()
+        if latency_summary:
+            logger.info("Enumeration Latency (s after final key release):")
+            logger.info("{:>8}   {:<20} {:<6} {:>5}   {:>7}   {:>7}   {:>7}".format("Block", "Event", "Metric", "N", "p50", "p95", "Max"))
+            for block_id in sorted(latency_summary):
+                for event_type, metrics in latency_summary[block_id].items():
+                    for metric, stats in metrics.items():
+                        logger.info("Block {:<2}:   {:<20} {:<6} {:>5}   {:>7.3f}   {:>7.3f}   {:>7.3f}".format(
+                            block_id, event_type, metric, stats['count'], stats['p50'], stats['p95'], stats['max']))
+            self.logger.info("____"*10)
+
+        # --- Condition Waits ---
+        wait_summary = self.get_wait_summary()
+        if wait_summary:
+            logger.info("Condition Waits (s):")
+            logger.info("{:<20} {:>5}   {:>7}   {:>7}   {:>8}   {:>8}".format("Wait", "N", "p50", "Max", "Deadline", "Saved"))
+            for name, stats in wait_summary.items():
+                logger.info("{:<20} {:>5}   {:>7.2f}   {:>7.2f}   {:>8.2f}   {:>8.1f}".format(
+                    name, stats['count'], stats['p50'], stats['max'], stats['max_wait'], stats['saved'])
+                    + (f"   ({stats['timeouts']} hit the deadline)" if stats['timeouts'] else ""))
+            self.logger.info("____"*10)
+
+        # --- Transition Latency ---
+        latency_summary = get_profiler().summary()
+        if latency_summary:
+            logger.info("Transition Latency (s):")
+            logger.info("{:<28} {:<32} {:>5}   {:>7}   {:>7}   {:>7}   {:>9}".format("Trigger", "Phase", "N", "p50", "p95", "Max", "Total"))
+            by_total = sorted(latency_summary.items(), key=lambda item: -sum(stats['total'] for stats in item[1].values()))
+            for trigger, phases in by_total:
+                # The trigger's own span first, then its phases slowest first.
+                ordered = sorted(phases.items(), key=lambda item: (item[0] != PHASE_TRIGGER, -item[1]['total']))
+                for phase, stats in ordered:
+                    logger.info("{:<28} {:<32} {:>5}   {:>7.2f}   {:>7.2f}   {:>7.2f}   {:>9.1f}".format(
+                        trigger, phase, stats['count'], stats['p50'], stats['p95'], stats['max'], stats['total']))
+            self.logger.info("____"*10)
+
+        # --- Phidget Detach Metrics ---
+        if self.phidget_detach_events:
+            durations_ms = [e.get('duration_s', 0.0) * 1000 for e in self.phidget_detach_events]
+            logger.info(f"Phidget Detaches: {len(durations_ms)} (Total: {sum(durations_ms):.1f}ms, Max: {max(durations_ms):.1f}ms)")
+            for block_id in sorted({e['block'] for e in self.phidget_detach_events}):
+                block_durations = [e.get('duration_s', 0.0) * 1000 for e in self.phidget_detach_events if e['block'] == block_id]
+                logger.info(f"  Block {block_id}: {len(block_durations)} detach(es), Max: {max(block_durations):.1f}ms")
+
         logger.info(f"{self.script_title} script complete.")
         logger.info("")
 
@@ -537,6 +1297,11 @@ class TestSession:
         
         # Step 1: Generate and log the detailed report using the session object.
         self.generate_summary_report()
+        if self.journal is not None:
+            self.journal.flush()
+        profiler = get_profiler()
+        if profiler.enabled and profiler.events:
+            profiler.export_chrome_trace()
 
         # Step 2: Perform final hardware cleanup.
         self.logger.info("Powering down device at end of session.")
@@ -554,16 +1319,19 @@ class CallableCondition:
     A wrapper that makes a callable condition have a readable __name__
     for diagram generation, allowing inline lambda definitions to be labeled.
     """
-    def __init__(self, func: Callable[..., bool], name: str):
+    def __init__(self, func: Callable[..., bool], name: str, release_valve: bool = False):
         """
         Initializes the CallableCondition.
 
         Args:
             func: The callable (e.g., a lambda) to be executed as the condition.
             name: A human-readable name for the condition, used in diagrams.
+            release_valve: True when calling the condition performs the transition's
+                           hardware action (a rewired release-valve callback).
         """
         self.func = func
         self.__name__ = name  # <-- THE CRITICAL CHANGE
+        self.release_valve = release_valve
 
     def __call__(self, *args, **kwargs) -> bool:
         """
@@ -584,6 +1352,108 @@ class CallableCondition:
         # A helpful representation for debugging
         return f"<CallableCondition: {self.__name__}>"
 
+
+class ModelCondition(CallableCondition):
+    """
+    A condition on the FSM it is evaluated for: `func(fsm)` rather than a closure over
+    one instance, so a single transition table serves every model on the shared machine.
+    """
+    def __call__(self, event_data: EventData) -> bool:
+        return self.holds_for(event_data.model)
+
+    def holds_for(self, model: Any) -> bool:
+        """Evaluates the condition for `model` (used by the StateNavigator, which has no EventData)."""
+        return bool(self.func(model))
+
+
+class ReleaseValveCondition(CallableCondition):
+    """
+    A rewired @release_valve 'before' callback: calls the named method of the model
+    that fired the trigger and lets the transition happen only if it returned True.
+    """
+    def __init__(self, method_name: str):
+        super().__init__(self._call, f"{method_name} release valve", release_valve=True)
+        self.method_name = method_name
+
+    def _call(self, event_data: EventData) -> bool:
+        return getattr(event_data.model, self.method_name)(event_data)
+
+
+# --- Transition conditions on the DeviceUnderTest model ---
+NO_BATTERY = ModelCondition(lambda fsm: not bool(fsm.dut.battery), "dut.battery == False")
+CMFR_NOT_COMPLETED = ModelCondition(lambda fsm: not bool(fsm.dut.completed_cmfr), "dut.completed_cmfr == False")
+BRUTE_FORCE_COUNTER_EXHAUSTED = ModelCondition(lambda fsm: fsm.dut.brute_force_counter_current == 0, "dut.brute_force_counter_current == 0")
+USER_FORCED_ENROLLMENT_ENABLED = ModelCondition(lambda fsm: bool(fsm.dut.user_forced_enrollment), "dut.user_forced_enrollment == True")
+ADMIN_PIN_NOT_ENROLLED = ModelCondition(lambda fsm: not bool(fsm.dut.admin_pin), "dut.admin_pin not enrolled")
+ADMIN_PIN_ENROLLED = ModelCondition(lambda fsm: bool(fsm.dut.admin_pin), "dut.admin_pin enrolled")
+RESET_ALLOWED = ModelCondition(lambda fsm: not bool(fsm.dut.provision_lock), "dut.provision_lock == False")
+RESET_ALLOWED_ON_BATTERY = ModelCondition(lambda fsm: not bool(fsm.dut.provision_lock) and bool(fsm.dut.battery), "dut.provision_lock == False AND dut.battery == True")
+USER_PIN_ENROLLED = ModelCondition(lambda fsm: any(pin is not None for pin in fsm.dut.user_pin.values()), "dut.user_pin(s) enrolled")
+USER_SLOT_AVAILABLE = ModelCondition(lambda fsm: any(pin_value is None for pin_value in fsm.dut.user_pin.values()), "Empty user slot available")
+BRUTE_FORCE_NOT_TRIGGERED = ModelCondition(lambda fsm: fsm.dut.brute_force_counter_current > 1 and not (fsm.dut.brute_force_counter_current == (fsm.dut.brute_force_counter/2)+1), "Brute Force not triggered")
+BRUTE_FORCE_TRIGGERED = ModelCondition(lambda fsm: (fsm.dut.brute_force_counter_current == (fsm.dut.brute_force_counter/2)+1) or fsm.dut.brute_force_counter_current == 1, "Brute Force triggered")
+BRUTE_FORCE_TRIGGERED_FROM_FORCED_ENROLLMENT = ModelCondition(lambda fsm: fsm.dut.brute_force_counter_current == fsm.dut.brute_force_counter/2 or fsm.dut.brute_force_counter_current == 1, "Brute Force triggered")
+BRUTE_FORCE_HALFWAY = ModelCondition(lambda fsm: fsm.dut.brute_force_counter_current == fsm.dut.brute_force_counter/2, "Brute Force halfway point")
+
+class WeakModelList:
+    """
+    The models of the shared Machine, held by weak reference. Machine keeps its
+    models in a plain list, so without this every FSM ever built (with its session,
+    DUT model and controller) would stay alive for as long as the machine does.
+    An FSM that is no longer used drops out once it is garbage collected.
+    """
+    def __init__(self):
+        self._refs: List[weakref.ref] = []
+
+    def _discard(self, ref: weakref.ref):
+        try:
+            self._refs.remove(ref)
+        except ValueError:
+            pass
+
+    def _live(self) -> List[Any]:
+        return [model for model in (ref() for ref in list(self._refs)) if model is not None]
+
+    def append(self, model: Any):
+        self._refs.append(weakref.ref(model, self._discard))
+
+    def remove(self, model: Any):
+        for ref in list(self._refs):
+            if ref() is model:
+                self._refs.remove(ref)
+                return
+        raise ValueError(f"{model!r} is not a model of this machine")
+
+    def __contains__(self, model: Any) -> bool:
+        return any(ref() is model for ref in list(self._refs))
+
+    def __iter__(self):
+        return iter(self._live())
+
+    def __len__(self) -> int:
+        return len(self._live())
+
+    def __getitem__(self, index):
+        return self._live()[index]
+
+
+class ModelMachine:
+    """
+    One FSM's handle on the shared Machine. set_state() without a model moves only
+    this FSM, as it did when every FSM had a machine of its own; everything else is
+    the shared Machine's.
+    """
+    def __init__(self, machine: Machine, model: Any):
+        self.shared = machine
+        self._model = weakref.ref(model)
+
+    def set_state(self, state: str, model: Any = None):
+        self.shared.set_state(state, model=self._model() if model is None else model)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.shared, name)
+
+
 ## --- FSM Class Definition ---
 class ApricornDeviceFSM:
     """
@@ -599,7 +1469,7 @@ class ApricornDeviceFSM:
         STATES: A list of all possible states the machine can be in.
         logger: A dedicated logger for FSM activities.
         at: The `UnifiedController` instance for hardware interaction.
-        machine: The `transitions` library's `Machine` object that powers the FSM.
+        machine: This FSM's handle on the shared `transitions` `Machine` that powers the FSM.
         state: The current state of the FSM.
         source_state: The state from which the last transition originated.
     """
@@ -610,13 +1480,163 @@ class ApricornDeviceFSM:
                          'DIAGNOSTIC_MODE',
     ]
 
+    # The transition table, once for every instance. Conditions read the model they are
+    # evaluated for (see ModelCondition); compile_transitions() turns @release_valve
+    # 'before' callbacks into gating conditions.
+    TRANSITIONS: List[Dict[str, Any]] = [
+        # --- Power On/Off Transitions ---
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'POWER_ON_SELF_TEST', 'before': '_do_power_on', 'conditions': [NO_BATTERY]},
+        {'trigger': 'power_off', 'source': '*', 'dest': 'OFF', 'before': '_do_power_off'},
+        # {'trigger': 'collect_error_number', 'source': '*', 'dest': 'ERROR_MODE'},
+
+        # --- 'Idle' Mode Transitions (battery-powered) ---
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'FACTORY_MODE',  'before': '_do_power_on', 'conditions': [CMFR_NOT_COMPLETED]},
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'BRUTE_FORCE',  'before': '_do_power_on', 'conditions': [BRUTE_FORCE_COUNTER_EXHAUSTED]},
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'USER_FORCED_ENROLLMENT',  'before': '_do_power_on', 'conditions': [USER_FORCED_ENROLLMENT_ENABLED]},
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'OOB_MODE',  'before': '_do_power_on', 'conditions': [ADMIN_PIN_NOT_ENROLLED]},
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'STANDBY_MODE',  'before': '_do_power_on', 'conditions': [ADMIN_PIN_ENROLLED]},
+        {'trigger': 'user_reset', 'source': 'OFF', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [RESET_ALLOWED_ON_BATTERY]},
+        {'trigger': 'manufacturer_reset', 'source': 'OFF', 'dest': 'OOB_MODE', 'before': '_do_manufacturer_reset', 'conditions': [RESET_ALLOWED_ON_BATTERY]},
+
+        # --- 'Idle' Mode Transitions (from POST) ---
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'FACTORY_MODE', 'conditions': [CMFR_NOT_COMPLETED]},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'BRUTE_FORCE', 'conditions': [BRUTE_FORCE_COUNTER_EXHAUSTED]},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'USER_FORCED_ENROLLMENT', 'conditions': [USER_FORCED_ENROLLMENT_ENABLED]},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'OOB_MODE', 'conditions': [ADMIN_PIN_NOT_ENROLLED]},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'STANDBY_MODE', 'conditions': [ADMIN_PIN_ENROLLED]},
+
+        # --- RESET Transitions ---
+        {'trigger': 'manufacturer_reset', 'source': ['FACTORY_MODE', 'OOB_MODE', 'STANDBY_MODE', 'BRUTE_FORCE', 'USER_FORCED_ENROLLMENT'], 'dest': 'UNLOCKED_RESET', 'before': '_do_manufacturer_reset'},
+        {'trigger': 'lock_reset', 'source': 'UNLOCKED_RESET', 'dest': 'OOB_MODE', 'before': '_press_lock_button'},
+
+        # --- OOB Mode Transitions ---
+        {'trigger': 'enter_diagnostic_mode', 'source': 'OOB_MODE', 'dest': 'DIAGNOSTIC_MODE'},
+        {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'OOB_MODE', 'conditions': [ADMIN_PIN_NOT_ENROLLED]},
+        {'trigger': 'enroll_admin', 'source': 'OOB_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_admin_enrollment'},
+        {'trigger': 'user_reset', 'source': 'OOB_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [RESET_ALLOWED]},
+
+        # --- Standby Mode Transitions ---
+        {'trigger': 'admin_mode_login', 'source': 'STANDBY_MODE', 'dest': 'ADMIN_MODE', 'before': '_enter_admin_mode_login'},
+        {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
+        {'trigger': 'unlock_admin', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_admin_pin'},
+        {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
+        {'trigger': 'enter_diagnostic_mode', 'source': 'STANDBY_MODE', 'dest': 'DIAGNOSTIC_MODE'},
+        {'trigger': 'self_destruct', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_self_destruct_pin'},
+        {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'STANDBY_MODE', 'conditions': [ADMIN_PIN_ENROLLED]},
+        {'trigger': 'user_reset', 'source': 'STANDBY_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [RESET_ALLOWED]},
+        {'trigger': 'unlock_user', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_USER', 'before': '_enter_user_pin'},
+        {'trigger': 'lock_user', 'source': 'UNLOCKED_USER', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
+        {'trigger': 'fail_unlock', 'source': 'STANDBY_MODE', 'dest': 'STANDBY_MODE', 'before': '_enter_invalid_pin', 'conditions': [BRUTE_FORCE_NOT_TRIGGERED]},
+        {'trigger': 'fail_unlock', 'source': 'STANDBY_MODE', 'dest': 'BRUTE_FORCE', 'before': '_enter_invalid_pin', 'conditions': [BRUTE_FORCE_TRIGGERED]},
+
+        # --- User-Forced Enrollment Mode Transitions ---
+        {'trigger': 'admin_mode_login', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_enter_admin_mode_login'},
+        {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
+        {'trigger': 'unlock_admin', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_admin_pin'},
+        {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
+        {'trigger': 'enroll_user', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'STANDBY_MODE', 'before': '_user_enrollment'},
+        {'trigger': 'enter_diagnostic_mode', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'DIAGNOSTIC_MODE'},
+        {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'USER_FORCED_ENROLLMENT', 'conditions': [USER_FORCED_ENROLLMENT_ENABLED]},
+        {'trigger': 'self_destruct', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_self_destruct_pin'},
+        {'trigger': 'user_reset', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [RESET_ALLOWED]},
+        {'trigger': 'unlock_user', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_USER', 'before': '_enter_user_pin', 'conditions': [USER_PIN_ENROLLED]},
+        {'trigger': 'lock_user', 'source': 'UNLOCKED_USER', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
+        {'trigger': 'fail_unlock', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'STANDBY_MODE', 'before': '_enter_invalid_pin', 'conditions': [BRUTE_FORCE_NOT_TRIGGERED]},
+        {'trigger': 'fail_unlock', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'BRUTE_FORCE', 'before': '_enter_invalid_pin', 'conditions': [BRUTE_FORCE_TRIGGERED_FROM_FORCED_ENROLLMENT]},
+
+        # --- Brute Force Mode Transitions ---
+        {'trigger': 'last_try_login', 'source': 'BRUTE_FORCE', 'dest': 'STANDBY_MODE', 'before': '_enter_last_try_pin', 'conditions': [BRUTE_FORCE_HALFWAY]},
+        {'trigger': 'user_reset', 'source': 'BRUTE_FORCE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [RESET_ALLOWED]},
+        {'trigger': 'admin_recovery_failed', 'source': 'BRUTE_FORCE', 'dest': 'BRICKED'},
+
+        # --- Admin Mode Enrollment Transitions ---
+        {'trigger': 'user_reset', 'source': 'ADMIN_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset'},
+        
+        # Counter Enrollments
+        {'trigger': 'enroll_brute_force_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_brute_force_counter_enrollment'},
+        {'trigger': 'enroll_unattended_auto_lock_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_unattended_auto_lock_enrollment'},
+        {'trigger': 'enroll_min_pin_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_min_pin_enrollment'},
+        {'trigger': 'enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_counter_enrollment'},
+        {'trigger': 'timeout_enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_timeout_counter_enrollment'},
+        {'trigger': 'exit_enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_press_lock_button'},
+
+        # PIN Enrollments
+        {'trigger': 'enroll_admin', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_admin_enrollment'},
+        {'trigger': 'enroll_user', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_user_enrollment', 'conditions': [USER_SLOT_AVAILABLE]},
+        {'trigger': 'enroll_recovery', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_recovery_pin_enrollment'},
+        {'trigger': 'enroll_self_destruct', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_self_destruct_pin_enrollment'},
+        {'trigger': 'enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_pin_enrollment'},
+        {'trigger': 'timeout_enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_timeout_pin_enrollment'},
+        {'trigger': 'exit_enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_press_lock_button'},
+
+        # --- Admin Mode Toggle Transitions (Self-Loops) ---
+        {'trigger': 'toggle_basic_disk', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_basic_disk_toggle'},
+        {'trigger': 'toggle_removable_media', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_removable_media_toggle'},
+        {'trigger': 'enable_led_Flicker', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_led_flicker_enable'},
+        {'trigger': 'disable_led_Flicker', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_led_flicker_disable'},
+        {'trigger': 'delete_pins', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_delete_pins_toggle'},
+        {'trigger': 'toggle_lock_override', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_lock_override_toggle'},
+        {'trigger': 'enable_provision_lock', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_provision_lock_toggle'},
+        {'trigger': 'toggle_read_only', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_read_only_toggle'},
+        {'trigger': 'toggle_read_write', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_read_write_toggle'},
+        {'trigger': 'enable_self_destruct', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_self_destruct_toggle'},
+        {'trigger': 'toggle_user_forced_enrollment', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_user_forced_enrollment_toggle'},
+    ]
+
     logger: logging.Logger
     at: 'UnifiedController'
     dut: 'DeviceUnderTest'
     session: 'TestSession'
-    machine: Machine
+    machine: ModelMachine
     state: str
     source_state: str = 'OFF'
+    # TRANSITIONS as passed to the machine (compile_transitions(), run once at import).
+    transition_config: List[Dict[str, Any]]
+    _shared_machine: Optional[Machine] = None
+
+    @classmethod
+    def compile_transitions(cls) -> List[Dict[str, Any]]:
+        """
+        Copies TRANSITIONS for the machine, moving every 'before' callback marked
+        @release_valve into a ReleaseValveCondition so its result gates the transition.
+        """
+        compiled = []
+        for transition in cls.TRANSITIONS:
+            transition = dict(transition, conditions=list(transition.get('conditions', [])))
+            before_name = transition.get('before')
+            if before_name and getattr(getattr(cls, before_name, None), '_release_valve', False):
+                transition.pop('before')
+                transition['conditions'].append(ReleaseValveCondition(before_name))
+            if not transition['conditions']:
+                del transition['conditions']
+            compiled.append(transition)
+        return compiled
+
+    @classmethod
+    def shared_machine(cls) -> Machine:
+        """The Machine every instance is a model of, built on first use."""
+        if cls._shared_machine is None:
+            machine_kwargs = {
+                'model': None,
+                'states': cls.STATES,
+                'transitions': cls.transition_config,
+                'initial': 'OFF',
+                'send_event': True,
+                'after_state_change': '_log_state_change_details',
+                'prepare_event': '_start_transition_timer',
+                'finalize_event': ['_record_transition_timer', '_notify_transition_listeners'],
+                'auto_transitions': True,
+            }
+
+            # Conditionally add the diagramming engine parameter
+            if DIAGRAM_MODE:
+                machine_kwargs['graph_engine'] = 'pygraphviz'
+
+            # Initialize the machine by unpacking the keyword arguments dictionary
+            machine = Machine(**machine_kwargs)
+            machine.models = WeakModelList()
+            cls._shared_machine = machine
+        return cls._shared_machine
 
     def __init__(self, at_controller: 'UnifiedController', session_instance: 'TestSession', dut_instance: 'DeviceUnderTest'):
         """
@@ -628,146 +1648,27 @@ class ApricornDeviceFSM:
         self.dut = dut_instance
         self.session = session_instance
 
-        # Define all transitions in a single list of dictionaries, including lambdas.
-        transitions = [
-            # --- Power On/Off Transitions ---
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'POWER_ON_SELF_TEST', 'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: not bool(self.dut.battery), "dut.battery == False")]},
-            {'trigger': 'power_off', 'source': '*', 'dest': 'OFF', 'before': '_do_power_off'},
-            # {'trigger': 'collect_error_number', 'source': '*', 'dest': 'ERROR_MODE'},
-
-            # --- 'Idle' Mode Transitions (battery-powered) ---
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'FACTORY_MODE',  'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: not bool(self.dut.completed_cmfr), "dut.completed_cmfr == False")]},
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'BRUTE_FORCE',  'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current == 0, "dut.brute_force_counter_current == 0")]},
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'USER_FORCED_ENROLLMENT',  'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: bool(self.dut.user_forced_enrollment), "dut.user_forced_enrollment == True")]},
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'OOB_MODE',  'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: not bool(self.dut.admin_pin), "dut.admiPIN not enrolled")]},
-            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'STANDBY_MODE',  'before': '_do_power_on', 'conditions': [CallableCondition(lambda _: bool(self.dut.admin_pin), "dut.admin_pin enrolled")]},
-            {'trigger': 'user_reset', 'source': 'OFF', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock) and bool (self.dut.battery), "dut.provision_lock == False AND dut.battery == True")]},
-            {'trigger': 'manufacturer_reset', 'source': 'OFF', 'dest': 'OOB_MODE', 'before': '_do_manufacturer_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock) and bool (self.dut.battery), "dut.provision_lock == False AND dut.battery == True")]},
-
-            # --- 'Idle' Mode Transitions (from POST) ---
-            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'FACTORY_MODE', 'conditions': [CallableCondition(lambda _: not bool(self.dut.completed_cmfr), "dut.completed_cmfr == False")]},
-            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'BRUTE_FORCE', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current == 0, "dut.brute_force_counter_current == 0")]},
-            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'USER_FORCED_ENROLLMENT', 'conditions': [CallableCondition(lambda _: bool(self.dut.user_forced_enrollment), "dut.user_forced_enrollment == True")]},
-            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'OOB_MODE', 'conditions': [CallableCondition(lambda _: not bool(self.dut.admin_pin), "dut.admiPIN not enrolled")]},
-            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'STANDBY_MODE', 'conditions': [CallableCondition(lambda _: bool(self.dut.admin_pin), "dut.admin_pin enrolled")]},
-
-            # --- RESET Transitions ---
-            {'trigger': 'manufacturer_reset', 'source': ['FACTORY_MODE', 'OOB_MODE', 'STANDBY_MODE', 'BRUTE_FORCE', 'USER_FORCED_ENROLLMENT'], 'dest': 'UNLOCKED_RESET', 'before': '_do_manufacturer_reset'},
-            {'trigger': 'lock_reset', 'source': 'UNLOCKED_RESET', 'dest': 'OOB_MODE', 'before': '_press_lock_button'},
-
-            # --- OOB Mode Transitions ---
-            {'trigger': 'enter_diagnostic_mode', 'source': 'OOB_MODE', 'dest': 'DIAGNOSTIC_MODE'},
-            {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'OOB_MODE', 'conditions': [CallableCondition(lambda _: not bool(self.dut.admin_pin), "dut.admin_pin not enrolled")]},
-            {'trigger': 'enroll_admin', 'source': 'OOB_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_admin_enrollment'},
-            {'trigger': 'user_reset', 'source': 'OOB_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock), "dut.provision_lock == False")]},
-
-            # --- Standby Mode Transitions ---
-            {'trigger': 'admin_mode_login', 'source': 'STANDBY_MODE', 'dest': 'ADMIN_MODE', 'before': '_enter_admin_mode_login'},
-            {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
-            {'trigger': 'unlock_admin', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_admin_pin'},
-            {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
-            {'trigger': 'enter_diagnostic_mode', 'source': 'STANDBY_MODE', 'dest': 'DIAGNOSTIC_MODE'},
-            {'trigger': 'self_destruct', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_self_destruct_pin'},
-            {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'STANDBY_MODE', 'conditions': [CallableCondition(lambda _: bool(self.dut.admin_pin), "dut.admin_pin enrolled")]},
-            {'trigger': 'user_reset', 'source': 'STANDBY_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock), "dut.provision_lock == False")]},
-            {'trigger': 'unlock_user', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_USER', 'before': '_enter_user_pin'},
-            {'trigger': 'lock_user', 'source': 'UNLOCKED_USER', 'dest': 'STANDBY_MODE', 'before': '_press_lock_button'},
-            {'trigger': 'fail_unlock', 'source': 'STANDBY_MODE', 'dest': 'STANDBY_MODE', 'before': '_enter_invalid_pin', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current > 1 and not (self.dut.brute_force_counter_current == (self.dut.brute_force_counter/2)+1), "Brute Force not triggered")]},
-            {'trigger': 'fail_unlock', 'source': 'STANDBY_MODE', 'dest': 'BRUTE_FORCE', 'before': '_enter_invalid_pin', 'conditions': [CallableCondition(lambda _: (self.dut.brute_force_counter_current == (self.dut.brute_force_counter/2)+1) or self.dut.brute_force_counter_current == 1, "Brute Force triggered")]},
-
-            # --- User-Forced Enrollment Mode Transitions ---
-            {'trigger': 'admin_mode_login', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_enter_admin_mode_login'},
-            {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
-            {'trigger': 'unlock_admin', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_admin_pin'},
-            {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
-            {'trigger': 'enroll_user', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'STANDBY_MODE', 'before': '_user_enrollment'},
-            {'trigger': 'enter_diagnostic_mode', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'DIAGNOSTIC_MODE'},
-            {'trigger': 'exit_diagnostic_mode', 'source': 'DIAGNOSTIC_MODE', 'dest': 'USER_FORCED_ENROLLMENT', 'conditions': [CallableCondition(lambda _: bool(self.dut.user_forced_enrollment), "dut.user_forced_enrollment == True")]},
-            {'trigger': 'self_destruct', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_ADMIN', 'before': '_enter_self_destruct_pin'},
-            {'trigger': 'user_reset', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock), "dut.provision_lock == False")]},
-            {'trigger': 'unlock_user', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'UNLOCKED_USER', 'before': '_enter_user_pin', 'conditions': [CallableCondition(lambda _: any(pin is not None for pin in self.dut.user_pin.values()), "dut.user_pin(s) enrolled")]},
-            {'trigger': 'lock_user', 'source': 'UNLOCKED_USER', 'dest': 'USER_FORCED_ENROLLMENT', 'before': '_press_lock_button'},
-            {'trigger': 'fail_unlock', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'STANDBY_MODE', 'before': '_enter_invalid_pin', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current > 1 and not (self.dut.brute_force_counter_current == (self.dut.brute_force_counter/2)+1), "Brute Force not triggered")]},
-            {'trigger': 'fail_unlock', 'source': 'USER_FORCED_ENROLLMENT', 'dest': 'BRUTE_FORCE', 'before': '_enter_invalid_pin', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current == self.dut.brute_force_counter/2 or self.dut.brute_force_counter_current == 1, "Brute Force triggered")]},
-
-            # --- Brute Force Mode Transitions ---
-            {'trigger': 'last_try_login', 'source': 'BRUTE_FORCE', 'dest': 'STANDBY_MODE', 'before': '_enter_last_try_pin', 'conditions': [CallableCondition(lambda _: self.dut.brute_force_counter_current == self.dut.brute_force_counter/2, "Brute Force halfway point")]},
-            {'trigger': 'user_reset', 'source': 'BRUTE_FORCE', 'dest': 'OOB_MODE', 'before': '_do_user_reset', 'conditions': [CallableCondition(lambda _: not bool(self.dut.provision_lock), "dut.provision_lock == False")]},
-            {'trigger': 'admin_recovery_failed', 'source': 'BRUTE_FORCE', 'dest': 'BRICKED'},
-
-            # --- Admin Mode Enrollment Transitions ---
-            {'trigger': 'user_reset', 'source': 'ADMIN_MODE', 'dest': 'OOB_MODE', 'before': '_do_user_reset'},
-            
-            # Counter Enrollments
-            {'trigger': 'enroll_brute_force_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_brute_force_counter_enrollment'},
-            {'trigger': 'enroll_unattended_auto_lock_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_unattended_auto_lock_enrollment'},
-            {'trigger': 'enroll_min_pin_counter', 'source': 'ADMIN_MODE', 'dest': 'COUNTER_ENROLLMENT', 'before': '_min_pin_enrollment'},
-            {'trigger': 'enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_counter_enrollment'},
-            {'trigger': 'timeout_enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_timeout_counter_enrollment'},
-            {'trigger': 'exit_enroll_counter', 'source': 'COUNTER_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_press_lock_button'},
-
-            # PIN Enrollments
-            {'trigger': 'enroll_admin', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_admin_enrollment'},
-            {'trigger': 'enroll_user', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_user_enrollment', 'conditions': [CallableCondition(lambda _: any(pin_value is None for pin_value in self.dut.user_pin.values()), "Empty user slot available")]},
-            {'trigger': 'enroll_recovery', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_recovery_pin_enrollment'},
-            {'trigger': 'enroll_self_destruct', 'source': 'ADMIN_MODE', 'dest': 'PIN_ENROLLMENT', 'before': '_self_destruct_pin_enrollment'},
-            {'trigger': 'enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_pin_enrollment'},
-            {'trigger': 'timeout_enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_timeout_pin_enrollment'},
-            {'trigger': 'exit_enroll_pin', 'source': 'PIN_ENROLLMENT', 'dest': 'ADMIN_MODE', 'before': '_press_lock_button'},
-
-            # --- Admin Mode Toggle Transitions (Self-Loops) ---
-            {'trigger': 'toggle_basic_disk', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_basic_disk_toggle'},
-            {'trigger': 'toggle_removable_media', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_removable_media_toggle'},
-            {'trigger': 'enable_led_Flicker', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_led_flicker_enable'},
-            {'trigger': 'disable_led_Flicker', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_led_flicker_disable'},
-            {'trigger': 'delete_pins', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_delete_pins_toggle'},
-            {'trigger': 'toggle_lock_override', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_lock_override_toggle'},
-            {'trigger': 'enable_provision_lock', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_provision_lock_toggle'},
-            {'trigger': 'toggle_read_only', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_read_only_toggle'},
-            {'trigger': 'toggle_read_write', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_read_write_toggle'},
-            {'trigger': 'enable_self_destruct', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_self_destruct_toggle'},
-            {'trigger': 'toggle_user_forced_enrollment', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE', 'before': '_user_forced_enrollment_toggle'},
-        ]
-
-        release_valve_transitions: List[Tuple[Dict[str, Any], Callable[[EventData], Any]]] = []
-        for transition in transitions:
-            before_name = transition.get('before')
-            if not before_name:
-                continue
-            candidate = getattr(self, before_name, None)
-            if callable(candidate) and getattr(candidate, '_release_valve', False):
-                release_valve_transitions.append((transition, candidate))
-
-        for transition, method in release_valve_transitions:
-            transition.pop('before', None)
-            transition.setdefault('conditions', [])
-            transition['conditions'].append(
-                CallableCondition(
-                    lambda event_data, bound_method=method: bool(bound_method(event_data)),
-                    f"{method.__name__} release valve"
-                )
-            )
-
-        machine_kwargs = {
-            'model': self,
-            'states': ApricornDeviceFSM.STATES,
-            'transitions': transitions,
-            'initial': 'OFF',
-            'send_event': True,
-            'after_state_change': '_log_state_change_details',
-            'auto_transitions': True,
-        }
-
-        # Conditionally add the diagramming engine parameter
-        if DIAGRAM_MODE:
-            machine_kwargs['graph_engine'] = 'pygraphviz'
-
-        # Initialize the machine by unpacking the keyword arguments dictionary
-        self.machine = Machine(**machine_kwargs)
-        self.transition_config = transitions
+        # One machine serves every instance; this FSM is one of its models (held weakly,
+        # so it leaves the machine when it is garbage collected).
+        self.machine = ModelMachine(self.shared_machine(), self)
+        self.machine.add_model(self)
+        # Called with the EventData after each of this FSM's triggers (see add_transition_listener).
+        self.transition_listeners: List[Callable[[EventData], None]] = [self._journal_transition]
+        # Per-trigger, per-phase latency spans (a no-op unless TRANSITION_PROFILER_ENABLED).
+        get_profiler().instrument(self.machine.shared)
+
+        # Measured trigger durations weight the navigator's graph. Timers nest because
+        # on_enter callbacks can fire further triggers (e.g. post_pass inside power_on).
+        self.transition_costs = TransitionCostModel()
+        self.navigator = StateNavigator(self.transition_config, ApricornDeviceFSM.STATES, self.transition_costs,
+                                        model=self, logger_instance=self.logger)
+        self._transition_timers: List[Tuple[str, float]] = []
+        # Duration of the trigger whose finalize callbacks are running (for the session's metrics).
+        self._last_trigger_duration: Optional[float] = None
 
         self._block_orientation_log: Dict[int, str] = {}
         self.orienting: bool = False
+        self.enum_latency_mode: bool = ENUM_LATENCY_MODE
 
         # --- Public functions --- #
         self.admin_mode_login: Callable
@@ -815,46 +1716,237 @@ class ApricornDeviceFSM:
     def orient_for_block(
         self,
         *,
+        target_state: Optional[Union[str, List[str]]] = None,
         usb3: bool = True,
         retry_attempts: int = 1,
         retry_delay_sec: float = 3.0,
-    ) -> None:
-        """Ensure the device boots into OOB_MODE before block actions begin."""
+    ) -> bool:
+        """
+        Ensure the device is in a known state before block actions begin.
+
+        With a target_state, the cheapest trigger path there (see navigate_to) is
+        tried first and a reset is only the fallback. The path only counts when no
+        failure (LED or enumeration check) was logged on the way: orientation
+        usually follows a failed iteration, when the model is least trustworthy.
+        Without a target_state, the device is reset into OOB_MODE, as it is when
+        its LEDs contradict the model.
+
+        Args:
+            target_state: State, or list of acceptable states, the block starts from.
+            usb3: Passed to power_on when the path or the fallback powers the device on.
+            retry_attempts: Extra reset attempts after the first one fails.
+            retry_delay_sec: Longest wait for the device to go idle between attempts.
+
+        Returns:
+            True once the device is in target_state (or reset, without one). False
+            when a reset succeeded but target_state cannot be reached from the reset
+            state (e.g. STANDBY_MODE, which needs the PINs the reset cleared); the
+            device is left oriented in the reset state for the caller to set up.
+            The session is ended (SystemExit) only when every reset attempt fails.
+        """
         self.orienting = True
         self.logger.warning(
             f"=== Block {self.session.current_test_block}: '{self.session.test_blocks[self.session.current_test_block]}' mode orientation ==="
         )
 
         self.dut.needs_block_orientation = False
-        total_attempts = max(0, int(retry_attempts)) + 1
 
+        if target_state is not None:
+            if self._navigate_verified(target_state, usb3=usb3):
+                self._finish_orientation()
+                return True
+            self.logger.info(f"No reset-free path to {target_state}; falling back to a reset.")
+
+        total_attempts = max(0, int(retry_attempts)) + 1
+        reset_trigger = 'manufacturer_reset' if self.dut.provision_lock else 'user_reset'
         for attempt in range(1, total_attempts + 1):
             self.logger.info(
                 f"Mode orientation attempt {attempt}/{total_attempts} (usb3={usb3})."
             )
 
-            if self.dut.provision_lock:
-                if self.manufacturer_reset():
-                    self.lock_reset()
-                    self.orienting = False
-                    self.dut.needs_block_orientation = False
-                    self.logger.warning(
-                        f"=== Block {self.session.current_test_block}: '{self.session.test_blocks[self.session.current_test_block]}' mode orientation success ==="
-                    )
-                    return
-            else:
-                if self.user_reset():
-                    self.orienting = False
-                    self.dut.needs_block_orientation = False
-                    self.logger.warning(
-                        f"=== Block {self.session.current_test_block}: '{self.session.test_blocks[self.session.current_test_block]}' mode orientation success ==="
-                    )
-                    return
-            time.sleep(retry_delay_sec)
+            # The reset may not be available from here (e.g. OFF without a battery); get somewhere it is.
+            reset_sources = self.navigator.sources_for(reset_trigger)
+            oriented = self.navigate_to(reset_sources, usb3=usb3)
+            if oriented:
+                if self.dut.provision_lock:
+                    oriented = bool(self.manufacturer_reset())
+                    if oriented:
+                        self.lock_reset()
+                else:
+                    oriented = bool(self.user_reset())
+            if oriented:
+                reached = target_state is None or self._navigate_verified(target_state, usb3=usb3)
+                self._finish_orientation()
+                if not reached:
+                    self.logger.warning(f"{target_state} is not reachable after the reset; staying in {self.state}.")
+                return reached
+            if attempt < total_attempts:
+                # A failed reset can leave key generation running; retry once the device is idle.
+                self._timed_wait(
+                    "orient_retry",
+                    lambda budget: get_clock().wait_for(self._device_idle, budget, poll_interval=0.1),
+                    retry_delay_sec,
+                )
         self.logger.error("Mode orientation failed")
         self.session.generate_summary_report()
         raise SystemExit()
 
+    def resume_from_checkpoint(self, saved_state: str) -> None:
+        """
+        Puts the FSM back in the state a checkpoint recorded, then powers the device off.
+
+        After a crash the device can be anywhere between the checkpointed state and
+        whatever the interrupted iteration did next. OFF is reachable from every
+        state, and from there the block's orientation brings the device back up
+        along a reset-free path using the restored PINs.
+
+        Args:
+            saved_state: The FSM state stored in the checkpoint.
+        """
+        self.set_state(saved_state)
+        self.source_state = saved_state
+        self.logger.info(f"FSM restored to {saved_state} from checkpoint; powering off to re-orient.")
+        self.power_off()
+
+    def _navigate_verified(self, target_state: Union[str, List[str]], *, usb3: bool = True) -> bool:
+        """navigate_to(), failed if any step logged a session failure even though the model reached the target."""
+        block = self.session.current_test_block
+        failures_before = self.session.block_failure_count.get(block, 0)
+        reached = self.navigate_to(target_state, usb3=usb3)
+        failures = self.session.block_failure_count.get(block, 0) - failures_before
+        if reached and failures:
+            self.logger.warning(f"Reached {self.state}, but {failures} failure(s) were logged on the way; not trusting the model.")
+            return False
+        return reached
+
+    def _finish_orientation(self) -> None:
+        self.orienting = False
+        self.dut.needs_block_orientation = False
+        self.logger.warning(
+            f"=== Block {self.session.current_test_block}: '{self.session.test_blocks[self.session.current_test_block]}' mode orientation success ==="
+        )
+
+    def navigate_to(self, target_state: Union[str, List[str]], *, usb3: bool = True) -> bool:
+        """
+        Drives the device to `target_state` along the cheapest trigger path.
+
+        The path is planned over the transition table with the current DUT model
+        and the measured trigger durations, and re-planned after every step, since
+        a step can land somewhere else (power_on runs POST and picks the idle mode
+        from the model). Resets, enrollments and anything that needs a PIN from the
+        caller are never used as steps.
+
+        Args:
+            target_state: State, or list of acceptable states, to end in.
+            usb3: Passed to power_on if the path powers the device on.
+
+        Returns:
+            True once the FSM is in a target state; False when no reset-free path
+            exists or a step fails.
+        """
+        targets = [target_state] if isinstance(target_state, str) else list(target_state)
+        for _ in range(len(ApricornDeviceFSM.STATES)):
+            path = self.navigator.plan(self.state, targets)
+            if path is None:
+                self.logger.info(f"No reset-free path from {self.state} to {targets}.")
+                return False
+            if not path:
+                return True
+            trigger, expected = path[0]
+            self.logger.info(
+                f"Navigating {self.state} -> {path[-1][1]} via {[step[0] for step in path]} "
+                f"(~{self.navigator.path_cost(self.state, path):.1f}s): '{trigger}'"
+            )
+            kwargs = {'usb3': usb3} if trigger == 'power_on' else {}
+            try:
+                moved = getattr(self, trigger)(**kwargs)
+            except (MachineError, TransitionCallbackError) as e:
+                self.logger.warning(f"Navigation step '{trigger}' from {self.state} failed: {e}")
+                return False
+            if not moved:
+                self.logger.warning(f"Navigation step '{trigger}' was refused in {self.state} (expected {expected}).")
+                return False
+        return self.state in targets
+
+    def _start_transition_timer(self, event_data: EventData) -> None:
+        self._transition_timers.append((self.state, get_clock().monotonic()))
+
+    def _record_transition_timer(self, event_data: EventData) -> None:
+        """Feeds the duration of every completed trigger into the navigator's cost model."""
+        self._last_trigger_duration = None
+        if not self._transition_timers:
+            return
+        source, started = self._transition_timers.pop()
+        self._last_trigger_duration = get_clock().monotonic() - started
+        if event_data.result and event_data.transition is not None:
+            self.transition_costs.record(source, event_data.event.name, self._last_trigger_duration)
+
+    def add_transition_listener(self, callback: Callable[[EventData], None]) -> None:
+        """
+        Calls `callback(event_data)` after every trigger of this FSM, like a finalize_event
+        callback but without seeing the triggers of other models of the shared machine.
+        """
+        self.transition_listeners.append(callback)
+
+    def _journal_transition(self, event_data: EventData) -> None:
+        if event_data.transition is not None:
+            self.session.log_transition(event_data.event.name, event_data.transition.source, self.state,
+                                        bool(event_data.result), duration_s=self._last_trigger_duration)
+
+    def _notify_transition_listeners(self, event_data: EventData) -> None:
+        for callback in list(self.transition_listeners):
+            callback(event_data)
+
+    def set_state(self, state: str) -> None:
+        """Puts this FSM in `state` without firing a trigger; other FSMs on the shared machine are untouched."""
+        self.machine.set_state(state)
+
+    def release(self) -> None:
+        """Removes this FSM from the shared machine now, rather than when it is garbage collected."""
+        if self in self.machine.models:
+            self.machine.remove_model(self)
+
+    def _timed_wait(self, name: str, wait_fn: Callable[[float], bool], max_wait_sec: float) -> bool:
+        """
+        Runs a condition wait with a deadline and records the actual vs. maximum wait.
+
+        Args:
+            name: Label for the wait in the session's wait summary.
+            wait_fn: Called with the time budget in seconds; returns True once the
+                     condition is met, False if the budget ran out.
+            max_wait_sec: The deadline.
+
+        Returns:
+            Whether the condition was met before the deadline.
+        """
+        clock = get_clock()
+        started = clock.monotonic()
+        met = bool(wait_fn(max_wait_sec))
+        self.session.log_wait(name, clock.monotonic() - started, max_wait_sec, met)
+        return met
+
+    def _device_idle(self) -> bool:
+        """True when the camera sees the device and it is not generating keys."""
+        leds = self.at.current_led_state()
+        return bool(leds) and leds != LEDs['KEY_GENERATION']
+
+    def _await_unlock_settled(self, pattern_name: str, max_wait_sec: float) -> None:
+        """
+        Waits for the post-unlock LED warm-up to end before the enumeration pattern is checked.
+
+        The read-only and lock-override patterns open with a warm-up phase (their
+        first step); the periodic part starts with the pattern's second step, so
+        that is the state waited for. A zero max_wait_sec skips the wait.
+        """
+        if max_wait_sec <= 0:
+            return
+        settled_state = {k: v for k, v in LEDs[pattern_name][1].items() if k != 'duration'}
+        self._timed_wait(
+            "unlock_settle",
+            lambda budget: self.at.await_led_state(settled_state, timeout=budget, manage_replay=False),
+            max_wait_sec,
+        )
+
     def _log_state_change_details(self, event_data: EventData) -> None:
         """
         Logs the details of every state transition.
@@ -912,6 +2004,35 @@ class ApricornDeviceFSM:
             # The FSM has a logger and can correctly log a warning.
             self.logger.warning(f"Invalid enumeration type '{enum_type}' passed for tracking.")
 
+    def _record_enum_latency(self, event_data: EventData, device_info: Any, measure_mount: bool = False):
+        """
+        Records how long the DUT took to enumerate after the last Phidget actuation
+        (the final key release of a PIN/reset, or the 'connect' relay for power-on).
+
+        Args:
+            event_data: The event data of the transition that caused the enumeration.
+            device_info: The device record returned by the enumeration check.
+            measure_mount (bool): Also wait for filesystem mount readiness. Only honoured
+                when enum_latency_mode is enabled.
+        """
+        actuation = self.at.last_actuation()
+        enum_result = self.at.last_enum_result
+        if not actuation or not isinstance(enum_result, dict):
+            return
+        released_at = actuation[0]
+
+        def _since_release(timestamp: Optional[float]) -> Optional[float]:
+            # A device that was already on the bus before the actuation has no meaningful latency.
+            return timestamp - released_at if timestamp is not None and timestamp >= released_at else None
+
+        latencies = {
+            'usb': _since_release(enum_result.get('first_seen_time')),
+            'block': _since_release(enum_result.get('block_device_seen_time')),
+        }
+        if measure_mount and self.enum_latency_mode:
+            latencies['mount'] = _since_release(self.at.wait_for_mount_ready(device_info, timeout=ENUM_LATENCY_MOUNT_TIMEOUT_SEC))
+        self.session.log_enum_latency(event_data.event.name, latencies)
+
 ###########################################################################################################
 # Transition Functions (Automatic on entry to state)
     
@@ -1050,6 +2171,7 @@ class ApricornDeviceFSM:
             # For example, to update the DUT model with the most current info.
             if device_info:
                 self._increment_enumeration_count('oob')
+                self._record_enum_latency(event_data, device_info)
                 self.dut.serial_number = device_info.iSerial
                 # You could update other properties here as well if they can change
                 self.logger.info(f"Successfully confirmed enumeration for S/N: {self.dut.serial_number}")
@@ -1116,6 +2238,7 @@ class ApricornDeviceFSM:
             # For example, to update the DUT model with the most current info.
             if device_info:
                 self._increment_enumeration_count('pin')
+                self._record_enum_latency(event_data, device_info, measure_mount=True)
                 self.dut.serial_number = device_info.iSerial
                 if sys.platform.startswith('win32'):
                     self.dut.disk_path = device_info.physicalDriveNum
@@ -1149,6 +2272,7 @@ class ApricornDeviceFSM:
             # For example, to update the DUT model with the most current info.
             if device_info:
                 self._increment_enumeration_count('pin')
+                self._record_enum_latency(event_data, device_info, measure_mount=True)
                 self.dut.serial_number = device_info.iSerial
                 if sys.platform == 'win32':
                     self.dut.disk_path = device_info.physicalDriveNum
@@ -1185,6 +2309,7 @@ class ApricornDeviceFSM:
             # For example, to update the DUT model with the most current info.
             if device_info:
                 self._increment_enumeration_count('mfr')
+                self._record_enum_latency(event_data, device_info, measure_mount=True)
                 self.dut.serial_number = device_info.iSerial
                 if sys.platform.startswith('win32'):
                     self.dut.disk_path = device_info.physicalDriveNum
@@ -1292,11 +2417,12 @@ class ApricornDeviceFSM:
             raise TransitionCallbackError("usb3 argument, if provided, must be a boolean")
 
         self.logger.info("Powering dut on and performing self-test...")
+        self.dut.usb3 = usb3
         if usb3:
             self.at.on("usb3")
         
         self.at.on("connect") # This will now be called correctly.
-        time.sleep(0.5)
+        get_clock().sleep(0.5)
         
         if self.dut.battery:
             pass
@@ -1348,7 +2474,7 @@ class ApricornDeviceFSM:
         else:
             pattern = 'ENUM_LEGACY'
             duration = 0
-        time.sleep(duration)
+        self._await_unlock_settled(pattern, duration)
         if not self.at.await_and_confirm_led_pattern(LEDs[pattern], timeout=15, replay_extra_context=context):
             self.session.log_failure("Failed Admin unlock LED pattern")
             return False
@@ -1385,7 +2511,7 @@ class ApricornDeviceFSM:
         else:
             pattern = 'ENUM'
             duration = 0
-        time.sleep(duration)
+        self._await_unlock_settled(pattern, duration)
         if not self.at.await_and_confirm_led_pattern(LEDs[pattern], timeout=15, replay_extra_context=context):
             self.session.log_failure("Failed Self-Destruct unlock LED pattern")
             return False
@@ -1433,7 +2559,7 @@ class ApricornDeviceFSM:
         else:
             pattern = 'ENUM_LEGACY'
             duration = 0
-        time.sleep(duration)
+        self._await_unlock_settled(pattern, duration)
         if not self.at.await_and_confirm_led_pattern(LEDs[pattern], timeout=15, replay_extra_context=context):
             self.session.log_failure(f"Failed User {user_id} unlock LED pattern")
             return False
@@ -1509,12 +2635,20 @@ class ApricornDeviceFSM:
         dest_state = event_data.transition.dest if event_data.transition else "UNKNOWN"
         context = {'fsm_current_state': self.state, 'fsm_destination_state': dest_state}
         self.logger.info("Initiating User Reset...")
+        clock = get_clock()
         if self.state == "ADMIN_MODE":
             self._sequence([["lock", "unlock", "key2"]], pause_duration_ms=100)
+            # From Admin mode the device warns first, then starts key generation on its own.
+            self._timed_wait(
+                "user_reset_warning",
+                lambda budget: self.at.await_led_state(LEDs["KEY_GENERATION"], timeout=budget, manage_replay=False),
+                10,
+            )
         else:
             self._on("lock")
             self._on("unlock")
             self._on("key2")
+            hold_started = clock.monotonic()
             if self.dut.battery:
                 pattern = LEDs["USER_RESET_KEY"]
             else:
@@ -1524,7 +2658,12 @@ class ApricornDeviceFSM:
                 self.at.off("lock", "unlock", "key2")
                 self.session.log_failure("Failed to observe user reset initiation pattern")
                 return False
-        time.sleep(10)
+
+            def _hold_keys(budget: float) -> bool:
+                clock.sleep(min(budget, max(0.0, USER_RESET_HOLD_SEC - (clock.monotonic() - hold_started))))
+                return clock.monotonic() - hold_started >= USER_RESET_HOLD_SEC
+
+            self._timed_wait("user_reset_hold", _hold_keys, 10)
         self.at.off("lock", "unlock", "key2")
         user_reset_pattern = self.at.confirm_led_solid(LEDs["KEY_GENERATION"], minimum=8, timeout=15, replay_extra_context=context)
         if not user_reset_pattern:
@@ -1551,7 +2690,7 @@ class ApricornDeviceFSM:
         else:
             self.logger.info("Initiating Manufacturer Reset...")
             self._sequence([["lock", "key2"], "key3", "key8"], pause_duration_ms=200)
-            time.sleep(.2)
+            get_clock().sleep(.2)
             self._press("lock", duration_ms=6000)
 
         if not self.at.await_and_confirm_led_pattern(LEDs['RED_GREEN_BLUE'], timeout=7, clear_buffer=True, replay_extra_context=context):
@@ -1675,7 +2814,7 @@ class ApricornDeviceFSM:
         context = {'fsm_current_state': self.state, 'fsm_destination_state': dest_state}
         
         self.logger.info("Simulating 30-second PIN enrollment timeout...")
-        time.sleep(30) # Simulate the timeout
+        get_clock().sleep(30) # Simulate the timeout
 
         if pin_entered:
             self.logger.info("Partial PIN was entered before timeout, expecting REJECT pattern.")
@@ -1823,9 +2962,9 @@ class ApricornDeviceFSM:
         dest_state = event_data.transition.dest if event_data.transition else "UNKNOWN"
         context = {'fsm_current_state': self.state, 'fsm_destination_state': dest_state}
         if not pin_entered:
-            time.sleep(30)
+            get_clock().sleep(30)
         else:
-            time.sleep(30)
+            get_clock().sleep(30)
             if not self.at.await_and_confirm_led_pattern(LEDs['REJECT'], timeout=5.0, replay_extra_context=context):
                 self.session.log_failure("Did not observe REJECT for counter enrollment timeout")
 
@@ -2380,6 +3519,11 @@ class ApricornDeviceFSM:
         This delegates to `UnifiedController._format_disk`, allowing the controller
         to pick the correct OS-specific tooling. When the disk is not available
         (e.g., device still locked) the operation is skipped gracefully.
+
+        The controller's phase timings are recorded on the session. With Read-Only
+        mode enabled a refused format is the expected outcome and a successful one
+        is logged as a failure. A phase the Linux format pipeline failed in is
+        logged as a failure; on other platforms a failed format is only logged.
         """
         self.logger.info("Performing format operation...")
 
@@ -2429,19 +3573,31 @@ class ApricornDeviceFSM:
                 format_kwargs["windows_partition_number"] = 1
             results = self.at._format_disk(**format_kwargs)
 
+        format_result = getattr(self.at, 'last_format_result', None)
+        if isinstance(format_result, dict):
+            self.session.add_format_result(format_result)
+        else:
+            format_result = {}
+
         if results:
+            if self.dut.read_only_enabled:
+                self.session.log_failure("Format succeeded while Read-Only mode is enabled")
+                return
             self.logger.info("Format operation completed successfully.")
             return
 
         if self.dut.read_only_enabled:
             self.logger.info("Read-Only prevented drive format.")
+        elif sys.platform.startswith("linux") and format_result.get('failed_phase'):
+            # Only the Linux pipeline verifies the format phase by phase; elsewhere a failed format stays informational.
+            self.session.log_failure(f"DUT format failed in phase '{format_result['failed_phase']}': {format_result.get('error')}")
         else:
             self.logger.info("DUT format failed.")
 
 #################
 ## Speed Test
 
-    def speed_test(self) -> Optional[Dict[str, float]]:
+    def speed_test(self) -> Optional[Dict[str, FioJobResult]]:
         """
         Performs a standardized FIO speed test on the DUT's disk.
 
@@ -2450,7 +3606,7 @@ class ApricornDeviceFSM:
         potential errors like a missing disk path.
 
         Returns:
-            A dictionary with 'read' and 'write' speeds in MB/s on success,
+            Per-job FioJobResult objects keyed by job name on success,
             or None on failure.
         """
         self.logger.info(f"Performing FIO Speed Test...")
@@ -2466,8 +3622,72 @@ class ApricornDeviceFSM:
             disk_path=disk_to_test,
             drive_letter=self.dut.drive_letter
         )
-        
+
+        timeseries = getattr(self.at, 'last_fio_timeseries', None)
+        if isinstance(timeseries, list) and timeseries:
+            self.session.add_speed_test_timeseries(timeseries, abort_reason=getattr(self.at, 'last_fio_abort_reason', None))
+
         if results:
             self.session.add_speed_test_result(results)
 
         return results
+
+#################
+## Data Integrity
+
+    def integrity_write(self, seed: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Writes the seeded data-integrity pattern to the DUT's disk.
+
+        The seed is kept on the session so a later integrity_verify() (after a
+        power cycle or lock/unlock) checks the same pattern.
+
+        Args:
+            seed (Optional[int]): Pattern seed; a new one is drawn when omitted.
+
+        Returns:
+            The write result dict on success, or None on failure.
+        """
+        disk_to_test = self.dut.disk_path
+        if not disk_to_test:
+            self.logger.error("Cannot write integrity pattern: DUT disk path is not set. Ensure the device is unlocked first.")
+            return None
+
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), 'little')
+        self.logger.info(f"Writing data-integrity pattern to {disk_to_test} (seed {seed})...")
+        result = self.at.run_data_integrity(disk_path=disk_to_test, operation='write', seed=seed)
+        if result:
+            self.session.integrity_seed = seed
+            self.session.add_integrity_result(result)
+        else:
+            self.session.log_failure("Data integrity pattern write failed.")
+        return result
+
+    def integrity_verify(self) -> Optional[Dict[str, Any]]:
+        """
+        Verifies the pattern written by the last integrity_write() on the DUT's disk.
+
+        Returns:
+            The verify result dict ('passed', 'mismatches', ...), or None if no
+            pattern has been written or the pass could not run.
+        """
+        disk_to_test = self.dut.disk_path
+        if not disk_to_test:
+            self.logger.error("Cannot verify integrity pattern: DUT disk path is not set. Ensure the device is unlocked first.")
+            return None
+        if self.session.integrity_seed is None:
+            self.logger.error("Cannot verify integrity pattern: no pattern has been written this session.")
+            return None
+
+        self.logger.info(f"Verifying data-integrity pattern on {disk_to_test} (seed {self.session.integrity_seed})...")
+        result = self.at.run_data_integrity(disk_path=disk_to_test, operation='verify', seed=self.session.integrity_seed)
+        if result:
+            self.session.add_integrity_result(result)
+        else:
+            self.session.log_failure("Data integrity verify could not be run.")
+        return result
+
+
+# Compiled once, for every instance, the StateNavigator and the diagram tool.
+ApricornDeviceFSM.transition_config = ApricornDeviceFSM.compile_transitions()
@@ -0,0 +1,178 @@
+# Directory: controllers
+# Filename: fio_results.py
+#!/usr/bin/env python3
+
+# Typed speed-test results. One FioJobResult per fio job (or direct I/O engine job),
+# carrying bandwidth, IOPS, completion-latency percentiles, runtime and errors for
+# each direction the job exercised.
+
+import logging
+import math
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence
+
+module_logger = logging.getLogger(__name__)
+
+# Bytes per MB, matching the MB/s figures reported throughout the toolkit.
+BYTES_PER_MB = 1000 ** 2
+
+# fio clat percentile keys -> field suffix
+_CLAT_PERCENTILES = {"50.000000": "p50", "99.000000": "p99", "99.900000": "p999"}
+
+# Per-direction metrics aggregated across iterations, in report order.
+DIRECTION_METRICS = ("bw_mbps", "iops", "clat_p50_ms", "clat_p99_ms", "clat_p999_ms")
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class FioDirectionResult:
+    """Throughput and completion latency for one direction (read or write) of a job."""
+    bw_mbps: float
+    iops: float
+    io_bytes: int
+    runtime_s: float
+    clat_p50_ms: Optional[float] = None
+    clat_p99_ms: Optional[float] = None
+    clat_p999_ms: Optional[float] = None
+
+    @classmethod
+    def from_fio_json(cls, direction: Dict[str, Any]) -> "FioDirectionResult":
+        """
+        Builds the result from one 'read'/'write' block of fio's JSON job output.
+
+        Newer fio reports completion latency in 'clat_ns'; older builds use 'clat' in usec.
+        """
+        if "clat_ns" in direction:
+            clat, to_ms = direction["clat_ns"], 1e-6
+        else:
+            clat, to_ms = direction.get("clat", {}), 1e-3
+        percentiles = clat.get("percentile", {}) if isinstance(clat, dict) else {}
+        latencies = {f"clat_{suffix}_ms": round(float(percentiles[key]) * to_ms, 3)
+                     for key, suffix in _CLAT_PERCENTILES.items() if key in percentiles}
+        return cls(
+            bw_mbps=round(direction["bw_bytes"] / BYTES_PER_MB, 2),
+            iops=round(float(direction.get("iops", 0.0)), 1),
+            io_bytes=int(direction["io_bytes"]),
+            runtime_s=round(direction.get("runtime", 0) / 1000.0, 3),
+            **latencies,
+        )
+
+    @classmethod
+    def from_samples(cls, io_bytes: int, elapsed_s: float, latencies_s: List[float]) -> "FioDirectionResult":
+        """Builds the result from per-I/O completion latencies measured in-process."""
+        if elapsed_s <= 0:
+            return cls(bw_mbps=0.0, iops=0.0, io_bytes=io_bytes, runtime_s=0.0)
+        latencies = {}
+        if latencies_s:
+            latencies = {f"clat_{suffix}_ms": round(percentile(latencies_s, float(key)) * 1000.0, 3)
+                         for key, suffix in _CLAT_PERCENTILES.items()}
+        return cls(
+            bw_mbps=round(io_bytes / elapsed_s / BYTES_PER_MB, 2),
+            iops=round(len(latencies_s) / elapsed_s, 1),
+            io_bytes=io_bytes,
+            runtime_s=round(elapsed_s, 3),
+            **latencies,
+        )
+
+
+@dataclass
+class FioJobResult:
+    """All measurements for one job. Directions without I/O are None."""
+    name: str
+    read: Optional[FioDirectionResult] = None
+    write: Optional[FioDirectionResult] = None
+    runtime_s: float = 0.0
+    error: int = 0
+    total_errors: int = 0
+
+    @classmethod
+    def from_fio_json(cls, job: Dict[str, Any], default_name: str = "job") -> "FioJobResult":
+        """
+        Builds the result from one entry of fio's JSON 'jobs' array.
+
+        Raises:
+            KeyError: If a direction with I/O lacks 'bw_bytes'.
+        """
+        directions = {}
+        for direction in ("read", "write"):
+            block = job.get(direction)
+            if block and block.get("io_bytes", 0) > 0:
+                directions[direction] = FioDirectionResult.from_fio_json(block)
+        if "job_runtime" in job:
+            runtime_s = round(job["job_runtime"] / 1000.0, 3)
+        else:
+            runtime_s = max((d.runtime_s for d in directions.values()), default=0.0)
+        return cls(
+            name=job.get("jobname") or default_name,
+            runtime_s=runtime_s,
+            error=int(job.get("error", 0) or 0),
+            total_errors=int(job.get("total_err", 0) or 0),
+            **directions,
+        )
+
+    @property
+    def directions(self) -> Dict[str, FioDirectionResult]:
+        """Direction name -> result, for the directions that performed I/O."""
+        return {name: result for name, result in (("read", self.read), ("write", self.write)) if result is not None}
+
+    @property
+    def bandwidth(self) -> Dict[str, float]:
+        """{'read' and/or 'write': MB/s}, the shape reported before per-job results carried latency."""
+        return {name: result.bw_mbps for name, result in self.directions.items()}
+
+    @property
+    def has_io(self) -> bool:
+        return bool(self.directions)
+
+    def summary(self) -> str:
+        """One-line human readable summary used in logs."""
+        parts = []
+        for name, result in self.directions.items():
+            text = f"{name.capitalize()}: {result.bw_mbps} MB/s, {result.iops:.0f} IOPS"
+            if result.clat_p99_ms is not None:
+                text += f", clat p50/p99/p99.9 {result.clat_p50_ms}/{result.clat_p99_ms}/{result.clat_p999_ms} ms"
+            parts.append(text)
+        if self.error or self.total_errors:
+            parts.append(f"errors: {self.total_errors} (error {self.error})")
+        return "; ".join(parts) if parts else "no I/O"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FioJobResult":
+        """Rebuilds a result from to_dict() output (e.g. a session checkpoint)."""
+        values = dict(data)
+        for direction in ("read", "write"):
+            if values.get(direction) is not None:
+                values[direction] = FioDirectionResult(**values[direction])
+        return cls(**values)
+
+
+def summarize_values(values: Sequence[float]) -> Dict[str, float]:
+    """
+    Aggregates one metric across iterations.
+
+    Returns:
+        Dict[str, float]: count, min, max, mean, stdev (0.0 for a single value),
+        and nearest-rank p50/p99 across iterations, i.e. for a latency percentile
+        the percentile-of-percentiles.
+    """
+    count = len(values)
+    mean = sum(values) / count
+    stdev = math.sqrt(sum((v - mean) ** 2 for v in values) / (count - 1)) if count > 1 else 0.0
+    return {
+        "count": count,
+        "min": min(values),
+        "max": max(values),
+        "mean": mean,
+        "stdev": stdev,
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+    }
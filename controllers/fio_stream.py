@@ -0,0 +1,219 @@
+# Directory: controllers
+# Filename: fio_stream.py
+#!/usr/bin/env python3
+
+# Incremental parsing of fio's --status-interval JSON output. fio prints one full
+# (cumulative) JSON document per interval followed by the final report; each
+# document is turned into a bandwidth/IOPS sample for the interval it covers, and
+# abort policies can stop a run early when the DUT stalls or collapses to a
+# fraction of its expected speed.
+
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+module_logger = logging.getLogger(__name__)
+
+BYTES_PER_MB = 1000 ** 2
+
+# Seconds between fio status reports; 0 disables streaming status output.
+try:
+    FIO_STATUS_INTERVAL_SEC = int(os.environ.get("FIO_STATUS_INTERVAL_SEC", "1"))
+except (TypeError, ValueError):
+    FIO_STATUS_INTERVAL_SEC = 1
+
+# Abort when throughput stays below FIO_ABORT_MIN_MBPS for FIO_ABORT_MIN_MBPS_WINDOW_SEC
+# (disabled while the floor is 0), or when no I/O completes for FIO_ABORT_STALL_SEC
+# (disabled while 0, the default). fio lays out and preallocates files, and a DUT
+# may re-enumerate, without completing any I/O, so a stall window must be generous.
+try:
+    FIO_ABORT_MIN_MBPS = float(os.environ.get("FIO_ABORT_MIN_MBPS", "0"))
+except (TypeError, ValueError):
+    FIO_ABORT_MIN_MBPS = 0.0
+try:
+    FIO_ABORT_MIN_MBPS_WINDOW_SEC = float(os.environ.get("FIO_ABORT_MIN_MBPS_WINDOW_SEC", "5"))
+except (TypeError, ValueError):
+    FIO_ABORT_MIN_MBPS_WINDOW_SEC = 5.0
+try:
+    FIO_ABORT_STALL_SEC = float(os.environ.get("FIO_ABORT_STALL_SEC", "0"))
+except (TypeError, ValueError):
+    FIO_ABORT_STALL_SEC = 0.0
+
+# A policy receives the newest sample and the full series so far, and returns an
+# abort reason, or None to let the run continue.
+AbortPolicy = Callable[[Dict[str, Any], List[Dict[str, Any]]], Optional[str]]
+
+
+class _SustainedConditionPolicy:
+    """Fires once a condition has held for every sample spanning at least `window_s` seconds."""
+
+    def __init__(self, window_s: float):
+        self.window_s = window_s
+
+    def _matches(self, sample: Dict[str, Any]) -> bool:  # pragma: no cover - overridden
+        raise NotImplementedError
+
+    def _held_for(self, series: List[Dict[str, Any]]) -> float:
+        """Seconds the condition has held, counting back from the newest sample."""
+        held_since = None
+        for sample in reversed(series):
+            if not self._matches(sample):
+                break
+            held_since = sample["t"] - sample["interval_s"]
+        return series[-1]["t"] - held_since if held_since is not None else 0.0
+
+
+class MinThroughputPolicy(_SustainedConditionPolicy):
+    """Aborts when throughput stays below `min_mbps` for `window_s` seconds."""
+
+    def __init__(self, min_mbps: float, window_s: float = FIO_ABORT_MIN_MBPS_WINDOW_SEC):
+        super().__init__(window_s)
+        self.min_mbps = min_mbps
+
+    def _matches(self, sample: Dict[str, Any]) -> bool:
+        return sample["bw_mbps"] < self.min_mbps
+
+    def __call__(self, sample: Dict[str, Any], series: List[Dict[str, Any]]) -> Optional[str]:
+        held = self._held_for(series)
+        if held >= self.window_s:
+            return f"throughput below {self.min_mbps} MB/s for {held:.1f}s (last {sample['bw_mbps']} MB/s in {sample['job']})"
+        return None
+
+
+class StallPolicy(_SustainedConditionPolicy):
+    """
+    Aborts when no I/O completes for `window_s` seconds.
+
+    The startup phase, before the run completes its first I/O (file layout,
+    preallocation), never counts as a stall.
+    """
+
+    def __init__(self, window_s: float = 60.0):
+        super().__init__(window_s)
+
+    def _matches(self, sample: Dict[str, Any]) -> bool:
+        return sample["ios"] == 0
+
+    def __call__(self, sample: Dict[str, Any], series: List[Dict[str, Any]]) -> Optional[str]:
+        if all(self._matches(earlier) for earlier in series):
+            return None  # Still starting up.
+        held = self._held_for(series)
+        if held >= self.window_s:
+            return f"no I/O completed for {held:.1f}s (job {sample['job']})"
+        return None
+
+
+def default_abort_policies() -> List[AbortPolicy]:
+    """The policies configured through the FIO_ABORT_* environment variables."""
+    policies: List[AbortPolicy] = []
+    if FIO_ABORT_STALL_SEC > 0:
+        policies.append(StallPolicy(FIO_ABORT_STALL_SEC))
+    if FIO_ABORT_MIN_MBPS > 0:
+        policies.append(MinThroughputPolicy(FIO_ABORT_MIN_MBPS, FIO_ABORT_MIN_MBPS_WINDOW_SEC))
+    return policies
+
+
+class FioStatusParser:
+    """
+    Splits a stream of concatenated fio JSON documents and converts each into
+    an interval sample.
+
+    Samples are dicts with: t (seconds since start), interval_s, job (the job
+    that did most of the I/O, or the last active one), bw_mbps, read_mbps,
+    write_mbps, iops and ios (I/Os completed in the interval).
+    """
+
+    def __init__(self, start_time: Optional[float] = None, logger_instance: Optional[logging.Logger] = None):
+        self.logger = logger_instance if logger_instance else module_logger
+        self.start_time = start_time if start_time is not None else time.monotonic()
+        self.samples: List[Dict[str, Any]] = []
+        self.last_document: Optional[str] = None
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._previous: Dict[str, Dict[str, int]] = {}
+        self._previous_t = 0.0
+        self._first_timestamp_ms: Optional[int] = None
+        self._first_t = 0.0
+        self._last_job: Optional[str] = None
+
+    def feed(self, text: str, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Adds stdout text and returns the samples for any documents it completed.
+
+        Text outside a JSON document (fio notes and warnings) is skipped.
+        """
+        self._buffer += text
+        new_samples = []
+        while True:
+            start = self._buffer.find("{")
+            if start == -1:
+                self._buffer = ""
+                break
+            try:
+                document, end = self._decoder.raw_decode(self._buffer, start)
+            except json.JSONDecodeError:
+                self._buffer = self._buffer[start:]
+                break  # Incomplete document; wait for more output.
+            self.last_document = self._buffer[start:end]
+            self._buffer = self._buffer[end:]
+            sample = self._sample(document, now)
+            if sample is not None:
+                new_samples.append(sample)
+        return new_samples
+
+    def _elapsed(self, document: Dict[str, Any], now: Optional[float]) -> float:
+        timestamp_ms = document.get("timestamp_ms")
+        if isinstance(timestamp_ms, (int, float)):
+            # Anchor fio's wall clock to the first report so host clock jumps don't skew intervals.
+            if self._first_timestamp_ms is None:
+                self._first_timestamp_ms = timestamp_ms
+                self._first_t = (now if now is not None else time.monotonic()) - self.start_time
+                return self._first_t
+            return self._first_t + (timestamp_ms - self._first_timestamp_ms) / 1000.0
+        return (now if now is not None else time.monotonic()) - self.start_time
+
+    def _sample(self, document: Dict[str, Any], now: Optional[float]) -> Optional[Dict[str, Any]]:
+        jobs = document.get("jobs")
+        if not isinstance(jobs, list):
+            return None
+        t = self._elapsed(document, now)
+        interval = t - self._previous_t
+        if interval <= 0:
+            return None  # A second report for the same instant carries no new I/O.
+
+        deltas = {"read": 0, "write": 0}
+        ios = 0
+        busiest, busiest_bytes = None, 0
+        for index, job in enumerate(jobs):
+            name = job.get("jobname") or f"job{index}"
+            previous = self._previous.setdefault(name, {})
+            job_bytes = 0
+            for direction in ("read", "write"):
+                block = job.get(direction) or {}
+                io_bytes = int(block.get("io_bytes", 0))
+                total_ios = int(block.get("total_ios", 0))
+                delta_bytes = io_bytes - previous.get(f"{direction}_bytes", 0)
+                ios += total_ios - previous.get(f"{direction}_ios", 0)
+                previous[f"{direction}_bytes"], previous[f"{direction}_ios"] = io_bytes, total_ios
+                deltas[direction] += delta_bytes
+                job_bytes += delta_bytes
+            if job_bytes > busiest_bytes:
+                busiest, busiest_bytes = name, job_bytes
+        if busiest is not None:
+            self._last_job = busiest
+
+        self._previous_t = t
+        sample = {
+            "t": round(t, 3),
+            "interval_s": round(interval, 3),
+            "job": self._last_job or (jobs[0].get("jobname") if jobs else None) or "job0",
+            "bw_mbps": round((deltas["read"] + deltas["write"]) / interval / BYTES_PER_MB, 2),
+            "read_mbps": round(deltas["read"] / interval / BYTES_PER_MB, 2),
+            "write_mbps": round(deltas["write"] / interval / BYTES_PER_MB, 2),
+            "iops": round(ios / interval, 1),
+            "ios": ios,
+        }
+        self.samples.append(sample)
+        return sample
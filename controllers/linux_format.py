@@ -0,0 +1,428 @@
+# Directory: controllers
+# Filename: linux_format.py
+#!/usr/bin/env python3
+
+# Linux format pipeline for the DUT. Detects the partition layout from sysfs,
+# refuses read-only targets before mkfs gets a chance to retry against them,
+# formats with cluster size and alignment derived from the device geometry,
+# waits for the kernel/udev 'change' event that follows the new filesystem
+# instead of sleeping, and proves the volume is usable with a mount + small
+# write/read + unmount. Every phase is timed so format latency can be tracked.
+
+import logging
+import os
+import select
+import socket
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from controllers.usb_watcher import NETLINK_KOBJECT_UEVENT
+
+module_logger = logging.getLogger(__name__)
+
+SYSFS_CLASS_BLOCK_DIR = "/sys/class/block"
+PROC_MOUNTS_PATH = "/proc/mounts"
+
+# Filesystem written by default ('vfat' -> FAT32, or 'exfat').
+FORMAT_FS_TYPE = os.environ.get("FORMAT_FS_TYPE") or "vfat"
+try:
+    FORMAT_CLUSTER_KB = int(os.environ.get("FORMAT_CLUSTER_KB", "32"))
+except (TypeError, ValueError):
+    FORMAT_CLUSTER_KB = 32
+try:
+    # Upper bound on the wait for the post-mkfs udev 'change' event.
+    FORMAT_REREAD_TIMEOUT_SEC = float(os.environ.get("FORMAT_REREAD_TIMEOUT_SEC", "10"))
+except (TypeError, ValueError):
+    FORMAT_REREAD_TIMEOUT_SEC = 10.0
+try:
+    FORMAT_VERIFY_BYTES = int(os.environ.get("FORMAT_VERIFY_BYTES", str(1024 * 1024)))
+except (TypeError, ValueError):
+    FORMAT_VERIFY_BYTES = 1024 * 1024
+FORMAT_VERIFY_ENABLED = os.environ.get("FORMAT_VERIFY_ENABLED", "true").lower() == "true"
+
+# Phases in execution order; every result carries a duration for those that ran.
+FORMAT_PHASES = ("detect", "unmount", "mkfs", "reread", "verify")
+
+_COMMAND_TIMEOUT_SEC = 300
+
+
+class FormatPhaseError(RuntimeError):
+    """A format phase failed; `phase` names the phase."""
+
+    def __init__(self, phase: str, message: str):
+        super().__init__(message)
+        self.phase = phase
+
+
+def _read_sysfs(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as handle:
+            return handle.read().strip()
+    except OSError:
+        return None
+
+
+class BlockUeventListener:
+    """
+    Subscribes to kernel uevents for one block device.
+
+    Open it before the operation that triggers the event so nothing is missed;
+    unavailable netlink sockets (non-Linux, containers) leave `available` False.
+    """
+
+    def __init__(self, device_name: str, logger_instance: Optional[logging.Logger] = None):
+        self.logger = logger_instance if logger_instance else module_logger
+        self.device_name = device_name
+        self._sock: Optional[socket.socket] = None
+
+    @property
+    def available(self) -> bool:
+        return self._sock is not None
+
+    def open(self) -> "BlockUeventListener":
+        if hasattr(socket, "AF_NETLINK"):
+            try:
+                sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+                sock.bind((0, 1))
+                sock.setblocking(False)
+                self._sock = sock
+            except OSError as exc:
+                self.logger.debug("Kernel uevent socket unavailable (%s).", exc)
+        return self
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def matches(self, payload: bytes, actions=(b"change", b"add")) -> bool:
+        """True for a block-subsystem uevent about this device with one of the given actions."""
+        fields = payload.split(b"\0")
+        header = fields[0]
+        env = dict(field.split(b"=", 1) for field in fields[1:] if b"=" in field)
+        action = env.get(b"ACTION") or header.split(b"@", 1)[0]
+        return (env.get(b"SUBSYSTEM") == b"block"
+                and env.get(b"DEVNAME", b"").rsplit(b"/", 1)[-1] == self.device_name.encode()
+                and action in actions)
+
+    def wait(self, timeout: float) -> Optional[float]:
+        """
+        Waits for a matching event.
+
+        Returns:
+            Optional[float]: Seconds waited, or None on timeout or without a socket.
+        """
+        if self._sock is None:
+            return None
+        start = time.monotonic()
+        deadline = start + max(0.0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                readable, _, _ = select.select([self._sock], [], [], remaining)
+            except (OSError, ValueError):
+                return None
+            if not readable:
+                return None
+            while True:
+                try:
+                    payload = self._sock.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    return None
+                if self.matches(payload):
+                    return time.monotonic() - start
+
+
+class LinuxFormatPipeline:
+    """
+    Formats a DUT block device on Linux and records per-phase timings.
+
+    `device` may be the whole disk (e.g. /dev/sdb) or a partition. When the disk
+    carries a partition table its first partition is formatted, otherwise the
+    whole disk is formatted as a superfloppy, matching how the DUT ships.
+    """
+
+    def __init__(self, device: str, label: str = "DUT", fs_type: str = FORMAT_FS_TYPE,
+                 cluster_kb: int = FORMAT_CLUSTER_KB, verify: bool = FORMAT_VERIFY_ENABLED,
+                 reread_timeout: float = FORMAT_REREAD_TIMEOUT_SEC, verify_bytes: int = FORMAT_VERIFY_BYTES,
+                 sysfs_block_dir: str = SYSFS_CLASS_BLOCK_DIR, mounts_path: str = PROC_MOUNTS_PATH,
+                 runner: Callable[..., subprocess.CompletedProcess] = subprocess.run,
+                 listener_factory: Callable[[str], BlockUeventListener] = BlockUeventListener,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            device (str): Block device path.
+            label (str): Volume label.
+            fs_type (str): 'vfat' (FAT32) or 'exfat'.
+            cluster_kb (int): Cluster size in KiB.
+            verify (bool): Run the mount/write/read/unmount quick-verify.
+            reread_timeout (float): Maximum wait for the post-mkfs udev event.
+            verify_bytes (int): Size of the quick-verify file.
+            sysfs_block_dir (str): /sys/class/block, overridable for tests.
+            mounts_path (str): /proc/mounts, overridable for tests.
+            runner: subprocess.run-compatible callable used for external tools.
+            listener_factory: Builds the uevent listener for a device name.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+
+        Raises:
+            ValueError: For an unsupported fs_type.
+        """
+        if fs_type not in ("vfat", "exfat"):
+            raise ValueError(f"Unsupported filesystem type '{fs_type}'. Use 'vfat' or 'exfat'.")
+        self.logger = logger_instance if logger_instance else module_logger
+        self.device = device
+        self.label = label
+        self.fs_type = fs_type
+        self.cluster_kb = cluster_kb
+        self.verify_enabled = verify
+        self.reread_timeout = reread_timeout
+        self.verify_bytes = verify_bytes
+        self.sysfs_block_dir = sysfs_block_dir
+        self.mounts_path = mounts_path
+        self.runner = runner
+        self.listener_factory = listener_factory
+
+    def _run(self, phase: str, command: List[str], timeout: float = _COMMAND_TIMEOUT_SEC) -> subprocess.CompletedProcess:
+        self.logger.debug("Format %s: %s", phase, " ".join(command))
+        try:
+            return self.runner(command, check=True, capture_output=True, text=True, timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            detail = (e.stderr or e.stdout or "").strip()
+            raise FormatPhaseError(phase, f"{command[0]} exited with {e.returncode}: {detail}") from e
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise FormatPhaseError(phase, f"{command[0]} failed: {e}") from e
+
+    # --- Phases ---
+
+    def detect(self) -> Dict[str, Any]:
+        """
+        Reads the partition layout and geometry of the device from sysfs.
+
+        Returns:
+            Dict[str, Any]: disk, target (the node that gets formatted), partitions,
+            partition_table ('gpt', 'dos' or None), read_only, logical_block_size,
+            start_sector and size_bytes.
+
+        Raises:
+            FormatPhaseError: If the device has no sysfs entry.
+        """
+        name = os.path.basename(os.path.realpath(self.device))
+        entry = os.path.join(self.sysfs_block_dir, name)
+        if not os.path.isdir(entry):
+            raise FormatPhaseError("detect", f"{self.device} is not a block device (no {entry}).")
+        entry = os.path.realpath(entry)
+        is_partition = os.path.exists(os.path.join(entry, "partition"))
+        disk_entry = os.path.dirname(entry) if is_partition else entry
+        disk = os.path.basename(disk_entry)
+
+        partitions = []
+        for child in os.listdir(disk_entry):
+            number = _read_sysfs(os.path.join(disk_entry, child, "partition"))
+            if number is not None and number.isdigit():
+                partitions.append((int(number), child))
+        partitions = [child for _, child in sorted(partitions)]
+
+        target = name if is_partition or not partitions else partitions[0]
+        target_entry = os.path.join(disk_entry, target) if target != disk else disk_entry
+
+        partition_table = None
+        try:
+            completed = self.runner(["blkid", "-p", "-o", "value", "-s", "PTTYPE", f"/dev/{disk}"],
+                                    capture_output=True, text=True, timeout=30)
+            partition_table = (completed.stdout or "").strip() or None
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.logger.debug("Partition table probe unavailable: %s", e)
+
+        logical_block_size = _read_sysfs(os.path.join(disk_entry, "queue", "logical_block_size"))
+        start_sector = _read_sysfs(os.path.join(target_entry, "start"))
+        size_sectors = _read_sysfs(os.path.join(target_entry, "size"))
+        return {
+            "disk": disk,
+            "target": target,
+            "partitions": partitions,
+            "partition_table": partition_table,
+            "read_only": _read_sysfs(os.path.join(target_entry, "ro")) == "1",
+            "logical_block_size": int(logical_block_size) if logical_block_size and logical_block_size.isdigit() else 512,
+            "start_sector": int(start_sector) if start_sector and start_sector.isdigit() else 0,
+            # sysfs 'size' is always in 512-byte units.
+            "size_bytes": int(size_sectors) * 512 if size_sectors and size_sectors.isdigit() else 0,
+        }
+
+    def mountpoints(self, target: str) -> List[str]:
+        """Mount points of /dev/<target>, from /proc/mounts."""
+        points = []
+        try:
+            with open(self.mounts_path, "r") as mounts:
+                for line in mounts:
+                    fields = line.split()
+                    if len(fields) >= 2 and fields[0] == f"/dev/{target}":
+                        points.append(fields[1].replace("\\040", " "))
+        except OSError:
+            pass
+        return points
+
+    def unmount(self, target: str) -> List[str]:
+        """Unmounts every mount of the target (desktop automounters grab the DUT)."""
+        points = self.mountpoints(target)
+        for point in points:
+            self._run("unmount", ["umount", point])
+        return points
+
+    def mkfs_command(self, layout: Dict[str, Any]) -> List[str]:
+        """
+        Builds the mkfs command for the detected geometry.
+
+        FAT32 gets the device's logical sector size, a cluster of `cluster_kb`
+        expressed in sectors, and the partition start as hidden sectors so the
+        data region stays aligned to the partition offset.
+        """
+        device = f"/dev/{layout['target']}"
+        if self.fs_type == "exfat":
+            return ["mkfs.exfat", "-L", self.label, "-c", f"{self.cluster_kb}K", device]
+        sector = layout["logical_block_size"]
+        sectors_per_cluster = max(1, min(128, self.cluster_kb * 1024 // sector))
+        # mkfs.vfat only accepts powers of two.
+        sectors_per_cluster = 1 << (sectors_per_cluster.bit_length() - 1)
+        return ["mkfs.vfat", "-F", "32", "-n", self.label[:11].upper(), "-S", str(sector),
+                "-s", str(sectors_per_cluster), "-h", str(layout["start_sector"]), device]
+
+    def wait_for_reread(self, listener: BlockUeventListener) -> str:
+        """
+        Waits until udev has processed the new filesystem.
+
+        Returns:
+            str: 'uevent' when the change event arrived, 'udevadm' when udevadm
+            settle was used instead, or 'timeout'/'none' when neither worked.
+        """
+        if listener.available:
+            if listener.wait(self.reread_timeout) is not None:
+                return "uevent"
+            self.logger.warning("No udev change event for %s within %.1fs.", listener.device_name, self.reread_timeout)
+        try:
+            self._run("reread", ["udevadm", "settle", f"--timeout={int(max(1, self.reread_timeout))}"],
+                      timeout=self.reread_timeout + 5)
+            return "udevadm"
+        except FormatPhaseError as e:
+            self.logger.debug("udevadm settle unavailable: %s", e)
+            return "timeout" if listener.available else "none"
+
+    def quick_verify(self, target: str) -> None:
+        """
+        Mounts the new filesystem, writes and reads back a small file, and unmounts.
+
+        Raises:
+            FormatPhaseError: If any step fails or the data does not match.
+        """
+        mount_dir = tempfile.mkdtemp(prefix="dut-format-verify-")
+        mounted = False
+        try:
+            self._run("verify", ["mount", "-t", self.fs_type, f"/dev/{target}", mount_dir])
+            mounted = True
+            payload = os.urandom(self.verify_bytes)
+            path = os.path.join(mount_dir, "format_verify.bin")
+            try:
+                with open(path, "wb") as handle:
+                    handle.write(payload)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    # Drop the cached pages so the read-back comes from the device.
+                    if hasattr(os, "posix_fadvise"):
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                    with os.fdopen(fd, "rb", closefd=False) as handle:
+                        read_back = handle.read()
+                finally:
+                    os.close(fd)
+                os.remove(path)
+            except OSError as e:
+                raise FormatPhaseError("verify", f"Quick-verify I/O failed: {e}") from e
+            if read_back != payload:
+                raise FormatPhaseError("verify", f"Quick-verify read back {len(read_back)} bytes that do not match what was written.")
+        finally:
+            if mounted:
+                self._run("verify", ["umount", mount_dir])
+            try:
+                os.rmdir(mount_dir)
+            except OSError:
+                pass
+
+    # --- Pipeline ---
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs every phase, stopping at the first failure.
+
+        Returns:
+            Dict[str, Any]: device, target, fs_type, partition_table, read_only,
+            phases (phase -> seconds, for the phases that ran), reread_source,
+            total_s, passed, failed_phase and error.
+        """
+        result: Dict[str, Any] = {
+            "device": self.device,
+            "target": None,
+            "fs_type": self.fs_type,
+            "partition_table": None,
+            "read_only": False,
+            "phases": {},
+            "reread_source": None,
+            "total_s": 0.0,
+            "passed": False,
+            "failed_phase": None,
+            "error": None,
+        }
+        start = time.perf_counter()
+        phase = "detect"
+
+        def timed(name: str, fn: Callable[[], Any]) -> Any:
+            nonlocal phase
+            phase = name
+            phase_start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                result["phases"][name] = round(time.perf_counter() - phase_start, 3)
+
+        try:
+            layout = timed("detect", self.detect)
+            target = layout["target"]
+            result.update(target=f"/dev/{target}", partition_table=layout["partition_table"],
+                          read_only=layout["read_only"])
+            if layout["read_only"]:
+                # mkfs against a write-protected device can spin on retries; stop here.
+                raise FormatPhaseError("detect", f"/dev/{target} is read-only.")
+            timed("unmount", lambda: self.unmount(target))
+            with self.listener_factory(target) as listener:
+                timed("mkfs", lambda: self._run("mkfs", self.mkfs_command(layout)))
+                result["reread_source"] = timed("reread", lambda: self.wait_for_reread(listener))
+            if self.verify_enabled:
+                timed("verify", lambda: self.quick_verify(target))
+            result["passed"] = True
+        except FormatPhaseError as e:
+            result["failed_phase"] = "read_only" if result["read_only"] else e.phase
+            result["error"] = str(e)
+        except OSError as e:
+            result["failed_phase"] = phase
+            result["error"] = str(e)
+        result["total_s"] = round(time.perf_counter() - start, 3)
+
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["phases"].items())
+        if result["passed"]:
+            self.logger.info("Formatted %s as %s in %.2fs (%s).", result["target"], self.fs_type, result["total_s"], phases)
+        elif result["read_only"]:
+            self.logger.info("Format of %s refused: device is read-only.", result["target"])
+        else:
+            self.logger.error("Format of %s failed in phase '%s': %s", self.device, result["failed_phase"], result["error"])
+        return result
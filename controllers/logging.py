@@ -1,14 +1,41 @@
 # Directory: utils
 # Filename: logging_config.py
 
+# setup_logging() puts a QueueHandler on the root logger and hands every record
+# to a QueueListener thread that owns the console and file handlers. A log call
+# in a camera confirm loop or a Phidget edge used to format the record and write
+# it to the console and disk on the calling thread; it now only creates the
+# record and enqueues it, and formatting and I/O happen on the listener thread.
+# High-rate debug output goes to the 'trace' channel (trace_logger()), which is
+# off unless LOG_TRACE_ENABLED=true and is meant to be called with %-style
+# arguments (or LazyMessage) so that a disabled call costs one level check.
+
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
+from typing import Any, Callable, List, Optional
 
 # Default log format matching your example (without logger name for cleaner output)
 DEFAULT_LOG_FORMAT = '%(asctime)s.%(msecs)03d  %(levelname)-8s  %(message)s'
 DEFAULT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# --- Configuration for the Logging Pipeline ---
+LOG_QUEUE_ENABLED = os.environ.get("LOG_QUEUE_ENABLED", "true").lower() == "true"
+LOG_TRACE_ENABLED = os.environ.get("LOG_TRACE_ENABLED", "false").lower() == "true"
+TRACE_LOGGER_NAME = "trace"
+# Size-based rotation of the log file; 0 keeps a single, unbounded file.
+try:
+    LOG_FILE_MAX_BYTES = int(os.environ.get("LOG_FILE_MAX_BYTES", "0"))
+except (TypeError, ValueError):
+    LOG_FILE_MAX_BYTES = 0
+try:
+    LOG_FILE_BACKUP_COUNT = int(os.environ.get("LOG_FILE_BACKUP_COUNT", "5"))
+except (TypeError, ValueError):
+    LOG_FILE_BACKUP_COUNT = 5
+
 # --- Configuration for Specific Logger Levels ---
 # Keys are logger names. 'root' is the default for unlisted loggers.
 LOG_LEVEL_CONFIG = {
@@ -22,6 +49,7 @@ LOG_LEVEL_CONFIG = {
     "controllers.unified_controller": logging.INFO, # For UnifiedController's own messages
     "Phidget22": logging.WARNING, # Default verbosity for the Phidget22 library itself
     "transitions": logging.WARNING,
+    TRACE_LOGGER_NAME: logging.DEBUG if LOG_TRACE_ENABLED else logging.WARNING,
     # "MyMainScript": logging.DEBUG # Example if you have another main script
 }
 
@@ -32,6 +60,83 @@ LOG_FILE_MODE = "a" # "a" for append, "w" for overwrite
 
 ENABLE_CONSOLE_LOGGING = True
 
+# The running listener and the handlers it owns (see setup_logging / stop_logging).
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are. The stock QueueHandler formats the
+    message on the calling thread so that records can be pickled; this queue
+    never leaves the process, so formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LazyMessage:
+    """
+    A log argument that is only built when the record is formatted.
+
+        logger.debug("LED state %s", LazyMessage(format_state, state))
+
+    With the queue pipeline that happens on the listener thread, so the function
+    must not depend on state the caller changes afterwards.
+    """
+
+    __slots__ = ("function", "args")
+
+    def __init__(self, function: Callable[..., Any], *args: Any):
+        self.function = function
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.function(*self.args))
+
+
+def trace_logger(name: str) -> logging.Logger:
+    """
+    The high-rate debug channel of a module: logger 'trace.<name>'.
+
+    Its level comes from LOG_TRACE_ENABLED (DEBUG when true, WARNING otherwise),
+    independent of the module's own logger. Call it with %-style arguments so a
+    disabled call builds no string.
+    """
+    return logging.getLogger(f"{TRACE_LOGGER_NAME}.{name}")
+
+
+def stop_logging() -> None:
+    """
+    Writes out every queued record and stops the listener thread.
+
+    The listener's handlers are put back on the root logger, so anything logged
+    afterwards is still written, synchronously. Safe to call twice; also runs
+    at exit.
+    """
+    global _queue_listener
+    listener, _queue_listener = _queue_listener, None
+    if listener is None:
+        return
+    listener.stop()
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, _EnqueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in listener.handlers:
+        root_logger.addHandler(handler)
+
+
+atexit.register(stop_logging)
+
+
+def _create_file_handler(log_file_path: str, log_file_mode: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    if max_bytes > 0:
+        # RotatingFileHandler always appends; a fresh run starts a fresh directory anyway.
+        return logging.handlers.RotatingFileHandler(log_file_path, mode=log_file_mode, maxBytes=max_bytes,
+                                                    backupCount=backup_count, encoding='utf-8')
+    return logging.FileHandler(log_file_path, mode=log_file_mode, encoding='utf-8')
+
 
 def setup_logging(
     default_log_level=None,
@@ -40,11 +145,21 @@ def setup_logging(
     log_level_overrides=None,
     log_to_console=ENABLE_CONSOLE_LOGGING,
     log_file_path=None,
-    log_file_mode=LOG_FILE_MODE
+    log_file_mode=LOG_FILE_MODE,
+    log_file_max_bytes=LOG_FILE_MAX_BYTES,
+    log_file_backup_count=LOG_FILE_BACKUP_COUNT,
+    use_queue=LOG_QUEUE_ENABLED
 ):
     """
     Configures the Python logging system. Call once at application start.
+
+    With `use_queue` the console and file handlers are owned by a QueueListener
+    thread and the root logger only enqueues records; stop_logging() (also run at
+    exit) writes out what is still queued. `log_file_max_bytes` > 0 rotates the
+    log file at that size, keeping `log_file_backup_count` old files.
     """
+    global _queue_listener
+    stop_logging()
     effective_root_level = default_log_level if default_log_level is not None else LOG_LEVEL_CONFIG.get("root", logging.INFO)
     root_logger = logging.getLogger()
     root_logger.setLevel(effective_root_level)
@@ -56,11 +171,18 @@ def setup_logging(
 
     formatter = logging.Formatter(log_format, datefmt=date_format)
     console_handler = None # To check if it was added, for error logging during setup
+    handlers: List[logging.Handler] = []
+    if use_queue:
+        # Handlers go to the listener; records logged during setup are written once it starts.
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root_logger.addHandler(_EnqueueHandler(log_queue))
 
     if log_to_console:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
+        if not use_queue:
+            root_logger.addHandler(console_handler)
 
     # MODIFIED: Logic now checks if a path was provided.
     if log_file_path:
@@ -68,9 +190,11 @@ def setup_logging(
             log_dir = os.path.dirname(log_file_path)
             if log_dir and not os.path.exists(log_dir):
                 os.makedirs(log_dir)
-            file_handler = logging.FileHandler(log_file_path, mode=log_file_mode, encoding='utf-8')
+            file_handler = _create_file_handler(log_file_path, log_file_mode, log_file_max_bytes, log_file_backup_count)
             file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
+            handlers.append(file_handler)
+            if not use_queue:
+                root_logger.addHandler(file_handler)
         except Exception as e:
             error_msg = f"Error setting up file logging to '{log_file_path}': {e}"
             if console_handler: # Safely use root_logger if console is up
@@ -78,6 +202,10 @@ def setup_logging(
             else:
                 print(error_msg, file=sys.stderr)
 
+    if use_queue:
+        _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+
     combined_log_levels = LOG_LEVEL_CONFIG.copy()
     if log_level_overrides:
         combined_log_levels.update(log_level_overrides)
@@ -103,6 +231,8 @@ def setup_logging(
     startup_logger = logging.getLogger("LoggingConfig") # Or root_logger
     # MODIFIED: The log message now accurately reflects the file logging status.
     file_logging_status = f"'{log_file_path}'" if log_file_path else "Disabled"
-    startup_logger.info(f"Logging configured. Root level: {logging.getLevelName(root_logger.level)}. Console: {log_to_console}, File: {file_logging_status}.")
+    if log_file_path and log_file_max_bytes > 0:
+        file_logging_status += f" (rotating at {log_file_max_bytes} bytes, {log_file_backup_count} backups)"
+    startup_logger.info(f"Logging configured. Root level: {logging.getLevelName(root_logger.level)}. Console: {log_to_console}, File: {file_logging_status}, Queue: {use_queue}.")
     if combined_log_levels:
         startup_logger.debug(f"Specific logger levels applied: {combined_log_levels}")
\ No newline at end of file
@@ -12,9 +12,12 @@ import numpy as np # Import numpy for array operations
 import collections # For deque, for instant replay
 import datetime # For timestamping replay files
 import os # For path manipulation for replay files
-from typing import Dict, Optional, List, Tuple, Any # For type hinting
+from typing import Dict, Optional, List, Tuple, Any, Callable # For type hinting
 import threading
 
+from controllers.clock import get_clock
+from controllers.logging import LazyMessage
+
 
 # Get the logger for this module. Its name will be 'controllers.logitech_webcam'.
 # Configuration (handlers, level, format) comes from the global setup.
@@ -179,9 +182,13 @@ class LogitechLedChecker:
                  replay_output_dir: Optional[str] = None,
                  enable_instant_replay: Optional[bool] = None,
                  keypad_layout: Optional[List[List[str]]] = None,
-                 camera_hw_settings: Optional[Dict[int, Any]] = None):
+                 camera_hw_settings: Optional[Dict[int, Any]] = None,
+                 frame_source: Optional[Any] = None):
         self.logger = logger_instance if logger_instance else logger
         self.cap = None
+        # Optional cv2.VideoCapture-like object (isOpened/read/set/get/release) used
+        # instead of opening camera_id, e.g. a VirtualLedCamera.
+        self.frame_source = frame_source
         self.is_camera_initialized = False
         self.camera_id = camera_id
         self.preferred_backend = get_capture_backend()
@@ -194,6 +201,11 @@ class LogitechLedChecker:
         self.keypad_layout = keypad_layout
         self.active_keys_for_replay: set = set()
         self.active_keys_lock = threading.Lock()
+        # Called with every logged LED run (see add_led_run_listener).
+        self._led_run_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # Frame counters of the frame thread (see camera_stats); a failed read counts as dropped.
+        self.frames_captured = 0
+        self.frames_dropped = 0
 
         # --- Instant Replay Initialization ---
         if enable_instant_replay is not None:
@@ -275,6 +287,8 @@ class LogitechLedChecker:
         if self.is_camera_initialized:
             self.thread = threading.Thread(target=self._update_frame_thread, args=())
             self.thread.daemon = True
+            # Registered before start so a simulated clock cannot advance past its first frame.
+            get_clock().register_actor(self.thread)
             self.thread.start()
 
     def _update_frame_thread(self):
@@ -288,7 +302,9 @@ class LogitechLedChecker:
                 if self.cap and self.cap.isOpened():
                     ret, frame = self.cap.read()
                     if not ret:
+                        self.frames_dropped += 1
                         continue
+                    self.frames_captured += 1
 
                     detected_led_states = {}
                     for led_key, config_item in self.led_configs.items():
@@ -299,7 +315,7 @@ class LogitechLedChecker:
                         active_keys_snapshot = self.active_keys_for_replay.copy()
 
                     with self.buffer_lock:
-                        current_capture_time = time.time()
+                        current_capture_time = get_clock().time()
                         # MODIFIED: The tuple now includes the active keys snapshot.
                         self.replay_buffer.append((current_capture_time, frame.copy(),
                                                    detected_led_states.copy(), active_keys_snapshot))
@@ -307,7 +323,7 @@ class LogitechLedChecker:
                             h, w = frame.shape[:2]
                             self.replay_frame_width, self.replay_frame_height = w, h
                 else:
-                    time.sleep(0.1)
+                    get_clock().sleep(0.1)
         finally:
             self._frame_thread_active = False
             self.logger.info("Frame-reading and processing thread has stopped.")
@@ -318,7 +334,11 @@ class LogitechLedChecker:
         Now accepts settings as a direct argument for clarity and testability.
         """
         try:
-            if self.preferred_backend is not None:
+            if self.frame_source is not None:
+                self.cap = self.frame_source
+                if not self.cap.isOpened():
+                    raise IOError(f"Frame source {self.frame_source!r} is not open.")
+            elif self.preferred_backend is not None:
                 self.cap = cv2.VideoCapture(self.camera_id, self.preferred_backend)
             else:
                 self.cap = cv2.VideoCapture(self.camera_id)
@@ -380,7 +400,7 @@ class LogitechLedChecker:
             self.logger.warning("Camera not initialized. Cannot clear buffer.")
             return
         
-        cleared_timestamp = time.time()
+        cleared_timestamp = get_clock().time()
         with self.buffer_lock:
             cleared_frames = len(self.replay_buffer)
             self.replay_buffer.clear()
@@ -393,11 +413,11 @@ class LogitechLedChecker:
             return
 
         wait_deadline = cleared_timestamp + wait_timeout
-        while time.time() < wait_deadline:
+        while get_clock().time() < wait_deadline:
             with self.buffer_lock:
                 if self.replay_buffer and self.replay_buffer[-1][0] >= cleared_timestamp:
                     return
-            time.sleep(0.01)
+            get_clock().sleep(0.01)
 
         self.logger.warning("Timed out waiting for fresh frame after clearing camera buffer.")
 
@@ -545,6 +565,40 @@ class LogitechLedChecker:
 
         return overlay_frame
     
+    def add_led_run_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Registers a callback invoked for each LED state logged while observing the LEDs.
+
+        Args:
+            callback (Callable[[Dict[str, Any]], None]): Receives a dict with the keys 'state'
+                (LED name -> 0/1), 'duration_s' and 'final'. 'final' marks the state still
+                showing when the observation ended, whose duration is a lower bound.
+        """
+        self._led_run_listeners.append(callback)
+
+    def _notify_led_run(self, state: dict, duration_s: float, final: bool = False):
+        run = {'state': dict(state), 'duration_s': duration_s, 'final': final}
+        for listener in list(self._led_run_listeners):
+            try: listener(run)
+            except Exception as e: self.logger.error(f"LED run listener {listener!r} failed: {e}", exc_info=True)
+
+    def camera_stats(self) -> Dict[str, Any]:
+        """
+        Frame counters for live monitoring.
+
+        Returns:
+            Dict with 'frames_captured', 'frames_dropped' (failed reads) and 'fps', the
+            capture rate over the frames currently in the replay buffer (0.0 until two
+            frames were captured).
+        """
+        capture_times = [entry[0] for entry in list(self.replay_buffer)]
+        span = capture_times[-1] - capture_times[0] if len(capture_times) > 1 else 0.0
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'fps': (len(capture_times) - 1) / span if span > 0 else 0.0,
+        }
+
     def set_keypad_layout(self, layout: list[list[str]]):
         self.logger.info(f"Keypad layout for replay overlays has been set.")
         self.keypad_layout = layout
@@ -689,7 +743,7 @@ class LogitechLedChecker:
         if not success:
             self.replay_failure_reason = failure_reason.replace("_", " ")
             if self.replay_buffer and self.replay_output_dir:
-                self.replay_start_time = time.time()
+                self.replay_start_time = get_clock().time()
                 
                 # CORRECTED LOGIC: Snapshot the pre-roll buffer immediately.
                 pre_roll_footage = list(self.replay_buffer)
@@ -699,8 +753,8 @@ class LogitechLedChecker:
                                   f"Captured {len(pre_roll_footage)} pre-roll frames. Now recording post-failure.")
 
                 post_roll_footage = []
-                post_failure_start_time = time.time()
-                while time.time() - post_failure_start_time < self.replay_post_failure_duration_sec:
+                post_failure_start_time = get_clock().time()
+                while get_clock().time() - post_failure_start_time < self.replay_post_failure_duration_sec:
                     frame, detected_led_states = self._get_current_led_state_from_camera()
                     # The main buffer continues to update, but we don't care about it anymore for this save.
                     if frame is not None:
@@ -708,12 +762,12 @@ class LogitechLedChecker:
                             active_keys_snapshot = self.active_keys_for_replay.copy()
                         
                         post_roll_footage.append((
-                            time.time(), 
+                            get_clock().time(), 
                             frame.copy(), 
                             detected_led_states, 
                             active_keys_snapshot  # Add the missing 4th element
                         ))
-                    time.sleep(1.0 / self.replay_fps if self.replay_fps > 0 else 0.01)
+                    get_clock().sleep(1.0 / self.replay_fps if self.replay_fps > 0 else 0.01)
                 
                 # DEBUG LOG: Log the number of post-roll frames captured.
                 self.logger.debug(f"Replay: Captured {len(post_roll_footage)} post-roll frames.")
@@ -774,8 +828,9 @@ class LogitechLedChecker:
         if current_state_dict != prev_state_dict:
             duration = current_time - prev_state_timestamp
             if duration >= MIN_LOGGABLE_STATE_DURATION:
-                self.logger.info(f"{self._format_led_display_string(prev_state_dict)} ({duration:.2f}s)")
+                self.logger.info("%s (%.2fs)", LazyMessage(self._format_led_display_string, prev_state_dict), duration)
                 logged_change = True
+                self._notify_led_run(prev_state_dict, duration)
             last_state_info[0] = current_state_dict
             last_state_info[1] = current_time
         return logged_change
@@ -785,7 +840,9 @@ class LogitechLedChecker:
         if state_dict is not None:
             duration = end_time - state_timestamp
             if duration >= MIN_LOGGABLE_STATE_DURATION:
-                self.logger.info(f"{self._format_led_display_string(state_dict)} ({duration:.2f}s{reason_suffix})")
+                self.logger.info("%s (%.2fs%s)", LazyMessage(self._format_led_display_string, state_dict), duration,
+                                 reason_suffix)
+                self._notify_led_run(state_dict, duration, final=True)
 
     def _process_pattern_step(self, step_cfg: dict, ordered_keys: List[str], overall_timeout_end_time: float, step_idx: int, total_steps: int) -> Tuple[bool, str]:
         """
@@ -811,7 +868,7 @@ class LogitechLedChecker:
 
         # --- Phase 1: Find the target state for this step ---
         step_seen_at = None
-        step_find_start_time = time.time()
+        step_find_start_time = get_clock().time()
         
         # Determine the maximum time to wait for the step to *appear*.
         step_appearance_timeout = max(1.0, max_d_orig if max_d_orig != float('inf') else 5.0) + 2.0
@@ -821,17 +878,17 @@ class LogitechLedChecker:
             step_appearance_timeout = 0.5 
         
         # Ensure we don't exceed the overall pattern timeout
-        current_step_find_timeout_end_time = min(overall_timeout_end_time, time.time() + step_appearance_timeout)
+        current_step_find_timeout_end_time = min(overall_timeout_end_time, get_clock().time() + step_appearance_timeout)
 
-        while time.time() < current_step_find_timeout_end_time:
+        while get_clock().time() < current_step_find_timeout_end_time:
             _, current_leds = self._get_current_led_state_from_camera()
             if not current_leds:
-                time.sleep(0.001)
+                get_clock().sleep(0.001)
                 continue
             if self._matches_state(current_leds, target_state_for_step):
-                step_seen_at = time.time()
+                step_seen_at = get_clock().time()
                 break
-            time.sleep(0.001)
+            get_clock().sleep(0.001)
 
         if step_seen_at is None:
             # Special handling for initial 0-duration step not found
@@ -844,13 +901,13 @@ class LogitechLedChecker:
 
         # --- Phase 2: Confirm the state holds for the required duration ---
         held_time = None
-        while time.time() < overall_timeout_end_time:
-            current_time = time.time()
+        while get_clock().time() < overall_timeout_end_time:
+            current_time = get_clock().time()
             held_time = current_time - step_seen_at
             
             _, current_leds = self._get_current_led_state_from_camera()
             if not current_leds:
-                time.sleep(0.001)
+                get_clock().sleep(0.001)
                 continue
             
             if self._matches_state(current_leds, target_state_for_step):
@@ -873,7 +930,7 @@ class LogitechLedChecker:
                     current_led_str = self._format_led_display_string(current_leds, ordered_keys)
                     return False, f"step_{step_idx+1}_state_{target_state_str.replace(' ','_')}_changed_to_{current_led_str.replace(' ','_')}_early_held_{held_time:.2f}s_min_{min_d_orig:.2f}s"
             
-            time.sleep(0.001) # Small sleep to prevent busy-waiting
+            get_clock().sleep(0.001) # Small sleep to prevent busy-waiting
 
         # If the loop finishes without success or failure (i.e., hit overall_timeout_end_time), it's a timeout.
         return False, f"timeout_hold_step_{step_idx+1}_held_{held_time:.2f}s"
@@ -897,8 +954,8 @@ class LogitechLedChecker:
         Returns:
             Tuple: (success: bool, time_state_appeared: Optional[float], failure_reason: str)
         """
-        while time.time() < timeout_end_time:
-            current_time = time.time()
+        while get_clock().time() < timeout_end_time:
+            current_time = get_clock().time()
             
             _, current_leds = self._get_current_led_state_from_camera()
             
@@ -906,7 +963,7 @@ class LogitechLedChecker:
                 self._handle_state_change_logging(current_leds, current_time, last_state_info_for_logging)
 
             if not current_leds:
-                time.sleep(0.001) # Yield CPU if no frame is ready
+                get_clock().sleep(0.001) # Yield CPU if no frame is ready
                 continue
             
             if fail_leds:
@@ -921,10 +978,10 @@ class LogitechLedChecker:
                 self.logger.debug(f"Awaited '{description}': state {self._format_led_display_string(target_state)} observed.")
                 return True, current_time, "" # Success
             
-            time.sleep(0.001) # Small sleep to prevent busy-waiting if state is not found immediately
+            get_clock().sleep(0.001) # Small sleep to prevent busy-waiting if state is not found immediately
 
         if last_state_info_for_logging is not None:
-            self._log_final_state(last_state_info_for_logging, time.time(), reason_suffix=f" at timeout for {description}")
+            self._log_final_state(last_state_info_for_logging, get_clock().time(), reason_suffix=f" at timeout for {description}")
         return False, None, f"timeout_await_{description.replace(' ','_')}"
 
     # --- Public methods remain unchanged ---
@@ -945,7 +1002,7 @@ class LogitechLedChecker:
             failure_detail = "camera_not_initialized"
         else:
             last_state_info = [None, 0.0] 
-            initial_capture_time = time.time()
+            initial_capture_time = get_clock().time()
             if clear_buffer: self._clear_camera_buffer()
             
             # CORRECTED: The call no longer takes a 'record_for_replay' argument.
@@ -954,11 +1011,11 @@ class LogitechLedChecker:
             if not initial_leds_for_log: initial_leds_for_log = {} 
             last_state_info = [initial_leds_for_log, initial_capture_time]
 
-            overall_start_time = time.time()
+            overall_start_time = get_clock().time()
             continuous_target_match_start_time = None
             try:
-                while time.time() - overall_start_time < timeout:
-                    current_time = time.time()
+                while get_clock().time() - overall_start_time < timeout:
+                    current_time = get_clock().time()
                     
                     # This call is correct, as it was already updated.
                     _, current_leds = self._get_current_led_state_from_camera()
@@ -966,7 +1023,7 @@ class LogitechLedChecker:
                     if not current_leds: 
                         self._handle_state_change_logging({}, current_time, last_state_info)
                         continuous_target_match_start_time = None
-                        time.sleep(0.01) # Minimal sleep for empty frames
+                        get_clock().sleep(0.01) # Minimal sleep for empty frames
                         continue
                     
                     self._handle_state_change_logging(current_leds, current_time, last_state_info)
@@ -980,6 +1037,7 @@ class LogitechLedChecker:
                             success_flag = True; break
                     else: 
                         continuous_target_match_start_time = None 
+                    get_clock().idle()
             
             except Exception as e_loop:
                 failure_detail = f"exception_in_solid_loop_{type(e_loop).__name__}"
@@ -987,9 +1045,9 @@ class LogitechLedChecker:
                 success_flag = False
 
             if not success_flag:
-                self._log_final_state(last_state_info, time.time(), reason_suffix=" at timeout")
+                self._log_final_state(last_state_info, get_clock().time(), reason_suffix=" at timeout")
                 if continuous_target_match_start_time is not None:
-                    held_duration = time.time() - continuous_target_match_start_time
+                    held_duration = get_clock().time() - continuous_target_match_start_time
                     if held_duration >= (minimum - self.duration_tolerance_sec):
                         self.logger.warning(f"Timeout for {method_name}, but final duration {held_duration:.2f}s was within tolerance of required {minimum:.2f}s. Passing.")
                         success_flag = True
@@ -1019,16 +1077,16 @@ class LogitechLedChecker:
             if clear_buffer: self._clear_camera_buffer()
             _, initial_leds = self._get_current_led_state_from_camera() # Refactored call
             initial_leds = initial_leds or {}
-            last_state_info = [initial_leds, time.time()]
+            last_state_info = [initial_leds, get_clock().time()]
             self.logger.info(f"Initial for strict: {self._format_led_display_string(initial_leds)}")
 
             if not self._matches_state(initial_leds, state, None):
                 failure_detail="initial_state_not_target_strict"; self.logger.warning(f"{method_name} FAILED: {failure_detail}")
             else:
-                target_state_began_at = last_state_info[1]; strict_op_start_time = time.time()
+                target_state_began_at = last_state_info[1]; strict_op_start_time = get_clock().time()
                 try:
-                    while time.time() - target_state_began_at < minimum:
-                        current_time = time.time()
+                    while get_clock().time() - target_state_began_at < minimum:
+                        current_time = get_clock().time()
                         if current_time - strict_op_start_time > (minimum + 5.0):
                             failure_detail=f"op_timeout_strict_aiming_{minimum:.2f}s"; self.logger.warning(f"{method_name} FAILED: {failure_detail}"); success_flag=False; break
                         _, current_leds = self._get_current_led_state_from_camera() # Refactored call
@@ -1048,9 +1106,9 @@ class LogitechLedChecker:
                             break
 
                         # time.sleep(1 / self.replay_fps if self.replay_fps > 0 else 0.1)
-                        time.sleep(0.001)
+                        get_clock().sleep(0.001)
                     else:
-                        self._log_final_state(last_state_info, time.time(), reason_suffix=" on success") 
+                        self._log_final_state(last_state_info, get_clock().time(), reason_suffix=" on success") 
                         success_flag = True; self.logger.info(f"{method_name}: LED strictly solid confirmed: {formatted_target_state}")
                 except Exception as e_strict_loop:
                     failure_detail=f"exception_strict_loop_{type(e_strict_loop).__name__}"; self.logger.error(f"Exception in {method_name} loop: {e_strict_loop}", exc_info=True); success_flag=False
@@ -1075,9 +1133,9 @@ class LogitechLedChecker:
             
             # Initialize state logging info for the helper
             _, initial_leds = self._get_current_led_state_from_camera()
-            last_state_info_for_logging = [initial_leds or {}, time.time()]
+            last_state_info_for_logging = [initial_leds or {}, get_clock().time()]
 
-            await_timeout_end_time = time.time() + timeout
+            await_timeout_end_time = get_clock().time() + timeout
             success_flag, _, reason = self._await_state_appearance(
                 state,
                 await_timeout_end_time,
@@ -1120,13 +1178,13 @@ class LogitechLedChecker:
                 inf_steps = sum(1 for p in pattern if p.get('duration', [0, 0])[1] == float('inf'))
                 # Add a generous buffer for each step and overall operation
                 overall_timeout = max_dur_sum + (inf_steps * 10.0) + (len(pattern) * 5.0) + 15.0
-                pattern_start_time = time.time()
+                pattern_start_time = get_clock().time()
                 overall_timeout_end_time = pattern_start_time + overall_timeout
                 
                 self.logger.info(f"Attempting to match LED pattern...")
 
                 for current_step_idx, step_cfg in enumerate(pattern):
-                    if time.time() > overall_timeout_end_time:
+                    if get_clock().time() > overall_timeout_end_time:
                         failure_detail = f"overall_timeout_pattern_at_step_{current_step_idx+1}"
                         self.logger.error(f"{method_name} Error: {failure_detail}")
                         success_flag = False
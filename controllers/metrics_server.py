@@ -0,0 +1,224 @@
+# Directory: controllers
+# Filename: metrics_server.py
+#!/usr/bin/env python3
+
+# Live metrics of a running session over HTTP. A 12-hour stress run used to give
+# no feedback but scrolling log text until generate_summary_report() ran at the
+# end. MetricsServer serves TestSession.metrics_snapshot() from a stdlib
+# ThreadingHTTPServer on a background thread:
+#
+#   GET /metrics       Prometheus text exposition format (version 0.0.4)
+#   GET /metrics.json  the snapshot as JSON
+#
+# Each station of an orchestrated run serves its own port (station config
+# 'metrics_port'), labelled with its station id, so a lab dashboard can scrape
+# every fixture. The snapshot is built on the server thread from copies of the
+# session's counters; the test itself never waits for a scrape.
+
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+module_logger = logging.getLogger(__name__)
+
+METRICS_SERVER_ENABLED = os.environ.get("METRICS_SERVER_ENABLED", "false").lower() == "true"
+METRICS_SERVER_HOST = os.environ.get("METRICS_SERVER_HOST", "127.0.0.1")
+try:
+    METRICS_SERVER_PORT = int(os.environ.get("METRICS_SERVER_PORT", "9400"))
+except (TypeError, ValueError):
+    METRICS_SERVER_PORT = 9400
+
+METRIC_PREFIX = "flight_control_"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (snapshot quantile key, Prometheus quantile label)
+_QUANTILES = (("p50", "0.5"), ("p95", "0.95"), ("max", "1"))
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Exposition:
+    """Collects samples per metric family and renders them in the text format."""
+
+    def __init__(self, labels: Dict[str, Any]):
+        self.labels = labels
+        self.families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(self, name: str, metric_type: str, help_text: str, value: Any, **labels: Any) -> None:
+        if value is None:
+            return
+        full_name = METRIC_PREFIX + name
+        family = self.families.setdefault(full_name, (metric_type, help_text, []))
+        all_labels = dict(self.labels, **labels)
+        label_text = ",".join(f'{key}="{_escape_label(label)}"' for key, label in all_labels.items())
+        family[2].append(f"{full_name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{full_name} {_format_value(value)}")
+
+    def render(self) -> str:
+        lines = []
+        for name, (metric_type, help_text, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def render_prometheus(snapshot: Dict[str, Any], labels: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Renders a TestSession.metrics_snapshot() in the Prometheus text format.
+
+    Args:
+        snapshot (Dict[str, Any]): The snapshot.
+        labels (Optional[Dict[str, Any]]): Labels added to every sample (e.g. the station id).
+
+    Returns:
+        str: The exposition, one '# HELP'/'# TYPE' header per metric family.
+    """
+    out = _Exposition(labels or {})
+    out.add("uptime_seconds", "gauge", "Seconds since the session started.", snapshot["uptime_s"])
+    out.add("current_block", "gauge", "Test block currently running (-1 before the first).", snapshot["current_block"])
+    out.add("iterations_total", "counter", "Loop iterations completed.", snapshot["iterations"])
+    out.add("iterations_per_hour", "gauge", "Average loop iterations per hour since the session started.",
+            snapshot["iterations_per_hour"])
+
+    for block, stats in snapshot["blocks"].items():
+        block_labels = {"block": block, "block_name": stats["name"]}
+        for result in ("passed", "failed"):
+            out.add("block_iterations_total", "counter", "Loop iterations per block and result.",
+                    stats[f"iterations_{result}"], result=result, **block_labels)
+        out.add("block_failures_total", "counter", "Failures logged per block.", stats["failures"], **block_labels)
+        out.add("block_warnings_total", "counter", "Warnings logged per block.", stats["warnings"], **block_labels)
+        for enum_type, count in stats["enumerations"].items():
+            out.add("block_enumerations_total", "counter", "Enumerations per block and type.", count,
+                    type=enum_type, **block_labels)
+
+    for trigger, stats in snapshot["transitions"].items():
+        for result in ("ok", "failed"):
+            out.add("transitions_total", "counter", "FSM triggers per trigger and result.", stats[result],
+                    trigger=trigger, result=result)
+        for key, quantile in _QUANTILES:
+            out.add("transition_latency_seconds", "gauge", "Trigger duration quantiles over the recent window.",
+                    stats.get(key), trigger=trigger, quantile=quantile)
+
+    for block, events in snapshot["enum_latency"].items():
+        for event_type, metrics in events.items():
+            for metric, stats in metrics.items():
+                for key, quantile in _QUANTILES:
+                    out.add("enum_latency_seconds", "gauge", "Enumeration latency after the final key release.",
+                            stats[key], block=block, event=event_type, metric=metric, quantile=quantile)
+
+    camera = snapshot.get("camera")
+    if camera:
+        out.add("camera_frames_total", "counter", "Camera frames captured.", camera["frames_captured"])
+        out.add("camera_dropped_frames_total", "counter", "Camera reads that returned no frame.", camera["frames_dropped"])
+        out.add("camera_fps", "gauge", "Recent camera capture rate.", camera["fps"])
+
+    speed = snapshot.get("last_speed_test")
+    if speed:
+        for job_name, directions in speed["jobs"].items():
+            for direction, stats in directions.items():
+                speed_labels = {"block": speed["block"], "job": job_name, "direction": direction}
+                out.add("speed_test_bandwidth_mbps", "gauge", "Bandwidth of the last speed test.", stats["bw_mbps"], **speed_labels)
+                out.add("speed_test_iops", "gauge", "IOPS of the last speed test.", stats["iops"], **speed_labels)
+                out.add("speed_test_clat_p99_ms", "gauge", "p99 completion latency of the last speed test.",
+                        stats["clat_p99_ms"], **speed_labels)
+    return out.render()
+
+
+class MetricsServer:
+    """
+    Serves a metrics snapshot over HTTP from a daemon thread.
+
+    Every request calls `snapshot_fn` on a server thread; a failing snapshot is
+    answered with 500 and logged, never raised into the test.
+    """
+
+    def __init__(self, snapshot_fn: Callable[[], Dict[str, Any]], host: str = METRICS_SERVER_HOST,
+                 port: int = METRICS_SERVER_PORT, labels: Optional[Dict[str, Any]] = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            snapshot_fn (Callable[[], Dict[str, Any]]): Usually TestSession.metrics_snapshot.
+            host (str): Address to bind. Defaults to localhost only.
+            port (int): Port to bind; 0 picks a free port (see `port` after start()).
+            labels (Optional[Dict[str, Any]]): Labels added to every Prometheus sample and
+                to the JSON snapshot (e.g. {'station': 'A'}).
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.snapshot_fn = snapshot_fn
+        self.host = host
+        self.port = port
+        self.labels = dict(labels or {})
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        """Binds the port and starts serving. Raises OSError if the port is taken."""
+        if self._server is not None:
+            return self
+        server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        server.daemon_threads = True
+        self._server = server
+        self.port = server.server_address[1]
+        self._thread = threading.Thread(target=server.serve_forever, name=f"MetricsServer:{self.port}", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Serving live metrics on http://{self.host}:{self.port}/metrics (JSON: /metrics.json).")
+        return self
+
+    def stop(self) -> None:
+        """Stops serving and releases the port. Safe to call twice."""
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def render(self, path: str) -> Optional[Tuple[str, str]]:
+        """The (content type, body) answering `path`, or None for an unknown path."""
+        path = path.split("?", 1)[0]
+        if path == "/metrics":
+            return PROMETHEUS_CONTENT_TYPE, render_prometheus(self.snapshot_fn(), self.labels)
+        if path == "/metrics.json":
+            return "application/json", json.dumps(dict(self.snapshot_fn(), labels=self.labels), default=str)
+        return None
+
+    def _handler_class(self) -> type:
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                try:
+                    answer = metrics_server.render(self.path)
+                except Exception as e:
+                    metrics_server.logger.error(f"Metrics snapshot failed: {e}", exc_info=True)
+                    self.send_error(500, "Metrics snapshot failed")
+                    return
+                if answer is None:
+                    self.send_error(404, "Try /metrics or /metrics.json")
+                    return
+                content_type, body = answer
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                metrics_server.logger.debug(f"{self.address_string()} {format % args}")
+
+        return Handler
@@ -0,0 +1,503 @@
+# Directory: controllers
+# Filename: orchestrator.py
+#!/usr/bin/env python3
+
+# Runs one test script on several fixtures of the same host in parallel.
+# automation_toolkit builds one global controller, DUT model, session and FSM, so
+# a PC used to test one device at a time even though most of a run is spent
+# waiting on LEDs and enumeration. A station is one fixture: its own camera,
+# Phidget board (by serial) and DUT (by iSerial), with its own UnifiedController,
+# DeviceUnderTest, TestSession and ApricornDeviceFSM. The orchestrator starts one
+# worker process per station (each with its own GIL, clock, camera thread and
+# module globals), and every worker streams its transitions, progress reports
+# and result back over a pipe. Scripts are station-agnostic: a script is a
+# module-level function `script(station, **kwargs)` named as "module:function",
+# so it can be imported in the worker and run against that worker's station.
+
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional
+
+from .clock import get_clock
+from .metrics_server import METRICS_SERVER_HOST, MetricsServer
+from .session_journal import SESSION_JOURNAL_ENABLED, SESSION_JOURNAL_FILENAME
+
+module_logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "logs")
+
+# Seconds between two aggregated progress lines in the orchestrator's log.
+try:
+    STATION_PROGRESS_INTERVAL_SEC = float(os.environ.get("STATION_PROGRESS_INTERVAL_SEC", "60"))
+except (TypeError, ValueError):
+    STATION_PROGRESS_INTERVAL_SEC = 60.0
+
+# Seconds a worker gets to exit on its own before it is terminated.
+try:
+    STATION_SHUTDOWN_TIMEOUT_SEC = float(os.environ.get("STATION_SHUTDOWN_TIMEOUT_SEC", "10"))
+except (TypeError, ValueError):
+    STATION_SHUTDOWN_TIMEOUT_SEC = 10.0
+
+# Keys of a station configuration and their defaults.
+STATION_DEFAULTS: Dict[str, Any] = {
+    "station_id": None,
+    "camera_id": 0,
+    "phidget_serial": None,
+    "dut_serial": None,
+    "virtual_dut": None,
+    "metrics_port": None,
+}
+
+# Event kinds a worker sends, in the order a healthy worker sends them.
+EVENT_STARTED = "started"
+EVENT_READY = "ready"
+EVENT_TRANSITION = "transition"
+EVENT_PROGRESS = "progress"
+EVENT_DONE = "done"
+EVENT_ERROR = "error"
+
+# Station statuses as seen by the orchestrator.
+STATUS_PENDING = "pending"
+STATUS_STARTING = "starting"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CRASHED = "crashed"
+STATUS_TIMEOUT = "timeout"
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CRASHED, STATUS_TIMEOUT)
+
+
+def station_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates a station configuration and fills in the defaults.
+
+    Args:
+        config (Dict[str, Any]): station_id (required), camera_id, phidget_serial,
+            dut_serial, virtual_dut (None follows VIRTUAL_DUT_ENABLED) and metrics_port
+            (None serves no live metrics).
+
+    Returns:
+        Dict[str, Any]: The complete configuration.
+
+    Raises:
+        ValueError: If station_id is missing or a key is unknown.
+    """
+    unknown = set(config) - set(STATION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown station configuration key(s): {sorted(unknown)}")
+    if config.get("station_id") in (None, ""):
+        raise ValueError(f"Station configuration without a station_id: {config}")
+    merged = dict(STATION_DEFAULTS)
+    merged.update(config)
+    merged["station_id"] = str(merged["station_id"])
+    return merged
+
+
+def resolve_script(spec: str) -> Callable[..., Any]:
+    """
+    Imports a station script named as "package.module:function".
+
+    Raises:
+        ValueError: If the spec is not of that form or does not name a callable.
+    """
+    module_name, _, function_name = spec.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Script '{spec}' is not of the form 'module:function'.")
+    script = getattr(importlib.import_module(module_name), function_name, None)
+    if not callable(script):
+        raise ValueError(f"Script '{spec}' does not name a function.")
+    return script
+
+
+class Station:
+    """
+    One fixture's controller, DUT model, session and FSM.
+
+    Scripts receive a Station instead of importing the automation_toolkit globals,
+    and call report() to publish progress to the orchestrator.
+    """
+
+    def __init__(self, station_id: str, at: Any, dut: Any, session: Any, fsm: Any,
+                 pin_gen: Any = None, output_dir: Optional[str] = None,
+                 event_sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            station_id (str): Name of the station in events and reports.
+            at (UnifiedController): The station's controller.
+            dut (DeviceUnderTest): The station's DUT model.
+            session (TestSession): The station's session metrics.
+            fsm (ApricornDeviceFSM): The station's state machine.
+            pin_gen (Optional[PINGenerator]): PIN generator bound to the DUT model.
+            output_dir (Optional[str]): Directory for the station's logs and artifacts.
+            event_sink (Optional[Callable]): Receives every event; None outside an orchestrator.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.station_id = station_id
+        self.at = at
+        self.dut = dut
+        self.session = session
+        self.fsm = fsm
+        self.pin_gen = pin_gen
+        self.output_dir = output_dir
+        self._event_sink = event_sink
+        self._lock = threading.Lock()
+        self.metrics_server: Optional[MetricsServer] = None
+
+    def emit(self, kind: str, **payload: Any) -> None:
+        """Sends an event to the orchestrator; send errors are logged, not raised."""
+        if self._event_sink is None:
+            return
+        event = {"station": self.station_id, "kind": kind, "time": get_clock().time()}
+        event.update(payload)
+        try:
+            with self._lock:
+                self._event_sink(event)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Station {self.station_id}: could not send '{kind}' event: {e}")
+
+    def report(self, **fields: Any) -> None:
+        """Publishes script progress (block, iteration, ...) to the orchestrator."""
+        self.emit(EVENT_PROGRESS, fields=fields)
+
+    def forward_transitions(self) -> None:
+        """Streams the outcome of every FSM trigger to the orchestrator."""
+        self.fsm.add_transition_listener(self._after_trigger)
+
+    def _after_trigger(self, event_data: Any) -> None:
+        if getattr(event_data, "transition", None) is None:
+            return
+        self.emit(EVENT_TRANSITION, trigger=event_data.event.name, source=event_data.transition.source,
+                  dest=self.fsm.state, ok=bool(event_data.result))
+
+    def serve_metrics(self, port: int, host: str = METRICS_SERVER_HOST) -> MetricsServer:
+        """Serves the station's live session metrics, labelled with its station id, until close()."""
+        if self.metrics_server is None:
+            self.metrics_server = MetricsServer(self.session.metrics_snapshot, host=host, port=port,
+                                                labels={"station": self.station_id},
+                                                logger_instance=self.logger).start()
+        return self.metrics_server
+
+    def failure_count(self) -> int:
+        """Failures logged in the session so far."""
+        return sum(self.session.block_failure_count.values())
+
+    def close(self) -> None:
+        """Releases the station's metrics server, camera, Phidget and USB watcher, its FSM's place on the shared machine and its journal."""
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.fsm is not None and hasattr(self.fsm, "release"):
+            self.fsm.release()
+        if self.session is not None and hasattr(self.session, "close_journal"):
+            self.session.close_journal()
+        if self.at is not None and hasattr(self.at, "close"):
+            self.at.close()
+
+
+def build_station(config: Dict[str, Any], output_dir: Optional[str] = None,
+                  event_sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  logger_instance: Optional[logging.Logger] = None) -> Station:
+    """
+    Builds a station the way automation_toolkit builds its globals.
+
+    Args:
+        config (Dict[str, Any]): Station configuration (see station_config).
+        output_dir (Optional[str]): Directory for the station's instant replays, logs and session journal.
+        event_sink (Optional[Callable]): Receives the station's events.
+        logger_instance (Optional[logging.Logger]): Parent logger.
+
+    Returns:
+        Station: The station, with its USB watcher started.
+    """
+    from .finite_state_machine import ApricornDeviceFSM, TestSession
+    from .unified_controller import UnifiedController
+    from utils.pin_generator import PINGenerator
+
+    config = station_config(config)
+    logger = (logger_instance if logger_instance else module_logger).getChild(f"Station.{config['station_id']}")
+    at = UnifiedController(
+        camera_id=config["camera_id"],
+        display_order=["red", "green", "blue"],
+        logger_instance=logger.getChild("UnifiedInstance"),
+        enable_instant_replay=True,
+        replay_output_dir=output_dir,
+        virtual_dut=config["virtual_dut"],
+        phidget_serial=config["phidget_serial"],
+        dut_serial=config["dut_serial"],
+    )
+    try:
+        if at.dut is None:
+            raise RuntimeError(f"Station {config['station_id']}: the DUT model could not be initialized.")
+        at.start_usb_watcher()
+        session = TestSession(at_controller=at, dut_instance=at.dut)
+        at.add_phidget_detach_listener(session.log_phidget_detach)
+        at.add_led_run_listener(session.log_led_run)
+        if SESSION_JOURNAL_ENABLED and output_dir:
+            session.open_journal(os.path.join(output_dir, SESSION_JOURNAL_FILENAME))
+        fsm = ApricornDeviceFSM(at_controller=at, session_instance=session, dut_instance=at.dut)
+        pin_gen = PINGenerator(dut_model=at.dut)
+    except BaseException:
+        at.close()
+        raise
+    return Station(config["station_id"], at, at.dut, session, fsm, pin_gen=pin_gen,
+                   output_dir=output_dir, event_sink=event_sink, logger_instance=logger)
+
+
+def station_worker(config: Dict[str, Any], script: str, script_kwargs: Dict[str, Any],
+                   connection: Any, output_dir: str) -> None:
+    """
+    Entry point of a station's worker process.
+
+    Logs to <output_dir>/main.log, builds the station, runs the script on it and
+    reports the outcome. Every step is sent over `connection` as an event.
+    """
+    from .logging import setup_logging, stop_logging
+
+    os.makedirs(output_dir, exist_ok=True)
+    setup_logging(log_file_path=os.path.join(output_dir, "main.log"), log_file_mode="w", log_to_console=False)
+    station_id = str(config.get("station_id"))
+    logger = logging.getLogger("StationWorker").getChild(station_id)
+
+    def send(event: Dict[str, Any]) -> None:
+        connection.send(event)
+
+    def send_direct(kind: str, **payload: Any) -> None:
+        event = {"station": station_id, "kind": kind, "time": get_clock().time()}
+        event.update(payload)
+        try:
+            send(event)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not send '{kind}' event: {e}")
+
+    send_direct(EVENT_STARTED, pid=os.getpid())
+    station = None
+    try:
+        run = resolve_script(script)
+        station = build_station(config, output_dir=output_dir, event_sink=send, logger_instance=logger)
+        station.forward_transitions()
+        if config.get("metrics_port") is not None:
+            station.serve_metrics(int(config["metrics_port"]))
+        station.emit(EVENT_READY, device=station.dut.device_name, dut_serial=station.dut.scanned_serial_number,
+                     state=station.fsm.state, virtual=station.at.virtual_dut is not None)
+        result = run(station, **script_kwargs)
+        station.emit(EVENT_DONE, result=result, state=station.fsm.state, failures=station.failure_count())
+    except BaseException as e:
+        logger.error(f"Station {station_id} failed: {e}", exc_info=True)
+        send_direct(EVENT_ERROR, error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(),
+                    failures=station.failure_count() if station else None)
+    finally:
+        if station is not None:
+            try:
+                station.close()
+            except Exception as e:
+                logger.error(f"Error closing station {station_id}: {e}", exc_info=True)
+        connection.close()
+        # Worker processes exit without running atexit: write out the queued log records now.
+        stop_logging()
+
+
+class StationOrchestrator:
+    """
+    Runs a script on several stations, one worker process each, and aggregates their progress.
+    """
+
+    def __init__(self, stations: List[Dict[str, Any]], script: str,
+                 script_kwargs: Optional[Dict[str, Any]] = None,
+                 output_dir: Optional[str] = None,
+                 progress_interval_sec: float = STATION_PROGRESS_INTERVAL_SEC,
+                 on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 worker: Callable[..., None] = station_worker,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            stations (List[Dict[str, Any]]): Station configurations (see station_config).
+            script (str): The station script, as "module:function".
+            script_kwargs (Optional[Dict[str, Any]]): Keyword arguments for every script call.
+                They must be picklable.
+            output_dir (Optional[str]): Run directory; each station logs to <output_dir>/station_<id>.
+            progress_interval_sec (float): Seconds between aggregated progress lines.
+            on_event (Optional[Callable]): Called with every event received from a worker.
+            worker (Callable): Worker process entry point (station_worker).
+            logger_instance (Optional[logging.Logger]): Logger to use.
+
+        Raises:
+            ValueError: If a configuration is invalid or two stations share an id,
+                a camera, a Phidget, a DUT or a metrics port.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.stations = [station_config(config) for config in stations]
+        for key in ("station_id", "camera_id", "phidget_serial", "dut_serial", "metrics_port"):
+            # Virtual stations render their own frames and share no hardware.
+            values = [config[key] for config in self.stations
+                      if config[key] is not None
+                      and (key in ("station_id", "dut_serial", "metrics_port") or not config["virtual_dut"])]
+            if len(values) != len(set(values)):
+                raise ValueError(f"Stations share a {key}: {values}")
+        self.script = script
+        self.script_kwargs = dict(script_kwargs or {})
+        self.output_dir = output_dir or DEFAULT_OUTPUT_DIR
+        self.progress_interval_sec = progress_interval_sec
+        self.on_event = on_event
+        self.worker = worker
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[str, Any] = {}
+        self._connections: Dict[str, Any] = {}
+        self._status: Dict[str, Dict[str, Any]] = {
+            config["station_id"]: {
+                "station": config["station_id"], "status": STATUS_PENDING, "pid": None, "state": None,
+                "transitions": 0, "failed_transitions": 0, "last_trigger": None, "progress": {},
+                "failures": None, "result": None, "error": None, "exitcode": None,
+                "started_at": None, "finished_at": None,
+            } for config in self.stations
+        }
+
+    def station_dir(self, station_id: str) -> str:
+        return os.path.join(self.output_dir, f"station_{station_id}")
+
+    def start(self) -> None:
+        """Starts one worker process per station."""
+        for config in self.stations:
+            station_id = config["station_id"]
+            reader, writer = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=self.worker, name=f"station-{station_id}",
+                args=(config, self.script, self.script_kwargs, writer, self.station_dir(station_id)),
+            )
+            process.start()
+            writer.close()
+            self._processes[station_id] = process
+            self._connections[station_id] = reader
+            self._status[station_id].update(status=STATUS_STARTING, pid=process.pid, started_at=get_clock().time())
+        self.logger.info(f"Started {len(self.stations)} station(s) running '{self.script}'; logs in {self.output_dir}.")
+
+    def run(self, timeout_sec: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Starts the stations and waits for all of them to finish.
+
+        Args:
+            timeout_sec (Optional[float]): Stations still running after this long are
+                terminated and reported as timed out.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The final progress of every station (see progress()).
+        """
+        clock = get_clock()
+        if not self._processes:
+            self.start()
+        deadline = clock.monotonic() + timeout_sec if timeout_sec is not None else None
+        next_report = clock.monotonic() + self.progress_interval_sec
+        try:
+            while self._connections:
+                now = clock.monotonic()
+                if deadline is not None and now >= deadline:
+                    self.stop(STATUS_TIMEOUT)
+                    break
+                wake = min(next_report, deadline) if deadline is not None else next_report
+                for connection in wait(list(self._connections.values()), timeout=max(0.0, wake - now)):
+                    self._receive(connection)
+                if clock.monotonic() >= next_report:
+                    self.log_progress()
+                    next_report = clock.monotonic() + self.progress_interval_sec
+        except KeyboardInterrupt:
+            self.logger.warning("Interrupted; terminating stations.")
+            self.stop(STATUS_FAILED)
+            raise
+        self.log_progress()
+        return self.progress()
+
+    def _receive(self, connection: Any) -> None:
+        station_id = next(key for key, value in self._connections.items() if value is connection)
+        try:
+            event = connection.recv()
+        except (EOFError, OSError):
+            self._finish(station_id)
+            return
+        self._handle(event)
+
+    def _handle(self, event: Dict[str, Any]) -> None:
+        status = self._status.get(event.get("station"))
+        if status is None:
+            self.logger.warning(f"Event from unknown station: {event}")
+            return
+        kind = event.get("kind")
+        if kind == EVENT_READY:
+            status.update(status=STATUS_RUNNING, state=event.get("state"))
+            self.logger.info(f"Station {status['station']}: {event.get('device')} S/N {event.get('dut_serial')} ready in {event.get('state')}.")
+        elif kind == EVENT_TRANSITION:
+            status["transitions"] += 1
+            status["last_trigger"] = event.get("trigger")
+            status["state"] = event.get("dest")
+            if not event.get("ok"):
+                status["failed_transitions"] += 1
+        elif kind == EVENT_PROGRESS:
+            status["progress"].update(event.get("fields") or {})
+        elif kind == EVENT_DONE:
+            status.update(status=STATUS_DONE, result=event.get("result"), state=event.get("state"),
+                          failures=event.get("failures"))
+            self.logger.info(f"Station {status['station']} finished with {event.get('failures')} failure(s).")
+        elif kind == EVENT_ERROR:
+            status.update(status=STATUS_FAILED, error=event.get("error"), failures=event.get("failures"))
+            self.logger.error(f"Station {status['station']} failed: {event.get('error')}")
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def _finish(self, station_id: str) -> None:
+        """Reaps a worker whose pipe has closed."""
+        connection = self._connections.pop(station_id)
+        connection.close()
+        process = self._processes[station_id]
+        process.join(STATION_SHUTDOWN_TIMEOUT_SEC)
+        status = self._status[station_id]
+        status.update(exitcode=process.exitcode, finished_at=get_clock().time())
+        if status["status"] not in FINAL_STATUSES:
+            status["status"] = STATUS_CRASHED
+            self.logger.error(f"Station {station_id} exited without a result (exit code {process.exitcode}).")
+
+    def stop(self, final_status: str = STATUS_FAILED) -> None:
+        """Terminates the workers that are still running."""
+        for station_id in list(self._connections):
+            process = self._processes[station_id]
+            if process.is_alive():
+                process.terminate()
+            self._status[station_id]["status"] = final_status
+            self._finish(station_id)
+
+    def progress(self) -> Dict[str, Dict[str, Any]]:
+        """The aggregated status of every station, keyed by station id."""
+        return {station_id: dict(status, progress=dict(status["progress"]))
+                for station_id, status in self._status.items()}
+
+    def totals(self) -> Dict[str, Any]:
+        """Station counts by status, and transitions and failures over all stations."""
+        statuses = list(self._status.values())
+        by_status: Dict[str, int] = {}
+        for status in statuses:
+            by_status[status["status"]] = by_status.get(status["status"], 0) + 1
+        return {
+            "stations": len(statuses),
+            "by_status": by_status,
+            "transitions": sum(status["transitions"] for status in statuses),
+            "failed_transitions": sum(status["failed_transitions"] for status in statuses),
+            "failures": sum(status["failures"] or 0 for status in statuses),
+        }
+
+    def log_progress(self) -> None:
+        """Logs one line per station and a total."""
+        for status in self._status.values():
+            fields = ", ".join(f"{key}={value}" for key, value in status["progress"].items())
+            self.logger.info(
+                f"Station {status['station']}: {status['status']}, state {status['state']}, "
+                f"{status['transitions']} transition(s) ({status['failed_transitions']} failed)"
+                + (f", {fields}" if fields else "")
+            )
+        totals = self.totals()
+        self.logger.info(f"All stations: {totals['by_status']}, {totals['transitions']} transition(s), "
+                         f"{totals['failed_transitions']} failed.")
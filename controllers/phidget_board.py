@@ -2,19 +2,25 @@
 # Filename: phidget_board.py
 #!/usr/bin/env python3
 
-import time
+import copy
 import sys
 import logging # Standard library logging
+from collections import deque
 from Phidget22.Phidget import Phidget
 from Phidget22.Devices.DigitalOutput import DigitalOutput
 from Phidget22.Devices.DigitalInput import DigitalInput
 from Phidget22.PhidgetException import PhidgetException
 from Phidget22.ErrorCode import ErrorCode
-from typing import Optional, List, Any, Union
+from typing import Optional, List, Any, Union, Callable, Dict, Tuple, Deque
+
+from controllers.clock import get_clock
+from controllers.logging import trace_logger
 
 # Get the logger for this module. Its name will be 'controllers.phidget_board'.
 # Configuration (handlers, level, format) comes from the global setup.
 module_logger = logging.getLogger(__name__)
+# Every output edge, hold and pause; enable with LOG_TRACE_ENABLED=true.
+module_trace = trace_logger(__name__)
 
 # --- Default Script Channel Map Configuration ---
 DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG = {
@@ -43,6 +49,9 @@ DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG = {
     }
 }
 
+# Number of output actuations (time, name, state) kept for latency measurements.
+ACTUATION_TIMELINE_LENGTH = 256
+
 # Default device configurations (can be overridden or extended by constructor argument)
 DEFAULT_DEVICE_CONFIGS = {
     "main_phidget": {
@@ -59,7 +68,7 @@ class PhidgetController:
                  logger_instance=None):
         self.logger = logger_instance if logger_instance else module_logger
         self.script_map_config = script_map_config if script_map_config is not None else DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG
-        self.device_configs = DEFAULT_DEVICE_CONFIGS.copy()
+        self.device_configs = copy.deepcopy(DEFAULT_DEVICE_CONFIGS)
         if device_configs:
             for key, val in device_configs.items():
                 if key in self.device_configs: self.device_configs[key].update(val)
@@ -67,6 +76,16 @@ class PhidgetController:
         self.logger.debug(f"Using device configurations: {self.device_configs}")
         self.channels = {}
         self._opened_physical_channels = {}
+        # Detach/reattach bookkeeping. Intended output states are tracked per physical
+        # channel so that they can be replayed as soon as the board re-enumerates.
+        self._channel_keys: Dict[str, Tuple[str, str, int]] = {}
+        self._intended_output_states: Dict[Tuple[str, str, int], bool] = {}
+        self._detached_since: Dict[Tuple[str, str, int], float] = {}
+        self._detach_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.detach_events: List[Dict[str, Any]] = []
+        self._closing = False
+        # Wall-clock (time.time) timeline of successful output changes, newest last.
+        self.actuation_timeline: Deque[Tuple[float, str, bool]] = deque(maxlen=ACTUATION_TIMELINE_LENGTH)
         self._initialize_channels()
 
     def _configure_phidget_connection(self, ph: Phidget, device_key: str):
@@ -96,6 +115,7 @@ class PhidgetController:
                     self.logger.debug(f"  Opening {type_name[:-1]} '{script_name}' (DevKey: {ph_id_key}, PhysChan: {phys_ch_idx}).")
                     try:
                         ch = ph_class(); timeout = self._configure_phidget_connection(ch, ph_id_key); ch.setChannel(phys_ch_idx)
+                        self._register_attach_handlers(ch, unique_key)
                         self.logger.debug(f"    Opening '{script_name}' with timeout {timeout}ms...")
                         ch.openWaitForAttachment(timeout)
                         self.logger.debug(f"    Opened '{script_name}'. Dev: {ch.getDeviceName()}, S/N: {ch.getDeviceSerialNumber()}, Ch: {ch.getChannel()}, HubPort: {ch.getHubPort() if ch.getIsHubPortDevice() else 'N/A'}, Remote: {ch.getIsRemote()}")
@@ -106,9 +126,70 @@ class PhidgetController:
                         self.logger.error(log_msg); self._opened_physical_channels[unique_key] = None
                     except Exception as e: self.logger.error(f"Unexpected error opening {type_name[:-1]} '{script_name}': {e}", exc_info=True); self._opened_physical_channels[unique_key] = None
                 self.channels[script_name] = self._opened_physical_channels.get(unique_key)
+                self._channel_keys[script_name] = unique_key
                 if not self.channels[script_name] and unique_key in self._opened_physical_channels: self.logger.warning(f"    Channel '{script_name}' failed init.")
         self.logger.debug("Phidget module initialized.")
 
+    def _register_attach_handlers(self, ch: Phidget, unique_key: Tuple[str, str, int]):
+        """Registers attach/detach handlers so a board glitch can be recovered without re-opening channels."""
+        ch.setOnDetachHandler(lambda _ph, key=unique_key: self._on_channel_detach(key))
+        ch.setOnAttachHandler(lambda _ph, key=unique_key: self._on_channel_attach(key))
+
+    def _scripts_for_key(self, unique_key: Tuple[str, str, int]) -> List[str]:
+        return [name for name, key in self._channel_keys.items() if key == unique_key]
+
+    def _on_channel_detach(self, unique_key: Tuple[str, str, int]):
+        """Phidget22 detach handler. Records when the channel dropped off the bus."""
+        if self._closing: return
+        self._detached_since.setdefault(unique_key, get_clock().monotonic())
+        self.logger.warning(f"Phidget channel detached: DevKey '{unique_key[0]}', Type '{unique_key[1]}', PhysCh {unique_key[2]} (Scripts: {self._scripts_for_key(unique_key)}).")
+
+    def _on_channel_attach(self, unique_key: Tuple[str, str, int]):
+        """
+        Phidget22 attach handler. On a re-attach, replays the last intended output
+        state onto the channel and records how long it was gone.
+
+        The initial attach fired by openWaitForAttachment() is ignored, since no
+        detach was recorded for it.
+        """
+        detached_at = self._detached_since.pop(unique_key, None)
+        if detached_at is None: return
+        duration_s = get_clock().monotonic() - detached_at
+        scripts = self._scripts_for_key(unique_key)
+        restored_state = self._intended_output_states.get(unique_key)
+        ch = self._opened_physical_channels.get(unique_key)
+        if ch is not None and restored_state is not None and isinstance(ch, DigitalOutput):
+            try: ch.setState(restored_state)
+            except PhidgetException as e:
+                self.logger.error(f"Error restoring output {scripts} to {'ON' if restored_state else 'OFF'} after reattach: {e.description}", exc_info=False)
+                restored_state = None
+        event = {"scripts": scripts, "phidget_id": unique_key[0], "type": unique_key[1], "physical_channel": unique_key[2],
+                 "duration_s": duration_s, "restored_state": restored_state}
+        self.detach_events.append(event)
+        state_note = f", restored {'ON' if restored_state else 'OFF'}" if restored_state is not None else ""
+        self.logger.warning(f"Phidget channel reattached after {duration_s * 1000:.1f}ms: {scripts}{state_note}.")
+        for listener in list(self._detach_listeners):
+            try: listener(event)
+            except Exception as e: self.logger.error(f"Detach listener {listener!r} failed: {e}", exc_info=True)
+
+    def add_detach_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Registers a callback invoked with a detach event dict each time a channel
+        reattaches after a detach.
+
+        Args:
+            callback (Callable[[Dict[str, Any]], None]): Receives a dict with the keys
+                'scripts', 'phidget_id', 'type', 'physical_channel', 'duration_s' and
+                'restored_state' (None for inputs or outputs never driven).
+        """
+        self._detach_listeners.append(callback)
+
+    def get_detach_stats(self) -> Dict[str, Any]:
+        """Returns the count, total and max detach duration (seconds) seen so far."""
+        durations = [e["duration_s"] for e in self.detach_events]
+        return {"count": len(durations), "total_s": sum(durations), "max_s": max(durations, default=0.0),
+                "currently_detached": sorted(s for key in self._detached_since for s in self._scripts_for_key(key))}
+
     def _get_channel_object(self, name, expected_type=None):
         if name not in self.channels:
             is_def = any(name in self.script_map_config.get(t, {}) for t in ["outputs", "inputs"])
@@ -123,19 +204,26 @@ class PhidgetController:
         return ch
 
     def set_output(self, name, state):
+        # Record intent before touching the hardware so a detached channel is driven to it on reattach.
+        if name in self._channel_keys: self._intended_output_states[self._channel_keys[name]] = bool(state)
         do_ch = self._get_channel_object(name, DigitalOutput)
-        try: do_ch.setState(bool(state)); self.logger.debug(f"Output '{name}' set to {'ON' if state else 'OFF'}.")
+        try: do_ch.setState(bool(state)); module_trace.debug("Output '%s' set to %s.", name, 'ON' if state else 'OFF')
         except PhidgetException as e: self.logger.error(f"Error setting output '{name}': {e.description}", exc_info=False); raise
+        self.actuation_timeline.append((get_clock().time(), name, bool(state)))
+
+    def last_actuation(self) -> Optional[Tuple[float, str, bool]]:
+        """Returns the most recent (timestamp, output name, state) actuation, or None if nothing was driven yet."""
+        return self.actuation_timeline[-1] if self.actuation_timeline else None
 
     def on(self, name): self.set_output(name, True)
     
     def off(self, name): self.set_output(name, False)
 
     def hold(self, name: str, duration_ms: float = 200):
-        self.logger.debug(f"Holding '{name}' ON for {duration_ms}ms.")
+        module_trace.debug("Holding '%s' ON for %sms.", name, duration_ms)
         try:
             self.on(name)
-            time.sleep(duration_ms / 1000.0)
+            get_clock().sleep(duration_ms / 1000.0)
         finally:
             try:
                 self.off(name)
@@ -171,11 +259,11 @@ class PhidgetController:
 
     def _pulse_simultaneous(self, pins: List[str], duration_ms: float):
         """Turns on a list of pins simultaneously, holds, then turns them off."""
-        self.logger.debug(f"Simultaneous press: {pins} for {duration_ms}ms.")
+        module_trace.debug("Simultaneous press: %s for %sms.", pins, duration_ms)
         try:
             for pin in pins:
                 self.on(pin)
-            time.sleep(duration_ms / 1000.0)
+            get_clock().sleep(duration_ms / 1000.0)
         finally:
             for pin in pins:
                 try:
@@ -213,8 +301,8 @@ class PhidgetController:
                 raise TypeError(f"Sequence item must be a string or a list of strings, but got {type(item)}.")
 
             if i < len(pins) - 1 and pause_ms > 0:
-                self.logger.debug(f"  Pause {pause_ms}ms.")
-                time.sleep(pause_ms / 1000.0)
+                module_trace.debug("  Pause %sms.", pause_ms)
+                get_clock().sleep(pause_ms / 1000.0)
 
     def read_input(self, name: str) -> Optional[bool]:
         di_ch = self._get_channel_object(name, DigitalInput)
@@ -227,9 +315,9 @@ class PhidgetController:
             raise
 
     def wait_for_input(self, name: str, expected_state: bool, timeout_s: float = 5, poll_s: float = 0.05) -> bool:
-        expected = bool(expected_state); start = time.time()
+        expected = bool(expected_state); start = get_clock().time()
         self.logger.info(f"Waiting for input '{name}' to be {'HIGH' if expected else 'LOW'} (timeout: {timeout_s}s)...")
-        while time.time() - start < timeout_s:
+        while get_clock().time() - start < timeout_s:
             try:
                 ch = self._get_channel_object(name, DigitalInput)
                 if ch.getState() == expected:
@@ -245,7 +333,7 @@ class PhidgetController:
             except (NameError, RuntimeError, TypeError) as e:
                 self.logger.error(f"Cannot wait for '{name}': {e}", exc_info=True)
                 raise
-            time.sleep(poll_s)
+            get_clock().sleep(poll_s)
         last_state = "UNKNOWN"; ch = self.channels.get(name)
         try:
             if ch and ch.getAttached():
@@ -259,6 +347,7 @@ class PhidgetController:
 
     def close_all(self):
         closed, failed = 0, 0
+        self._closing = True
         for key, ch in list(self._opened_physical_channels.items()):
             if ch:
                 log_ref = f"DevKey '{key[0]}', Type '{key[1]}', PhysCh {key[2]} (Scripts: {[s for s,c in self.channels.items() if c==ch]})"
@@ -269,6 +358,8 @@ class PhidgetController:
                     except PhidgetException as e: self.logger.error(f"Error closing {log_ref}: {e.description}", exc_info=False); failed+=1
                 else: self.logger.debug(f"  {log_ref} not attached/already closed."); ch.close() # Close non-attached too
         self._opened_physical_channels.clear(); self.channels.clear()
+        self._channel_keys.clear(); self._intended_output_states.clear(); self._detached_since.clear()
+        self._closing = False
         self.logger.info(f"Phidgets close complete. Closed: {closed}, Errors: {failed}.")
 
     def __enter__(self): return self
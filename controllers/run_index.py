@@ -0,0 +1,472 @@
+# Directory: controllers
+# Filename: run_index.py
+#!/usr/bin/env python3
+
+# Cross-run index of logs/. Every run leaves a directory of main.log, session
+# journal and instant replays, and answering "which firmware has the most
+# ACCEPT_PATTERN timeouts" meant grepping all of them. RunIndex ingests run
+# directories into one SQLite database: one row per run (device profile, counts)
+# plus its failures and warnings, per-block iteration results, per-trigger
+# transition totals, speed results and replay files. Aggregates are built while
+# the journal is streamed, so a run costs a handful of rows per trigger/block
+# rather than one per record. Ingestion is incremental: a run whose files have
+# the same size and mtime as last time is skipped without being read, and one
+# whose checksum is unchanged is not re-ingested. Runs from before the session
+# journal only have main.log, which is not parsed: they are indexed with NULL
+# counts so they drop out of the aggregates instead of counting as clean runs.
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from controllers.fio_results import FioJobResult
+from controllers.session_journal import (
+    SESSION_JOURNAL_FILENAME, RECORD_BLOCK_START, RECORD_FAILURE, RECORD_ITERATION, RECORD_SESSION_START,
+    RECORD_SPEED_RESULT, RECORD_TRANSITION, RECORD_WARNING, read_journal,
+)
+from controllers.speed_baseline import TRACKED_METRICS
+
+module_logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOGS_DIR = os.path.join(PROJECT_ROOT, "logs")
+DEFAULT_RUN_INDEX_DB_PATH = os.environ.get("RUN_INDEX_DB") or os.path.join(DEFAULT_LOGS_DIR, "run_index.sqlite3")
+
+MAIN_LOG_FILENAME = "main.log"
+# replay_<HH-MM-SS>_<method>.mp4, as written by LogitechLedChecker._save_replay_video
+_REPLAY_NAME = re.compile(r"^replay_\d{2}-\d{2}-\d{2}_(?P<method>.+)\.mp4$")
+# Serial numbers, addresses and measured values vary between runs of the same failure.
+_VARIABLE_TOKEN = re.compile(r"\b\w*\d{4,}\w*\b|\b\d+(?:\.\d+)?\b")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    fingerprint TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    started_at REAL,
+    ended_at REAL,
+    device_name TEXT,
+    bridge_fw TEXT,
+    mcu_fw TEXT,
+    serial TEXT,
+    script_title TEXT,
+    records INTEGER,
+    iterations INTEGER,
+    failures INTEGER,
+    warnings INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_profile ON runs (device_name, bridge_fw, mcu_fw, started_at);
+CREATE TABLE IF NOT EXISTS run_events (
+    run_id INTEGER NOT NULL,
+    block INTEGER,
+    block_name TEXT,
+    kind TEXT NOT NULL,
+    recorded_at REAL,
+    message TEXT NOT NULL,
+    reason TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_events_run ON run_events (run_id);
+CREATE INDEX IF NOT EXISTS idx_run_events_reason ON run_events (kind, reason);
+CREATE TABLE IF NOT EXISTS run_blocks (
+    run_id INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    name TEXT,
+    iterations_passed INTEGER NOT NULL,
+    iterations_failed INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    warnings INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_blocks_run ON run_blocks (run_id);
+CREATE TABLE IF NOT EXISTS run_transitions (
+    run_id INTEGER NOT NULL,
+    trigger TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    total_s REAL NOT NULL,
+    max_s REAL
+);
+CREATE INDEX IF NOT EXISTS idx_run_transitions_run ON run_transitions (run_id);
+CREATE INDEX IF NOT EXISTS idx_run_transitions_trigger ON run_transitions (trigger);
+CREATE TABLE IF NOT EXISTS run_speed (
+    run_id INTEGER NOT NULL,
+    block INTEGER,
+    recorded_at REAL,
+    usb_mode TEXT,
+    job TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_speed_run ON run_speed (run_id);
+CREATE INDEX IF NOT EXISTS idx_run_speed_metric ON run_speed (metric, job, direction);
+CREATE TABLE IF NOT EXISTS run_replays (
+    run_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    method TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_replays_run ON run_replays (run_id);
+CREATE INDEX IF NOT EXISTS idx_run_replays_method ON run_replays (method);
+"""
+
+_CHILD_TABLES = ("run_events", "run_blocks", "run_transitions", "run_speed", "run_replays")
+
+
+def failure_reason(message: str) -> str:
+    """A failure message with its run-specific tokens (serials, numbers) replaced by '#', for grouping."""
+    return _VARIABLE_TOKEN.sub("#", message).strip()
+
+
+def find_run_dirs(logs_dir: str) -> Iterator[str]:
+    """
+    Yields every run directory under `logs_dir`: one holding a session journal or main.log.
+
+    A multi-station run is one directory per station (logs/<timestamp>/station_<id>).
+    """
+    for directory, subdirectories, filenames in os.walk(logs_dir):
+        subdirectories.sort()
+        if SESSION_JOURNAL_FILENAME in filenames or MAIN_LOG_FILENAME in filenames:
+            yield directory
+
+
+def _file_sha256(path: str, digest: Any) -> None:
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+
+
+class _RunScan:
+    """The files of one run directory, their fingerprint and their checksum."""
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.journal_path: Optional[str] = None
+        self.main_log_path: Optional[str] = None
+        self.replays: List[Tuple[str, str, int]] = []
+        parts = []
+        with os.scandir(run_dir) as entries:
+            for entry in sorted(entries, key=lambda item: item.name):
+                if not entry.is_file():
+                    continue
+                match = _REPLAY_NAME.match(entry.name)
+                if entry.name == SESSION_JOURNAL_FILENAME:
+                    self.journal_path = entry.path
+                elif entry.name == MAIN_LOG_FILENAME:
+                    self.main_log_path = entry.path
+                elif match is None:
+                    continue
+                stat = entry.stat()
+                if match is not None:
+                    self.replays.append((entry.name, match.group("method"), stat.st_size))
+                parts.append(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}")
+        self.fingerprint = "|".join(parts)
+
+    def checksum(self) -> str:
+        """SHA-256 of the journal (or main.log without one) and the replay names and sizes."""
+        digest = hashlib.sha256()
+        content_path = self.journal_path or self.main_log_path
+        if content_path is not None:
+            _file_sha256(content_path, digest)
+        for name, _, size in self.replays:
+            digest.update(f"\n{name}:{size}".encode("utf-8"))
+        return digest.hexdigest()
+
+
+class RunIndex:
+    """
+    SQLite index of run directories, with canned cross-run queries.
+
+    The database is only opened on first use, so constructing an index is free.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_RUN_INDEX_DB_PATH, logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            db_path (str): SQLite file; created (with its directory) on first use.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    # --- Ingestion ---
+
+    def ingest(self, logs_dir: str = DEFAULT_LOGS_DIR, force: bool = False) -> Dict[str, int]:
+        """
+        Ingests every new or changed run directory under `logs_dir`.
+
+        Args:
+            logs_dir (str): The logs root.
+            force (bool): Re-ingest every run, even unchanged ones.
+
+        Returns:
+            Dict[str, int]: 'scanned', 'ingested', 'unchanged' (same files) and 'failed' run counts.
+        """
+        counts = {"scanned": 0, "ingested": 0, "unchanged": 0, "failed": 0}
+        logs_dir = os.path.abspath(logs_dir)
+        with self._lock:
+            connection = self._connect()
+            known = {row["path"]: (row["fingerprint"], row["checksum"])
+                     for row in connection.execute("SELECT path, fingerprint, checksum FROM runs")}
+        for run_dir in find_run_dirs(logs_dir):
+            counts["scanned"] += 1
+            path = os.path.relpath(run_dir, logs_dir).replace(os.sep, "/")
+            try:
+                outcome = self.ingest_run(run_dir, path=path, known=known.get(path), force=force)
+            except (OSError, sqlite3.Error) as e:
+                self.logger.error(f"Could not index run {run_dir}: {e}")
+                counts["failed"] += 1
+                continue
+            counts[outcome] += 1
+        self.logger.info(f"Indexed {logs_dir}: {counts['ingested']} run(s) ingested, {counts['unchanged']} unchanged, "
+                         f"{counts['failed']} failed.")
+        return counts
+
+    def ingest_run(self, run_dir: str, path: Optional[str] = None,
+                   known: Optional[Tuple[str, str]] = None, force: bool = False) -> str:
+        """
+        Ingests one run directory, replacing what was indexed for it before.
+
+        Args:
+            run_dir (str): The run directory.
+            path (Optional[str]): Key of the run in the index (default: the directory name).
+            known (Optional[Tuple[str, str]]): The (fingerprint, checksum) indexed for it, if any.
+            force (bool): Ingest even if the run is unchanged.
+
+        Returns:
+            str: 'ingested' or 'unchanged'.
+        """
+        path = path or os.path.basename(os.path.normpath(run_dir))
+        scan = _RunScan(run_dir)
+        if known is not None and not force and known[0] == scan.fingerprint:
+            return "unchanged"
+        checksum = scan.checksum()
+        if known is not None and not force and known[1] == checksum:
+            # Touched but not changed (e.g. copied): remember the new fingerprint only.
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute("UPDATE runs SET fingerprint = ? WHERE path = ?", (scan.fingerprint, path))
+            return "unchanged"
+
+        summary = _JournalSummary()
+        if scan.journal_path is not None:
+            for record in read_journal(scan.journal_path, logger_instance=self.logger):
+                try:
+                    summary.add(record)
+                except (KeyError, TypeError, ValueError) as e:
+                    self.logger.warning(f"Skipping malformed '{record['kind']}' record in {scan.journal_path}: {e}")
+            counts = (summary.records, summary.iterations, summary.failures, summary.warnings)
+        else:
+            self.logger.info(f"{run_dir} has no session journal; indexed without counts.")
+            counts = (None, None, None, None)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                self._delete_run(connection, path)
+                cursor = connection.execute(
+                    "INSERT INTO runs (path, fingerprint, checksum, ingested_at, started_at, ended_at, device_name, "
+                    "bridge_fw, mcu_fw, serial, script_title, records, iterations, failures, warnings) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, scan.fingerprint, checksum, time.time(), summary.started_at, summary.ended_at,
+                     summary.device.get("device"), summary.device.get("bridge_fw"), summary.device.get("mcu_fw"),
+                     summary.device.get("serial"), summary.script_title, *counts),
+                )
+                run_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT INTO run_events (run_id, block, block_name, kind, recorded_at, message, reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id, *event) for event in summary.events])
+                connection.executemany(
+                    "INSERT INTO run_blocks (run_id, block, name, iterations_passed, iterations_failed, failures, "
+                    "warnings) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, block, stats["name"], stats["passed"], stats["failed"], stats["failures"],
+                      stats["warnings"]) for block, stats in summary.blocks.items()])
+                connection.executemany(
+                    "INSERT INTO run_transitions (run_id, trigger, ok, failed, total_s, max_s) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, trigger, stats["ok"], stats["failed"], stats["total_s"], stats["max_s"])
+                     for trigger, stats in summary.transitions.items()])
+                connection.executemany(
+                    "INSERT INTO run_speed (run_id, block, recorded_at, usb_mode, job, direction, metric, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(run_id, *row) for row in summary.speed])
+                connection.executemany(
+                    "INSERT INTO run_replays (run_id, filename, method, size_bytes) VALUES (?, ?, ?, ?)",
+                    [(run_id, *replay) for replay in scan.replays])
+        return "ingested"
+
+    @staticmethod
+    def _delete_run(connection: sqlite3.Connection, path: str) -> None:
+        row = connection.execute("SELECT id FROM runs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        for table in _CHILD_TABLES:
+            connection.execute(f"DELETE FROM {table} WHERE run_id = ?", (row["id"],))
+        connection.execute("DELETE FROM runs WHERE id = ?", (row["id"],))
+
+    # --- Canned queries ---
+
+    def _query(self, sql: str, parameters: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, parameters)]
+
+    def runs(self, device: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        The most recently started runs, optionally of one device.
+
+        Runs without a session journal have None for records, iterations, failures and warnings.
+        """
+        return self._query(
+            "SELECT path, started_at, device_name, bridge_fw, mcu_fw, serial, script_title, records, iterations, "
+            "failures, warnings FROM runs WHERE (? IS NULL OR device_name = ?) "
+            "ORDER BY started_at DESC, id DESC LIMIT ?", (device, device, limit))
+
+    def failure_histogram(self, match: Optional[str] = None, device: Optional[str] = None,
+                          kind: str = RECORD_FAILURE, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Failure (or warning) reasons by device profile, most frequent first.
+
+        Args:
+            match (Optional[str]): Only reasons containing this text (e.g. 'ACCEPT_PATTERN').
+            device (Optional[str]): Only runs of this device name.
+            kind (str): RECORD_FAILURE or RECORD_WARNING.
+            limit (int): Rows to return.
+
+        Returns:
+            List[Dict[str, Any]]: device_name, bridge_fw, mcu_fw, reason, count and runs
+            (the number of runs it occurred in).
+        """
+        return self._query(
+            "SELECT r.device_name, r.bridge_fw, r.mcu_fw, e.reason, COUNT(*) AS count, "
+            "COUNT(DISTINCT e.run_id) AS runs FROM run_events e JOIN runs r ON r.id = e.run_id "
+            "WHERE e.kind = ? AND (? IS NULL OR instr(e.reason, ?) > 0) AND (? IS NULL OR r.device_name = ?) "
+            "GROUP BY r.device_name, r.bridge_fw, r.mcu_fw, e.reason ORDER BY count DESC, runs DESC LIMIT ?",
+            (kind, match, match, device, device, limit))
+
+    def throughput_trend(self, metric: str = "bw_mbps", device: Optional[str] = None,
+                         job: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Speed-test results per firmware, in the order the firmware was first tested.
+
+        Args:
+            metric (str): One of speed_baseline.TRACKED_METRICS.
+            device (Optional[str]): Only runs of this device name.
+            job (Optional[str]): Only this fio job.
+
+        Returns:
+            List[Dict[str, Any]]: device_name, usb_mode, job, direction, bridge_fw, mcu_fw,
+            runs, samples, mean, min, max and first_seen per firmware.
+        """
+        return self._query(
+            "SELECT r.device_name, s.usb_mode, s.job, s.direction, r.bridge_fw, r.mcu_fw, "
+            "COUNT(DISTINCT s.run_id) AS runs, COUNT(*) AS samples, AVG(s.value) AS mean, MIN(s.value) AS min, "
+            "MAX(s.value) AS max, MIN(r.started_at) AS first_seen FROM run_speed s JOIN runs r ON r.id = s.run_id "
+            "WHERE s.metric = ? AND (? IS NULL OR r.device_name = ?) AND (? IS NULL OR s.job = ?) "
+            "GROUP BY r.device_name, s.usb_mode, s.job, s.direction, r.bridge_fw, r.mcu_fw "
+            "ORDER BY r.device_name, s.usb_mode, s.job, s.direction, first_seen",
+            (metric, device, device, job, job))
+
+
+class _JournalSummary:
+    """Per-run aggregates built while a journal is streamed."""
+
+    def __init__(self):
+        self.records = 0
+        self.device: Dict[str, Any] = {}
+        self.script_title: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        self.iterations = 0
+        self.failures = 0
+        self.warnings = 0
+        self.events: List[Tuple[Any, ...]] = []
+        self.blocks: Dict[int, Dict[str, Any]] = {}
+        self.transitions: Dict[str, Dict[str, Any]] = {}
+        self.speed: List[Tuple[Any, ...]] = []
+        self._failure_marks: Dict[int, int] = {}
+        # Wall time of monotonic time 0 of the current session (a resumed run appends a new one).
+        self._wall_offset: Optional[float] = None
+
+    def _wall(self, record: Dict[str, Any]) -> Optional[float]:
+        if self._wall_offset is None or record.get("t") is None:
+            return None
+        return self._wall_offset + record["t"]
+
+    def _block(self, block: Any) -> Dict[str, Any]:
+        stats = self.blocks.get(block)
+        if stats is None:
+            stats = self.blocks[block] = {"name": None, "passed": 0, "failed": 0, "failures": 0, "warnings": 0}
+        return stats
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.records += 1
+        kind = record["kind"]
+        if kind == RECORD_SESSION_START:
+            if record.get("wall") is not None:
+                self._wall_offset = record["wall"] - record.get("t", 0.0)
+                if self.started_at is None:
+                    self.started_at = record["wall"]
+            self.device.update({key: record[key] for key in ("device", "bridge_fw", "mcu_fw", "serial")
+                                if record.get(key) is not None})
+        elif kind == RECORD_BLOCK_START:
+            self._block(record["block"])["name"] = record.get("name")
+            self.script_title = record.get("script_title", self.script_title)
+        elif kind in (RECORD_FAILURE, RECORD_WARNING):
+            block = record.get("block")
+            message = str(record.get("message") if kind == RECORD_FAILURE else record.get("summary"))
+            stats = self._block(block)
+            if kind == RECORD_FAILURE:
+                self.failures += 1
+                stats["failures"] += 1
+            else:
+                self.warnings += 1
+                stats["warnings"] += 1
+            self.events.append((block, stats["name"], kind, self._wall(record), message, failure_reason(message)))
+        elif kind == RECORD_ITERATION:
+            stats = self._block(record.get("block"))
+            failed = stats["failures"] > self._failure_marks.get(record.get("block"), 0)
+            self._failure_marks[record.get("block")] = stats["failures"]
+            stats["failed" if failed else "passed"] += 1
+            self.iterations += 1
+        elif kind == RECORD_TRANSITION:
+            stats = self.transitions.setdefault(record["trigger"], {"ok": 0, "failed": 0, "total_s": 0.0, "max_s": None})
+            stats["ok" if record.get("ok") else "failed"] += 1
+            duration_s = record.get("duration_s")
+            if duration_s is not None:
+                stats["total_s"] += duration_s
+                stats["max_s"] = duration_s if stats["max_s"] is None else max(stats["max_s"], duration_s)
+        elif kind == RECORD_SPEED_RESULT:
+            for job_name, job in record.get("jobs", {}).items():
+                for direction, direction_result in FioJobResult.from_dict(job).directions.items():
+                    for metric in TRACKED_METRICS:
+                        value = getattr(direction_result, metric)
+                        if value is not None:
+                            self.speed.append((record.get("block"), self._wall(record), record.get("usb_mode"),
+                                               job_name, direction, metric, float(value)))
+        wall = self._wall(record)
+        if wall is not None:
+            self.ended_at = wall if self.ended_at is None else max(self.ended_at, wall)
@@ -0,0 +1,240 @@
+# Directory: controllers
+# Filename: session_journal.py
+#!/usr/bin/env python3
+
+# Append-only event journal of a TestSession. The session used to keep its
+# counters in dicts and only wrote them out as a human-readable summary at the
+# end, so a multi-day run could not be queried while it ran and a crash lost
+# everything since the last checkpoint. Every key press, transition, LED run,
+# enumeration, wait, speed result, loop iteration, warning and failure is now
+# also one typed JSON-lines record with a monotonic timestamp. The caller only builds the
+# record and puts it on a bounded queue. A background thread serializes it,
+# writes through a buffered file, flushes every SESSION_JOURNAL_FLUSH_INTERVAL_SEC
+# and fsyncs every SESSION_JOURNAL_FSYNC_INTERVAL_SEC. A crash can lose at most
+# the last unflushed records and leaves at most one truncated line, which
+# read_journal() skips. TestSession.rebuild_from_journal() replays a journal into
+# the session metrics, one line at a time.
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from .clock import get_clock
+
+module_logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+SESSION_JOURNAL_ENABLED = os.environ.get("SESSION_JOURNAL_ENABLED", "true").lower() == "true"
+SESSION_JOURNAL_FILENAME = "session_journal.jsonl"
+
+# Flushes and fsyncs run on the writer thread on real time, also under a simulated clock.
+try:
+    SESSION_JOURNAL_FLUSH_INTERVAL_SEC = float(os.environ.get("SESSION_JOURNAL_FLUSH_INTERVAL_SEC", "1"))
+except (TypeError, ValueError):
+    SESSION_JOURNAL_FLUSH_INTERVAL_SEC = 1.0
+try:
+    SESSION_JOURNAL_FSYNC_INTERVAL_SEC = float(os.environ.get("SESSION_JOURNAL_FSYNC_INTERVAL_SEC", "10"))
+except (TypeError, ValueError):
+    SESSION_JOURNAL_FSYNC_INTERVAL_SEC = 10.0
+# Records the writer may fall behind by before record() blocks the caller.
+try:
+    SESSION_JOURNAL_QUEUE_SIZE = int(os.environ.get("SESSION_JOURNAL_QUEUE_SIZE", "10000"))
+except (TypeError, ValueError):
+    SESSION_JOURNAL_QUEUE_SIZE = 10000
+
+# --- Record kinds ---
+RECORD_SESSION_START = "session_start"
+RECORD_RESTORE = "restore"
+RECORD_BLOCK_START = "block_start"
+RECORD_BLOCK_RESUME = "block_resume"
+RECORD_BLOCK_END = "block_end"
+RECORD_KEY_PRESS = "key_press"
+RECORD_TRANSITION = "transition"
+RECORD_LED_RUN = "led_run"
+RECORD_ENUMERATION = "enumeration"
+RECORD_ENUM_LATENCY = "enum_latency"
+RECORD_WAIT = "wait"
+RECORD_PHIDGET_DETACH = "phidget_detach"
+RECORD_FAILURE = "failure"
+RECORD_WARNING = "warning"
+RECORD_SPEED_RESULT = "speed_result"
+RECORD_SPEED_REGRESSION = "speed_regression"
+RECORD_SPEED_TIMESERIES = "speed_timeseries"
+RECORD_INTEGRITY = "integrity"
+RECORD_FORMAT = "format"
+RECORD_ITERATION = "iteration"
+
+# Queue markers for the writer thread.
+_CLOSE = object()
+
+
+class SessionJournal:
+    """
+    Appends records to a JSON-lines file through a background writer thread.
+
+    Each record gets a sequence number ('seq') and the monotonic time of the
+    get_clock() it was recorded at ('t'). The session_start record written by
+    TestSession.open_journal() pairs that time with the wall-clock time.
+    """
+
+    def __init__(self, path: str, flush_interval_sec: float = SESSION_JOURNAL_FLUSH_INTERVAL_SEC,
+                 fsync_interval_sec: float = SESSION_JOURNAL_FSYNC_INTERVAL_SEC,
+                 queue_size: int = SESSION_JOURNAL_QUEUE_SIZE, logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            path (str): The journal file. It is appended to, so a resumed run continues it.
+            flush_interval_sec (float): Longest time a written record stays in the file buffer.
+            fsync_interval_sec (float): Longest time between two fsyncs of the file.
+            queue_size (int): Records the writer may fall behind by before record() blocks.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.path = path
+        self.flush_interval_sec = max(0.0, float(flush_interval_sec))
+        self.fsync_interval_sec = max(0.0, float(fsync_interval_sec))
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._handle = open(path, "a", encoding="utf-8")
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.written = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, name="SessionJournalWriter", daemon=True)
+        self._thread.start()
+
+    def record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Stamps `record` with 'seq' and 't' and queues it for writing.
+
+        The record is serialized later on the writer thread, so it must not be
+        changed after this call. Records sent after close() are dropped.
+        """
+        with self._lock:
+            if self.closed:
+                return record
+            self._seq += 1
+            record["seq"] = self._seq
+            record["t"] = get_clock().monotonic()
+            self._queue.put(record)
+        return record
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Blocks until every record queued so far is written and fsynced.
+
+        Returns:
+            bool: False if the writer did not get there within `timeout` seconds.
+        """
+        done = threading.Event()
+        with self._lock:
+            if self.closed:
+                return True
+            self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Writes and fsyncs the remaining records and closes the file. Safe to call twice."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._queue.put(_CLOSE)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.warning(f"Session journal writer did not finish within {timeout}s; {self.path} may be incomplete.")
+
+    def _run(self) -> None:
+        last_flush = last_fsync = time.monotonic()
+        dirty = unsynced = False
+        while True:
+            # Sleep until the next record, or until buffered data is due for a flush or fsync.
+            timeout = None
+            if dirty:
+                timeout = max(0.0, last_flush + self.flush_interval_sec - time.monotonic())
+            elif unsynced:
+                timeout = max(0.0, last_fsync + self.fsync_interval_sec - time.monotonic())
+            item = None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            lines = []
+            markers = []
+            while item is not None:
+                if isinstance(item, dict):
+                    lines.append(json.dumps(item, separators=(",", ":"), default=str))
+                else:
+                    markers.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if lines:
+                self._write("\n".join(lines) + "\n", len(lines))
+                dirty = unsynced = True
+            now = time.monotonic()
+            if dirty and (markers or now - last_flush >= self.flush_interval_sec):
+                self._sync(fsync=False)
+                dirty, last_flush = False, now
+            if unsynced and (markers or now - last_fsync >= self.fsync_interval_sec):
+                self._sync(fsync=True)
+                unsynced, last_fsync = False, now
+            for marker in markers:
+                if marker is not _CLOSE:
+                    marker.set()
+            if _CLOSE in markers:
+                self._handle.close()
+                return
+
+    def _write(self, text: str, count: int) -> None:
+        try:
+            self._handle.write(text)
+            self.written += count
+        except (OSError, ValueError) as e:
+            self._report_error(f"Session journal write failed, {count} record(s) lost", e)
+
+    def _sync(self, fsync: bool) -> None:
+        try:
+            self._handle.flush()
+            if fsync:
+                os.fsync(self._handle.fileno())
+                self.fsyncs += 1
+        except (OSError, ValueError) as e:
+            self._report_error("Session journal flush failed", e)
+
+    def _report_error(self, message: str, error: Exception) -> None:
+        # Logged once per burst rather than once per record; the run goes on either way.
+        self.errors += 1
+        if self.errors == 1 or self.errors % 1000 == 0:
+            self.logger.error(f"{message} ({self.path}): {error} [{self.errors} error(s) so far]")
+
+
+def read_journal(path: str, logger_instance: Optional[logging.Logger] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of a journal one line at a time.
+
+    Lines that are not a JSON object (the truncated last line of a crashed run)
+    are skipped with a warning.
+    """
+    logger = logger_instance if logger_instance else module_logger
+    with open(path, "r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict) or "kind" not in record:
+                logger.warning(f"Skipping unreadable journal line {line_number} of {path}.")
+                continue
+            yield record
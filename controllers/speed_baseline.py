@@ -0,0 +1,234 @@
+# Directory: controllers
+# Filename: speed_baseline.py
+#!/usr/bin/env python3
+
+# Persistent speed-test baselines. Every speed-test result is stored in a small
+# SQLite database under logs/, keyed by device profile (device name, bridge FW,
+# MCU FW, USB mode). New results are compared against the recent history of the
+# same profile with a median/MAD robust z-score, so a firmware drop that costs a
+# few percent of throughput is flagged instead of disappearing into min/max/avg.
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from controllers.fio_results import FioJobResult
+
+module_logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_DB_PATH = os.environ.get("SPEED_BASELINE_DB") or os.path.join(
+    PROJECT_ROOT, "logs", "speed_baselines.sqlite3")
+SPEED_BASELINE_ENABLED = os.environ.get("SPEED_BASELINE_ENABLED", "true").lower() == "true"
+
+# Results per profile/job/metric the baseline is built from (most recent first),
+# and how many are needed before anything is flagged.
+try:
+    SPEED_BASELINE_WINDOW = int(os.environ.get("SPEED_BASELINE_WINDOW", "50"))
+except (TypeError, ValueError):
+    SPEED_BASELINE_WINDOW = 50
+try:
+    SPEED_BASELINE_MIN_SAMPLES = int(os.environ.get("SPEED_BASELINE_MIN_SAMPLES", "5"))
+except (TypeError, ValueError):
+    SPEED_BASELINE_MIN_SAMPLES = 5
+
+# A result is a regression when its robust z-score passes the threshold in the bad
+# direction AND it is at least the minimum relative change from the median.
+try:
+    SPEED_BASELINE_Z_THRESHOLD = float(os.environ.get("SPEED_BASELINE_Z_THRESHOLD", "3.5"))
+except (TypeError, ValueError):
+    SPEED_BASELINE_Z_THRESHOLD = 3.5
+try:
+    SPEED_BASELINE_MIN_CHANGE_PCT = float(os.environ.get("SPEED_BASELINE_MIN_CHANGE_PCT", "3"))
+except (TypeError, ValueError):
+    SPEED_BASELINE_MIN_CHANGE_PCT = 3.0
+
+# Scales the MAD to a standard-deviation estimate for normally distributed data.
+MAD_SCALE = 1.4826
+
+# metric -> True when higher is better
+TRACKED_METRICS = {
+    "bw_mbps": True,
+    "iops": True,
+    "clat_p99_ms": False,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS speed_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    device_name TEXT NOT NULL,
+    bridge_fw TEXT NOT NULL,
+    mcu_fw TEXT NOT NULL,
+    usb_mode TEXT NOT NULL,
+    serial TEXT,
+    job TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_speed_results_profile
+    ON speed_results (device_name, bridge_fw, mcu_fw, usb_mode, job, direction, metric, recorded_at);
+"""
+
+# (device_name, bridge_fw, mcu_fw, usb_mode)
+Profile = Tuple[str, str, str, str]
+
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def robust_score(value: float, baseline: List[float]) -> Tuple[float, float, Optional[float]]:
+    """
+    Compares a value with a baseline distribution.
+
+    Returns:
+        Tuple[float, float, Optional[float]]: (median, MAD, robust z-score). The
+        z-score is None when the MAD is zero, i.e. the baseline has no spread.
+    """
+    center = median(baseline)
+    mad = median([abs(v - center) for v in baseline])
+    if mad == 0:
+        return center, mad, None
+    return center, mad, (value - center) / (MAD_SCALE * mad)
+
+
+class SpeedBaselineStore:
+    """
+    SQLite-backed history of speed-test metrics per device profile.
+
+    The database is only opened on first use, so constructing a store is free.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_BASELINE_DB_PATH, window: int = SPEED_BASELINE_WINDOW,
+                 min_samples: int = SPEED_BASELINE_MIN_SAMPLES, z_threshold: float = SPEED_BASELINE_Z_THRESHOLD,
+                 min_change_pct: float = SPEED_BASELINE_MIN_CHANGE_PCT,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            db_path (str): SQLite file; created (with its directory) on first use.
+            window (int): Most recent results per metric that form the baseline.
+            min_samples (int): Baseline size required before regressions are flagged.
+            z_threshold (float): Robust z-score beyond which a change is significant.
+            min_change_pct (float): Smallest relative change (vs. the median) to flag.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.db_path = db_path
+        self.window = window
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.min_change_pct = min_change_pct
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @staticmethod
+    def _metric_values(job_results: Dict[str, FioJobResult]) -> List[Tuple[str, str, str, float]]:
+        """Flattens results into (job, direction, metric, value) rows for the tracked metrics."""
+        rows = []
+        for job_name, job_result in job_results.items():
+            for direction, direction_result in job_result.directions.items():
+                for metric in TRACKED_METRICS:
+                    value = getattr(direction_result, metric)
+                    if value is not None:
+                        rows.append((job_name, direction, metric, float(value)))
+        return rows
+
+    def history(self, profile: Profile, job: str, direction: str, metric: str) -> List[float]:
+        """The most recent `window` values for one profile/job/direction/metric, newest first."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT value FROM speed_results WHERE device_name = ? AND bridge_fw = ? AND mcu_fw = ? "
+                "AND usb_mode = ? AND job = ? AND direction = ? AND metric = ? "
+                "ORDER BY recorded_at DESC, id DESC LIMIT ?",
+                (*profile, job, direction, metric, self.window),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def record(self, profile: Profile, job_results: Dict[str, FioJobResult], serial: Optional[str] = None,
+               recorded_at: Optional[float] = None) -> int:
+        """
+        Appends a speed-test result to the profile's history.
+
+        Returns:
+            int: Number of metric rows written.
+        """
+        timestamp = recorded_at if recorded_at is not None else time.time()
+        rows = [(timestamp, *profile, serial, job, direction, metric, value)
+                for job, direction, metric, value in self._metric_values(job_results)]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO speed_results (recorded_at, device_name, bridge_fw, mcu_fw, usb_mode, serial, "
+                    "job, direction, metric, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return len(rows)
+
+    def check(self, profile: Profile, job_results: Dict[str, FioJobResult]) -> List[Dict[str, Any]]:
+        """
+        Compares a result with the profile's baseline, before it is recorded.
+
+        Returns:
+            List[Dict[str, Any]]: One entry per regressed metric with job, direction,
+            metric, value, baseline median, MAD, robust z-score (None when the
+            baseline has no spread), change_pct and the baseline sample count.
+        """
+        regressions = []
+        for job, direction, metric, value in self._metric_values(job_results):
+            baseline = self.history(profile, job, direction, metric)
+            if len(baseline) < self.min_samples:
+                continue
+            center, mad, z_score = robust_score(value, baseline)
+            if center == 0:
+                continue
+            change_pct = (value - center) / abs(center) * 100.0
+            higher_is_better = TRACKED_METRICS[metric]
+            worse = change_pct < 0 if higher_is_better else change_pct > 0
+            if not worse or abs(change_pct) < self.min_change_pct:
+                continue
+            if z_score is not None and abs(z_score) < self.z_threshold:
+                continue
+            regressions.append({
+                "job": job,
+                "direction": direction,
+                "metric": metric,
+                "value": value,
+                "median": center,
+                "mad": mad,
+                "robust_z": round(z_score, 2) if z_score is not None else None,
+                "change_pct": round(change_pct, 2),
+                "samples": len(baseline),
+            })
+        return regressions
+
+    def check_and_record(self, profile: Profile, job_results: Dict[str, FioJobResult],
+                         serial: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Checks a result against the baseline, then adds it to the history."""
+        regressions = self.check(profile, job_results)
+        self.record(profile, job_results, serial=serial)
+        return regressions
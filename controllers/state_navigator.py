@@ -0,0 +1,241 @@
+# Directory: controllers
+# Filename: state_navigator.py
+#!/usr/bin/env python3
+
+# Shortest-path planning over the ApricornDeviceFSM transition table. The
+# transition list is turned into a weighted graph: a transition is an edge when
+# its conditions hold for the current DeviceUnderTest model, and its weight is
+# the median of the measured durations of that trigger from that state (or a
+# default until it has been measured). Dijkstra then gives the cheapest trigger
+# path to a target state, so block orientation can be one lock press instead of
+# a full reset plus key generation. Resets are left out of the graph on purpose;
+# the FSM falls back to them when no path exists.
+
+import heapq
+import logging
+import os
+import statistics
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+module_logger = logging.getLogger(__name__)
+
+# Measured durations kept per (source, trigger); the weight is their median.
+try:
+    TRANSITION_COST_WINDOW = int(os.environ.get("TRANSITION_COST_WINDOW", "20"))
+except (TypeError, ValueError):
+    TRANSITION_COST_WINDOW = 20
+
+# Rough hardware times in seconds, used until a transition has been measured.
+DEFAULT_TRANSITION_COST_SEC: Dict[str, float] = {
+    "power_on": 8.0,
+    "power_off": 1.0,
+    "lock_admin": 2.0,
+    "lock_user": 2.0,
+    "lock_reset": 3.0,
+    "unlock_admin": 12.0,
+    "unlock_user": 12.0,
+    "admin_mode_login": 6.0,
+    "exit_enroll_pin": 2.0,
+    "exit_enroll_counter": 2.0,
+    "user_reset": 45.0,
+    "manufacturer_reset": 60.0,
+}
+DEFAULT_COST_SEC = 5.0
+
+# Triggers the navigator never fires: resets (the fallback, not a step), anything that
+# needs caller input (PINs, counters, a user slot), anything that spends brute-force
+# attempts or destroys data, and transitions that only move the model without a
+# hardware action.
+NAVIGATION_EXCLUDED_TRIGGERS: Set[str] = {
+    "user_reset", "manufacturer_reset",
+    "enroll_admin", "enroll_user", "enroll_recovery", "enroll_self_destruct", "enroll_pin",
+    "enroll_brute_force_counter", "enroll_unattended_auto_lock_counter", "enroll_min_pin_counter",
+    "enroll_counter", "timeout_enroll_pin", "timeout_enroll_counter",
+    "unlock_user", "self_destruct", "fail_unlock", "last_try_login", "admin_recovery_failed",
+    "enter_diagnostic_mode", "exit_diagnostic_mode",
+}
+
+# Triggers the FSM fires itself from an on_enter callback. An edge into their source
+# state continues straight on to their destination.
+AUTOMATIC_TRIGGERS: Set[str] = {"post_pass"}
+
+# (trigger, destination state)
+Step = Tuple[str, str]
+
+
+class TransitionCostModel:
+    """Per (source, trigger) transition durations, measured as the FSM runs."""
+
+    def __init__(self, window: int = TRANSITION_COST_WINDOW):
+        self.window = max(1, int(window))
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, source: str, trigger: str, duration_s: float):
+        key = (source, trigger)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(max(0.0, float(duration_s)))
+
+    def cost(self, source: str, trigger: str) -> float:
+        """Median measured duration, or the trigger's default when it has not been measured."""
+        samples = self._samples.get((source, trigger))
+        if samples:
+            return statistics.median(samples)
+        return DEFAULT_TRANSITION_COST_SEC.get(trigger, DEFAULT_COST_SEC)
+
+    def measured(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """(source, trigger) -> count and median for every measured transition."""
+        return {key: {"count": len(samples), "median": statistics.median(samples)}
+                for key, samples in self._samples.items() if samples}
+
+
+class StateNavigator:
+    """
+    Plans the cheapest trigger path between FSM states.
+
+    The graph is rebuilt on every call to plan(), because the edges depend on the
+    DeviceUnderTest model (an enrolled admin PIN, provision lock, battery, ...)
+    and that changes as the test runs.
+    """
+
+    def __init__(self, transition_config: List[Dict[str, Any]], states: Iterable[str],
+                 cost_model: Optional[TransitionCostModel] = None,
+                 excluded_triggers: Optional[Set[str]] = None,
+                 model: Any = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            transition_config (List[Dict[str, Any]]): The FSM's transition list.
+            states (Iterable[str]): Every FSM state (used to expand a '*' source).
+            cost_model (Optional[TransitionCostModel]): Edge weights. Defaults to a new, unmeasured model.
+            excluded_triggers (Optional[Set[str]]): Triggers never used as a step.
+                Defaults to NAVIGATION_EXCLUDED_TRIGGERS.
+            model (Any): The FSM whose DUT model the conditions are evaluated against.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.transition_config = transition_config
+        self.states = list(states)
+        self.cost_model = cost_model if cost_model is not None else TransitionCostModel()
+        self.excluded_triggers = NAVIGATION_EXCLUDED_TRIGGERS if excluded_triggers is None else excluded_triggers
+        self.model = model
+
+    def conditions_hold(self, transition: Dict[str, Any]) -> bool:
+        """
+        Evaluates a transition's model conditions. Release-valve conditions perform the
+        hardware action itself, so they are assumed to pass rather than called.
+        """
+        for condition in transition.get("conditions", []):
+            if getattr(condition, "release_valve", False):
+                continue
+            holds_for = getattr(condition, "holds_for", None)
+            try:
+                if not (holds_for(self.model) if holds_for else condition(None)):
+                    return False
+            except Exception:
+                return False
+        return True
+
+    def _sources(self, transition: Dict[str, Any]) -> List[str]:
+        source = transition["source"]
+        if source == "*":
+            return self.states
+        return source if isinstance(source, list) else [source]
+
+    def _resolve(self, state: str, trigger: str) -> Optional[str]:
+        """The destination `trigger` reaches from `state` under the current model, like Machine picks it."""
+        for transition in self.transition_config:
+            if transition["trigger"] == trigger and state in self._sources(transition) and self.conditions_hold(transition):
+                return transition["dest"]
+        return None
+
+    def sources_for(self, trigger: str) -> List[str]:
+        """States `trigger` can currently be fired from."""
+        return [state for state in self.states if self._resolve(state, trigger) is not None]
+
+    def _follow_automatic(self, state: str) -> str:
+        seen = {state}
+        while True:
+            for trigger in AUTOMATIC_TRIGGERS:
+                dest = self._resolve(state, trigger)
+                if dest and dest not in seen:
+                    break
+            else:
+                return state
+            seen.add(dest)
+            state = dest
+
+    def destination(self, state: str, trigger: str) -> Optional[str]:
+        """Where `trigger` currently leads from `state`, after any automatic follow-on transition."""
+        dest = self._resolve(state, trigger)
+        return self._follow_automatic(dest) if dest is not None else None
+
+    def edges(self, include_self_loops: bool = False) -> Dict[str, List[Tuple[float, str, str]]]:
+        """
+        state -> (cost, trigger, destination) for every trigger the navigator may fire right now.
+
+        Args:
+            include_self_loops (bool): Keep triggers that end where they started (the
+                admin-mode toggles). They never shorten a path, so plan() leaves them out.
+        """
+        graph: Dict[str, List[Tuple[float, str, str]]] = {state: [] for state in self.states}
+        seen: Set[Tuple[str, str]] = set()
+        for transition in self.transition_config:
+            trigger = transition["trigger"]
+            if trigger in self.excluded_triggers or trigger in AUTOMATIC_TRIGGERS:
+                continue
+            for source in self._sources(transition):
+                if (source, trigger) in seen:
+                    continue
+                seen.add((source, trigger))
+                dest = self.destination(source, trigger)
+                # A '*' transition back into its own source (power_off while OFF) is not a real step.
+                if dest is None or (dest == source and (not include_self_loops or transition["source"] == "*")):
+                    continue
+                graph.setdefault(source, []).append((self.cost_model.cost(source, trigger), trigger, dest))
+        return graph
+
+    def plan(self, source: str, targets: Iterable[str]) -> Optional[List[Step]]:
+        """
+        Finds the cheapest trigger path from `source` to any of `targets` (Dijkstra).
+
+        Returns:
+            Optional[List[Step]]: (trigger, destination) steps, empty when `source` is
+            already a target, or None when no target is reachable without a reset.
+        """
+        targets = set(targets)
+        if source in targets:
+            return []
+        graph = self.edges()
+        best: Dict[str, float] = {source: 0.0}
+        previous: Dict[str, Tuple[str, str]] = {}
+        queue: List[Tuple[float, str]] = [(0.0, source)]
+        while queue:
+            cost, state = heapq.heappop(queue)
+            if cost > best.get(state, float("inf")):
+                continue
+            if state in targets:
+                path: List[Step] = []
+                while state != source:
+                    prior, trigger = previous[state]
+                    path.append((trigger, state))
+                    state = prior
+                path.reverse()
+                return path
+            for edge_cost, trigger, dest in graph.get(state, []):
+                new_cost = cost + edge_cost
+                if new_cost < best.get(dest, float("inf")):
+                    best[dest] = new_cost
+                    previous[dest] = (state, trigger)
+                    heapq.heappush(queue, (new_cost, dest))
+        return None
+
+    def path_cost(self, source: str, path: List[Step]) -> float:
+        """Expected duration of `path` in seconds, starting from `source`."""
+        total = 0.0
+        state = source
+        for trigger, dest in path:
+            total += self.cost_model.cost(state, trigger)
+            state = dest
+        return total
@@ -0,0 +1,335 @@
+# Directory: controllers
+# Filename: transition_profiler.py
+#!/usr/bin/env python3
+
+# Per-transition latency profiling. A stress iteration takes 40-90 s and the
+# state-change log only says which transitions ran, not where the time went.
+# The profiler times every trigger from entry to finalize, and inside it every
+# 'before' callback, condition, release valve, on_enter_* callback and the
+# hardware waits the UnifiedController does on their behalf (LED checks,
+# enumeration checks, fio). Durations go into per-trigger, per-phase histograms
+# for the session summary, and every span is kept as a Chrome trace event so a
+# run can be opened in chrome://tracing or Perfetto as a flame chart.
+#
+# The Machine is instrumented by wrapping its resolve_callable(): transitions
+# resolves every callback and condition through it, so no callback has to know
+# it is being timed. Profiling is off unless TRANSITION_PROFILER_ENABLED=true.
+
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .clock import get_clock
+from .fio_results import percentile
+
+module_logger = logging.getLogger(__name__)
+
+TRANSITION_PROFILER_ENABLED = os.environ.get("TRANSITION_PROFILER_ENABLED", "false").lower() == "true"
+
+# Chrome trace events kept in memory; spans past the limit still feed the histograms.
+try:
+    TRANSITION_PROFILER_MAX_EVENTS = int(os.environ.get("TRANSITION_PROFILER_MAX_EVENTS", "200000"))
+except (TypeError, ValueError):
+    TRANSITION_PROFILER_MAX_EVENTS = 200000
+
+# Upper bucket edges in seconds; a final open bucket catches everything slower.
+HISTOGRAM_BUCKETS_SEC: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+DEFAULT_TRACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+# Phase names. A hardware wait is recorded as "wait:<method name>".
+PHASE_TRIGGER = "trigger"
+PHASE_BEFORE = "before"
+PHASE_CONDITION = "condition"
+PHASE_RELEASE_VALVE = "release_valve"
+PHASE_ON_ENTER = "on_enter"
+PHASE_ON_EXIT = "on_exit"
+PHASE_AFTER = "after"
+PHASE_WAIT = "wait"
+
+# Key for spans that run outside any trigger (e.g. a wait called directly by a script).
+NO_TRIGGER = "-"
+
+
+class TransitionProfiler:
+    """
+    Collects timed spans per thread and aggregates them per (trigger, phase).
+
+    Spans nest: a span belongs to the innermost trigger open on its thread, so the
+    callbacks of post_pass (fired from on_enter_POWER_ON_SELF_TEST) are counted
+    under post_pass, while power_on's trigger span still covers all of it.
+    """
+
+    def __init__(self, enabled: bool = True, max_events: int = TRANSITION_PROFILER_MAX_EVENTS,
+                 buckets: Tuple[float, ...] = HISTOGRAM_BUCKETS_SEC,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            enabled (bool): When False, span() and instrument() do nothing.
+            max_events (int): Chrome trace events kept in memory.
+            buckets (Tuple[float, ...]): Histogram bucket upper edges in seconds.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.enabled = enabled
+        self.max_events = max(0, int(max_events))
+        self.buckets = tuple(sorted(buckets))
+        self.events: List[Dict[str, Any]] = []
+        self.dropped_events = 0
+        self._durations: Dict[Tuple[str, str], List[float]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = get_clock().monotonic()
+
+    # --- Spans ---
+    def _stack(self) -> List[Tuple[str, str, float]]:
+        """(phase, name, start) of the spans open on the calling thread."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _current_trigger(self) -> str:
+        for phase, name, _ in reversed(self._stack()):
+            if phase == PHASE_TRIGGER:
+                return name
+        return NO_TRIGGER
+
+    def _open(self, phase: str, name: str) -> None:
+        self._stack().append((phase, name, get_clock().monotonic()))
+
+    def _close(self, args: Optional[Dict[str, Any]] = None) -> None:
+        stack = self._stack()
+        if not stack:
+            return
+        phase, name, start = stack.pop()
+        duration = max(0.0, get_clock().monotonic() - start)
+        trigger = name if phase == PHASE_TRIGGER else self._current_trigger()
+        key = (trigger, f"{PHASE_WAIT}:{name}" if phase == PHASE_WAIT else phase)
+        thread = threading.current_thread()
+        event = {
+            "name": name, "cat": phase, "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 3), "dur": round(duration * 1e6, 3),
+            "pid": os.getpid(), "tid": thread.ident,
+            "args": dict(args or {}, trigger=trigger),
+        }
+        with self._lock:
+            self._durations.setdefault(key, []).append(duration)
+            self._thread_names.setdefault(thread.ident, thread.name)
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            else:
+                self.dropped_events += 1
+
+    @contextmanager
+    def span(self, name: str, phase: str, **args: Any) -> Iterator[None]:
+        """
+        Times the enclosed block as one span.
+
+        Args:
+            name: Span name (callback, condition or method name).
+            phase: One of the PHASE_* names.
+            **args: Extra details stored with the Chrome trace event.
+        """
+        if not self.enabled:
+            yield
+            return
+        self._open(phase, name)
+        try:
+            yield
+        finally:
+            self._close(args)
+
+    def timed(self, func: Callable[..., Any], name: str, phase: str) -> Callable[..., Any]:
+        """Returns `func` wrapped in a span."""
+        @functools.wraps(func)
+        def _timed(*args: Any, **kwargs: Any) -> Any:
+            with self.span(name, phase):
+                return func(*args, **kwargs)
+        return _timed
+
+    # --- Machine instrumentation ---
+    def _begin_trigger(self, event_data: Any) -> None:
+        # Kept on the EventData: finalize callbacks also run for triggers that were
+        # invalid in the current state, which never ran the prepare callbacks.
+        event_data.profiler_source = event_data.state.name if event_data.state else None
+        self._open(PHASE_TRIGGER, event_data.event.name)
+
+    def _end_trigger(self, event_data: Any) -> None:
+        if not hasattr(event_data, "profiler_source"):
+            return
+        self._close({"source": event_data.profiler_source, "ok": bool(event_data.result)})
+
+    @staticmethod
+    def phase_of(func: Any, event_data: Any) -> Optional[str]:
+        """
+        The phase a callback resolved by the Machine belongs to, or None for the
+        Machine's own bookkeeping callbacks (prepare/finalize), which are not timed.
+        """
+        if getattr(func, "release_valve", False):
+            return PHASE_RELEASE_VALVE
+        transition = getattr(event_data, "transition", None)
+        if transition is not None:
+            if func in transition.before:
+                return PHASE_BEFORE
+            if func in transition.after:
+                return PHASE_AFTER
+            if any(condition.func is func for condition in transition.conditions):
+                return PHASE_CONDITION
+        machine = event_data.machine
+        if func in machine.before_state_change:
+            return PHASE_BEFORE
+        if func in machine.after_state_change:
+            return PHASE_AFTER
+        if isinstance(func, str):
+            if func.startswith("on_enter_"):
+                return PHASE_ON_ENTER
+            if func.startswith("on_exit_"):
+                return PHASE_ON_EXIT
+        return None
+
+    def instrument(self, machine: Any) -> None:
+        """
+        Times every trigger, callback and condition `machine` runs from now on.
+
+        A machine shared by several FSMs follows the current profiler: instrumenting
+        it moves it over from the profiler that instrumented it before, and a disabled
+        profiler only removes that instrumentation.
+        """
+        previous = getattr(machine, "_transition_profiler", None)
+        if previous is self:
+            return
+        if previous is not None:
+            previous.uninstrument(machine)
+        if not self.enabled:
+            return
+        resolve = machine.resolve_callable
+
+        def resolve_callable(func: Any, event_data: Any) -> Callable[..., Any]:
+            resolved = resolve(func, event_data)
+            phase = self.phase_of(func, event_data)
+            if phase is None:
+                return resolved
+            name = func if isinstance(func, str) else getattr(func, "__name__", repr(func))
+            return self.timed(resolved, name, phase)
+
+        # resolve_callable is a staticmethod on Machine; the instance attribute shadows it
+        # for Machine.callback() and Condition.check() alike.
+        machine.resolve_callable = resolve_callable
+        machine.prepare_event = [self._begin_trigger] + list(machine.prepare_event)
+        machine.finalize_event = list(machine.finalize_event) + [self._end_trigger]
+        machine._transition_profiler = self
+
+    def uninstrument(self, machine: Any) -> None:
+        """Undoes instrument(): `machine` runs its callbacks untimed again."""
+        if getattr(machine, "_transition_profiler", None) is not self:
+            return
+        del machine.resolve_callable
+        machine.prepare_event = [func for func in machine.prepare_event if func != self._begin_trigger]
+        machine.finalize_event = [func for func in machine.finalize_event if func != self._end_trigger]
+        del machine._transition_profiler
+
+    # --- Results ---
+    def histogram(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """trigger -> phase -> bucket label ('<=0.5', ..., '>120.0') -> count."""
+        labels = [f"<={edge}" for edge in self.buckets] + [f">{self.buckets[-1]}" if self.buckets else ">0"]
+        result: Dict[str, Dict[str, Dict[str, int]]] = {}
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._durations.items()]
+        for (trigger, phase), values in items:
+            counts = [0] * len(labels)
+            for value in values:
+                counts[bisect.bisect_left(self.buckets, value)] += 1
+            result.setdefault(trigger, {})[phase] = dict(zip(labels, counts))
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """trigger -> phase -> count, total, p50, p95 and max in seconds."""
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            items = [(key, sorted(values)) for key, values in self._durations.items()]
+        for (trigger, phase), values in items:
+            result.setdefault(trigger, {})[phase] = {
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": values[-1],
+            }
+        return result
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The recorded spans in Chrome trace-event format."""
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self._thread_names)
+            dropped = self.dropped_events
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in thread_names.items()]
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": dropped, "simulated_clock": get_clock().is_simulated},
+        }
+
+    def export_chrome_trace(self, path: Optional[str] = None) -> str:
+        """Writes chrome_trace() as JSON (default logs/transition_trace_<timestamp>.json). Returns the path."""
+        if path is None:
+            path = os.path.join(DEFAULT_TRACE_DIR, f"transition_trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.chrome_trace(), handle)
+        self.logger.info(f"Transition trace written to {path}")
+        return path
+
+    def reset(self) -> None:
+        """Drops every recorded span."""
+        with self._lock:
+            self.events = []
+            self.dropped_events = 0
+            self._durations = {}
+            self._thread_names = {}
+
+
+_profiler = TransitionProfiler(enabled=TRANSITION_PROFILER_ENABLED)
+
+
+def get_profiler() -> TransitionProfiler:
+    """The profiler the FSM and the controllers currently report to."""
+    return _profiler
+
+
+def set_profiler(profiler: Optional[TransitionProfiler]) -> TransitionProfiler:
+    """
+    Installs `profiler` as the shared profiler (None installs a disabled one).
+    Machines already instrumented keep reporting to the profiler they were given.
+
+    Returns:
+        TransitionProfiler: The previously installed profiler.
+    """
+    global _profiler
+    previous = _profiler
+    _profiler = profiler if profiler is not None else TransitionProfiler(enabled=False)
+    return previous
+
+
+def profiled_wait(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator for hardware waits: times each call as a 'wait' span on the shared profiler."""
+    @functools.wraps(func)
+    def _profiled(*args: Any, **kwargs: Any) -> Any:
+        profiler = _profiler
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        with profiler.span(func.__name__, PHASE_WAIT):
+            return func(*args, **kwargs)
+    return _profiled
@@ -7,14 +7,16 @@ import json
 import logging
 import sys
 import os
+import re
 import time
-from typing import Optional, List, Dict, Any, Union, Tuple, TYPE_CHECKING
+from typing import Optional, List, Dict, Any, Union, Tuple, Callable, TYPE_CHECKING
 import threading
 from pprint import pprint
 import subprocess
 import copy
 import textwrap
 import stat
+import tempfile
 
 # --- Path Setup ---
 CONTROLLERS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -30,6 +32,16 @@ DEFAULT_REPLAY_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "logs", "camera_replays")
 # Default size for the temporary FIO file used during Windows fallback testing.
 DEFAULT_FIO_FALLBACK_FILE_SIZE = os.environ.get('FIO_FALLBACK_FILE_SIZE') or '512M'
 
+# Speed-test engine: 'auto' runs fio and falls back to the built-in direct-I/O
+# engine when no fio binary ships for the host; 'fio' or 'native' force one of them.
+SPEED_TEST_ENGINE = os.environ.get("SPEED_TEST_ENGINE", "auto").strip().lower()
+
+# Default speed-test jobs, in fio job-option form.
+DEFAULT_SPEED_TESTS: List[Dict[str, Any]] = [
+    {'name': 'W-SEQ-1M-Q32', 'rw': 'write', 'bs': '1m', 'iodepth': 32},
+    {'name': 'R-SEQ-1M-Q32', 'rw': 'read', 'bs': '1m', 'iodepth': 32},
+]
+
 # Location of the packaged apricorn_usb_tool binaries.
 APRICORN_USB_TOOL_DIR = os.path.join(PROJECT_ROOT, "utils", "apricorn_usb_tool")
 try:
@@ -37,6 +49,18 @@ try:
 except (TypeError, ValueError):
     APRICORN_USB_TOOL_TIMEOUT_SEC = 5.0
 
+# Enumeration backend: 'auto' uses the in-process sysfs backend on Linux and the
+# apricorn_usb_tool elsewhere; 'sysfs' or 'tool' force one of them.
+APRICORN_USB_BACKEND = os.environ.get("APRICORN_USB_BACKEND", "auto").strip().lower()
+
+# Sampling period used while confirming enumeration stability with the USB watcher
+# running. Without it each sample runs the enumeration tool, so the bus is only
+# sampled when the stability window opens and once it has elapsed.
+try:
+    APRICORN_ENUM_SAMPLE_INTERVAL_SEC = float(os.environ.get("APRICORN_ENUM_SAMPLE_INTERVAL_SEC", "0.1"))
+except (TypeError, ValueError):
+    APRICORN_ENUM_SAMPLE_INTERVAL_SEC = 0.1
+
 try:
     from controllers.phidget_board import PhidgetController, DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG
     from controllers.logitech_webcam import (
@@ -45,6 +69,18 @@ try:
         DEFAULT_REPLAY_POST_FAIL_DURATION_SEC as CAMERA_DEFAULT_REPLAY_DURATION, 
     )
     from controllers.barcode_scanner import BarcodeScanner
+    from controllers.usb_watcher import UsbDeviceWatcher
+    from controllers.usb_sysfs import SysfsUsbBackend
+    from controllers.direct_io import DirectIOBenchmark, is_supported as direct_io_supported
+    from controllers.fio_results import FioJobResult
+    from controllers.data_integrity import DataIntegrityEngine
+    from controllers.linux_format import LinuxFormatPipeline
+    from controllers.fio_stream import FioStatusParser, AbortPolicy, default_abort_policies, FIO_STATUS_INTERVAL_SEC
+    from controllers.virtual_dut import (
+        VirtualApricornDevice, VirtualLedCamera, SimulatedPhidgetController, VIRTUAL_DUT_ENABLED,
+    )
+    from controllers.clock import get_clock, set_clock, SimulatedClock, SIMULATED_CLOCK_ENABLED
+    from controllers.transition_profiler import profiled_wait
     from Phidget22.PhidgetException import PhidgetException
     if TYPE_CHECKING: # pragma: no cover
         from controllers.finite_state_machine import DeviceUnderTest
@@ -161,7 +197,42 @@ def _parse_apricorn_usb_devices(raw_output: str) -> List[ApricornUSBDevice]:
     return parsed_devices
 
 
+_sysfs_backend: Optional["SysfsUsbBackend"] = None
+
+
+def _native_usb_backend() -> Optional["SysfsUsbBackend"]:
+    """
+    Return the shared sysfs backend when it should be used, else None.
+    """
+    global _sysfs_backend
+    if APRICORN_USB_BACKEND == "tool":
+        return None
+    if APRICORN_USB_BACKEND != "sysfs" and not sys.platform.startswith("linux"):
+        return None
+    if _sysfs_backend is None:
+        if not SysfsUsbBackend.is_available():
+            return None
+        _sysfs_backend = SysfsUsbBackend(logger_instance=module_logger.getChild("sysfs"))
+    return _sysfs_backend
+
+
 def find_apricorn_device() -> List[ApricornUSBDevice]:
+    """
+    Return the list of attached Apricorn devices.
+
+    Uses the in-process sysfs backend on Linux (static descriptors are cached
+    between calls) and falls back to the apricorn_usb_tool binary otherwise.
+    """
+    backend = _native_usb_backend()
+    if backend is not None:
+        try:
+            return [ApricornUSBDevice(record) for record in backend.enumerate()]
+        except Exception as exc:
+            module_logger.error("sysfs USB backend failed (%s); falling back to apricorn_usb_tool.", exc, exc_info=True)
+    return _run_apricorn_usb_tool()
+
+
+def _run_apricorn_usb_tool() -> List[ApricornUSBDevice]:
     """
     Execute the apricorn_usb_tool binary and return the list of discovered devices.
     """
@@ -220,6 +291,8 @@ class UnifiedController:
     _phidget_controller: Optional[PhidgetController]
     _camera_checker: Optional[LogitechLedChecker]
     _barcode_scanner: Optional[BarcodeScanner]
+    _usb_watcher: Optional[UsbDeviceWatcher]
+    virtual_dut: Optional[VirtualApricornDevice]
     logger: logging.Logger
     phidget_config_to_use: Dict[str, Any]
     effective_led_duration_tolerance: float
@@ -238,16 +311,54 @@ class UnifiedController:
                  replay_output_dir: Optional[str] = None,
                  enable_instant_replay: Optional[bool] = None,
                  skip_initial_scan: bool = False,
-                 scan_retry_delay_sec: Optional[float] = None):
+                 scan_retry_delay_sec: Optional[float] = None,
+                 virtual_dut: Union[bool, VirtualApricornDevice, None] = None,
+                 phidget_serial: Optional[int] = None,
+                 dut_serial: Optional[str] = None):
         self.logger = logger_instance if logger_instance else module_logger
         
         self._phidget_controller: Optional[PhidgetController] = None
         self._camera_checker: Optional[LogitechLedChecker] = None
         self._barcode_scanner: Optional[BarcodeScanner] = None
+        self._usb_watcher: Optional[UsbDeviceWatcher] = None
+        # Timing/flap details of the most recent confirm_device_enum/confirm_drive_enum call.
+        self.last_enum_result: Optional[Dict[str, Any]] = None
+        # Abort policies applied to streamed fio status samples (None: FIO_ABORT_* defaults).
+        self.fio_abort_policies: Optional[List[AbortPolicy]] = None
+        # Interval samples and abort reason of the most recent fio run.
+        self.last_fio_timeseries: List[Dict[str, Any]] = []
+        self.last_fio_abort_reason: Optional[str] = None
+        # Phase timings and outcome of the most recent _format_disk call.
+        self.last_format_result: Optional[Dict[str, Any]] = None
         self.scanned_serial_number: Optional[str] = None
         self.dut: Optional['DeviceUnderTest'] = None
         self.is_fully_initialized: bool = False
         self._keypad_layout: Optional[List[List[str]]] = None
+
+        # Hardware-free mode: the Phidget, camera and USB enumeration all talk to a
+        # simulated device. None follows VIRTUAL_DUT_ENABLED.
+        if virtual_dut is None:
+            virtual_dut = VIRTUAL_DUT_ENABLED
+        # Virtual time is only safe when nothing on the bench is real. The constructing
+        # thread becomes an actor right away so the camera thread cannot run ahead of it.
+        if virtual_dut and SIMULATED_CLOCK_ENABLED and not get_clock().is_simulated:
+            set_clock(SimulatedClock(logger_instance=self.logger.getChild("Clock")))
+            get_clock().register_actor()
+        if isinstance(virtual_dut, VirtualApricornDevice):
+            self.virtual_dut = virtual_dut
+        elif virtual_dut:
+            virtual_kwargs = {'serial_number': dut_serial} if dut_serial else {}
+            self.virtual_dut = VirtualApricornDevice(logger_instance=self.logger.getChild("VirtualDUT"), **virtual_kwargs)
+        else:
+            self.virtual_dut = None
+        # Enumeration backend; None resolves find_apricorn_device at call time.
+        self._usb_enumerate_fn: Optional[Callable[[], List[ApricornUSBDevice]]] = None
+        if self.virtual_dut:
+            device = self.virtual_dut
+            self._usb_enumerate_fn = lambda: [ApricornUSBDevice(record) for record in device.enumerate()]
+            device.add_enumeration_listener(self._on_virtual_enumeration)
+            self.logger.warning(f"Running against a virtual DUT ({device.device_name}, S/N {device.serial_number}).")
+
         # Control retry delay for barcode scanning (useful for tests)
         try:
             env_delay = float(os.environ.get("SCAN_RETRY_DELAY_SEC", "3"))
@@ -261,13 +372,24 @@ class UnifiedController:
 
         phidget_init_successful = False
         camera_init_successful = False
+        # A station on a multi-fixture host opens its own board rather than the first one found.
+        phidget_device_configs = {"main_phidget": {"serial_number": int(phidget_serial)}} if phidget_serial is not None else None
 
         # --- Initialize Phidget FIRST ---
         try:
-            self._phidget_controller = PhidgetController(
-                script_map_config=script_map_config or DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG,
-                logger_instance=self.logger.getChild("Phidget")
-            )
+            if self.virtual_dut:
+                self._phidget_controller = SimulatedPhidgetController(
+                    self.virtual_dut,
+                    script_map_config=script_map_config or DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG,
+                    device_configs=phidget_device_configs,
+                    logger_instance=self.logger.getChild("Phidget")
+                )
+            else:
+                self._phidget_controller = PhidgetController(
+                    script_map_config=script_map_config or DEFAULT_SCRIPT_CHANNEL_MAP_CONFIG,
+                    device_configs=phidget_device_configs,
+                    logger_instance=self.logger.getChild("Phidget")
+                )
             phidget_init_successful = True
         except Exception as e_phidget_init:
             self.logger.error(f"Failed to initialize PhidgetController: {e_phidget_init}", exc_info=True)
@@ -279,6 +401,8 @@ class UnifiedController:
         from .logitech_webcam import load_all_camera_settings, PRIMARY_LED_CONFIGURATIONS, ROI_SIZE_SECURE_KEYPAD, ROI_SIZE_STANDARD_KEYPAD
         
         camera_settings_to_apply, roi_positions, target_device_name, battery_present = load_all_camera_settings()
+        if self.virtual_dut:
+            target_device_name, battery_present = self.virtual_dut.device_name, self.virtual_dut.battery
         self.logger.debug(f"Loaded target device profile from config: '{target_device_name}'")
 
         # --- Initialize DUT to determine hardware properties ---
@@ -290,9 +414,14 @@ class UnifiedController:
                 'target_device_profile': target_device_name,
                 'power': battery_present 
             }
-            if skip_initial_scan:
+            if dut_serial:
+                self.logger.info(f"DUT serial number {dut_serial} given by the station configuration; skipping barcode scan.")
+                dut_kwargs['scanned_serial_number'] = dut_serial
+            elif skip_initial_scan:
                 self.logger.info("DUT initialization requested to skip initial barcode scan.")
                 dut_kwargs['scanned_serial_number'] = "SCAN_SKIPPED_BY_TOOL"
+            elif self.virtual_dut:
+                dut_kwargs['scanned_serial_number'] = self.virtual_dut.serial_number
             
             self.dut = DeviceUnderTest(**dut_kwargs)
 
@@ -335,7 +464,8 @@ class UnifiedController:
                 replay_output_dir=replay_output_dir or DEFAULT_REPLAY_OUTPUT_DIR,
                 enable_instant_replay=enable_instant_replay,
                 keypad_layout=self._keypad_layout,
-                camera_hw_settings=camera_settings_to_apply
+                camera_hw_settings=camera_settings_to_apply,
+                frame_source=VirtualLedCamera(self.virtual_dut, final_led_configs) if self.virtual_dut else None
             )
             # Ensure the replay output directory exists
             if self._camera_checker.replay_output_dir:
@@ -393,6 +523,18 @@ class UnifiedController:
     def wait_for_input(self, channel_name: str, expected_state: bool, timeout_s: float = 5, poll_interval_s: float = 0.05) -> bool:
         if not self._phidget_controller: self.logger.error("Phidget not init for 'wait_for_input'."); return False
         return self._phidget_controller.wait_for_input(channel_name, expected_state, timeout_s, poll_interval_s)
+    def last_actuation(self) -> Optional[Tuple[float, str, bool]]:
+        if not self._phidget_controller: return None
+        return self._phidget_controller.last_actuation()
+    def add_phidget_detach_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        if not self._phidget_controller: self.logger.error("Phidget not init for 'add_phidget_detach_listener'."); return
+        self._phidget_controller.add_detach_listener(callback)
+    def add_led_run_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        if not self._camera_checker: self.logger.error("Camera not init for 'add_led_run_listener'."); return
+        self._camera_checker.add_led_run_listener(callback)
+    def camera_stats(self) -> Optional[Dict[str, Any]]:
+        if not self._camera_checker: return None
+        return self._camera_checker.camera_stats()
     
     def scan_barcode(self) -> str:
         """
@@ -488,6 +630,15 @@ class UnifiedController:
     def is_camera_ready(self) -> bool:
         return self._camera_checker is not None and self._camera_checker.is_camera_initialized
 
+    def current_led_state(self) -> Dict[str, int]:
+        """The LED state detected in the most recent camera frame ({} if none is available)."""
+        checker = self._camera_checker
+        if checker is None or not checker.is_camera_initialized:
+            return {}
+        _, leds = checker._get_current_led_state_from_camera()
+        return leds
+
+    @profiled_wait
     def confirm_led_solid(self, state: dict, minimum: float = 2, timeout: float = 10,
                                  fail_leds: Optional[List[str]] = None, clear_buffer: bool = True, 
                                  manage_replay: bool = True, replay_extra_context: Optional[Dict[str, Any]] = None) -> bool:
@@ -498,6 +649,7 @@ class UnifiedController:
         return checker.confirm_led_solid(state, minimum, timeout, fail_leds, clear_buffer, 
                                          manage_replay=manage_replay, replay_extra_context=replay_extra_context)
 
+    @profiled_wait
     def confirm_led_solid_strict(self, state: dict, minimum: float, clear_buffer: bool = True, 
                                  manage_replay: bool = True, replay_extra_context: Optional[Dict[str, Any]] = None) -> bool:
         checker = self._camera_checker
@@ -507,6 +659,7 @@ class UnifiedController:
         return checker.confirm_led_solid_strict(state, minimum, clear_buffer, 
                                                 manage_replay=manage_replay, replay_extra_context=replay_extra_context)
 
+    @profiled_wait
     def await_led_state(self, state: dict, timeout: float = 1,
                                fail_leds: Optional[List[str]] = None, clear_buffer: bool = True, 
                                manage_replay: bool = True, replay_extra_context: Optional[Dict[str, Any]] = None) -> bool:
@@ -517,6 +670,7 @@ class UnifiedController:
         return checker.await_led_state(state, timeout, fail_leds, clear_buffer, 
                                        manage_replay=manage_replay, replay_extra_context=replay_extra_context)
 
+    @profiled_wait
     def confirm_led_pattern(self, pattern: list, clear_buffer: bool = True, 
                             manage_replay: bool = True, replay_extra_context: Optional[Dict[str, Any]] = None) -> bool:
         checker = self._camera_checker
@@ -526,6 +680,7 @@ class UnifiedController:
         return checker.confirm_led_pattern(pattern, clear_buffer, 
                                            manage_replay=manage_replay, replay_extra_context=replay_extra_context)
 
+    @profiled_wait
     def await_and_confirm_led_pattern(self, pattern: list, timeout: float,
                                              clear_buffer: bool = True, manage_replay: bool = True, replay_extra_context: Optional[Dict[str, Any]] = None) -> bool:
         checker = self._camera_checker
@@ -535,8 +690,78 @@ class UnifiedController:
         return checker.await_and_confirm_led_pattern(pattern, timeout, clear_buffer, 
                                                      manage_replay=manage_replay, replay_extra_context=replay_extra_context)
 
+    # --- USB Enumeration ---
+    def start_usb_watcher(self, **watcher_kwargs: Any) -> Optional[UsbDeviceWatcher]:
+        """
+        Starts the persistent USB device watcher. Once running, enumeration lookups
+        read its in-memory index instead of spawning the apricorn_usb_tool per call.
+
+        Args:
+            **watcher_kwargs: Passed through to UsbDeviceWatcher.
+
+        Returns:
+            Optional[UsbDeviceWatcher]: The running watcher, or None if it failed to start
+            or there is no sysfs to watch (Windows, macOS), where lookups keep running
+            the tool on demand.
+        """
+        if self._usb_watcher and self._usb_watcher.is_running:
+            return self._usb_watcher
+        if self.virtual_dut:
+            # The virtual device pushes its changes (see _on_virtual_enumeration).
+            watcher_kwargs.setdefault("use_uevents", False)
+        try:
+            watcher = UsbDeviceWatcher(
+                enumerate_fn=self._enumerate_backend,
+                logger_instance=self.logger.getChild("USB"),
+                **watcher_kwargs
+            )
+            if not (self.virtual_dut or watcher.has_sysfs):
+                # Nothing would tell the watcher that the bus changed; look devices up on demand instead.
+                self.logger.info("No sysfs USB device tree; USB devices are enumerated on demand.")
+                return None
+            self._usb_watcher = watcher
+            self._usb_watcher.start()
+        except Exception as e_watcher:
+            self.logger.error(f"Failed to start USB device watcher: {e_watcher}", exc_info=True)
+            self._usb_watcher = None
+        return self._usb_watcher
+
+    def stop_usb_watcher(self):
+        if self._usb_watcher:
+            self._usb_watcher.stop()
+            self._usb_watcher = None
+
+    def _enumerate_backend(self) -> List[ApricornUSBDevice]:
+        # Resolve find_apricorn_device at call time so the backend can be swapped/patched.
+        if self._usb_enumerate_fn is not None:
+            return self._usb_enumerate_fn()
+        return find_apricorn_device()
+
+    def _on_virtual_enumeration(self, _records: List[Dict[str, Any]]):
+        """Virtual DUT enumeration listener: refreshes the watcher index right away."""
+        if self._usb_watcher and self._usb_watcher.is_running:
+            self._usb_watcher.refresh()
+
+    def _enumerate_apricorn_devices(self) -> List[ApricornUSBDevice]:
+        """Returns the current device list from the watcher index, or a fresh tool run if no watcher is active."""
+        if self._usb_watcher and self._usb_watcher.is_running:
+            return self._usb_watcher.devices()
+        return self._enumerate_backend()
+
+    def get_usb_device(self, serial_number: str) -> Optional[ApricornUSBDevice]:
+        """Looks up a single device by iSerial."""
+        if self._usb_watcher and self._usb_watcher.is_running:
+            return self._usb_watcher.get(serial_number)
+        for device in self._enumerate_backend():
+            if device.iSerial == serial_number:
+                return device
+        return None
+
     # --- Resource Management ---
     def close(self):
+        if self._usb_watcher:
+            try: self.stop_usb_watcher()
+            except Exception as e: self.logger.error(f"Error stopping USB watcher: {e}", exc_info=True)
         if self._camera_checker and hasattr(self._camera_checker, 'release_camera'):
             try: self._camera_checker.release_camera()
             except Exception as e: self.logger.error(f"Error releasing camera: {e}", exc_info=True)
@@ -546,134 +771,238 @@ class UnifiedController:
     def __enter__(self): return self
     def __exit__(self, exc_type, exc_val, exc_tb): self.close()
 
-    def confirm_device_enum(self, serial_number: str, stable_min: float = 5, timeout: float = 15) -> Tuple[bool, Optional[Any]]:
+    @profiled_wait
+    def confirm_device_enum(self, serial_number: str, stable_min: float = 5, timeout: float = 15,
+                            sample_interval: Optional[float] = None, fail_on_flap: bool = True) -> Tuple[bool, Optional[Any]]:
         """
         Confirms a device is enumerated and stable in OOB/Standby mode (no data partition).
-        
+
+        See _await_stable_enumeration() for the sampling semantics. Timing and flap
+        details of the check are left in self.last_enum_result.
+
         Returns:
             A tuple containing:
             - bool: True if the device was found and stable, False otherwise.
             - Optional[ApricornDevice]: The device object if successful, else None.
         """
         self.logger.info(f"Confirming Device enumeration (stable: {stable_min}s, overall_timeout: {timeout}s)...")
-        overall_start_time = time.time()
-        
-        # Use find_apricorn_device and handle the case where it returns an empty list
-        devices = find_apricorn_device()
-        if not devices:
-            self.logger.warning("No device found on initial enum check.")
-            return False, None
-        
-        DUT_ping_1 = None
-        for device in devices:
-            if device.iSerial == serial_number:
-                DUT_ping_1 = device
-
-        if DUT_ping_1 == None:
-            self.logger.error(f"Could not match devices on bus with Serial Number...")
-            return False, None
-        
-        first_device_serial = DUT_ping_1.iSerial
-        if DUT_ping_1.driveSizeGB != "N/A (OOB Mode)":
-            self.logger.warning(f"Device volume is exposed! Expected OOB/Standby mode.")
-            return False, None
-        else:
-            self.logger.info(f"Initial device found with iSerial: {first_device_serial}. Verifying stability...")
-        
-        stability_wait_start = time.time()
-        while time.time() - stability_wait_start < stable_min:
-            if time.time() - overall_start_time > timeout:
-                self.logger.warning(f"Overall timeout ({timeout}s) reached while waiting for stability for device {first_device_serial}.")
-                return False, None
-            time.sleep(0.2)
-
-        devices_after_wait = find_apricorn_device()
-        if not devices_after_wait:
-            self.logger.warning(f"Device with iSerial {first_device_serial} disappeared after {time.time() - stability_wait_start:.2f}s stability wait.")
-            return False, None
-        
-        DUT_ping_2 = None
-        for device in devices_after_wait:
-            if device.iSerial == serial_number:
-                DUT_ping_2 = device
-
-        if DUT_ping_2 == None:
-            self.logger.error(f"Device is not stable on the bus...")
-            return False, None
-
-        if DUT_ping_2.driveSizeGB != "N/A (OOB Mode)":
-            self.logger.warning(f"Device volume became exposed during stability wait!")
-            pprint(DUT_ping_2)
-            return False, None
+        return self._await_stable_enumeration(serial_number, expect_exposed=False, stable_min=stable_min, timeout=timeout,
+                                              sample_interval=sample_interval, fail_on_flap=fail_on_flap)
 
-        self.logger.info(f"Device with iSerial {first_device_serial} confirmed stable for at least {stable_min}s:")
-        self.logger.info(f"  VID:PID  [Firm] @USB iSerial      iProduct")
-        self.logger.info(f" {DUT_ping_2.idVendor}:{DUT_ping_2.idProduct} [{DUT_ping_2.bcdDevice}] @{DUT_ping_2.bcdUSB} {DUT_ping_2.iSerial} {DUT_ping_2.iProduct}")
-        return True, DUT_ping_2
-    
-    def confirm_drive_enum(self, serial_number: str, stable_min: float = 5, timeout: float = 15) -> Tuple[bool, Optional[Any]]:
+    @profiled_wait
+    def confirm_drive_enum(self, serial_number: str, stable_min: float = 5, timeout: float = 15,
+                           sample_interval: Optional[float] = None, fail_on_flap: bool = True) -> Tuple[bool, Optional[Any]]:
         """
         Confirms a device's data partition is enumerated and stable.
-        
+
+        See _await_stable_enumeration() for the sampling semantics. Timing and flap
+        details of the check are left in self.last_enum_result.
+
         Returns:
             A tuple containing:
             - bool: True if the drive was found and stable, False otherwise.
             - Optional[ApricornDevice]: The device object if successful, else None.
         """
         self.logger.info(f"Confirming Drive enumeration (stable: {stable_min}s, overall_timeout: {timeout}s)...")
-        overall_start_time = time.time()
-        
-        devices = find_apricorn_device()
-        if not devices:
-            self.logger.warning("No device found on initial enum check.")
-            return False, None
-        
-        DUT_ping_1 = None
-        for device in devices:
-            if device.iSerial == serial_number:
-                DUT_ping_1 = device
+        return self._await_stable_enumeration(serial_number, expect_exposed=True, stable_min=stable_min, timeout=timeout,
+                                              sample_interval=sample_interval, fail_on_flap=fail_on_flap)
 
-        if DUT_ping_1 == None:
-            self.logger.error(f"Could not match devices on bus with Serial Number...")
-            return False, None
+    def _await_stable_enumeration(self, serial_number: str, expect_exposed: bool, stable_min: float, timeout: float,
+                                  sample_interval: Optional[float] = None, fail_on_flap: bool = True) -> Tuple[bool, Optional[Any]]:
+        """
+        Samples the bus until the target serial has been present in the expected mode
+        for `stable_min` seconds without interruption.
+
+        The target must be on the bus at the first sample; otherwise the check fails
+        right away. Any disappearance or mode change of the target after that is a
+        flap; by default a flap fails the check immediately. With fail_on_flap=False
+        the stability window restarts instead and the flap is counted.
+        When the USB watcher is running, samples are index reads taken every
+        APRICORN_ENUM_SAMPLE_INTERVAL_SEC, the loop returns as soon as the window is
+        satisfied, and a remove/re-add between two samples is still detected as a flap.
+        Without the watcher every sample runs the enumeration tool, so by default the
+        bus is sampled only when the window opens and again once it has elapsed.
 
-        first_device_serial = DUT_ping_1.iSerial
-        if DUT_ping_1.driveSizeGB == "N/A (OOB Mode)":
-            self.logger.warning(f"Device volume is not exposed!")
-            return False, None
+        Args:
+            serial_number (str): The iSerial to track.
+            expect_exposed (bool): True if the data volume must be exposed (drive mode),
+                False for OOB/Standby mode.
+            stable_min (float): Required continuous presence in the expected mode, in seconds.
+            timeout (float): Overall deadline for the stability window, including restarts.
+            sample_interval (Optional[float]): Seconds between samples. Defaults to
+                APRICORN_ENUM_SAMPLE_INTERVAL_SEC with the watcher, else `stable_min`.
+            fail_on_flap (bool): Fail immediately on a flap rather than restarting the window.
+
+        Returns:
+            Tuple[bool, Optional[ApricornUSBDevice]]: Success flag and the stable device record.
+        """
+        label = "Drive" if expect_exposed else "Device"
+        watcher = self._usb_watcher if (self._usb_watcher and self._usb_watcher.is_running) else None
+        if sample_interval is not None:
+            interval = sample_interval
         else:
-            self.logger.info(f"Initial device found with iSerial: {first_device_serial}. Verifying stability...")
-        
-        stability_wait_start = time.time()
-        while time.time() - stability_wait_start < stable_min:
-            if time.time() - overall_start_time > timeout:
-                self.logger.warning(f"Overall timeout ({timeout}s) reached while waiting for stability for device {first_device_serial}.")
-                return False, None
-            time.sleep(0.2)
-
-        devices_after_wait = find_apricorn_device()
-        if not devices_after_wait:
-            self.logger.warning(f"Device with iSerial {first_device_serial} disappeared after {time.time() - stability_wait_start:.2f}s stability wait.")
+            interval = APRICORN_ENUM_SAMPLE_INTERVAL_SEC if watcher else stable_min
+
+        start_time = get_clock().time()
+        first_seen_at: Optional[float] = None
+        stable_since: Optional[float] = None
+        watcher_first_seen: Optional[float] = None
+        other_serials: set = set()
+        result: Dict[str, Any] = {
+            'serial': serial_number, 'expected_mode': 'drive' if expect_exposed else 'oob', 'success': False,
+            'time_to_first_enum_s': None, 'stable_after_s': None, 'flap_count': 0, 'samples': 0, 'failure_reason': None,
+            'first_seen_time': None, 'block_device_seen_time': None,
+        }
+        self.last_enum_result = result
+
+        def _fail(reason: str) -> Tuple[bool, Optional[Any]]:
+            result['failure_reason'] = reason
             return False, None
-        
-        DUT_ping_2 = None
-        for device in devices_after_wait:
-            if device.iSerial == serial_number:
-                DUT_ping_2 = device
 
-        if DUT_ping_2 == None:
-            self.logger.error(f"Device is not stable on the bus...")
-            return False, None
-        
-        if DUT_ping_2.driveSizeGB == "N/A (OOB Mode)":
-            self.logger.warning(f"Device volume disappeared during stability wait!")
-            return False, None
+        while True:
+            now = get_clock().time()
+            generation = watcher.generation if watcher else 0
+            devices = self._enumerate_apricorn_devices() or []
+            result['samples'] += 1
+            device = None
+            sample_others = []
+            for candidate in devices:
+                if candidate.iSerial == serial_number:
+                    device = candidate
+                else:
+                    sample_others.append(candidate.iSerial)
+            other_serials.update(sample_others)
+
+            is_exposed = device is not None and device.driveSizeGB != "N/A (OOB Mode)"
+            in_expected_mode = device is not None and is_exposed == expect_exposed
+
+            # A remove/re-add between two samples shows up as a new first-seen time in the watcher index.
+            if watcher and stable_since is not None and in_expected_mode:
+                if watcher.first_seen(serial_number) != watcher_first_seen:
+                    in_expected_mode = False
+
+            if first_seen_at is None and device is None:
+                # Waiting out the timeout would not bring a device that has not enumerated at all.
+                if other_serials:
+                    self.logger.error(f"Could not match devices on bus with Serial Number {serial_number} (seen: {sorted(other_serials)}).")
+                    return _fail('no_match')
+                self.logger.warning("No device found on initial enum check.")
+                return _fail('not_found')
+            if first_seen_at is None:
+                first_seen_at = now
+                result['time_to_first_enum_s'] = now - start_time
+                # The watcher timestamps the add event itself, which is tighter than our sample time.
+                watcher_added = watcher.first_seen(serial_number) if watcher else None
+                result['first_seen_time'] = min(now, watcher_added) if watcher_added else now
+                if not in_expected_mode and fail_on_flap:
+                    if expect_exposed: self.logger.warning(f"Device volume is not exposed!")
+                    else: self.logger.warning(f"Device volume is exposed! Expected OOB/Standby mode.")
+                    return _fail('wrong_mode')
+                self.logger.info(f"Initial device found with iSerial: {serial_number} after {now - start_time:.2f}s. Verifying stability...")
+            if device is not None and result['block_device_seen_time'] is None and self._device_block_path(device):
+                result['block_device_seen_time'] = now
+
+            if in_expected_mode:
+                if stable_since is None:
+                    stable_since = now
+                    watcher_first_seen = watcher.first_seen(serial_number) if watcher else None
+                if now - stable_since >= stable_min:
+                    result['success'] = True
+                    result['stable_after_s'] = now - start_time
+                    self.logger.info(f"{label} with iSerial {serial_number} confirmed stable for at least {stable_min}s "
+                                     f"(first enum {result['time_to_first_enum_s']:.2f}s, total {now - start_time:.2f}s, flaps: {result['flap_count']}):")
+                    self.logger.info(f"  VID:PID  [Firm] @USB iSerial      iProduct")
+                    self.logger.info(f" {device.idVendor}:{device.idProduct} [{device.bcdDevice}] @{device.bcdUSB} {device.iSerial} {device.iProduct}")
+                    return True, device
+            elif stable_since is not None:
+                result['flap_count'] += 1
+                held = now - stable_since
+                if fail_on_flap:
+                    if device is None and sample_others:
+                        self.logger.error(f"Device is not stable on the bus: iSerial {serial_number} replaced by {sorted(sample_others)} after {held:.2f}s.")
+                        return _fail('replaced')
+                    if device is None:
+                        self.logger.warning(f"Device with iSerial {serial_number} disappeared after {held:.2f}s stability wait.")
+                        return _fail('disappeared')
+                    if is_exposed != expect_exposed:
+                        if is_exposed: self.logger.warning(f"Device volume became exposed during stability wait!")
+                        else: self.logger.warning(f"Device volume disappeared during stability wait!")
+                        return _fail('mode_changed')
+                    self.logger.warning(f"Device with iSerial {serial_number} re-enumerated during stability wait.")
+                    return _fail('reenumerated')
+                self.logger.warning(f"{label} with iSerial {serial_number} flapped after {held:.2f}s (flap #{result['flap_count']}). Restarting stability window.")
+                stable_since = None
+
+            elapsed = get_clock().time() - start_time
+            if elapsed >= timeout:
+                self.logger.warning(f"Overall timeout ({timeout}s) reached while waiting for stability for device {serial_number}.")
+                return _fail('timeout')
+
+            remaining = timeout - elapsed
+            if stable_since is not None:
+                remaining = min(remaining, stable_min - (get_clock().time() - stable_since))
+            wait_s = max(0.0, min(interval, remaining))
+            if watcher:
+                watcher.wait_for_change(generation, wait_s)
+            else:
+                get_clock().sleep(wait_s)
+
+    @staticmethod
+    def _device_block_path(device: Any) -> Optional[str]:
+        """Returns the host block device (or Windows physical drive) for a device record, if exposed."""
+        attr = 'physicalDriveNum' if sys.platform == 'win32' else 'blockDevice'
+        value = getattr(device, attr, None)
+        if value in (None, '') or str(value).startswith('N/A'):
+            return None
+        return str(value)
+
+    def _is_mounted(self, device: Any) -> bool:
+        """Checks whether a filesystem on the device is mounted and reachable by the host."""
+        if sys.platform == 'win32':
+            drive_letter = self._normalize_windows_drive_letter(getattr(device, 'driveLetter', None))
+            return bool(drive_letter) and os.path.isdir(f"{drive_letter}{os.sep}")
+        block_path = self._device_block_path(device)
+        if not block_path:
+            return False
+        if not block_path.startswith('/'):
+            block_path = f"/dev/{block_path}"
+        # The whole device or one of its partitions (sdb1, nvme0n1p1, disk4s1), never
+        # another device that merely shares the prefix (sdba, nvme0n12).
+        partition = r"(?:p\d+|s\d+)?" if block_path[-1].isdigit() else r"\d*"
+        source = re.compile(re.escape(block_path) + partition)
+        if sys.platform.startswith('linux'):
+            try:
+                with open('/proc/mounts', 'r') as mounts:
+                    return any(source.fullmatch(line.split(' ', 1)[0]) for line in mounts)
+            except OSError:
+                return False
+        try:
+            completed = subprocess.run(['mount'], capture_output=True, text=True, timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return any(source.fullmatch(line.split(' ', 1)[0]) for line in completed.stdout.splitlines() if line)
+
+    @profiled_wait
+    def wait_for_mount_ready(self, device: Any, timeout: float = 10.0, poll_interval_sec: float = 0.1) -> Optional[float]:
+        """
+        Waits until a filesystem on the device is mounted.
+
+        Args:
+            device: The device record returned by confirm_drive_enum.
+            timeout (float): Maximum time to wait, in seconds.
+            poll_interval_sec (float): Interval between mount checks.
+
+        Returns:
+            Optional[float]: The time.time() at which the mount was observed, or None on timeout.
+        """
+        deadline = get_clock().time() + max(0.0, timeout)
+        while True:
+            if self._is_mounted(device):
+                return get_clock().time()
+            if get_clock().time() >= deadline:
+                return None
+            get_clock().sleep(poll_interval_sec)
 
-        self.logger.info(f"Drive with iSerial {first_device_serial} confirmed stable for at least {stable_min}s:")
-        self.logger.info(f"  VID:PID  [Firm] @USB iSerial      iProduct")
-        self.logger.info(f" {DUT_ping_2.idVendor}:{DUT_ping_2.idProduct} [{DUT_ping_2.bcdDevice}] @{DUT_ping_2.bcdUSB} {DUT_ping_2.iSerial} {DUT_ping_2.iProduct}")
-        return True, DUT_ping_2
-    
     def _format_disk(
         self,
         device,
@@ -691,13 +1020,29 @@ class UnifiedController:
         - Requires Admin; partition must already exist.
 
         Linux:
-        - device: path to partition (str), e.g., "/dev/sdb1"
-        - Uses: mkfs.vfat -F 32
+        - device: path to disk or partition (str), e.g., "/dev/sdb" or "/dev/sdb1"
+        - Uses: LinuxFormatPipeline (partition detection, mkfs.vfat -F 32 tuned to
+          the device geometry, udev re-read wait, mount/write/read quick-verify)
 
         macOS:
         - device: path to disk/partition (str), e.g., "/dev/disk2s1"
         - Uses: diskutil eraseVolume FAT32
+
+        The outcome and per-phase timings are left in self.last_format_result
+        (see LinuxFormatPipeline.run; other platforms report a single 'format' phase).
         """
+        self.last_format_result = None
+        start = time.perf_counter()
+
+        def _record(passed: bool, error: Optional[str] = None) -> bool:
+            elapsed = round(time.perf_counter() - start, 3)
+            self.last_format_result = {
+                "device": str(device), "target": str(device), "fs_type": None, "partition_table": None,
+                "read_only": False, "phases": {"format": elapsed}, "reread_source": None, "total_s": elapsed,
+                "passed": passed, "failed_phase": None if passed else "format", "error": error,
+            }
+            return passed
+
         try:
             if sys.platform.startswith("win32"):
                 dn = str(device).strip()
@@ -751,22 +1096,23 @@ class UnifiedController:
                     ],
                     check=True,
                 )
-                return True
+                return _record(True)
 
             elif sys.platform.startswith("linux"):
-                subprocess.run(["mkfs.vfat", "-F", "32", "-n", label, str(device)], check=True)
-                return True
+                self.last_format_result = LinuxFormatPipeline(str(device), label=label, logger_instance=self.logger).run()
+                return self.last_format_result["passed"]
 
             elif sys.platform.startswith("darwin"):
                 subprocess.run(["diskutil", "eraseVolume", "FAT32", label, str(device)], check=True)
-                return True
+                return _record(True)
 
             else:
                 raise NotImplementedError(f"Unsupported platform: {sys.platform}")
 
         except Exception as e:
             self.logger.error("Disk format failed: %s", e, exc_info=True)
-            return False
+            return _record(False, str(e))
+
     def _get_fio_path(self) -> str:
         """
         Determines the correct path to the bundled FIO binary based on the OS.
@@ -800,56 +1146,193 @@ class UnifiedController:
 
         return fio_path
     
-    def _parse_fio_json_output(self, json_output: str) -> Optional[Dict[str, float]]:
-        """
-        Parses the JSON output from FIO to extract read and write bandwidth.
+    def _run_fio_process(
+        self,
+        command: List[str],
+        abort_policies: Optional[List[AbortPolicy]] = None,
+    ) -> subprocess.CompletedProcess:
+        '''
+        Runs fio, parsing its status reports on a reader thread as they arrive.
+
+        Every status document becomes a sample in last_fio_timeseries. After each
+        sample the abort policies are consulted; the first reason returned is
+        stored in last_fio_abort_reason and fio is terminated.
+
+        Args:
+            command: The full fio command line.
+            abort_policies: Policies to apply; defaults to fio_abort_policies, then
+                to the FIO_ABORT_* environment configuration.
+
+        Returns:
+            A CompletedProcess whose stdout is the last JSON document fio printed.
+
+        Raises:
+            FileNotFoundError: If the fio executable cannot be started.
+            subprocess.CalledProcessError: If fio exits non-zero without being aborted.
+        '''
+        if abort_policies is None:
+            abort_policies = self.fio_abort_policies if self.fio_abort_policies is not None else default_abort_policies()
+
+        parser = FioStatusParser(logger_instance=self.logger)
+        self.last_fio_timeseries = parser.samples
+        self.last_fio_abort_reason = None
+        stderr_chunks: List[str] = []
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+        def read_stdout() -> None:
+            for line in process.stdout:
+                for sample in parser.feed(line):
+                    self.logger.debug(
+                        'FIO %.1fs [%s]: %s MB/s, %s IOPS',
+                        sample['t'],
+                        sample['job'],
+                        sample['bw_mbps'],
+                        sample['iops'],
+                    )
+                    if self.last_fio_abort_reason:
+                        continue
+                    for policy in abort_policies:
+                        reason = policy(sample, parser.samples)
+                        if reason:
+                            self.last_fio_abort_reason = reason
+                            self.logger.warning('Aborting FIO: %s', reason)
+                            process.terminate()
+                            break
+
+        def read_stderr() -> None:
+            stderr_chunks.append(process.stderr.read())
+
+        readers = [
+            threading.Thread(target=read_stdout, name='fio-stdout', daemon=True),
+            threading.Thread(target=read_stderr, name='fio-stderr', daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        returncode = process.wait()
+        for reader in readers:
+            reader.join()
+
+        stdout_text = parser.last_document or ''
+        stderr_text = ''.join(stderr_chunks)
+        if returncode != 0 and not self.last_fio_abort_reason:
+            raise subprocess.CalledProcessError(returncode, command, output=stdout_text, stderr=stderr_text)
+        return subprocess.CompletedProcess(command, returncode, stdout=stdout_text, stderr=stderr_text)
+
+    def _write_fio_job_file(
+        self,
+        target: str,
+        duration: int,
+        tests_to_run: List[Dict[str, Any]],
+        default_size: Optional[str] = None,
+        existing_path: Optional[str] = None,
+    ) -> str:
+        '''
+        Writes an fio job file with one stonewall-separated job per test definition.
+
+        Args:
+            target: Device or file path every job runs against.
+            duration: Runtime in seconds for each job.
+            tests_to_run: Test definitions ('name', 'rw', 'bs', 'iodepth', optional 'size').
+            default_size: Size applied to jobs without their own 'size' (file-based targets).
+            existing_path: Job file to overwrite instead of creating a new one.
+
+        Returns:
+            The path of the written job file.
+        '''
+        # fio treats ':' as a filename separator, so drive letters must be escaped.
+        filename = target.replace(':', '\\:') if sys.platform == 'win32' else target
+
+        lines = ['[global]']
+        if sys.platform.startswith('linux'):
+            lines.append('ioengine=libaio')
+        elif sys.platform == 'win32':
+            lines.extend(['ioengine=windowsaio', 'thread'])
+        lines.extend([
+            'direct=1',
+            'random_generator=tausworthe64',
+            f'filename={filename}',
+            f'runtime={duration}',
+        ])
+        if default_size:
+            lines.append(f'size={default_size}')
+
+        for test_params in tests_to_run:
+            lines.extend([
+                '',
+                f"[{test_params.get('name')}]",
+                'stonewall',
+                f"rw={test_params.get('rw')}",
+                f"bs={test_params.get('bs')}",
+                f"iodepth={test_params.get('iodepth')}",
+            ])
+            if test_params.get('size'):
+                lines.append(f"size={test_params['size']}")
+
+        if existing_path:
+            job_file_path = existing_path
+        else:
+            fd, job_file_path = tempfile.mkstemp(prefix='apricorn_fio_', suffix='.fio')
+            os.close(fd)
+        with open(job_file_path, 'w') as job_file:
+            job_file.write('\n'.join(lines) + '\n')
+        self.logger.debug('FIO job file %s:\n%s', job_file_path, '\n'.join(lines))
+        return job_file_path
+
+    def _load_fio_json(self, json_output: str) -> Optional[Dict[str, Any]]:
+        '''Extracts and decodes the JSON document from fio output, skipping any leading notes.'''
+        # FIO sometimes prints non-JSON warnings/notes before the actual JSON output.
+        # Find the start and end of the JSON object.
+        json_start = json_output.find('{')
+        json_end = json_output.rfind('}')
+
+        if json_start == -1 or json_end == -1:
+            self.logger.error("Could not find valid JSON start/end in FIO output.")
+            return None
+
+        # Extract only the JSON part
+        return json.loads(json_output[json_start : json_end + 1])
+
+    def _parse_fio_job_results(self, json_output: str) -> Optional[Dict[str, FioJobResult]]:
+        '''
+        Parses every job in an fio JSON document.
 
         Args:
             json_output: The string containing the FIO JSON data.
 
         Returns:
-            A dictionary with 'read' and/or 'write' keys and their speeds in MB/s,
-            or None if parsing fails.
-        """
+            Job name -> FioJobResult (bandwidth, IOPS, clat percentiles, runtime
+            and errors), or None if parsing fails or no job performed any I/O.
+        '''
         try:
-            # FIO sometimes prints non-JSON warnings/notes before the actual JSON output.
-            # Find the start and end of the JSON object.
-            json_start = json_output.find('{')
-            json_end = json_output.rfind('}')
-
-            if json_start == -1 or json_end == -1:
-                self.logger.error("Could not find valid JSON start/end in FIO output.")
+            data = self._load_fio_json(json_output)
+            if data is None:
                 return None
-
-            # Extract only the JSON part
-            clean_json_output = json_output[json_start : json_end + 1]
-            
-            data = json.loads(clean_json_output)
-            results = {}
-            # FIO output contains a list of jobs, we are interested in the first one.
-            if 'jobs' in data and data['jobs']:
-                job_result = data['jobs'][0]
-                
-                # Check for read results
-                if 'read' in job_result and job_result['read']['io_bytes'] > 0:
-                    bw_bytes = job_result['read']['bw_bytes']
-                    # Convert Bytes/sec to Megabytes/sec (1 MB = 1,000,000 bytes)
-                    results['read'] = round(bw_bytes / 1000**2, 2)
-
-                # Check for write results
-                if 'write' in job_result and job_result['write']['io_bytes'] > 0:
-                    bw_bytes = job_result['write']['bw_bytes']
-                    results['write'] = round(bw_bytes / 1000**2, 2)
-                
-                return results if results else None
-            else:
+            if not data.get('jobs'):
                 self.logger.warning("FIO JSON output is missing 'jobs' array.")
                 return None
-        except (json.JSONDecodeError, KeyError, IndexError) as e:
+            results: Dict[str, FioJobResult] = {}
+            for index, job in enumerate(data['jobs']):
+                job_result = FioJobResult.from_fio_json(job, default_name=f'job{index}')
+                if job_result.error or job_result.total_errors:
+                    self.logger.warning(
+                        "FIO job '%s' reported %s I/O error(s) (error code %s).",
+                        job_result.name,
+                        job_result.total_errors,
+                        job_result.error,
+                    )
+                results[job_result.name] = job_result
+            return results if any(r.has_io for r in results.values()) else None
+        except (json.JSONDecodeError, KeyError, IndexError, TypeError, ValueError) as e:
             self.logger.error(f"Failed to parse FIO JSON output: {e}", exc_info=True)
             return None
 
-
     def _has_admin_privileges(self) -> bool:
         '''Return True if the process is running with raw disk privileges.'''
         if sys.platform != 'win32':
@@ -1308,17 +1791,21 @@ class UnifiedController:
 
         return normalized_drive
 
+    @profiled_wait
     def run_fio_tests(
         self,
         disk_path: str,
         duration: int = 10,
         tests_to_run: Optional[List[Dict[str, Any]]] = None,
         drive_letter: Optional[str] = None,
-    ) -> Optional[Dict[str, float]]:
+    ) -> Optional[Dict[str, FioJobResult]]:
         '''
         Runs a series of specified FIO speed tests directly on the block device
         or via a file-based fallback when elevated privileges are unavailable.
 
+        All tests are written to one job file as stonewall-separated jobs and
+        run by a single fio invocation, so the device is opened once per call.
+
         Args:
             disk_path: Device path (e.g., '/dev/sdb' or 'PhysicalDrive1').
             duration: Runtime in seconds for each test.
@@ -1326,30 +1813,27 @@ class UnifiedController:
             drive_letter: Optional drive letter for Windows fallback testing.
 
         Returns:
-            Aggregated read/write results when successful; otherwise None.
+            Per-job FioJobResult objects keyed by job name when successful;
+            otherwise None.
         '''
         if tests_to_run is None:
             self.logger.debug('No specific tests provided, using default sequential R/W tests.')
-            tests_to_run = [
-                {
-                    'name': 'W-SEQ-1M-Q32',
-                    'rw': 'write',
-                    'bs': '1m',
-                    'iodepth': 32,
-                },
-                {
-                    'name': 'R-SEQ-1M-Q32',
-                    'rw': 'read',
-                    'bs': '1m',
-                    'iodepth': 32,
-                },
-            ]
+            tests_to_run = copy.deepcopy(DEFAULT_SPEED_TESTS)
+
+        if SPEED_TEST_ENGINE == 'native':
+            return self.run_direct_io_tests(disk_path, duration=duration, tests_to_run=tests_to_run)
 
         self.logger.debug('Starting FIO speed test sequence for %ss each.', duration)
 
         try:
             fio_path = self._get_fio_path()
-        except (FileNotFoundError, NotImplementedError) as exc:
+        except FileNotFoundError as exc:
+            if SPEED_TEST_ENGINE != 'fio' and sys.platform != 'win32' and direct_io_supported():
+                self.logger.warning('%s Falling back to the built-in direct I/O engine.', exc)
+                return self.run_direct_io_tests(disk_path, duration=duration, tests_to_run=tests_to_run)
+            self.logger.error('Cannot run FIO tests: %s', exc)
+            raise
+        except NotImplementedError as exc:
             self.logger.error('Cannot run FIO tests: %s', exc)
             raise
 
@@ -1453,159 +1937,153 @@ class UnifiedController:
                 fio_target_device,
             )
 
-        combined_results: Dict[str, float] = {}
+        job_names = [test_params.get('name') for test_params in tests_to_run]
+        job_results: Dict[str, FioJobResult] = {}
+        job_file_path: Optional[str] = None
         try:
-            for test_params in tests_to_run:
-                self.logger.debug('--- Preparing FIO test: %s ---', test_params.get('name', 'Unnamed'))
-
-                attempt = 0
-                while attempt < 2:
-                    attempt += 1
-
-                    base_command = [fio_path]
-
-                    # Add sudo for macOS
-                    if sys.platform == 'darwin':
-                        base_command.insert(0, 'sudo') # Prepend sudo
-
-                    if sys.platform.startswith('linux'):
-                        base_command.extend(['--ioengine=libaio'])
-                    elif sys.platform == 'win32':
-                        base_command.extend(['--ioengine=windowsaio', '--thread'])
-
-                    base_command.extend([
-                        '--direct=1',
-                        '--output-format=json',
-                        '--random_generator=tausworthe64',
-                        f'--filename={fio_target_device}',
-                        f'--runtime={duration}',
-                        f"--name={test_params.get('name')}",
-                        f"--rw={test_params.get('rw')}",
-                        f"--bs={test_params.get('bs')}",
-                        f"--iodepth={test_params.get('iodepth')}",
-                        '--group_reporting',
-                    ])
-
-                    requested_size = test_params.get('size')
-                    if requested_size:
-                        base_command.append(f'--size={requested_size}')
-                    elif using_temp_file: # Always add fallback size if using a temp file
-                        base_command.append(f'--size={fallback_file_size}')
+            attempt = 0
+            while attempt < 2:
+                attempt += 1
+
+                job_file_path = self._write_fio_job_file(
+                    target=fio_target_device,
+                    duration=duration,
+                    tests_to_run=tests_to_run,
+                    default_size=fallback_file_size if using_temp_file else None,
+                    existing_path=job_file_path,
+                )
 
-                    self.logger.debug(
-                        'Executing FIO command (attempt %s): %s',
-                        attempt,
-                        ' '.join(base_command),
+                base_command = [fio_path]
+
+                # Add sudo for macOS
+                if sys.platform == 'darwin':
+                    base_command.insert(0, 'sudo') # Prepend sudo
+
+                base_command.append('--output-format=json')
+                if FIO_STATUS_INTERVAL_SEC > 0:
+                    base_command.append(f'--status-interval={FIO_STATUS_INTERVAL_SEC}')
+                base_command.append(job_file_path)
+
+                self.logger.debug(
+                    'Executing FIO job file (attempt %s) with %s job(s): %s',
+                    attempt,
+                    len(tests_to_run),
+                    ', '.join(job_names),
+                )
+
+                try:
+                    result = self._run_fio_process(base_command)
+                except FileNotFoundError:
+                    self.logger.error("FIO command not found at '%s'.", fio_path)
+                    raise
+                except subprocess.CalledProcessError as exc:
+                    stderr_text = exc.stderr or ""
+                    stdout_text = getattr(exc, 'stdout', '') or ''
+
+                    can_retry_with_file = (
+                        sys.platform == 'win32'
+                        and not using_temp_file
+                        and disk_number_for_mount is not None
+                        and any(
+                            token in stderr_text.lower()
+                            for token in ('permission denied', 'access is denied', 'failed to open')
+                        )
                     )
 
-                    try:
-                        result = subprocess.run(
-                            base_command,
-                            check=True,
-                            capture_output=True,
-                            text=True,
+                    if can_retry_with_file:
+                        self.logger.warning(
+                            "Raw FIO access to %s was denied; retrying using temporary file fallback.",
+                            fio_target_device,
                         )
-                    except FileNotFoundError:
-                        self.logger.error("FIO command not found at '%s'.", fio_path)
-                        raise
-                    except subprocess.CalledProcessError as exc:
-                        stderr_text = exc.stderr or ""
-                        stdout_text = getattr(exc, 'stdout', '') or ''
-
-                        can_retry_with_file = (
-                            sys.platform == 'win32'
-                            and not using_temp_file
-                            and disk_number_for_mount is not None
-                            and any(
-                                token in stderr_text.lower()
-                                for token in ('permission denied', 'access is denied', 'failed to open')
-                            )
+                        candidate_drive = self._select_fallback_drive_letter(
+                            disk_number=disk_number_for_mount,
+                            initial_letter=normalized_drive_letter,
                         )
 
-                        if can_retry_with_file:
-                            self.logger.warning(
-                                "Raw FIO access to %s was denied; retrying using temporary file fallback.",
-                                fio_target_device,
+                        if not candidate_drive:
+                            assigned_letter = self._ensure_windows_test_mount(
+                                disk_number=disk_number_for_mount,
+                                drive_letter=normalized_drive_letter,
+                                ensure_temp_dir=False,
                             )
                             candidate_drive = self._select_fallback_drive_letter(
                                 disk_number=disk_number_for_mount,
-                                initial_letter=normalized_drive_letter,
+                                initial_letter=assigned_letter,
                             )
 
-                            if not candidate_drive:
-                                assigned_letter = self._ensure_windows_test_mount(
-                                    disk_number=disk_number_for_mount,
-                                    drive_letter=normalized_drive_letter,
-                                    ensure_temp_dir=False,
-                                )
-                                candidate_drive = self._select_fallback_drive_letter(
-                                    disk_number=disk_number_for_mount,
-                                    initial_letter=assigned_letter,
-                                )
-
-                            temp_path = None
-                            if candidate_drive:
-                                temp_path = self._prepare_windows_fio_file(candidate_drive)
-
-                            if temp_path:
-                                normalized_drive_letter = candidate_drive
-                                temp_file_path = temp_path
-                                fio_target_device = temp_file_path
-                                using_temp_file = True
-                                continue
-
-                            self.logger.error(
-                                "Unable to establish a file-backed FIO target for disk %s.",
-                                disk_number_for_mount or disk_path,
-                            )
+                        temp_path = None
+                        if candidate_drive:
+                            temp_path = self._prepare_windows_fio_file(candidate_drive)
+
+                        if temp_path:
+                            normalized_drive_letter = candidate_drive
+                            temp_file_path = temp_path
+                            fio_target_device = temp_file_path
+                            using_temp_file = True
+                            continue
 
                         self.logger.error(
-                            "FIO test '%s' failed with exit code %s.",
-                            test_params.get('name'),
-                            exc.returncode,
+                            "Unable to establish a file-backed FIO target for disk %s.",
+                            disk_number_for_mount or disk_path,
                         )
+
+                    self.logger.error(
+                        "FIO job file (%s) failed with exit code %s.",
+                        ', '.join(job_names),
+                        exc.returncode,
+                    )
+                    self.logger.error(
+                        '  This can happen if the script is not run with administrator/root privileges.',
+                    )
+                    self.logger.error('  Stdout: %s', stdout_text)
+                    self.logger.error('  Stderr: %s', stderr_text)
+                    return None
+                except Exception as exc:  # pragma: no cover - defensive
+                    self.logger.error(
+                        "An unexpected error occurred while running FIO: %s",
+                        exc,
+                        exc_info=True,
+                    )
+                    return None
+                else:
+                    if self.last_fio_abort_reason:
                         self.logger.error(
-                            '  This can happen if the script is not run with administrator/root privileges.',
+                            'FIO job file (%s) aborted early: %s',
+                            ', '.join(job_names),
+                            self.last_fio_abort_reason,
                         )
-                        self.logger.error('  Stdout: %s', stdout_text)
-                        self.logger.error('  Stderr: %s', stderr_text)
                         return None
-                    except Exception as exc:  # pragma: no cover - defensive
+
+                    parsed_results = self._parse_fio_job_results(result.stdout)
+                    if not parsed_results:
                         self.logger.error(
-                            "An unexpected error occurred while running FIO: %s",
-                            exc,
-                            exc_info=True,
+                            "Failed to parse results for FIO jobs: %s",
+                            ', '.join(job_names),
                         )
                         return None
-                    else:
-                        parsed_result = self._parse_fio_json_output(result.stdout)
-                        if parsed_result:
-                            self.logger.debug(
-                                "--- FIO Test '%s' Result: %s MB/s",
-                                test_params.get('name'),
-                                parsed_result,
-                            )
-                            for key, value in parsed_result.items():
-                                combined_results[key] = combined_results.get(key, 0.0) + value
-                        else:
-                            self.logger.error(
-                                "Failed to parse results for FIO test '%s'.",
-                                test_params.get('name'),
-                            )
-                            return None
 
-                        if result.stderr:
-                            self.logger.warning('FIO Stderr: %s', result.stderr)
+                    missing_jobs = [name for name in job_names if name not in parsed_results]
+                    if missing_jobs:
+                        self.logger.warning('FIO reported no results for job(s): %s', ', '.join(missing_jobs))
 
-                        break
-            if 'read' in combined_results:
-                self.logger.info('Read: %s', combined_results['read'])
-            if 'write' in combined_results:
-                self.logger.info('Write: %s', combined_results['write'])
-            if combined_results:
+                    job_results = parsed_results
+
+                    if result.stderr:
+                        self.logger.warning('FIO Stderr: %s', result.stderr)
+
+                    break
+
+            for job_name, job_result in job_results.items():
+                self.logger.info('%s: %s', job_name, job_result.summary())
+            if job_results:
                 self.logger.info('FIO test sequence completed successfully.')
-            return combined_results if combined_results else None
+            return job_results if job_results else None
         finally:
+            if job_file_path:
+                try:
+                    os.remove(job_file_path)
+                except OSError:
+                    pass
             if using_temp_file and temp_file_path and os.path.exists(temp_file_path):
                 try:
                     os.remove(temp_file_path)
@@ -1620,6 +2098,98 @@ class UnifiedController:
                         cleanup_error,
                     )
 
+    @staticmethod
+    def _direct_io_target(disk_path: str) -> str:
+        '''Maps a DUT disk path to the node used for in-process direct I/O.'''
+        target = str(disk_path)
+        if sys.platform.startswith('darwin') and not os.path.isabs(target):
+            target = f'/dev/r{target}'  # Raw node avoids the buffer cache.
+        elif sys.platform == 'win32':
+            if target.isdigit():
+                target = f'PhysicalDrive{target}'
+            if target.lower().startswith('physicaldrive'):
+                target = f'\\\\.\\{target}'
+        return target
+
+    def run_data_integrity(
+        self,
+        disk_path: str,
+        operation: str,
+        seed: int,
+        size: Optional[str] = None,
+        offset: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        '''
+        Writes or verifies the seeded data-integrity pattern on the DUT.
+
+        Args:
+            disk_path: Device path ('/dev/sdb', 'disk4' on macOS, 'PhysicalDrive1' or '1'
+                on Windows) or a file path.
+            operation: 'write' or 'verify'.
+            seed: Pattern seed; verify must use the seed of the preceding write.
+            size: Optional region size (defaults to DATA_INTEGRITY_REGION_SIZE).
+            offset: Optional region start (defaults to DATA_INTEGRITY_OFFSET).
+
+        Returns:
+            The engine's result dict (see DataIntegrityEngine.verify), or None if
+            the pass could not be run.
+        '''
+        if operation not in ('write', 'verify'):
+            raise ValueError(f"Unknown data-integrity operation '{operation}'.")
+
+        target = self._direct_io_target(disk_path)
+        options: Dict[str, Any] = {}
+        if size:
+            options['size'] = size
+        if offset:
+            options['offset'] = offset
+        try:
+            engine = DataIntegrityEngine(target, seed, logger_instance=self.logger, **options)
+            return engine.write() if operation == 'write' else engine.verify()
+        except (OSError, ValueError) as exc:
+            self.logger.error('Data-integrity %s on %s failed: %s', operation, target, exc)
+            return None
+
+    @profiled_wait
+    def run_direct_io_tests(
+        self,
+        disk_path: str,
+        duration: int = 10,
+        tests_to_run: Optional[List[Dict[str, Any]]] = None,
+        size: Optional[str] = None,
+    ) -> Optional[Dict[str, FioJobResult]]:
+        '''
+        Runs the speed-test jobs with the built-in direct I/O engine instead of fio.
+
+        Args:
+            disk_path: Device path ('/dev/sdb', or 'disk4' on macOS) or a file path.
+            duration: Maximum runtime in seconds for each job.
+            tests_to_run: fio-style job definitions; defaults to sequential R/W.
+            size: Optional region size (e.g. '512M') to limit or preallocate.
+
+        Returns:
+            Per-job results keyed by job name, as returned by run_fio_tests,
+            when successful; otherwise None.
+        '''
+        if tests_to_run is None:
+            tests_to_run = copy.deepcopy(DEFAULT_SPEED_TESTS)
+
+        target = self._direct_io_target(disk_path)
+
+        self.last_fio_timeseries = []
+        self.last_fio_abort_reason = None
+        self.logger.debug('Starting direct I/O speed test sequence on %s for up to %ss each.', target, duration)
+        try:
+            results = DirectIOBenchmark(target, duration=duration, size=size, logger_instance=self.logger).run(tests_to_run)
+        except (OSError, ValueError, NotImplementedError) as exc:
+            self.logger.error('Direct I/O speed test on %s failed: %s', target, exc)
+            self.logger.error('  This can happen if the script is not run with administrator/root privileges.')
+            return None
+
+        for job_name, job_result in results.items():
+            self.logger.info('%s: %s', job_name, job_result.summary())
+        return results if results else None
+
     # --- FSM Event Handling Callbacks (High-Level) ---
     def handle_post_failure(self, event_data: Any) -> None: 
         details = event_data.kwargs.get('details', "No details provided") if event_data and hasattr(event_data, 'kwargs') else "No details provided"
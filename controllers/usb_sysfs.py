@@ -0,0 +1,153 @@
+# Directory: controllers
+# Filename: usb_sysfs.py
+#!/usr/bin/env python3
+
+# In-process Linux enumeration backend. Builds the same records the apricorn_usb_tool
+# reports (iSerial, driveSizeGB, blockDevice, ...) directly from sysfs, so no external
+# binary has to be spawned and parsed for every lookup.
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+module_logger = logging.getLogger(__name__)
+
+APRICORN_VENDOR_ID = "0984"
+OOB_DRIVE_SIZE = "N/A (OOB Mode)"
+SYSFS_ROOT = "/sys"
+
+# Descriptor attributes that never change while a device stays enumerated at the same
+# bus address; these are read once and cached between polls.
+_STATIC_ATTRIBUTES = {
+    "idVendor": "idVendor",
+    "idProduct": "idProduct",
+    "bcdDevice": "bcdDevice",
+    "bcdUSB": "version",
+    "iManufacturer": "manufacturer",
+    "iProduct": "product",
+    "iSerial": "serial",
+}
+
+
+def _read_attr(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as handle:
+            return handle.read().strip()
+    except OSError:
+        return None
+
+
+class SysfsUsbBackend:
+    """
+    Enumerates Apricorn devices from /sys/bus/usb/devices and /sys/block.
+
+    Records are plain dicts using the apricorn_usb_tool field names, so the
+    caller can wrap them exactly like parsed tool output.
+    """
+
+    def __init__(self, sysfs_root: str = SYSFS_ROOT, vendor_id: str = APRICORN_VENDOR_ID,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            sysfs_root (str): Mount point of sysfs. Tests point this at a fake tree.
+            vendor_id (str): USB vendor ID (hex, lowercase) to report.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self.sysfs_root = sysfs_root
+        self.usb_devices_dir = os.path.join(sysfs_root, "bus", "usb", "devices")
+        self.block_dir = os.path.join(sysfs_root, "block")
+        self.vendor_id = vendor_id.lower()
+        # (sysfs name, busnum, devnum) -> static descriptor fields + resolved device path.
+        self._descriptor_cache: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+
+    @staticmethod
+    def is_available(sysfs_root: str = SYSFS_ROOT) -> bool:
+        return os.path.isdir(os.path.join(sysfs_root, "bus", "usb", "devices"))
+
+    def _static_descriptor(self, name: str, device_dir: str) -> Dict[str, Any]:
+        busnum = _read_attr(os.path.join(device_dir, "busnum")) or ""
+        devnum = _read_attr(os.path.join(device_dir, "devnum")) or ""
+        key = (name, busnum, devnum)
+        cached = self._descriptor_cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        descriptor: Dict[str, Any] = {field: _read_attr(os.path.join(device_dir, attr)) or ""
+                                      for field, attr in _STATIC_ATTRIBUTES.items()}
+        descriptor["busNumber"] = busnum
+        descriptor["deviceAddress"] = devnum
+        descriptor["usbPath"] = name
+        descriptor["_realpath"] = os.path.realpath(device_dir)
+        # Drop stale entries for this port (device re-enumerated at a new address).
+        for stale_key in [k for k in self._descriptor_cache if k[0] == name]:
+            del self._descriptor_cache[stale_key]
+        self._descriptor_cache[key] = descriptor
+        return descriptor
+
+    def _block_devices(self) -> List[Tuple[str, str]]:
+        """Returns (block name, resolved sysfs path) for every disk in /sys/block."""
+        try:
+            names = os.listdir(self.block_dir)
+        except OSError:
+            return []
+        return [(name, os.path.realpath(os.path.join(self.block_dir, name))) for name in sorted(names)]
+
+    def _block_info(self, block_name: str) -> Dict[str, Any]:
+        block_path = os.path.join(self.block_dir, block_name)
+        sectors = _read_attr(os.path.join(block_path, "size"))
+        size_bytes = int(sectors) * 512 if sectors and sectors.isdigit() else 0
+        return {
+            "size_bytes": size_bytes,
+            "readOnly": _read_attr(os.path.join(block_path, "ro")) == "1",
+        }
+
+    def enumerate(self) -> List[Dict[str, Any]]:
+        """
+        Builds one record per attached device with the configured vendor ID.
+
+        A device with no block device, or a block device reporting zero size,
+        is in OOB/Standby mode and gets driveSizeGB 'N/A (OOB Mode)'.
+
+        Returns:
+            List[Dict[str, Any]]: Records with the apricorn_usb_tool field names.
+        """
+        try:
+            entries = sorted(os.listdir(self.usb_devices_dir))
+        except OSError as exc:
+            self.logger.error("Unable to read %s: %s", self.usb_devices_dir, exc)
+            return []
+
+        block_devices = None
+        records: List[Dict[str, Any]] = []
+        for name in entries:
+            if ":" in name:
+                continue  # Interface nodes carry no device descriptor.
+            device_dir = os.path.join(self.usb_devices_dir, name)
+            vendor = _read_attr(os.path.join(device_dir, "idVendor"))
+            if not vendor or vendor.lower() != self.vendor_id:
+                continue
+            descriptor = self._static_descriptor(name, device_dir)
+            if block_devices is None:
+                block_devices = self._block_devices()
+
+            prefix = descriptor["_realpath"] + os.sep
+            owned = [block for block, real in block_devices if real.startswith(prefix)]
+            record = {k: v for k, v in descriptor.items() if not k.startswith("_")}
+            record["deviceIndex"] = str(len(records) + 1)
+            record["blockDevice"] = "N/A"
+            record["driveSizeGB"] = OOB_DRIVE_SIZE
+            record["readOnly"] = False
+            for block in owned:
+                info = self._block_info(block)
+                if info["size_bytes"] <= 0:
+                    continue
+                record["blockDevice"] = f"/dev/{block}"
+                record["driveSizeGB"] = round(info["size_bytes"] / 1e9)
+                record["readOnly"] = info["readOnly"]
+                break
+            records.append(record)
+        return records
@@ -0,0 +1,331 @@
+# Directory: controllers
+# Filename: usb_watcher.py
+#!/usr/bin/env python3
+
+# Long-lived USB enumeration service. A single UsbDeviceWatcher keeps an in-memory
+# index of ApricornUSBDevice records keyed by iSerial, so lookups are dict reads
+# instead of one apricorn_usb_tool spawn per call. On Linux, kernel uevents and a
+# cheap sysfs signature decide when the enumeration backend actually needs to run.
+
+import glob
+import logging
+import os
+import select
+import socket
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from controllers.clock import get_clock
+
+module_logger = logging.getLogger(__name__)
+
+# USB vendor ID assigned to Apricorn, as reported by sysfs 'idVendor'.
+APRICORN_VENDOR_ID = "0984"
+
+SYSFS_USB_DEVICES_DIR = "/sys/bus/usb/devices"
+SYSFS_BLOCK_DIR = "/sys/block"
+
+# NETLINK_KOBJECT_UEVENT from <linux/netlink.h>; not exported by the socket module.
+NETLINK_KOBJECT_UEVENT = 15
+
+try:
+    USB_WATCHER_POLL_INTERVAL_SEC = float(os.environ.get("USB_WATCHER_POLL_INTERVAL_SEC", "0.25"))
+except (TypeError, ValueError):
+    USB_WATCHER_POLL_INTERVAL_SEC = 0.25
+
+try:
+    # Forced re-enumeration interval, even when sysfs reports no change.
+    USB_WATCHER_RESYNC_INTERVAL_SEC = float(os.environ.get("USB_WATCHER_RESYNC_INTERVAL_SEC", "30"))
+except (TypeError, ValueError):
+    USB_WATCHER_RESYNC_INTERVAL_SEC = 30.0
+
+# How many add/remove/change events are retained for inspection.
+USB_WATCHER_EVENT_HISTORY = 512
+
+
+class UsbDeviceWatcher:
+    """
+    Maintains an index of enumerated Apricorn devices and publishes add/remove/change events.
+
+    Each event is a dict with the keys 'type' ('add', 'remove' or 'change'),
+    'serial', 'device' (the ApricornUSBDevice, or the last known record on
+    remove), 'previous' (the prior record on change) and 'timestamp'
+    (time.time() of detection).
+    """
+
+    def __init__(self,
+                 enumerate_fn: Callable[[], List[Any]],
+                 poll_interval_sec: Optional[float] = None,
+                 resync_interval_sec: Optional[float] = None,
+                 use_uevents: bool = True,
+                 sysfs_usb_dir: str = SYSFS_USB_DEVICES_DIR,
+                 sysfs_block_dir: str = SYSFS_BLOCK_DIR,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            enumerate_fn (Callable[[], List[Any]]): Returns the current list of
+                devices, each exposing an 'iSerial' attribute.
+            poll_interval_sec (Optional[float]): How often the sysfs signature is checked.
+            resync_interval_sec (Optional[float]): Maximum age of the index before
+                a forced re-enumeration, regardless of sysfs.
+            use_uevents (bool): Listen for kernel uevents on Linux.
+            sysfs_usb_dir (str): Root of the sysfs USB device tree.
+            sysfs_block_dir (str): Root of the sysfs block device tree.
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        self._enumerate_fn = enumerate_fn
+        self.poll_interval_sec = poll_interval_sec if poll_interval_sec is not None else USB_WATCHER_POLL_INTERVAL_SEC
+        self.resync_interval_sec = resync_interval_sec if resync_interval_sec is not None else USB_WATCHER_RESYNC_INTERVAL_SEC
+        self.use_uevents = use_uevents
+        self.sysfs_usb_dir = sysfs_usb_dir
+        self.sysfs_block_dir = sysfs_block_dir
+
+        self._devices: Dict[str, Any] = {}
+        self._first_seen: Dict[str, float] = {}
+        self._last_change: Dict[str, float] = {}
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=USB_WATCHER_EVENT_HISTORY)
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._condition = threading.Condition()
+        self.generation: int = 0
+        self.enumeration_count: int = 0
+        self.last_refresh_time: float = 0.0
+
+        self._last_signature: Optional[Tuple[Any, ...]] = None
+        self._uevent_sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # --- Index access ---
+    def get(self, serial_number: str) -> Optional[Any]:
+        """Returns the indexed device for a serial number, or None if it is not on the bus."""
+        with self._condition:
+            return self._devices.get(serial_number)
+
+    def devices(self) -> List[Any]:
+        """Returns a snapshot list of all indexed devices."""
+        with self._condition:
+            return list(self._devices.values())
+
+    def first_seen(self, serial_number: str) -> Optional[float]:
+        """Returns when the serial number was last added to the index, or None."""
+        with self._condition:
+            return self._first_seen.get(serial_number)
+
+    def last_change(self, serial_number: str) -> Optional[float]:
+        """Returns when the serial number last changed (add, remove or change), or None."""
+        with self._condition:
+            return self._last_change.get(serial_number)
+
+    @property
+    def has_sysfs(self) -> bool:
+        """True when the sysfs USB tree exists, so poll_once() has a cheap change signal."""
+        return os.path.isdir(self.sysfs_usb_dir)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """Registers a callback invoked (from the watcher thread) for every event."""
+        self._listeners.append(callback)
+
+    def wait_for_change(self, generation: int, timeout: float) -> int:
+        """
+        Blocks until the index generation moves past `generation` or the timeout expires.
+
+        Args:
+            generation (int): The generation previously observed by the caller.
+            timeout (float): Maximum time to wait, in seconds.
+
+        Returns:
+            int: The current generation (unchanged on timeout).
+        """
+        get_clock().wait_for(lambda: self.generation != generation, timeout, condition=self._condition)
+        return self.generation
+
+    # --- Enumeration ---
+    def refresh(self) -> List[Dict[str, Any]]:
+        """
+        Runs the enumeration backend once and reconciles the index.
+
+        Returns:
+            List[Dict[str, Any]]: The events produced by this refresh.
+        """
+        try:
+            current = self._enumerate_fn()
+        except Exception as exc:
+            self.logger.error("USB enumeration backend failed: %s", exc, exc_info=True)
+            return []
+        now = get_clock().time()
+        self.enumeration_count += 1
+        self.last_refresh_time = now
+
+        current_by_serial: Dict[str, Any] = {}
+        for device in current or []:
+            serial = getattr(device, "iSerial", None)
+            if serial:
+                current_by_serial[serial] = device
+
+        events: List[Dict[str, Any]] = []
+        with self._condition:
+            for serial, device in current_by_serial.items():
+                previous = self._devices.get(serial)
+                if previous is None:
+                    events.append({"type": "add", "serial": serial, "device": device, "previous": None, "timestamp": now})
+                    self._first_seen[serial] = now
+                    self._last_change[serial] = now
+                elif self._record_fields(previous) != self._record_fields(device):
+                    events.append({"type": "change", "serial": serial, "device": device, "previous": previous, "timestamp": now})
+                    self._last_change[serial] = now
+            for serial, previous in self._devices.items():
+                if serial not in current_by_serial:
+                    events.append({"type": "remove", "serial": serial, "device": previous, "previous": previous, "timestamp": now})
+                    self._first_seen.pop(serial, None)
+                    self._last_change[serial] = now
+            self._devices = current_by_serial
+            if events:
+                self.events.extend(events)
+                self.generation += 1
+                self._condition.notify_all()
+
+        for event in events:
+            self.logger.debug("USB %s: %s", event["type"], event["serial"])
+            for listener in list(self._listeners):
+                try:
+                    listener(event)
+                except Exception as exc:
+                    self.logger.error("USB watcher listener %r failed: %s", listener, exc, exc_info=True)
+        return events
+
+    @staticmethod
+    def _record_fields(device: Any) -> Dict[str, Any]:
+        if isinstance(device, dict):
+            return dict(device)
+        return dict(getattr(device, "__dict__", {}))
+
+    def _sysfs_signature(self) -> Optional[Tuple[Any, ...]]:
+        """
+        Builds a cheap signature of Apricorn USB devices and block devices from sysfs.
+
+        Returns None when sysfs is not available.
+        """
+        if not os.path.isdir(self.sysfs_usb_dir):
+            return None
+        usb_entries = []
+        for vendor_path in glob.glob(os.path.join(self.sysfs_usb_dir, "*", "idVendor")):
+            try:
+                with open(vendor_path, "r") as handle:
+                    if handle.read().strip().lower() != APRICORN_VENDOR_ID:
+                        continue
+            except OSError:
+                continue
+            usb_entries.append(os.path.basename(os.path.dirname(vendor_path)))
+        block_entries = []
+        if os.path.isdir(self.sysfs_block_dir):
+            for name in os.listdir(self.sysfs_block_dir):
+                size_path = os.path.join(self.sysfs_block_dir, name, "size")
+                try:
+                    with open(size_path, "r") as handle:
+                        block_entries.append((name, handle.read().strip()))
+                except OSError:
+                    block_entries.append((name, None))
+        return (tuple(sorted(usb_entries)), tuple(sorted(block_entries)))
+
+    def _open_uevent_socket(self) -> Optional[socket.socket]:
+        if not (self.use_uevents and sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK")):
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))  # Kernel-assigned port id, multicast group 1 (kernel uevents).
+            sock.setblocking(False)
+            return sock
+        except OSError as exc:
+            self.logger.debug("Kernel uevent socket unavailable (%s); relying on polling.", exc)
+            return None
+
+    def _drain_uevents(self) -> bool:
+        """Reads all pending uevents. Returns True if any USB or block event was seen."""
+        if self._uevent_sock is None:
+            return False
+        relevant = False
+        while True:
+            try:
+                payload = self._uevent_sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                self.logger.debug("Kernel uevent socket error (%s); relying on polling.", exc)
+                self._uevent_sock.close()
+                self._uevent_sock = None
+                break
+            if b"SUBSYSTEM=usb" in payload or b"SUBSYSTEM=block" in payload or b"SUBSYSTEM=scsi" in payload:
+                relevant = True
+        return relevant
+
+    def poll_once(self, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Re-enumerates when forced, when the sysfs signature changed, or when the
+        index is older than the resync interval. Without sysfs (Windows, macOS)
+        there is no cheap change signal, and running the backend on every poll
+        would spawn the tool several times a second, so only forced refreshes and
+        resyncs enumerate.
+        """
+        signature = self._sysfs_signature()
+        stale = get_clock().time() - self.last_refresh_time >= self.resync_interval_sec
+        changed = signature is not None and signature != self._last_signature
+        if force or stale or changed:
+            self._last_signature = signature
+            return self.refresh()
+        return []
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            force = False
+            if self._uevent_sock is not None:
+                try:
+                    readable, _, _ = select.select([self._uevent_sock], [], [], self.poll_interval_sec)
+                except (OSError, ValueError):
+                    readable = []
+                if readable:
+                    force = self._drain_uevents()
+            else:
+                self._stop_event.wait(self.poll_interval_sec)
+            if self._stop_event.is_set():
+                break
+            self.poll_once(force=force)
+
+    def start(self):
+        """Performs an initial enumeration and starts the background watcher thread."""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._uevent_sock = self._open_uevent_socket()
+        self._last_signature = self._sysfs_signature()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="UsbDeviceWatcher", daemon=True)
+        self._thread.start()
+        source = "uevents" if self._uevent_sock is not None else ("sysfs polling" if self._last_signature is not None else "tool polling")
+        self.logger.debug("USB device watcher started (%s, poll %.2fs).", source, self.poll_interval_sec)
+
+    def stop(self):
+        """Stops the watcher thread and releases the uevent socket."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(1.0, self.poll_interval_sec * 2))
+            self._thread = None
+        if self._uevent_sock is not None:
+            try:
+                self._uevent_sock.close()
+            except OSError:
+                pass
+            self._uevent_sock = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,980 @@
+# Directory: controllers
+# Filename: virtual_dut.py
+#!/usr/bin/env python3
+
+# Hardware-free stand-in for the fixture. VirtualApricornDevice reacts to Phidget
+# key/relay edges the way the device firmware does: LED patterns from
+# utils/led_states.py, OOB vs unlocked USB enumeration, PIN, enrollment and
+# brute-force counters. SimulatedPhidgetController forwards output edges to it,
+# VirtualLedCamera renders its LEDs into frames for LogitechLedChecker and
+# enumerate() publishes apricorn_usb_tool-style records, so ApricornDeviceFSM
+# flows run end to end on any Linux box (UnifiedController(virtual_dut=True) or
+# VIRTUAL_DUT_ENABLED=true). Add SIMULATED_CLOCK_ENABLED=true to run it on
+# virtual time (controllers/clock.py).
+#
+# Storage is not simulated: the unlocked drive reports blockDevice "N/A", so
+# format/speed-test steps fail the way they do on a drive that never mounted.
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from controllers.clock import get_clock
+from controllers.phidget_board import PhidgetController
+from controllers.usb_sysfs import OOB_DRIVE_SIZE
+from utils.led_states import LEDs
+
+module_logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CONFIG_DIR = os.path.join(_PROJECT_ROOT, "utils", "config")
+_DEVICE_PROPERTIES_FILE = os.path.join(_CONFIG_DIR, "device_properties.json")
+_HARDWARE_CONFIG_FILE = os.path.join(_CONFIG_DIR, "hardware_configuration_settings.json")
+
+VIRTUAL_DUT_ENABLED = os.environ.get("VIRTUAL_DUT_ENABLED", "false").lower() == "true"
+VIRTUAL_DUT_SERIAL = os.environ.get("VIRTUAL_DUT_SERIAL") or "VIRTUAL00000001"
+try:
+    VIRTUAL_DUT_DRIVE_SIZE_GB = int(os.environ.get("VIRTUAL_DUT_DRIVE_SIZE_GB", "64"))
+except (TypeError, ValueError):
+    VIRTUAL_DUT_DRIVE_SIZE_GB = 64
+# Delay between a mode change and the matching USB enumeration.
+try:
+    VIRTUAL_DUT_ENUM_DELAY_SEC = float(os.environ.get("VIRTUAL_DUT_ENUM_DELAY_SEC", "1.0"))
+except (TypeError, ValueError):
+    VIRTUAL_DUT_ENUM_DELAY_SEC = 1.0
+try:
+    VIRTUAL_CAMERA_FPS = float(os.environ.get("VIRTUAL_CAMERA_FPS", "30"))
+except (TypeError, ValueError):
+    VIRTUAL_CAMERA_FPS = 30.0
+
+# Where inside each pattern step's (min, max) window the rendered step ends.
+PATTERN_STEP_POSITION = 0.35
+
+# Firmware timings.
+LONG_PRESS_SEC = 5.0
+USER_RESET_WARNING_DELAY_SEC = 1.0
+USER_RESET_HOLD_SEC = 10.0
+ADMIN_USER_RESET_WARNING_SEC = 8.0
+KEY_GENERATION_SEC = 10.0
+ACCEPT_STATE_SEC = 1.5
+FIRST_KEY_BLUE_SEC = 0.15
+ENTRY_TIMEOUT_SEC = 30.0
+BATTERY_WAKE_SEC = 30.0
+MAXIMUM_PIN_LENGTH = 16
+FEEDBACK_BLINK_SEC = 0.3
+
+LED_NAMES = ("red", "green", "blue")
+DIGIT_KEYS = tuple(f"key{digit}" for digit in range(10))
+KEYPAD_KEYS = DIGIT_KEYS + ("lock", "unlock")
+LAST_TRY_PIN = ["key5", "key2", "key7", "key8", "key8", "key7", "key9"]
+
+USER_RESET_CHORD = frozenset({"lock", "unlock", "key2"})
+MANUFACTURER_RESET_SEQUENCE = (frozenset({"lock", "key2"}), frozenset({"key3"}), frozenset({"key8"}))
+
+# BGR fills that LogitechLedChecker's PRIMARY_LED_CONFIGURATIONS detect as lit.
+VIRTUAL_LED_ON_BGR = {
+    "red": (60, 60, 255),
+    "green": (60, 255, 60),
+    "blue": (255, 120, 60),
+}
+VIRTUAL_LED_OFF_BGR = (20, 20, 20)
+VIRTUAL_BACKGROUND_BGR = (20, 20, 20)
+
+# (state, seconds) pieces of an LED program.
+Segment = Tuple[Dict[str, int], float]
+
+
+def _led_state(step: Dict[str, Any]) -> Dict[str, int]:
+    return {name: int(step.get(name, 0)) for name in LED_NAMES}
+
+
+def _segments(pattern: List[Dict[str, Any]], first: int = 0, last: Optional[int] = None) -> List[Segment]:
+    """Renders pattern steps [first:last] as segments, each inside its step's duration window."""
+    rendered = []
+    for step in pattern[first:last]:
+        low, high = step.get("duration", (0.0, 1.0))
+        rendered.append((_led_state(step), low + (high - low) * PATTERN_STEP_POSITION))
+    return rendered
+
+
+def _solid(state_name: str) -> List[Segment]:
+    return [(_led_state(LEDs[state_name]), 1.0)]
+
+
+ALL_OFF: Dict[str, int] = _led_state(LEDs["ALL_OFF"])
+
+# Looping LED output per resting mode. Blinking modes repeat the steady part of
+# their pattern, so a check may start at any point of the cycle.
+_STEADY_LOOPS: Dict[str, List[Segment]] = {
+    "OOB_MODE": _solid("GREEN_BLUE_STATE"),
+    "USER_FORCED_ENROLLMENT": _solid("GREEN_BLUE_STATE"),
+    "STANDBY_MODE": _solid("STANDBY_MODE"),
+    "ADMIN_MODE": _solid("ADMIN_MODE"),
+    "BRUTE_FORCE": _segments(LEDs["BRUTE_FORCED"], 2, 4),
+    "PROVISION_LOCK_BRICKED": _segments(LEDs["PROVISION_LOCK_BRICKED"], 2, 4),
+    "ADMIN_LOGIN": _segments(LEDs["RED_LOGIN"], 2, 4),
+    "LAST_TRY_LOGIN": _segments(LEDs["RED_GREEN"], 2, 4),
+    "COUNTER_ENROLLMENT": _segments(LEDs["RED_COUNTER"], 2, 4),
+    "DELETE_PINS": _segments(LEDs["RED_BLUE"], 2, 4),
+    "USER_RESET": _segments(LEDs["RED_BLUE"], 2, 4),
+    "KEY_GENERATION": _solid("KEY_GENERATION"),
+    "RESET_READY": _solid("BLUE_ONLY"),
+}
+_ENROLLMENT_LOOPS = {
+    "GREEN_BLUE": _segments(LEDs["GREEN_BLUE"], 2, 4),
+    "RED_BLUE": _segments(LEDs["RED_BLUE"], 2, 4),
+}
+# Pattern steps an unlocked drive keeps repeating after its unlock pattern.
+_UNLOCKED_LOOP_STEPS = {
+    "ENUM": (-1, None),
+    "ENUM_LEGACY": (-1, None),
+    "ENUM_READ_ONLY": (2, 4),
+    "ENUM_LOCK_OVERRIDE": (2, 4),
+    "ENUM_LOCK_OVERRIDE_READ_ONLY": (3, 7),
+}
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r") as handle:
+        return json.load(handle)
+
+
+class _LedProgram:
+    """What the LEDs show from `start` on: one-shot segments, then a repeating loop."""
+
+    def __init__(self, start: float, once: List[Segment], loop: List[Segment]):
+        self.start = start
+        self.once = list(once)
+        self.loop = list(loop)
+
+    def state_at(self, now: float) -> Dict[str, int]:
+        offset = max(0.0, now - self.start)
+        for state, duration in self.once:
+            if offset < duration:
+                return state
+            offset -= duration
+        if not self.loop:
+            return ALL_OFF
+        cycle = sum(duration for _, duration in self.loop)
+        if cycle <= 0:
+            return self.loop[-1][0]
+        offset %= cycle
+        for state, duration in self.loop:
+            if offset < duration:
+                return state
+            offset -= duration
+        return self.loop[-1][0]
+
+
+class VirtualApricornDevice:
+    """
+    Behavioural model of an Apricorn keypad drive driven by key and relay edges.
+
+    Modes are named after the ApricornDeviceFSM states they correspond to. PINs
+    are stored as key lists without the trailing 'unlock'. All time-based
+    behaviour (pattern playback, key generation, enumeration delays) is derived
+    from the injected clock when the device is observed, so no thread is needed.
+    """
+
+    def __init__(self, device_name: Optional[str] = None, serial_number: str = VIRTUAL_DUT_SERIAL,
+                 battery: Optional[bool] = None, clock: Optional[Callable[[], float]] = None,
+                 logger_instance: Optional[logging.Logger] = None):
+        """
+        Args:
+            device_name (Optional[str]): Profile in device_properties.json. Defaults
+                to the profile in hardware_configuration_settings.json.
+            serial_number (str): iSerial reported on USB.
+            battery (Optional[bool]): Battery-backed device (no power-on self-test,
+                keypad usable while disconnected). Defaults to the hardware config.
+            clock (Optional[Callable[[], float]]): Time source in seconds. Defaults to
+                the shared clock service (controllers.clock.get_clock).
+            logger_instance (Optional[logging.Logger]): Logger to use.
+        """
+        self.logger = logger_instance if logger_instance else module_logger
+        hardware = _load_json(_HARDWARE_CONFIG_FILE).get("device_properties", {})
+        self.device_name = device_name or hardware.get("name")
+        self.properties = _load_json(_DEVICE_PROPERTIES_FILE)[self.device_name]
+        self.battery = bool(hardware.get("battery", False)) if battery is None else bool(battery)
+        self.serial_number = serial_number
+        self._clock = clock if clock else (lambda: get_clock().time())
+        self._lock = threading.RLock()
+        self._timers: List[Tuple[float, int, Callable[[float], Any]]] = []
+        self._timer_seq = itertools.count()
+        self._epoch = 0
+        self._entry_token = 0
+        self._usb_token = 0
+        self._enumeration_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._usb_changed = False
+
+        fips = self.properties.get("fips")
+        self.max_users = 1 if fips in [2, 3] else 4
+        self.max_recovery = 4
+
+        self.connected = False
+        self.usb3 = False
+        self.usb_state: Optional[str] = None
+        self._awake_until = 0.0
+        self._keys_down: Set[str] = set()
+        self._chord: Set[str] = set()
+        self._chord_time = 0.0
+        self._chord_dispatched = False
+        self._entry: List[str] = []
+        self._manufacturer_progress = 0
+        self._reset_from_locked = False
+        self._enrollment: Dict[str, Any] = {}
+        self._counter: Dict[str, Any] = {}
+        self._keypad_tested: Set[str] = set()
+        self.unlocked_as: Optional[str] = None
+        self._unlock_pattern = "ENUM_LEGACY"
+        self.mode = "OFF"
+        self.mode_history: Deque[Tuple[float, str]] = deque(maxlen=256)
+        self._program = _LedProgram(self._clock(), [], [(ALL_OFF, 1.0)])
+        self._factory_defaults()
+
+    def _factory_defaults(self):
+        """Settings and PINs as shipped (and as left behind by a user or manufacturer reset)."""
+        self.admin_pin: Optional[List[str]] = None
+        self.user_pins: Dict[int, Optional[List[str]]] = {slot: None for slot in range(1, self.max_users + 1)}
+        self.recovery_pins: Dict[int, Optional[List[str]]] = {slot: None for slot in range(1, self.max_recovery + 1)}
+        self.recovery_used: Dict[int, bool] = {slot: False for slot in range(1, self.max_recovery + 1)}
+        self.self_destruct_pin: Optional[List[str]] = None
+        self.self_destruct_enabled = False
+        self.read_only = False
+        self.lock_override = False
+        self.provision_lock = False
+        self.user_forced_enrollment = False
+        self.basic_disk = True
+        self.removable_media = False
+        self.brute_force_counter = 20
+        self.brute_force_remaining = 20
+        self.minimum_pin_length = int(self.properties.get("minimum_pin_length", 7))
+        self.unattended_auto_lock = 0
+        self._last_try_used = False
+
+    # --- Observation ---
+    def led_state(self, now: Optional[float] = None) -> Dict[str, int]:
+        """The LED output ({'red','green','blue'} -> 0/1) at `now` (default: the clock)."""
+        with self._lock:
+            now = self._clock() if now is None else now
+            self._advance(now)
+            state = dict(self._program.state_at(now))
+        self._flush_enumeration()
+        return state
+
+    def enumerate(self) -> List[Dict[str, Any]]:
+        """The device's current USB records, in apricorn_usb_tool format (empty when not enumerated)."""
+        with self._lock:
+            self._advance(self._clock())
+            records = self._records()
+        self._flush_enumeration()
+        return records
+
+    def add_enumeration_listener(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """Registers a callback invoked with the new records whenever the device (dis)appears on USB."""
+        self._enumeration_listeners.append(callback)
+
+    def read_input(self, name: str) -> bool:
+        if name == "power_on":
+            return self.connected
+        return name == "prod_inserted"
+
+    # --- Stimulus ---
+    def set_output(self, name: str, state: bool):
+        """Applies a Phidget output edge: a keypad key, the connect relay or the usb3 relay."""
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            if name == "connect":
+                self._set_connected(bool(state), now)
+            elif name == "usb3":
+                self.usb3 = bool(state)
+                if self.usb_state is not None:
+                    self._usb_changed = True
+            elif name in KEYPAD_KEYS:
+                self._key_edge(name, bool(state), now)
+        self._flush_enumeration()
+
+    # --- Timers ---
+    def _schedule(self, due: float, callback: Callable[[float], Any]):
+        heapq.heappush(self._timers, (due, next(self._timer_seq), callback))
+
+    def _schedule_in_mode(self, due: float, callback: Callable[[float], Any]):
+        """Schedules a callback that is dropped if the mode changes first."""
+        epoch = self._epoch
+        self._schedule(due, lambda at: callback(at) if self._epoch == epoch else None)
+
+    def _advance(self, now: float):
+        while self._timers and self._timers[0][0] <= now:
+            due, _, callback = heapq.heappop(self._timers)
+            callback(due)
+
+    # --- Modes ---
+    def _enter(self, mode: str, at: float, once: Optional[List[Segment]] = None):
+        """Switches mode at `at`, playing `once` before the mode's steady LED loop."""
+        if mode != self.mode:
+            self.mode_history.append((at, mode))
+            self.logger.debug(f"Virtual DUT: {self.mode} -> {mode}")
+        self.mode = mode
+        self._epoch += 1
+        self._program = _LedProgram(at, once or [], self._steady(mode))
+        self._sync_usb(at)
+
+    def _steady(self, mode: str) -> List[Segment]:
+        if mode == "UNLOCKED":
+            return _segments(LEDs[self._unlock_pattern], *_UNLOCKED_LOOP_STEPS[self._unlock_pattern])
+        if mode == "PIN_ENROLLMENT":
+            return _ENROLLMENT_LOOPS["RED_BLUE" if self._enrollment.get("kind") == "self_destruct" else "GREEN_BLUE"]
+        if mode == "KEYPAD_TEST":
+            return _solid("ACCEPT_STATE") if self._keys_down else _solid("ALL_OFF")
+        return _STEADY_LOOPS.get(mode, _solid("ALL_OFF"))
+
+    def _resting_mode(self) -> str:
+        """The mode the device settles in at power-on or after leaving a menu."""
+        if self.brute_force_remaining <= 0:
+            return "PROVISION_LOCK_BRICKED" if self.provision_lock else "BRUTE_FORCE"
+        if self.admin_pin is None:
+            return "OOB_MODE"
+        if self.user_forced_enrollment and not any(self.user_pins.values()):
+            return "USER_FORCED_ENROLLMENT"
+        return "STANDBY_MODE"
+
+    def _idle_mode(self, at: float) -> str:
+        powered = self.connected or (self.battery and at < self._awake_until)
+        return self._resting_mode() if powered else "OFF"
+
+    def _feedback(self, accepted: bool, at: float, mode: Optional[str] = None):
+        pattern = LEDs["ACCEPT_PATTERN"] if accepted else LEDs["REJECT"]
+        self._enter(mode or self.mode, at, once=_segments(pattern))
+
+    # --- Power ---
+    def _set_connected(self, connected: bool, now: float):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        self._clear_keypad_state()
+        if not connected:
+            self._awake_until = 0.0
+            self._enter("OFF", now)
+            return
+        resting = self._resting_mode()
+        if self.battery:
+            self._enter(resting, now)
+            return
+        boot = _segments(LEDs["RED_GREEN_BLUE"]) + _segments(LEDs["ACCEPT_PATTERN"])
+        self._enter("POWER_ON_SELF_TEST", now, once=boot)
+        self._schedule_in_mode(now + sum(duration for _, duration in boot),
+                               lambda at: self._enter(self._resting_mode(), at))
+
+    def _wake_on_battery(self, now: float):
+        """Keypad activity keeps a disconnected battery device awake."""
+        self._awake_until = now + BATTERY_WAKE_SEC
+        if self.mode == "OFF":
+            self._enter(self._resting_mode(), now)
+        self._schedule(self._awake_until, self._battery_sleep_check)
+
+    def _battery_sleep_check(self, at: float):
+        if self.connected or self._keys_down or at < self._awake_until or self.mode == "OFF":
+            return
+        if self.mode in ("KEY_GENERATION", "USER_RESET", "RESET_READY", "KEYPAD_TEST"):
+            self._awake_until = at + BATTERY_WAKE_SEC
+            self._schedule(self._awake_until, self._battery_sleep_check)
+            return
+        self._enter("OFF", at)
+
+    # --- USB ---
+    def _usb_target(self) -> Optional[str]:
+        if not self.connected:
+            return None
+        if self.mode == "UNLOCKED":
+            return "drive"
+        if self.mode == "OOB_MODE" or (self.mode == "PIN_ENROLLMENT" and self._enrollment.get("origin") == "OOB_MODE"):
+            return "oob"
+        return None
+
+    def _sync_usb(self, at: float):
+        target = self._usb_target()
+        self._usb_token += 1
+        if target == self.usb_state:
+            return
+        if target is None:
+            self._set_usb(None)
+            return
+        token = self._usb_token
+        self._schedule(at + VIRTUAL_DUT_ENUM_DELAY_SEC,
+                       lambda _at: self._set_usb(self._usb_target()) if token == self._usb_token else None)
+
+    def _set_usb(self, state: Optional[str]):
+        if state != self.usb_state:
+            self.usb_state = state
+            self._usb_changed = True
+
+    def _records(self) -> List[Dict[str, Any]]:
+        if self.usb_state is None:
+            return []
+        exposed = self.usb_state == "drive"
+        return [{
+            "idVendor": "0984",
+            "idProduct": self.properties.get("id_product"),
+            "bcdDevice": self.properties.get("bridge_fw"),
+            "bcdUSB": "3.20" if self.usb3 else "2.10",
+            "iManufacturer": "Apricorn",
+            "iProduct": self.device_name,
+            "iSerial": self.serial_number,
+            "deviceIndex": "1",
+            "blockDevice": "N/A",
+            "driveSizeGB": VIRTUAL_DUT_DRIVE_SIZE_GB if exposed else OOB_DRIVE_SIZE,
+            "readOnly": self.read_only if exposed else False,
+        }]
+
+    def _flush_enumeration(self):
+        """Notifies enumeration listeners outside the device lock."""
+        with self._lock:
+            if not self._usb_changed:
+                return
+            self._usb_changed = False
+            records = self._records()
+        for listener in list(self._enumeration_listeners):
+            try:
+                listener(records)
+            except Exception as e:
+                self.logger.error(f"Virtual DUT enumeration listener {listener!r} failed: {e}", exc_info=True)
+
+    # --- Keypad ---
+    def _clear_keypad_state(self):
+        self._keys_down.clear()
+        self._chord = set()
+        self._chord_dispatched = False
+        self._entry = []
+        self._manufacturer_progress = 0
+
+    def _key_edge(self, name: str, pressed: bool, now: float):
+        """
+        Tracks chords: every key pressed since the keypad was last idle. A chord is
+        dispatched once, on its first release, with the time it was held complete.
+        """
+        if not self.connected:
+            if not self.battery:
+                return
+            self._wake_on_battery(now)
+        if pressed:
+            if name in self._keys_down:
+                return
+            if not self._keys_down:
+                self._chord = set()
+                self._chord_dispatched = False
+            self._keys_down.add(name)
+            if not self._chord_dispatched:
+                self._chord.add(name)
+                self._chord_time = now
+                self._on_chord_down(frozenset(self._chord), now)
+            if self.mode in ("RESET_READY", "KEYPAD_TEST"):
+                self._keypad_test_edge(name, True, now)
+            return
+        if name not in self._keys_down:
+            return
+        self._keys_down.discard(name)
+        if not self._chord_dispatched:
+            self._chord_dispatched = True
+            self._on_chord(frozenset(self._chord), now - self._chord_time, now)
+        if self.mode == "KEYPAD_TEST":
+            self._keypad_test_edge(name, False, now)
+
+    def _on_chord_down(self, chord: frozenset, now: float):
+        if chord == USER_RESET_CHORD and self.mode in ("OOB_MODE", "STANDBY_MODE", "USER_FORCED_ENROLLMENT",
+                                                       "BRUTE_FORCE") and not self.provision_lock:
+            self._schedule_in_mode(now + USER_RESET_WARNING_DELAY_SEC, self._start_locked_user_reset)
+
+    def _on_chord(self, chord: frozenset, hold: float, now: float):
+        handler = {
+            "OOB_MODE": self._chord_locked,
+            "STANDBY_MODE": self._chord_locked,
+            "USER_FORCED_ENROLLMENT": self._chord_locked,
+            "BRUTE_FORCE": self._chord_locked,
+            "ADMIN_LOGIN": self._chord_admin_login,
+            "LAST_TRY_LOGIN": self._chord_last_try,
+            "ADMIN_MODE": self._chord_admin,
+            "PIN_ENROLLMENT": self._chord_pin_enrollment,
+            "COUNTER_ENROLLMENT": self._chord_counter_enrollment,
+            "DELETE_PINS": self._chord_delete_pins,
+            "USER_RESET": self._chord_user_reset,
+            "UNLOCKED": self._chord_unlocked,
+        }.get(self.mode)
+        if handler:
+            handler(chord, hold, now)
+
+    def _single_key(self, chord: frozenset) -> Optional[str]:
+        return next(iter(chord)) if len(chord) == 1 else None
+
+    def _collect_pin(self, chord: frozenset, now: float, submit: Callable[[List[str], float], None]):
+        """Digits accumulate, 'unlock' submits the entry and 'lock' clears it."""
+        key = self._single_key(chord)
+        if key is None:
+            self._entry = []
+        elif key in DIGIT_KEYS:
+            self._entry.append(key)
+        elif key == "lock":
+            self._entry = []
+        elif key == "unlock" and self._entry:
+            entry, self._entry = self._entry, []
+            submit(entry, now)
+
+    # --- Locked modes ---
+    def _chord_locked(self, chord: frozenset, hold: float, now: float):
+        if self._manufacturer_reset_step(chord, hold, now):
+            return
+        if chord == USER_RESET_CHORD:
+            self._epoch += 1  # released before the warning: drop it
+            return
+        if self.mode == "BRUTE_FORCE":
+            if (chord == {"key5", "unlock"} and hold >= LONG_PRESS_SEC and not self._last_try_used
+                    and self.brute_force_remaining == self.brute_force_counter // 2):
+                self._entry = []
+                self._enter("LAST_TRY_LOGIN", now)
+            return
+        if self.mode == "OOB_MODE":
+            if chord == {"unlock", "key9"}:
+                self._start_enrollment("admin", now)
+            return
+        if chord == {"key0", "unlock"} and hold >= LONG_PRESS_SEC:
+            self._entry = []
+            self._enter("ADMIN_LOGIN", now)
+            return
+        if self.mode == "USER_FORCED_ENROLLMENT" and chord == {"unlock", "key1"}:
+            self._start_enrollment("user", now)
+            return
+        self._collect_pin(chord, now, self._submit_unlock_pin)
+
+    def _manufacturer_reset_step(self, chord: frozenset, hold: float, now: float) -> bool:
+        """Tracks [lock+key2], key3, key8, lock (long). Returns True if the chord was consumed."""
+        progress = self._manufacturer_progress
+        if chord == MANUFACTURER_RESET_SEQUENCE[0]:
+            self._manufacturer_progress = 1
+            self._entry = []
+            return True
+        if 0 < progress < len(MANUFACTURER_RESET_SEQUENCE) and chord == MANUFACTURER_RESET_SEQUENCE[progress]:
+            self._manufacturer_progress += 1
+            return True
+        self._manufacturer_progress = 0
+        if progress == len(MANUFACTURER_RESET_SEQUENCE) and chord == {"lock"} and hold >= LONG_PRESS_SEC:
+            self._keypad_tested = set()
+            self._enter("RESET_READY", now, once=_segments(LEDs["RED_GREEN_BLUE"]))
+            return True
+        return False
+
+    def _submit_unlock_pin(self, entry: List[str], now: float):
+        if self.admin_pin is not None and entry == self.admin_pin:
+            self._unlock("admin", now)
+        elif entry in [pin for pin in self.user_pins.values() if pin]:
+            self._unlock("user", now)
+        elif self.self_destruct_enabled and self.self_destruct_pin and entry == self.self_destruct_pin:
+            self.admin_pin = self.self_destruct_pin
+            self.user_pins = {slot: None for slot in self.user_pins}
+            self.recovery_pins = {slot: None for slot in self.recovery_pins}
+            self.self_destruct_pin = None
+            self.self_destruct_enabled = False
+            self._unlock("self_destruct", now)
+        else:
+            for slot, pin in self.recovery_pins.items():
+                if pin and entry == pin and not self.recovery_used[slot]:
+                    self.recovery_used[slot] = True
+                    self._reset_brute_force()
+                    self._start_enrollment("admin", now)
+                    return
+            self._reject_pin(now)
+
+    def _reset_brute_force(self):
+        self.brute_force_remaining = self.brute_force_counter
+        self._last_try_used = False
+
+    def _reject_pin(self, now: float):
+        self.brute_force_remaining = max(0, self.brute_force_remaining - 1)
+        if self.brute_force_remaining == 0 or (
+                self.brute_force_remaining == self.brute_force_counter // 2 and not self._last_try_used):
+            next_mode = "PROVISION_LOCK_BRICKED" if self.provision_lock and self.brute_force_remaining == 0 else "BRUTE_FORCE"
+        else:
+            next_mode = self._resting_mode()
+        self._feedback(False, now, mode=next_mode)
+
+    def _unlock(self, kind: str, now: float):
+        if self.read_only and self.lock_override:
+            pattern = "ENUM_LOCK_OVERRIDE_READ_ONLY"
+        elif self.read_only:
+            pattern = "ENUM_READ_ONLY"
+        elif self.lock_override:
+            pattern = "ENUM_LOCK_OVERRIDE"
+        else:
+            pattern = "ENUM" if kind in ("self_destruct", "reset") else "ENUM_LEGACY"
+        if kind != "reset":
+            self._reset_brute_force()
+        self.unlocked_as = kind
+        self._unlock_pattern = pattern
+        self._enter("UNLOCKED", now, once=_segments(LEDs[pattern]))
+
+    def _chord_admin_login(self, chord: frozenset, hold: float, now: float):
+        if chord == {"lock"}:
+            self._entry = []
+            self._enter(self._resting_mode(), now)
+            return
+        self._collect_pin(chord, now, self._submit_admin_login_pin)
+
+    def _submit_admin_login_pin(self, entry: List[str], now: float):
+        if self.admin_pin is not None and entry == self.admin_pin:
+            self._reset_brute_force()
+            self._enter("ADMIN_MODE", now)
+        else:
+            self._reject_pin(now)
+
+    def _chord_last_try(self, chord: frozenset, hold: float, now: float):
+        self._collect_pin(chord, now, self._submit_last_try)
+
+    def _submit_last_try(self, entry: List[str], now: float):
+        if entry == LAST_TRY_PIN:
+            self._last_try_used = True
+            self._enter("STANDBY_MODE", now)
+        else:
+            self._feedback(False, now, mode="BRUTE_FORCE")
+
+    def _chord_unlocked(self, chord: frozenset, hold: float, now: float):
+        if chord == {"lock"}:
+            self.unlocked_as = None
+            self._enter(self._resting_mode(), now)
+
+    # --- Resets ---
+    def _start_locked_user_reset(self, at: float):
+        self._reset_from_locked = True
+        self._enter("USER_RESET", at)
+
+    def _chord_user_reset(self, chord: frozenset, hold: float, now: float):
+        if not self._reset_from_locked or chord != USER_RESET_CHORD:
+            return
+        if hold >= USER_RESET_HOLD_SEC:
+            self._commit_user_reset(now)
+        else:
+            self._enter(self._resting_mode(), now)
+
+    def _commit_user_reset(self, at: float):
+        self._factory_defaults()
+        self._enter("KEY_GENERATION", at)
+        self._schedule_in_mode(at + KEY_GENERATION_SEC, lambda done: self._enter(self._idle_mode(done), done))
+
+    def _keypad_test_edge(self, name: str, pressed: bool, now: float):
+        if pressed:
+            first = self.mode == "RESET_READY"
+            self._enter("KEYPAD_TEST", now, once=[(_led_state(LEDs["BLUE_ONLY"]), FIRST_KEY_BLUE_SEC)] if first else None)
+            return
+        self._keypad_tested.add(name)
+        if name == "unlock" and self._keypad_tested.issuperset(KEYPAD_KEYS):
+            self._factory_defaults()
+            self._enter("KEY_GENERATION", now)
+            self._schedule_in_mode(now + KEY_GENERATION_SEC, lambda done: self._unlock("reset", done))
+            return
+        self._enter("KEYPAD_TEST", now)
+
+    # --- Admin mode ---
+    def _chord_admin(self, chord: frozenset, hold: float, now: float):
+        long_press = hold >= LONG_PRESS_SEC
+        if chord == USER_RESET_CHORD:
+            self._reset_from_locked = False
+            self._enter("USER_RESET", now)
+            self._schedule_in_mode(now + ADMIN_USER_RESET_WARNING_SEC, self._commit_user_reset)
+        elif chord == {"lock"}:
+            self._enter(self._resting_mode(), now)
+        elif chord == {"unlock", "key9"}:
+            self._start_enrollment("admin", now)
+        elif chord == {"unlock", "key1"}:
+            if any(pin is None for pin in self.user_pins.values()):
+                self._start_enrollment("user", now)
+            else:
+                self._feedback(False, now)
+        elif chord == {"unlock", "key7"}:
+            if any(pin is None for pin in self.recovery_pins.values()):
+                self._start_enrollment("recovery", now)
+            else:
+                self._feedback(False, now)
+        elif chord == {"key3", "unlock"}:
+            if self.self_destruct_enabled:
+                self._start_enrollment("self_destruct", now)
+            else:
+                self._feedback(False, now)
+        elif long_press and chord == {"unlock", "key5"}:
+            self._start_counter_enrollment("brute_force", now)
+        elif long_press and chord == {"unlock", "key4"}:
+            self._start_counter_enrollment("min_pin", now)
+        elif long_press and chord == {"unlock", "key6"}:
+            self._start_counter_enrollment("auto_lock", now)
+        elif long_press and chord == {"key7", "key8"}:
+            self._enter("DELETE_PINS", now, once=_segments(LEDs["ACCEPT_PATTERN"]))
+        else:
+            self._admin_toggle(chord, now)
+
+    def _admin_toggle(self, chord: frozenset, now: float):
+        if chord == {"key2", "key3"}:
+            self.basic_disk, self.removable_media = True, False
+        elif chord == {"key3", "key7"}:
+            self.basic_disk, self.removable_media = False, True
+        elif chord == {"key0", "key3"}:
+            self.lock_override = not self.lock_override
+        elif chord == {"key2", "key5"}:
+            if self.self_destruct_enabled:
+                return self._feedback(False, now)
+            self.provision_lock = True
+        elif chord == {"key6", "key7"}:
+            self.read_only = True
+        elif chord == {"key7", "key9"}:
+            self.read_only = False
+        elif chord == {"key4", "key7"}:
+            if self.provision_lock:
+                return self._feedback(False, now)
+            self.self_destruct_enabled = True
+        elif chord == {"key0", "key1"}:
+            if self.user_forced_enrollment:
+                return self._feedback(False, now)
+            self.user_forced_enrollment = True
+        else:
+            return
+        self._feedback(True, now)
+
+    def _chord_delete_pins(self, chord: frozenset, hold: float, now: float):
+        if chord == {"key7", "key8"} and hold >= LONG_PRESS_SEC:
+            self.user_pins = {slot: None for slot in self.user_pins}
+            self.recovery_pins = {slot: None for slot in self.recovery_pins}
+            self.self_destruct_pin = None
+            self.user_forced_enrollment = False
+            self._enter("ADMIN_MODE", now, once=[(_led_state(LEDs["ACCEPT_STATE"]), ACCEPT_STATE_SEC)])
+        elif chord == {"lock"}:
+            self._enter("ADMIN_MODE", now)
+
+    # --- Enrollment ---
+    def _arm_entry_timeout(self, now: float):
+        self._entry_token += 1
+        token = self._entry_token
+        self._schedule(now + ENTRY_TIMEOUT_SEC,
+                       lambda at: self._entry_timed_out(at) if token == self._entry_token else None)
+
+    def _entry_timed_out(self, at: float):
+        if self.mode == "PIN_ENROLLMENT":
+            partial = bool(self._entry) or self._enrollment.get("first") is not None
+            self._enter(self._enrollment_exit_mode(False), at, once=_segments(LEDs["REJECT"]) if partial else None)
+        elif self.mode == "COUNTER_ENROLLMENT":
+            partial = bool(self._counter.get("digits"))
+            self._enter("ADMIN_MODE", at, once=_segments(LEDs["REJECT"]) if partial else None)
+
+    def _start_enrollment(self, kind: str, now: float):
+        self._enrollment = {"kind": kind, "origin": self.mode, "first": None}
+        self._entry = []
+        self._enter("PIN_ENROLLMENT", now)
+        self._arm_entry_timeout(now)
+
+    def _enrollment_exit_mode(self, enrolled: bool) -> str:
+        origin = self._enrollment.get("origin")
+        if origin == "ADMIN_MODE" or (enrolled and origin == "OOB_MODE"):
+            return "ADMIN_MODE"
+        return self._resting_mode()
+
+    def _chord_pin_enrollment(self, chord: frozenset, hold: float, now: float):
+        if chord == {"lock"}:
+            self._entry_token += 1
+            self._enter(self._enrollment_exit_mode(False), now)
+            return
+        self._arm_entry_timeout(now)
+        self._collect_pin(chord, now, self._submit_enrollment_pin)
+
+    def _submit_enrollment_pin(self, entry: List[str], now: float):
+        first = self._enrollment.get("first")
+        if first is None:
+            if self.minimum_pin_length <= len(entry) <= MAXIMUM_PIN_LENGTH:
+                self._enrollment["first"] = entry
+                self._feedback(True, now)
+                return
+        elif entry == first:
+            self._entry_token += 1
+            self._store_enrolled_pin(entry)
+            self._enter(self._enrollment_exit_mode(True), now,
+                        once=[(_led_state(LEDs["ACCEPT_STATE"]), ACCEPT_STATE_SEC)])
+            return
+        self._entry_token += 1
+        self._feedback(False, now, mode=self._enrollment_exit_mode(False))
+
+    def _store_enrolled_pin(self, pin: List[str]):
+        kind = self._enrollment.get("kind")
+        if kind == "admin":
+            self.admin_pin = pin
+        elif kind == "self_destruct":
+            self.self_destruct_pin = pin
+        else:
+            slots = self.user_pins if kind == "user" else self.recovery_pins
+            slot = next(slot for slot, existing in slots.items() if existing is None)
+            slots[slot] = pin
+            if kind == "recovery":
+                self.recovery_used[slot] = False
+
+    def _start_counter_enrollment(self, kind: str, now: float):
+        self._counter = {"kind": kind, "digits": []}
+        self._enter("COUNTER_ENROLLMENT", now)
+        self._arm_entry_timeout(now)
+
+    def _chord_counter_enrollment(self, chord: frozenset, hold: float, now: float):
+        key = self._single_key(chord)
+        if key == "lock":
+            self._entry_token += 1
+            self._enter("ADMIN_MODE", now)
+            return
+        if key not in DIGIT_KEYS:
+            return
+        self._arm_entry_timeout(now)
+        digits = self._counter["digits"]
+        digits.append(key[-1])
+        kind = self._counter["kind"]
+        if len(digits) < (1 if kind == "auto_lock" else 2):
+            return
+        self._entry_token += 1
+        value = int("".join(digits))
+        if kind == "brute_force" and 2 <= value <= 10:
+            self.brute_force_counter = self.brute_force_remaining = value
+            self._last_try_used = False
+            blink = [(ALL_OFF, FEEDBACK_BLINK_SEC), (_led_state(LEDs["ACCEPT_STATE"]), FEEDBACK_BLINK_SEC)]
+            self._enter("ADMIN_MODE", now, once=blink * value)
+        elif kind == "min_pin" and int(self.properties.get("minimum_pin_length", 7)) <= value <= MAXIMUM_PIN_LENGTH:
+            self.minimum_pin_length = value
+            self._feedback(True, now, mode="ADMIN_MODE")
+        elif kind == "auto_lock" and 0 <= value <= 3:
+            self.unattended_auto_lock = value
+            self._feedback(True, now, mode="ADMIN_MODE")
+        else:
+            self._feedback(False, now, mode="ADMIN_MODE")
+
+
+class VirtualLedCamera:
+    """
+    cv2.VideoCapture stand-in that renders a VirtualApricornDevice's LEDs into
+    frames, for LogitechLedChecker(frame_source=...).
+    """
+
+    def __init__(self, device: VirtualApricornDevice, led_configs: Dict[str, Dict[str, Any]],
+                 fps: float = VIRTUAL_CAMERA_FPS, frame_size: Tuple[int, int] = (640, 480)):
+        """
+        Args:
+            device (VirtualApricornDevice): Device whose LEDs are rendered.
+            led_configs (Dict[str, Dict[str, Any]]): LED configs; each LED's ROI is
+                filled with its VIRTUAL_LED_ON_BGR colour while it is lit.
+            fps (float): Frame rate read() is paced to (changed via set(CAP_PROP_FPS)).
+            frame_size (Tuple[int, int]): (width, height) of the rendered frames.
+        """
+        self.device = device
+        self.led_configs = led_configs
+        self._properties: Dict[int, float] = {
+            cv2.CAP_PROP_FPS: float(fps),
+            cv2.CAP_PROP_FRAME_WIDTH: float(frame_size[0]),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(frame_size[1]),
+        }
+        self._opened = True
+        self._next_frame_at: Optional[float] = None
+        self._frame_cache: Dict[Tuple[Any, ...], np.ndarray] = {}
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def set(self, prop: int, value: float) -> bool:
+        self._properties[prop] = float(value)
+        return True
+
+    def get(self, prop: int) -> float:
+        return self._properties.get(prop, 0.0)
+
+    def release(self):
+        self._opened = False
+
+    def render(self, led_state: Dict[str, int]) -> np.ndarray:
+        width = int(self._properties[cv2.CAP_PROP_FRAME_WIDTH])
+        height = int(self._properties[cv2.CAP_PROP_FRAME_HEIGHT])
+        # Only a handful of LED combinations exist, so frames are rendered once per
+        # combination; under a simulated clock this is most of the per-frame cost.
+        cache_key = (width, height, tuple(sorted((key, bool(value)) for key, value in led_state.items())))
+        frame = self._frame_cache.get(cache_key)
+        if frame is None:
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[:] = VIRTUAL_BACKGROUND_BGR
+            for led_key, config in self.led_configs.items():
+                x, y, w, h = config["roi"]
+                color = VIRTUAL_LED_ON_BGR.get(led_key, (255, 255, 255)) if led_state.get(led_key) else VIRTUAL_LED_OFF_BGR
+                frame[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = color
+            self._frame_cache[cache_key] = frame
+        return frame.copy()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened:
+            return False, None
+        fps = self._properties.get(cv2.CAP_PROP_FPS) or VIRTUAL_CAMERA_FPS
+        clock = get_clock()
+        now = clock.monotonic()
+        if self._next_frame_at is not None and now < self._next_frame_at:
+            clock.sleep(self._next_frame_at - now)
+            now = self._next_frame_at
+        self._next_frame_at = now + 1.0 / fps
+        return True, self.render(self.device.led_state())
+
+
+class _VirtualDigitalChannel:
+    """Phidget22 DigitalOutput/DigitalInput stand-in wired to a VirtualApricornDevice."""
+
+    def __init__(self, device: VirtualApricornDevice, script_name: str, channel: int, is_output: bool):
+        self._device = device
+        self._script_name = script_name
+        self._channel = channel
+        self._is_output = is_output
+        self._state = False
+        self._attached = True
+
+    def getAttached(self) -> bool:
+        return self._attached
+
+    def getDeviceSerialNumber(self) -> int:
+        return 0
+
+    def getChannel(self) -> int:
+        return self._channel
+
+    def setState(self, state: bool):
+        self._state = bool(state)
+        self._device.set_output(self._script_name, self._state)
+
+    def getState(self) -> bool:
+        return self._state if self._is_output else self._device.read_input(self._script_name)
+
+    def close(self):
+        if self._is_output and self._state:
+            self.setState(False)
+        self._attached = False
+
+
+class SimulatedPhidgetController(PhidgetController):
+    """PhidgetController whose channels drive a VirtualApricornDevice instead of a Phidget board."""
+
+    def __init__(self, device: VirtualApricornDevice, script_map_config=None, device_configs=None,
+                 logger_instance=None):
+        self.device = device
+        super().__init__(script_map_config=script_map_config, device_configs=device_configs,
+                         logger_instance=logger_instance)
+
+    def _initialize_channels(self):
+        for type_name in ("outputs", "inputs"):
+            for script_name, map_info in self.script_map_config.get(type_name, {}).items():
+                unique_key = (map_info.get("phidget_id"), type_name, map_info.get("physical_channel"))
+                if unique_key not in self._opened_physical_channels:
+                    self._opened_physical_channels[unique_key] = _VirtualDigitalChannel(
+                        self.device, script_name, unique_key[2], type_name == "outputs")
+                self.channels[script_name] = self._opened_physical_channels[unique_key]
+                self._channel_keys[script_name] = unique_key
+        self.logger.debug("Simulated Phidget module initialized.")
+
+    def _get_channel_object(self, name, expected_type=None):
+        # Virtual channels are not Phidget22 classes; skip the type check.
+        return super()._get_channel_object(name)
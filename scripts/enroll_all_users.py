@@ -13,24 +13,18 @@ if PROJECT_ROOT_ENROLL not in sys.path:
     sys.path.insert(0, PROJECT_ROOT_ENROLL)
 # --- End Path Setup ---
 
-# This try/except block is for when the script is run directly
-try:
-    from automation_toolkit import get_at_controller, get_dut, get_fsm
-except Exception as e:
-    logging.basicConfig(level=logging.CRITICAL)
-    logging.critical(f"Failed to import or get controllers from automation_toolkit: {e}", exc_info=True)
-    sys.exit("Critical error during setup. See logs.")
-
 script_logger = logging.getLogger("EnrollAndTestUsersScript")
 
 # MODIFICATION: The function now accepts fsm and dut as arguments.
 # This allows us to pass in MOCKS during testing.
-def run_sequence(fsm, dut):
+def run_sequence(fsm, dut, session=None):
     """
     Executes a full device setup and test sequence.
     This function contains the core logic and is now testable.
     """
     script_logger.info("--- Starting Full Enrollment & Test Sequence ---")
+    if session is not None:
+        session.start_new_block(block_name="Enroll All Users", current_test_block=0)
     
     # 1. Power on
     script_logger.info(f"Initial FSM state: {fsm.state}")
@@ -42,8 +36,7 @@ def run_sequence(fsm, dut):
     # 2. Enroll Admin
     script_logger.info("--- Enrolling Admin PIN ---")
     admin_pin = ['key1', 'key1', 'key2', 'key2', 'key3', 'key3', 'key4', 'key4', 'unlock']
-    enroll_admin_ok = fsm.enroll_admin(new_pin=admin_pin)
-    assert enroll_admin_ok, "Admin enrollment failed."
+    fsm.enroll_admin_pin(admin_pin)
     assert fsm.state == 'ADMIN_MODE', "FSM did not transition to ADMIN_MODE."
     script_logger.info("Admin enrollment successful.")
     
@@ -59,9 +52,9 @@ def run_sequence(fsm, dut):
     for i in range(max_users_to_enroll):
         user_id = i + 1
         script_logger.info(f"--- Enrolling User {user_id} ---")
-        enrolled_id = fsm.enroll_user_pin(new_pin=user_pins[i])
-        assert enrolled_id is not None, f"Failed to enroll User {user_id}."
-        script_logger.info(f"Successfully enrolled User {user_id} into slot: {enrolled_id}")
+        fsm.enroll_user_pin(user_pins[i])
+        assert dut.user_pin[user_id] is not None, f"Failed to enroll User {user_id}."
+        script_logger.info(f"Successfully enrolled User {user_id}.")
 
     # 4. Power cycle to lock
     script_logger.info("--- Preparing for Unlock/Lock Tests by Power-Cycling ---")
@@ -88,15 +81,32 @@ def run_sequence(fsm, dut):
     fsm.unlock_admin()
     assert fsm.state == 'UNLOCKED_ADMIN'
     fsm.lock_admin()
-    assert fsm.state == 'ADMIN_MODE'
+    assert fsm.state == 'STANDBY_MODE'
     reset_ok = fsm.user_reset()
     assert reset_ok, "User reset failed."
     assert fsm.state == 'OOB_MODE'
     script_logger.info("Device successfully reset.")
 
+def run_station(station):
+    """
+    Station script for the multi-station orchestrator (controllers/orchestrator.py):
+    runs the sequence on one station's FSM, DUT model and session.
+    """
+    run_sequence(station.fsm, station.dut, station.session)
+    return {'final_state': station.fsm.state}
+
 # MODIFICATION: This block is now ONLY for running the script directly.
-# It gets the REAL fsm and dut and passes them to the function.
+# It gets the REAL fsm and dut and passes them to the function. The toolkit is
+# imported here, not at module level, so that importing this module in a station
+# worker does not build the global controller.
 if __name__ == "__main__":
+    try:
+        from automation_toolkit import get_at_controller, get_dut, get_fsm, get_session
+    except Exception as e:
+        logging.basicConfig(level=logging.CRITICAL)
+        logging.critical(f"Failed to import or get controllers from automation_toolkit: {e}", exc_info=True)
+        sys.exit("Critical error during setup. See logs.")
+
     fsm_real = get_fsm()
     dut_real = get_dut()
-    run_sequence(fsm_real, dut_real)
\ No newline at end of file
+    run_sequence(fsm_real, dut_real, get_session())
\ No newline at end of file
@@ -0,0 +1,108 @@
+# Filename: scripts/index_runs.py
+
+# Indexes the run directories under logs/ into a SQLite database and answers
+# cross-run questions from it (see controllers/run_index.py).
+#
+#   python scripts/index_runs.py ingest
+#   python scripts/index_runs.py failures --match ACCEPT_PATTERN
+#   python scripts/index_runs.py throughput --metric bw_mbps --job seq_write
+#   python scripts/index_runs.py runs --device ASK3-NX
+#
+# The query commands ingest new and changed runs first unless --no-ingest is given.
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Sequence
+
+# --- Path Setup ---
+SCRIPT_DIR_INDEX = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT_INDEX = os.path.dirname(SCRIPT_DIR_INDEX)
+if PROJECT_ROOT_INDEX not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT_INDEX)
+# --- End Path Setup ---
+
+from controllers.run_index import DEFAULT_LOGS_DIR, DEFAULT_RUN_INDEX_DB_PATH, RunIndex
+from controllers.session_journal import RECORD_FAILURE, RECORD_WARNING
+from controllers.speed_baseline import TRACKED_METRICS
+
+script_logger = logging.getLogger("RunIndex")
+
+
+def _format_cell(value: Any, column: str) -> str:
+    if value is None:
+        return "-"
+    if column in ("started_at", "first_seen"):
+        return datetime.datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def format_table(rows: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+    """Formats query rows as a fixed-width text table."""
+    if not rows:
+        return "(no rows)"
+    cells = [[_format_cell(row[column], column) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[index]) for line in cells)) for index, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Index run directories and query them across runs.")
+    parser.add_argument("--logs", default=DEFAULT_LOGS_DIR, help="Logs root to index (default: %(default)s).")
+    parser.add_argument("--db", default=DEFAULT_RUN_INDEX_DB_PATH, help="Index database (default: %(default)s).")
+    parser.add_argument("--no-ingest", action="store_true", help="Query the index as it is.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Ingest new and changed runs.")
+    ingest_parser.add_argument("--force", action="store_true", help="Re-ingest every run.")
+
+    failures_parser = commands.add_parser("failures", help="Failure reasons by device profile.")
+    failures_parser.add_argument("--match", default=None, help="Only reasons containing this text.")
+    failures_parser.add_argument("--device", default=None, help="Only this device name.")
+    failures_parser.add_argument("--warnings", action="store_true", help="Count warnings instead of failures.")
+    failures_parser.add_argument("--limit", type=int, default=20)
+
+    throughput_parser = commands.add_parser("throughput", help="Speed-test results per firmware.")
+    throughput_parser.add_argument("--metric", default="bw_mbps", choices=sorted(TRACKED_METRICS))
+    throughput_parser.add_argument("--device", default=None, help="Only this device name.")
+    throughput_parser.add_argument("--job", default=None, help="Only this fio job.")
+
+    runs_parser = commands.add_parser("runs", help="Most recent runs.")
+    runs_parser.add_argument("--device", default=None, help="Only this device name.")
+    runs_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    index = RunIndex(db_path=args.db, logger_instance=script_logger)
+    try:
+        if args.command == "ingest" or not args.no_ingest:
+            counts = index.ingest(args.logs, force=getattr(args, "force", False))
+            if args.command == "ingest":
+                return 1 if counts["failed"] else 0
+
+        if args.command == "failures":
+            rows = index.failure_histogram(match=args.match, device=args.device,
+                                           kind=RECORD_WARNING if args.warnings else RECORD_FAILURE, limit=args.limit)
+            print(format_table(rows, ("count", "runs", "device_name", "bridge_fw", "mcu_fw", "reason")))
+        elif args.command == "throughput":
+            rows = index.throughput_trend(metric=args.metric, device=args.device, job=args.job)
+            print(format_table(rows, ("device_name", "usb_mode", "job", "direction", "bridge_fw", "mcu_fw",
+                                      "first_seen", "runs", "mean", "min", "max")))
+        else:
+            rows = index.runs(device=args.device, limit=args.limit)
+            print(format_table(rows, ("started_at", "path", "device_name", "bridge_fw", "mcu_fw", "script_title",
+                                      "iterations", "failures", "warnings")))
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
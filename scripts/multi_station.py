@@ -0,0 +1,77 @@
+# Filename: scripts/multi_station.py
+
+# Runs one station script on every fixture of this host in parallel, one worker
+# process per station (see controllers/orchestrator.py).
+#
+#   python scripts/multi_station.py --stations stations.json --script scripts.enroll_all_users:run_station
+#   python scripts/multi_station.py --virtual 4 --script scripts.stress_loop_test:run_station --script-args config.json
+#
+# stations.json is a list of station configurations:
+#   [{"station_id": "A", "camera_id": 0, "phidget_serial": 612345, "dut_serial": "151234567890"},
+#    {"station_id": "B", "camera_id": 1, "phidget_serial": 612346, "dut_serial": "151234567891"}]
+# --script-args is a JSON object passed to the script as keyword arguments.
+# A station with a "metrics_port" serves its live metrics on that port
+# (http://127.0.0.1:<port>/metrics); --metrics-port gives every station one,
+# counting up from the given port.
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+
+# --- Path Setup ---
+SCRIPT_DIR_MULTI = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT_MULTI = os.path.dirname(SCRIPT_DIR_MULTI)
+if PROJECT_ROOT_MULTI not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT_MULTI)
+# --- End Path Setup ---
+
+from controllers.logging import setup_logging
+from controllers.orchestrator import DEFAULT_OUTPUT_DIR, STATUS_DONE, StationOrchestrator
+
+script_logger = logging.getLogger("MultiStation")
+
+
+def _load_json(path: str):
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run a station script on several fixtures in parallel.")
+    stations_group = parser.add_mutually_exclusive_group(required=True)
+    stations_group.add_argument("--stations", help="JSON file with the list of station configurations.")
+    stations_group.add_argument("--virtual", type=int, help="Run this many virtual-DUT stations.")
+    parser.add_argument("--script", default="scripts.enroll_all_users:run_station",
+                        help="Station script as module:function (default: %(default)s).")
+    parser.add_argument("--script-args", default=None, help="JSON file with the script's keyword arguments.")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve live metrics of station N on this port + N - 1 (overrides the stations file).")
+    parser.add_argument("--timeout", type=float, default=None, help="Terminate stations still running after this many seconds.")
+    args = parser.parse_args(argv)
+
+    run_dir = os.path.join(DEFAULT_OUTPUT_DIR, datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    setup_logging(log_file_path=os.path.join(run_dir, "orchestrator.log"), log_file_mode="w")
+
+    if args.stations:
+        stations = _load_json(args.stations)
+    else:
+        stations = [{"station_id": str(index), "virtual_dut": True, "dut_serial": f"VIRTUAL{index:08d}"}
+                    for index in range(1, args.virtual + 1)]
+    if args.metrics_port is not None:
+        for index, station in enumerate(stations):
+            station["metrics_port"] = args.metrics_port + index
+    script_kwargs = _load_json(args.script_args) if args.script_args else {}
+
+    orchestrator = StationOrchestrator(stations, args.script, script_kwargs=script_kwargs, output_dir=run_dir,
+                                       logger_instance=script_logger)
+    results = orchestrator.run(timeout_sec=args.timeout)
+    for station_id, status in results.items():
+        script_logger.info(f"Station {station_id}: {status['status']} (result: {status['result']}, error: {status['error']})")
+    return 0 if all(status["status"] == STATUS_DONE for status in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
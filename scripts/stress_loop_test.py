@@ -1,10 +1,11 @@
-import crashguard
+if __name__ == "__main__":
+    import crashguard
+import argparse
 import sys
 import os
 import logging
 from pprint import pprint
 import random
-import time
 from functools import partial
 
 # --- Path Setup ---
@@ -14,27 +15,53 @@ if PROJECT_ROOT_ENROLL not in sys.path:
     sys.path.insert(0, PROJECT_ROOT_ENROLL)
 # --- End Path Setup ---
 
-# This try/except block is for when the script is run directly
-try:
-    from automation_toolkit import get_at_controller, get_dut, get_fsm, get_session, get_pin_generator
-except Exception as e:
-    logging.basicConfig(level=logging.CRITICAL)
-    logging.critical(f"Failed to import or get controllers from automation_toolkit: {e}", exc_info=True)
-    sys.exit("Critical error during setup. See logs.")
-
-dut = get_dut()
-fsm = get_fsm()
-session = get_session()
-pin_gen = get_pin_generator()
-script_logger = logging.getLogger("stress_loop_testing")
+from controllers.coverage_walk import CoverageWalker
+from controllers.checkpoint import SessionCheckpointer
+from controllers.clock import get_clock
+from controllers.orchestrator import Station
 
-session.script_num = 0
-session.script_title = "Stress Loop Testing"
+script_logger = logging.getLogger("stress_loop_testing")
+SCRIPT_TITLE = "Stress Loop Testing"
+
+# The station under test. run_station() binds these for the process it runs in,
+# so the blocks below work on whichever fixture the process drives: the
+# automation_toolkit globals when run directly, or one orchestrator station.
+station = None
+dut = None
+fsm = None
+session = None
+pin_gen = None
+checkpointer = None
+loop_test = None
+
+def default_seed() -> int:
+    """The seed of the script's random choices (PINs, unlock options, power cycles, USB mode)."""
+    try:
+        return int(os.environ.get("STRESS_SEED", ""))
+    except ValueError:
+        return random.SystemRandom().randrange(2**32)
 
 class StressTesting:
-    def __init__(self):
+    def __init__(self, config: dict = None, resume_point: dict = None):
+        """
+        Args:
+            config: Answers to the start-up prompts, as returned by config(); the
+                    user is prompted when not given.
+            resume_point: Checkpointed progress of a resumed session.
+        """
         self.time_check: float = 0.0
         self.iteration: int = 0
+        self.resume_point = resume_point
+
+        if config:
+            self.test_list: list = config['test_list']
+            self.test_duration: float = config['test_duration']
+            self.power_cycle_config: dict = config['power_cycle_config']
+            self.speed_test_config: dict = config['speed_test_config']
+            self.usb_2_config: dict = config['usb_2_config']
+            script_logger.info(f"Resumed configuration: tests {self.test_list}, {self.test_duration}h each.")
+            return
+
         self.test_list: list = self._get_test_list()
         self.test_duration: float = self._get_test_duration()
 
@@ -42,6 +69,16 @@ class StressTesting:
         self.speed_test_config: dict = self._get_speed_test_config()
         self.usb_2_config: dict = self._get_usb2_config()
 
+    def config(self) -> dict:
+        """The answers to the start-up prompts, as stored in the checkpoint."""
+        return {
+            'test_list': self.test_list,
+            'test_duration': self.test_duration,
+            'power_cycle_config': self.power_cycle_config,
+            'speed_test_config': self.speed_test_config,
+            'usb_2_config': self.usb_2_config,
+        }
+
     def _get_list_from_user(self, eligible_tests: list, prompt: str) -> list[int]:
         """A generic helper to get a list of tests from user input."""
         selected_list = []
@@ -86,7 +123,8 @@ class StressTesting:
                  "Manufacturer Reset",
                  "User Reset",
                  "Power Cycle",
-                 "Read-only"]
+                 "Read-only",
+                 "Coverage Walk"]
         options = list(range(len(tests)))
 
         script_logger.info("Available tests:")
@@ -169,10 +207,10 @@ class StressTesting:
         """
         config = {'mode': 'no', 'list': []}
         valid_options = {'y', 'yes', 'n', 'no', 'r', 'random'}
-        eligible_tests = [t for t in self.test_list if t != 3] # Power cycle is test 3
+        eligible_tests = [t for t in self.test_list if t not in {3, 5}] # Power cycle is test 3; the walk power-cycles itself
 
         if not eligible_tests:
-            script_logger.info("No tests eligible for power cycling (Test 3 is excluded). Skipping.")
+            script_logger.info("No tests eligible for power cycling (Tests 3 & 5 are excluded). Skipping.")
             return config
 
         while True:
@@ -217,10 +255,10 @@ class StressTesting:
         """
         config = {'mode': 'no', 'list': []}
         valid_options = {'y', 'yes', 'n', 'no', 'r', 'random'}
-        eligible_tests = [t for t in self.test_list if t not in {2, 3}]
+        eligible_tests = [t for t in self.test_list if t not in {2, 3, 5}]
 
         if not eligible_tests:
-            script_logger.info("No tests eligible for speed testing (Tests 2 & 3 are excluded). Skipping.")
+            script_logger.info("No tests eligible for speed testing (Tests 2, 3 & 5 are excluded). Skipping.")
             return config
 
         while True:
@@ -329,6 +367,83 @@ class StressTesting:
         """Return elapsed time since blockStart in hours, rounded to 2 decimals."""
         return round((current_time - session.block_start_time) / 3600, 2)
 
+    def should_run_block(self, test_id: int) -> bool:
+        """True for selected blocks that have not already completed (in a resumed session)."""
+        return test_id in self.test_list and test_id not in checkpointer.progress['completed_blocks']
+
+    def enter_block(self, test_id: int, block_title: str, loop_state, needs_admin_pin: bool = False) -> bool:
+        """
+        Starts a block, or re-enters it when the session was resumed inside it.
+
+        Args:
+            test_id: The ID of the block.
+            block_title: The block's name in the session report.
+            loop_state: State (or list of states) each iteration of the block starts from.
+            needs_admin_pin: The loop unlocks with PINs enrolled during the block's setup.
+
+        Returns:
+            True when the loop can carry on from the checkpoint: the device has been
+            oriented into loop_state with the restored PINs. False when the block's
+            setup has to run (a new block, a crash during setup, or an orientation
+            that had to reset the device, which clears the PINs and can leave
+            loop_state out of reach).
+        """
+        resume, self.resume_point = self.resume_point, None
+        if resume is None or resume.get('block') != test_id:
+            session.start_new_block(block_name=block_title, current_test_block=test_id)
+            self.iteration = 0
+            checkpointer.progress.update(block=test_id, iteration=0, in_loop=False)
+            checkpointer.save(force=True)
+            return False
+
+        session.resume_block()
+        self.iteration = int(resume.get('iteration', 0))
+        if not resume.get('in_loop'):
+            return False
+        if not fsm.orient_for_block(target_state=loop_state, usb3=self.setUSBProtocol(test_id)):
+            script_logger.warning(f"Block {test_id} cannot resume its loop from {fsm.state}; re-running its setup.")
+            return False
+        return not (needs_admin_pin and not dut.admin_pin)
+
+    def loop_started(self, test_id: int):
+        """Checkpoints the end of the block's setup."""
+        checkpointer.progress.update(block=test_id, iteration=self.iteration, in_loop=True)
+        checkpointer.save(force=True)
+        station.report(block=test_id, iteration=self.iteration)
+
+    def iteration_done(self):
+        """Counts the iteration and checkpoints the loop position (at most once per CHECKPOINT_INTERVAL_SEC)."""
+        session.log_iteration()
+        checkpointer.progress['iteration'] = self.iteration
+        checkpointer.save()
+        station.report(iteration=self.iteration)
+
+    def orient_setup(self, test_id: int, target_state, usb3: bool = True) -> bool:
+        """
+        Orients the device for the block's setup.
+
+        Returns:
+            True when the device reached target_state. Otherwise the block is logged as
+            failed, the device is powered off and the block is ended without running its
+            setup or loop, so no trigger is fired from the wrong state.
+        """
+        if fsm.orient_for_block(target_state=target_state, usb3=usb3):
+            return True
+        session.log_failure(f"Block {test_id} could not orient the device into {target_state} "
+                            f"(left in {fsm.state}); skipping the block.")
+        if fsm.state != 'OFF':
+            fsm.power_off()
+        self.finish_block(test_id)
+        return False
+
+    def finish_block(self, test_id: int):
+        """Ends the block in the session and checkpoints it as completed."""
+        session.end_block()
+        checkpointer.progress['completed_blocks'].append(test_id)
+        checkpointer.progress.update(block=None, iteration=0, in_loop=False)
+        checkpointer.save(force=True)
+        station.report(completed_blocks=list(checkpointer.progress['completed_blocks']))
+
     
 def block_0():
     """
@@ -341,32 +456,33 @@ def block_0():
        data access, and then locks it again.
     4. Optionally runs a speed test while unlocked.
     5. Optionally power-cycles the device between iterations.
-    6. After the loop, it performs a user reset to clean the device for the next block.
+    6. After the loop, the device is powered off with its PINs still enrolled;
+       the next block's orientation resets it only if that block needs OOB mode.
     """
     test_id = 0
     block_title = 'PIN Unlock'
-    if test_id in loop_test.test_list:
-        session.start_new_block(block_name=block_title, current_test_block=test_id)
-        
-        # Determine initial USB protocol based on user/random settings
-        is_usb3_initial = loop_test.setUSBProtocol(test_id)
-        
-        # --- Initial Setup for the Block ---
-        script_logger.info(f"Setting up Block {test_id} ({block_title})...")
-        fsm.power_on(usb3=is_usb3_initial)
-        options = []
-        admin_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
-        fsm.enroll_admin_pin(new_pin_sequence=admin_pin['sequence'])
-        options.append(fsm.unlock_admin)
-        for i in range(1, dut.user_count+1):
-            user_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
-            fsm.enroll_user_pin(new_pin_sequence=user_pin['sequence'])
-            options.append(partial(fsm.unlock_user, user_id=i))
-        fsm.lock_admin()
+    if loop_test.should_run_block(test_id):
+        if not loop_test.enter_block(test_id, block_title, loop_state='STANDBY_MODE', needs_admin_pin=True):
+            # Determine initial USB protocol based on user/random settings
+            is_usb3_initial = loop_test.setUSBProtocol(test_id)
+
+            # --- Initial Setup for the Block ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            if not loop_test.orient_setup(test_id, 'OOB_MODE', usb3=is_usb3_initial):
+                return
+            admin_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
+            fsm.enroll_admin_pin(new_pin_sequence=admin_pin['sequence'])
+            for i in range(1, dut.user_count+1):
+                user_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
+                fsm.enroll_user_pin(new_pin_sequence=user_pin['sequence'])
+            fsm.lock_admin()
+
+        # Unlock with the admin PIN or any enrolled user PIN (read from the model, so a resumed block has them too).
+        options = [fsm.unlock_admin] + [partial(fsm.unlock_user, user_id=i) for i, pin in dut.user_pin.items() if pin]
         
         # --- Main Test Loop ---
-        loop_test.time_check = loop_test.timeComparison(time.time())
-        loop_test.iteration = 0
+        loop_test.loop_started(test_id)
+        loop_test.time_check = loop_test.timeComparison(get_clock().time())
         while loop_test.time_check < loop_test.test_duration:
             loop_test.iteration += 1
             script_logger.info(f"Beginning iteration {loop_test.iteration}: (Block {session.current_test_block}) (({loop_test.time_check:.2f}h of {loop_test.test_duration}h))")
@@ -387,14 +503,14 @@ def block_0():
                 is_usb3_cycle = loop_test.setUSBProtocol(test_id)
                 fsm.power_on(usb3=is_usb3_cycle)
                 
-            loop_test.time_check = loop_test.timeComparison(time.time())
+            loop_test.time_check = loop_test.timeComparison(get_clock().time())
+            loop_test.iteration_done()
         
         # --- Block Teardown ---
-        fsm.user_reset()
         fsm.power_off()
         script_logger.info("")
         script_logger.info(f"Block {test_id} complete after {loop_test.iteration} iteration(s).")
-        session.end_block()
+        loop_test.finish_block(test_id)
 
 def block_1():
     """
@@ -411,17 +527,19 @@ def block_1():
     """
     test_id = 1
     block_title = 'Manufacturer Reset'
-    if test_id in loop_test.test_list:
-        session.start_new_block(block_name=block_title, current_test_block=test_id)
-
-        # --- Initial Setup ---
-        script_logger.info(f"Setting up Block {test_id} ({block_title})...")
-        is_usb3_initial = loop_test.setUSBProtocol(test_id)
-        fsm.power_on(usb3=is_usb3_initial)
+    if loop_test.should_run_block(test_id):
+        # A manufacturer reset wipes the device anyway, so any idle mode will do.
+        idle_modes = ['FACTORY_MODE', 'OOB_MODE', 'STANDBY_MODE']
+        if not loop_test.enter_block(test_id, block_title, loop_state=idle_modes):
+            # --- Initial Setup ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            is_usb3_initial = loop_test.setUSBProtocol(test_id)
+            if not loop_test.orient_setup(test_id, idle_modes, usb3=is_usb3_initial):
+                return
         
         # --- Main Test Loop ---
-        loop_test.time_check = loop_test.timeComparison(time.time())
-        loop_test.iteration = 0
+        loop_test.loop_started(test_id)
+        loop_test.time_check = loop_test.timeComparison(get_clock().time())
         while loop_test.time_check < loop_test.test_duration:
             loop_test.iteration += 1
             script_logger.info(f"Beginning iteration {loop_test.iteration}: (Block {session.current_test_block}) (({loop_test.time_check:.2f}h of {loop_test.test_duration}h))")
@@ -439,13 +557,14 @@ def block_1():
                 is_usb3_cycle = loop_test.setUSBProtocol(test_id)
                 fsm.power_on(usb3=is_usb3_cycle)
             
-            loop_test.time_check = loop_test.timeComparison(time.time())
+            loop_test.time_check = loop_test.timeComparison(get_clock().time())
+            loop_test.iteration_done()
             
         # --- Block Teardown ---
         fsm.power_off()
         script_logger.info("")
         script_logger.info(f"Block {test_id} complete after {loop_test.iteration} iteration(s).")
-        session.end_block()
+        loop_test.finish_block(test_id)
 
 def block_2():
     """
@@ -461,17 +580,17 @@ def block_2():
     """
     test_id = 2
     block_title = 'User Reset'
-    if test_id in loop_test.test_list:
-        session.start_new_block(block_name=block_title, current_test_block=test_id)
-
-        # --- Initial Setup ---
-        script_logger.info(f"Setting up Block {test_id} ({block_title})...")
-        is_usb3_initial = loop_test.setUSBProtocol(test_id)
-        fsm.power_on(usb3=is_usb3_initial)
+    if loop_test.should_run_block(test_id):
+        if not loop_test.enter_block(test_id, block_title, loop_state='OOB_MODE'):
+            # --- Initial Setup ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            is_usb3_initial = loop_test.setUSBProtocol(test_id)
+            if not loop_test.orient_setup(test_id, 'OOB_MODE', usb3=is_usb3_initial):
+                return
         
         # --- Main Test Loop ---
-        loop_test.time_check = loop_test.timeComparison(time.time())
-        loop_test.iteration = 0
+        loop_test.loop_started(test_id)
+        loop_test.time_check = loop_test.timeComparison(get_clock().time())
         while loop_test.time_check < loop_test.test_duration:
             loop_test.iteration += 1
             script_logger.info(f"Beginning iteration {loop_test.iteration}: (Block {session.current_test_block}) (({loop_test.time_check:.2f}h of {loop_test.test_duration}h))")
@@ -488,13 +607,14 @@ def block_2():
                 is_usb3_cycle = loop_test.setUSBProtocol(test_id)
                 fsm.power_on(usb3=is_usb3_cycle)
 
-            loop_test.time_check = loop_test.timeComparison(time.time())
+            loop_test.time_check = loop_test.timeComparison(get_clock().time())
+            loop_test.iteration_done()
 
         # --- Block Teardown ---
         fsm.power_off()
         script_logger.info("")
         script_logger.info(f"Block {test_id} complete after {loop_test.iteration} iteration(s).")
-        session.end_block()
+        loop_test.finish_block(test_id)
 
 def block_3():
     """
@@ -509,16 +629,17 @@ def block_3():
     """
     test_id = 3
     block_title = 'Power Cycle'
-    if test_id in loop_test.test_list:
-        session.start_new_block(block_name=block_title, current_test_block=test_id)
-
-        # --- Initial Setup ---
-        script_logger.info(f"Setting up Block {test_id} ({block_title})...")
-        # No device setup needed for this block.
+    if loop_test.should_run_block(test_id):
+        if not loop_test.enter_block(test_id, block_title, loop_state='OFF'):
+            # --- Initial Setup ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            # Each iteration powers the device on from OFF.
+            if not loop_test.orient_setup(test_id, 'OFF'):
+                return
         
         # --- Main Test Loop ---
-        loop_test.time_check = loop_test.timeComparison(time.time())
-        loop_test.iteration = 0
+        loop_test.loop_started(test_id)
+        loop_test.time_check = loop_test.timeComparison(get_clock().time())
         while loop_test.time_check < loop_test.test_duration:
             loop_test.iteration += 1
             script_logger.info(f"Beginning iteration {loop_test.iteration}: (Block {session.current_test_block}) (({loop_test.time_check:.2f}h of {loop_test.test_duration}h))")
@@ -528,12 +649,13 @@ def block_3():
             fsm.power_on(usb3=is_usb3_cycle)
             fsm.power_off()
             
-            loop_test.time_check = loop_test.timeComparison(time.time())
+            loop_test.time_check = loop_test.timeComparison(get_clock().time())
+            loop_test.iteration_done()
 
         # --- Block Teardown ---
         script_logger.info("")
         script_logger.info(f"Block {test_id} complete after {loop_test.iteration} iteration(s).")
-        session.end_block()
+        loop_test.finish_block(test_id)
 
 def block_4():
     """
@@ -545,27 +667,28 @@ def block_4():
     3. In each iteration, it unlocks the device with the Admin PIN and performs
        a format operation to verify read-only, and then locks it again.
     4. Optionally power-cycles the device between iterations.
-    5. After the loop, it performs a user reset to clean the device for the next block.
+    5. After the loop, the device is powered off with its Admin PIN still enrolled;
+       the next block's orientation resets it only if that block needs OOB mode.
     """
     test_id = 4
     block_title = 'Read-Only'
-    if test_id in loop_test.test_list:
-        session.start_new_block(block_name=block_title, current_test_block=test_id)
-        
-        # Determine initial USB protocol based on user/random settings
-        is_usb3_initial = loop_test.setUSBProtocol(test_id)
-        
-        # --- Initial Setup for the Block ---
-        script_logger.info(f"Setting up Block {test_id} ({block_title})...")
-        fsm.power_on(usb3=is_usb3_initial)
-        admin_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
-        fsm.enroll_admin_pin(new_pin_sequence=admin_pin['sequence'])
-        fsm.toggle_read_only()
-        fsm.lock_admin()
+    if loop_test.should_run_block(test_id):
+        if not loop_test.enter_block(test_id, block_title, loop_state='STANDBY_MODE', needs_admin_pin=True):
+            # Determine initial USB protocol based on user/random settings
+            is_usb3_initial = loop_test.setUSBProtocol(test_id)
+
+            # --- Initial Setup for the Block ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            if not loop_test.orient_setup(test_id, 'OOB_MODE', usb3=is_usb3_initial):
+                return
+            admin_pin = pin_gen.generate_valid_pin(dut.minimum_pin_counter)
+            fsm.enroll_admin_pin(new_pin_sequence=admin_pin['sequence'])
+            fsm.toggle_read_only()
+            fsm.lock_admin()
         
         # --- Main Test Loop ---
-        loop_test.time_check = loop_test.timeComparison(time.time())
-        loop_test.iteration = 0
+        loop_test.loop_started(test_id)
+        loop_test.time_check = loop_test.timeComparison(get_clock().time())
         while loop_test.time_check < loop_test.test_duration:
             loop_test.iteration += 1
             script_logger.info(f"Beginning iteration {loop_test.iteration}: (Block {session.current_test_block}) (({loop_test.time_check:.2f}h of {loop_test.test_duration}h))")
@@ -583,22 +706,126 @@ def block_4():
                 is_usb3_cycle = loop_test.setUSBProtocol(test_id)
                 fsm.power_on(usb3=is_usb3_cycle)
                 
-            loop_test.time_check = loop_test.timeComparison(time.time())
+            loop_test.time_check = loop_test.timeComparison(get_clock().time())
+            loop_test.iteration_done()
         
         # --- Block Teardown ---
-        fsm.user_reset()
         fsm.power_off()
         script_logger.info("")
         script_logger.info(f"Block {test_id} complete after {loop_test.iteration} iteration(s).")
-        session.end_block()
+        loop_test.finish_block(test_id)
 
-# Start Script ------------------------------------------------------------------- #
-# Execute Block Testing ---------------- #
+def block_5():
+    """
+    Executes a coverage-guided random walk over the FSM model.
 
-loop_test = StressTesting()
+    Test Flow:
+    1. Orients the device into any idle mode.
+    2. For the specified duration, fires the enabled trigger with the most new
+       transition/state-pair coverage per expected second (see CoverageWalker),
+       heading for uncovered parts of the model once the current state is exhausted.
+    3. Writes the seed, the step trace and the coverage summary to logs/.
+       Re-running with MODEL_WALK_SEED set to the logged seed repeats the walk.
+       A resumed block starts a new walk for the rest of the block's duration.
+    """
+    test_id = 5
+    block_title = 'Coverage Walk'
+    if loop_test.should_run_block(test_id):
+        if not loop_test.enter_block(test_id, block_title, loop_state=['OOB_MODE', 'STANDBY_MODE']):
+            # --- Initial Setup ---
+            script_logger.info(f"Setting up Block {test_id} ({block_title})...")
+            is_usb3_initial = loop_test.setUSBProtocol(test_id)
+            if not loop_test.orient_setup(test_id, ['OOB_MODE', 'STANDBY_MODE'], usb3=is_usb3_initial):
+                return
+        walker = CoverageWalker(fsm, pin_generator=pin_gen, usb3=partial(loop_test.setUSBProtocol, test_id))
+        script_logger.info(f"Coverage walk seed: {walker.seed}")
 
-functions = [block_0, block_1, block_2, block_3, block_4]
-for func in functions:
-    func()
+        # --- Main Test Loop ---
+        loop_test.loop_started(test_id)
+        remaining_sec = loop_test.test_duration * 3600 - (get_clock().time() - session.block_start_time)
+        coverage = walker.run(duration_sec=max(0.0, remaining_sec))
+        loop_test.iteration += len(walker.trace)
+        script_logger.info(f"Covered {coverage['transitions_covered']}/{coverage['transitions_total']} transitions; trace: {walker.write_trace()}")
 
-session.generate_summary_report()
+        # --- Block Teardown ---
+        if fsm.state != 'OFF':
+            fsm.power_off()
+        script_logger.info("")
+        script_logger.info(f"Block {test_id} complete after {loop_test.iteration} step(s).")
+        loop_test.finish_block(test_id)
+
+# Start Script ------------------------------------------------------------------- #
+# Execute Block Testing ---------------- #
+
+def run_station(target: Station, config: dict = None, resume: bool = False,
+                checkpoint: str = None, seed: int = None) -> dict:
+    """
+    Runs the selected blocks on one station.
+
+    Args:
+        target: The station to test.
+        config: Answers to the start-up prompts (see StressTesting.config()). Required
+                in an orchestrator worker, which has no console to prompt on.
+        resume: Continue the session saved in the checkpoint.
+        checkpoint: Checkpoint file. Defaults to the station's output directory, or
+                    logs/stress_checkpoint.json for a station without one.
+        seed: Seed of the script's random choices. Defaults to STRESS_SEED or a random seed.
+
+    Returns:
+        The seed and the completed blocks.
+    """
+    global station, dut, fsm, session, pin_gen, checkpointer, loop_test
+    station = target
+    dut, fsm, session, pin_gen = target.dut, target.fsm, target.session, target.pin_gen
+    session.script_num = 0
+    session.script_title = SCRIPT_TITLE
+    if checkpoint is None and target.output_dir:
+        checkpoint = os.path.join(target.output_dir, "stress_checkpoint.json")
+    seed = default_seed() if seed is None else seed
+    checkpointer = SessionCheckpointer(fsm, session, dut, path=checkpoint, seed=seed)
+
+    resume_point = None
+    if resume:
+        saved = checkpointer.load()
+        if saved is None:
+            sys.exit(f"No checkpoint to resume from at {checkpointer.path}.")
+        checkpointer.restore(saved)
+        resume_point = dict(checkpointer.progress)
+        script_logger.info(f"Resuming session (seed {checkpointer.seed}).")
+    else:
+        random.seed(seed)
+        script_logger.info(f"Random seed: {seed}")
+
+    if resume_point:
+        config = checkpointer.config
+    loop_test = StressTesting(config=config, resume_point=resume_point)
+    checkpointer.config = loop_test.config()
+    checkpointer.progress.setdefault('completed_blocks', [])
+    checkpointer.attach()
+
+    functions = [block_0, block_1, block_2, block_3, block_4, block_5]
+    for func in functions:
+        func()
+
+    session.generate_summary_report()
+    # The session finished; there is nothing left to resume.
+    checkpointer.clear()
+    return {'seed': checkpointer.seed, 'completed_blocks': list(checkpointer.progress['completed_blocks'])}
+
+if __name__ == "__main__":
+    try:
+        from automation_toolkit import get_at_controller, get_dut, get_fsm, get_session, get_pin_generator
+    except Exception as e:
+        logging.basicConfig(level=logging.CRITICAL)
+        logging.critical(f"Failed to import or get controllers from automation_toolkit: {e}", exc_info=True)
+        sys.exit("Critical error during setup. See logs.")
+
+    parser = argparse.ArgumentParser(description=SCRIPT_TITLE)
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the session saved in the checkpoint instead of starting a new one.")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (default: logs/stress_checkpoint.json).")
+    args, _ = parser.parse_known_args()
+
+    run_station(Station("local", get_at_controller(), get_dut(), get_session(), get_fsm(), pin_gen=get_pin_generator()),
+                resume=args.resume, checkpoint=args.checkpoint)
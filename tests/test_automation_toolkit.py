@@ -18,6 +18,8 @@ import importlib
 import io
 import logging
 
+from controllers.logging import stop_logging
+
 # Patch UnifiedController during import so tests never trigger the physical barcode scanner.
 _initial_uc_patcher = patch("controllers.unified_controller.UnifiedController")
 MockUnifiedController = _initial_uc_patcher.start()
@@ -349,6 +351,8 @@ class TestAutomationToolkit:
         # WHEN: The toolkit module is reloaded, and we redirect all stdout to our buffer
         with redirect_stdout(f):
             importlib.reload(at_toolkit)
+            # The console is written by the logging listener thread: drain it before reading.
+            stop_logging()
 
         # THEN: atexit.register should NOT have been called.
         mock_register.assert_not_called()
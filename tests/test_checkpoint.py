@@ -0,0 +1,222 @@
+# Directory: tests/
+# Filename: test_checkpoint.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/checkpoint.py.
+##
+## Run this test with the following command:
+## pytest tests/test_checkpoint.py --cov=controllers.checkpoint --cov-report term-missing
+##
+#############################################################
+
+import json
+import os
+import random
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from controllers.checkpoint import CHECKPOINT_VERSION, SessionCheckpointer, atomic_write_json
+from controllers.finite_state_machine import ApricornDeviceFSM, DeviceUnderTest, TestSession
+from controllers.fio_results import FioDirectionResult, FioJobResult
+
+
+def _rig():
+    at = MagicMock()
+    at.scan_barcode.return_value = "TEST_SERIAL_123"
+    dut = DeviceUnderTest(at_controller=at)
+    session = TestSession(at_controller=at, dut_instance=dut)
+    session.speed_baseline = None
+    fsm = ApricornDeviceFSM(at_controller=at, session_instance=session, dut_instance=dut)
+    return SimpleNamespace(at=at, dut=dut, session=session, fsm=fsm)
+
+
+@pytest.fixture
+def rig():
+    return _rig()
+
+
+@pytest.fixture
+def checkpointer(rig, tmp_path):
+    return SessionCheckpointer(rig.fsm, rig.session, rig.dut, path=str(tmp_path / "checkpoint.json"),
+                               interval_sec=60, seed=7)
+
+
+def test_atomic_write_replaces_and_leaves_no_temp_files(tmp_path):
+    path = tmp_path / "state.json"
+    atomic_write_json(str(path), {"a": [1, 2]})
+    atomic_write_json(str(path), {"a": [3]})
+    assert path.read_text() == '{"a":[3]}'
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_failed_write_keeps_previous_checkpoint(tmp_path):
+    path = tmp_path / "state.json"
+    atomic_write_json(str(path), {"generation": 1})
+    with patch("controllers.checkpoint.os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            atomic_write_json(str(path), {"generation": 2})
+    assert json.loads(path.read_text()) == {"generation": 1}
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_round_trip_restores_model_metrics_rng_and_position(rig, checkpointer):
+    rig.session.start_new_block(block_name="PIN Unlock", current_test_block=0)
+    rig.session.log_failure("boom")
+    rig.session.log_key_press("key1")
+    rig.session.speed_test_results.append({'block': 0, 'jobs': {'W': FioJobResult(
+        name='W', write=FioDirectionResult(bw_mbps=100.0, iops=95.0, io_bytes=1, runtime_s=1.0))}})
+    rig.dut.admin_pin = ['key1', 'key2', 'unlock']
+    rig.dut.user_pin[2] = ['key3', 'key4', 'unlock']
+    rig.dut.read_only_enabled = True
+    rig.fsm.machine.set_state("UNLOCKED_ADMIN")
+    checkpointer.progress = {'block': 0, 'iteration': 41, 'in_loop': True, 'completed_blocks': []}
+    checkpointer.config = {'test_list': [0, 4], 'test_duration': 24.0}
+    random.seed(99)
+    assert checkpointer.save(force=True)
+    expected_draws = [random.random() for _ in range(3)]
+
+    fresh = _rig()
+    restored = SessionCheckpointer(fresh.fsm, fresh.session, fresh.dut, path=checkpointer.path)
+    checkpoint = restored.load()
+    assert checkpoint["version"] == CHECKPOINT_VERSION and checkpoint["fsm_state"] == "UNLOCKED_ADMIN"
+    random.seed(0)
+    restored.restore(checkpoint)
+
+    assert [random.random() for _ in range(3)] == expected_draws
+    assert fresh.dut.admin_pin == ['key1', 'key2', 'unlock']
+    assert fresh.dut.user_pin == rig.dut.user_pin and fresh.dut.user_pin[2] == ['key3', 'key4', 'unlock']
+    assert fresh.dut.read_only_enabled is True
+    assert fresh.session.failure_block == {0: ["boom"]} and fresh.session.block_failure_count == {0: 1}
+    assert fresh.session.test_blocks == {0: "PIN Unlock"} and fresh.session.key_press_totals == {"key1": 1}
+    assert fresh.session.speed_test_results[0]['jobs']['W'].write.bw_mbps == 100.0
+    assert restored.progress['iteration'] == 41 and restored.config['test_list'] == [0, 4]
+    assert restored.seed == 7
+    # The device is powered off so the block's orientation can bring it back up.
+    assert fresh.fsm.state == "OFF"
+    fresh.at.off.assert_any_call("connect")
+
+
+def test_periodic_saves_are_throttled(checkpointer):
+    assert checkpointer.save() is True
+    assert checkpointer.save() is False
+    assert checkpointer.save(force=True) is True
+    assert checkpointer.saves == 2
+
+
+def test_dut_model_change_saves_immediately(rig, checkpointer):
+    checkpointer.attach()
+    checkpointer.save()
+    checkpointer._after_trigger(SimpleNamespace(result=True))
+    assert checkpointer.saves == 1
+
+    rig.dut.admin_pin = ['key1', 'key2', 'unlock']
+    checkpointer._after_trigger(SimpleNamespace(result=False))
+    assert checkpointer.saves == 1
+    checkpointer._after_trigger(SimpleNamespace(result=True))
+    assert checkpointer.saves == 2
+    assert json.loads(open(checkpointer.path).read())["dut"]["admin_pin"] == ['key1', 'key2', 'unlock']
+    assert checkpointer._after_trigger in rig.fsm.transition_listeners
+
+
+def test_write_errors_do_not_stop_the_run(checkpointer):
+    with patch("controllers.checkpoint.atomic_write_json", side_effect=OSError("read-only file system")):
+        assert checkpointer.save(force=True) is False
+    assert checkpointer.saves == 0
+
+
+def test_load_rejects_missing_corrupt_and_foreign_checkpoints(checkpointer):
+    assert checkpointer.load() is None
+    with open(checkpointer.path, "w") as handle:
+        handle.write('{"version": 1, "dut": ')
+    assert checkpointer.load() is None
+    atomic_write_json(checkpointer.path, {"version": CHECKPOINT_VERSION + 1})
+    assert checkpointer.load() is None
+
+    checkpointer.clear()
+    assert not os.path.exists(checkpointer.path)
+    checkpointer.clear()
+
+
+def test_resumed_standby_block_reruns_setup_when_only_a_reset_recovers(rig, checkpointer, monkeypatch):
+    from scripts import stress_loop_test as script
+
+    rig.session.start_new_block(block_name="PIN Unlock", current_test_block=0)
+    rig.dut.admin_pin = ['key1', 'key2', 'unlock']
+    rig.dut.provision_lock = False
+    checkpointer.progress = {'block': 0, 'iteration': 7, 'in_loop': True, 'completed_blocks': []}
+    checkpointer.save(force=True)
+    restored = checkpointer.load()
+    checkpointer.restore(restored)
+    assert rig.fsm.state == "OFF"
+
+    # Powering up to STANDBY_MODE fails, so orientation resets the device, clearing the admin PIN.
+    navigate_to = rig.fsm.navigate_to
+    rig.fsm.navigate_to = MagicMock(side_effect=lambda target, usb3=True: rig.fsm.navigate_to.call_count > 1 and navigate_to(target, usb3=usb3))
+
+    def reset():
+        rig.dut.admin_pin = []
+        rig.fsm.machine.set_state("OOB_MODE")
+        return True
+
+    rig.fsm.user_reset = MagicMock(side_effect=reset)
+    config = {'test_list': [0], 'test_duration': 1.0, 'power_cycle_config': {'mode': 'no', 'list': []},
+              'speed_test_config': {'mode': 'no', 'list': []}, 'usb_2_config': {'mode': 'no', 'list': []}}
+    for name, value in (('fsm', rig.fsm), ('dut', rig.dut), ('session', rig.session), ('checkpointer', checkpointer)):
+        monkeypatch.setattr(script, name, value)
+    loop_test = script.StressTesting(config=config, resume_point=dict(checkpointer.progress))
+
+    assert loop_test.enter_block(0, "PIN Unlock", loop_state='STANDBY_MODE', needs_admin_pin=True) is False
+    rig.fsm.user_reset.assert_called_once()
+    assert rig.fsm.state == "OOB_MODE" and loop_test.iteration == 7
+
+
+def test_block_setup_is_skipped_when_orientation_fails(rig, checkpointer, monkeypatch):
+    from scripts import stress_loop_test as script
+
+    config = {'test_list': [0], 'test_duration': 1.0, 'power_cycle_config': {'mode': 'no', 'list': []},
+              'speed_test_config': {'mode': 'no', 'list': []}, 'usb_2_config': {'mode': 'no', 'list': []}}
+    checkpointer.progress = {'block': None, 'iteration': 0, 'in_loop': False, 'completed_blocks': []}
+    loop_test = script.StressTesting(config=config)
+    for name, value in (('fsm', rig.fsm), ('dut', rig.dut), ('session', rig.session), ('checkpointer', checkpointer),
+                        ('station', MagicMock()), ('pin_gen', MagicMock()), ('loop_test', loop_test)):
+        monkeypatch.setattr(script, name, value)
+    rig.fsm.orient_for_block = MagicMock(return_value=False)
+    rig.fsm.enroll_admin_pin = MagicMock()
+
+    script.block_0()
+    rig.fsm.enroll_admin_pin.assert_not_called()
+    assert rig.session.block_failure_count[0] == 1
+    assert "could not orient the device into OOB_MODE" in rig.session.failure_block[0][0]
+    assert checkpointer.progress['completed_blocks'] == [0] and rig.fsm.state == "OFF"
+
+
+def test_dut_fields_are_typed_and_whitelisted(rig, checkpointer):
+    rig.dut.admin_pin = {'key1', 'key2'}
+    with pytest.raises(TypeError, match="admin_pin"):
+        checkpointer.save(force=True)
+    rig.dut.admin_pin = ['key1', 'key2', 'unlock']
+    rig.dut.brute_force_counter = True
+    with pytest.raises(TypeError, match="brute_force_counter"):
+        rig.dut.checkpoint_state()
+    rig.dut.brute_force_counter = 20
+    # A value JSON cannot hold inside an allowed field fails the save too, rather than becoming a string.
+    rig.dut.user_pin[1] = [object()]
+    with pytest.raises(TypeError):
+        checkpointer.save(force=True)
+    assert not os.path.exists(checkpointer.path)
+    rig.dut.user_pin[1] = None
+
+    state = json.loads(json.dumps(rig.dut.checkpoint_state()))
+    assert 'at' not in state and 'serial_number' not in state and 'bridge_fw' not in state
+    fresh = _rig().dut
+    with pytest.raises(TypeError, match="read_only_enabled"):
+        fresh.restore_checkpoint_state(dict(state, read_only_enabled="True", admin_pin=['key9']))
+    assert fresh.admin_pin == []
+    with pytest.raises(ValueError, match="at"):
+        fresh.restore_checkpoint_state(dict(state, at="<controller>"))
+    fresh.restore_checkpoint_state(state)
+    assert fresh.user_pin == rig.dut.user_pin and fresh.recovery_pin_used == rig.dut.recovery_pin_used
@@ -0,0 +1,166 @@
+# Directory: tests/
+# Filename: test_clock.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/clock.py.
+##
+## Run this test with the following command:
+## pytest tests/test_clock.py --cov=controllers.clock --cov-report term-missing
+##
+#############################################################
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from controllers.clock import Clock, Deadline, SimulatedClock, get_clock, set_clock, CLOCK_POLL_INTERVAL_SEC
+
+
+@pytest.fixture
+def restore_clock():
+    previous = get_clock()
+    yield
+    set_clock(previous)
+
+
+class TestClock:
+    def test_forwards_to_time_module(self):
+        clock = Clock()
+        with patch('time.time', return_value=123.0), patch('time.monotonic', return_value=4.5), \
+                patch('time.sleep') as mock_sleep:
+            assert clock.time() == 123.0
+            assert clock.monotonic() == 4.5
+            clock.sleep(2)
+        mock_sleep.assert_called_once_with(2)
+
+    def test_idle_is_a_no_op(self):
+        with patch('time.sleep') as mock_sleep:
+            Clock().idle()
+        mock_sleep.assert_not_called()
+
+    def test_wait_for_polls_until_true(self):
+        values = iter([False, False, True])
+        assert Clock().wait_for(lambda: next(values), timeout=1.0, poll_interval=0.001) is True
+
+    def test_wait_for_times_out(self):
+        assert Clock().wait_for(lambda: False, timeout=0.02, poll_interval=0.005) is False
+
+    def test_wait_for_blocks_on_condition(self):
+        condition = threading.Condition()
+        state = {"ready": False}
+
+        def _notify():
+            with condition:
+                state["ready"] = True
+                condition.notify_all()
+
+        timer = threading.Timer(0.01, _notify)
+        timer.start()
+        assert Clock().wait_for(lambda: state["ready"], timeout=2.0, condition=condition) is True
+        timer.join()
+
+    def test_deadline(self):
+        clock = SimulatedClock(start=0.0)
+        deadline = clock.deadline(5)
+        assert isinstance(deadline, Deadline)
+        assert deadline.remaining() == 5
+        clock.advance(3)
+        assert deadline.elapsed() == 3 and not deadline.expired()
+        clock.advance(3)
+        assert deadline.expired() and deadline.remaining() == 0
+
+
+class TestSimulatedClock:
+    def test_single_actor_sleeps_instantly(self):
+        clock = SimulatedClock(start=1000.0)
+        started = time.monotonic()
+        clock.sleep(8 * 3600)
+        assert time.monotonic() - started < 1.0
+        assert clock.monotonic() == 8 * 3600
+        assert clock.time() == 1000.0 + 8 * 3600
+
+    def test_actors_wake_in_virtual_order(self):
+        clock = SimulatedClock(start=0.0)
+        order = []
+        ready = threading.Barrier(2)
+
+        def _actor(name, delays):
+            clock.register_actor()
+            ready.wait()
+            for delay in delays:
+                clock.sleep(delay)
+                order.append((clock.monotonic(), name))
+
+        threads = [threading.Thread(target=_actor, args=("a", [1.0, 1.0, 1.0])),
+                   threading.Thread(target=_actor, args=("b", [1.5, 1.5]))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        assert [entry[0] for entry in order] == [1.0, 1.5, 2.0, 3.0, 3.0]
+
+    def test_running_actor_holds_time(self):
+        clock = SimulatedClock(start=0.0)
+        release = threading.Event()
+        clock.register_actor()
+
+        def _sleeper():
+            clock.sleep(10)
+            release.set()
+
+        thread = threading.Thread(target=_sleeper)
+        thread.start()
+        assert not release.wait(0.2)
+        assert clock.monotonic() == 0.0
+        clock.release_actor()
+        assert release.wait(2.0)
+        thread.join()
+        assert clock.monotonic() == 10.0
+
+    def test_exited_actor_does_not_stall(self):
+        clock = SimulatedClock(start=0.0)
+        thread = threading.Thread(target=clock.register_actor)
+        thread.start()
+        thread.join()
+        clock.sleep(1)
+        assert clock.monotonic() == 1.0
+
+    def test_idle_lets_one_poll_interval_pass(self):
+        clock = SimulatedClock(start=0.0)
+        clock.idle()
+        assert clock.monotonic() == CLOCK_POLL_INTERVAL_SEC
+
+    def test_wait_for_polls_on_virtual_time(self):
+        clock = SimulatedClock(start=0.0)
+        assert clock.wait_for(lambda: clock.monotonic() >= 2.0, timeout=5, poll_interval=0.5) is True
+        assert clock.monotonic() == 2.0
+        condition = threading.Condition()
+        assert clock.wait_for(lambda: False, timeout=3, condition=condition) is False
+        assert clock.monotonic() == 5.0
+
+
+class TestClockService:
+    def test_set_clock_returns_previous(self, restore_clock):
+        simulated = SimulatedClock()
+        previous = set_clock(simulated)
+        assert get_clock() is simulated
+        assert set_clock(None) is simulated
+        assert type(get_clock()) is Clock
+        assert not previous.is_simulated
+
+    def test_phidget_hold_uses_clock(self, restore_clock):
+        from controllers.virtual_dut import VirtualApricornDevice, SimulatedPhidgetController
+        simulated = SimulatedClock(start=5000.0)
+        set_clock(simulated)
+        device = VirtualApricornDevice(device_name="ask3nx-3861f", battery=False)
+        phidget = SimulatedPhidgetController(device)
+        phidget.on("connect")
+        phidget.hold("key1", 60_000)
+        assert simulated.monotonic() == 60.0
+        assert device.mode == "OOB_MODE"
+        assert phidget.actuation_timeline[-1][0] == 5060.0
+        phidget.close_all()
@@ -0,0 +1,169 @@
+# Directory: tests/
+# Filename: test_coverage_walk.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/coverage_walk.py.
+##
+## Run this test with the following command:
+## pytest tests/test_coverage_walk.py --cov=controllers.coverage_walk --cov-report term-missing
+##
+#############################################################
+
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from controllers.coverage_walk import CoverageWalker
+from controllers.finite_state_machine import TransitionCallbackError
+from controllers.state_navigator import TransitionCostModel
+from utils.pin_generator import PINGenerator
+
+
+class FakeFSM:
+    """Just enough of ApricornDeviceFSM: a transition table whose triggers move `state`."""
+
+    STATES = ['OFF', 'POWER_ON_SELF_TEST', 'STANDBY_MODE', 'ADMIN_MODE', 'UNLOCKED_ADMIN', 'UNLOCKED_USER']
+
+    def __init__(self):
+        self.state = 'OFF'
+        self.dut = SimpleNamespace(admin_pin=['key1', 'unlock'], user_pin={1: None, 2: None},
+                                   minimum_pin_counter=7, self_destruct_pin=[])
+        self.transition_costs = TransitionCostModel()
+        self.fired = []
+        self.failing = set()
+        self.transition_config = [
+            {'trigger': 'power_on', 'source': 'OFF', 'dest': 'POWER_ON_SELF_TEST'},
+            {'trigger': 'power_off', 'source': '*', 'dest': 'OFF'},
+            {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'STANDBY_MODE'},
+            {'trigger': 'admin_mode_login', 'source': 'STANDBY_MODE', 'dest': 'ADMIN_MODE'},
+            {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'STANDBY_MODE'},
+            {'trigger': 'toggle_read_only', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE'},
+            {'trigger': 'unlock_admin', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN'},
+            {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'STANDBY_MODE'},
+            {'trigger': 'unlock_user', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_USER'},
+            {'trigger': 'lock_user', 'source': 'UNLOCKED_USER', 'dest': 'STANDBY_MODE'},
+            {'trigger': 'fail_unlock', 'source': 'STANDBY_MODE', 'dest': 'STANDBY_MODE'},
+        ]
+
+    def __getattr__(self, trigger):
+        if trigger.startswith('_'):
+            raise AttributeError(trigger)
+
+        def _fire(**kwargs):
+            self.fired.append((trigger, kwargs))
+            if trigger in self.failing:
+                raise TransitionCallbackError(f"{trigger} failed")
+            for transition in self.transition_config:
+                sources = self.STATES if transition['source'] == '*' else [transition['source']]
+                if transition['trigger'] == trigger and self.state in sources:
+                    self.state = 'STANDBY_MODE' if transition['dest'] == 'POWER_ON_SELF_TEST' else transition['dest']
+                    return True
+            return False
+        return _fire
+
+
+@pytest.fixture
+def fake_fsm():
+    return FakeFSM()
+
+
+def test_walk_covers_model_and_skips_excluded(fake_fsm):
+    walker = CoverageWalker(fake_fsm, seed=1)
+    summary = walker.run(max_steps=40)
+
+    # unlock_user needs an enrolled user, so UNLOCKED_USER is never reached; fail_unlock is never fired.
+    assert summary["uncovered_transitions"] == [
+        ('STANDBY_MODE', 'unlock_user', 'UNLOCKED_USER'),
+        ('UNLOCKED_USER', 'lock_user', 'STANDBY_MODE'),
+        ('UNLOCKED_USER', 'power_off', 'OFF'),
+    ]
+    assert all(trigger not in ("fail_unlock", "unlock_user", "post_pass") for trigger, _ in fake_fsm.fired)
+    assert fake_fsm.fired[0] == ("power_on", {"usb3": True})
+
+
+def test_same_seed_same_walk():
+    traces = []
+    for _ in range(2):
+        walker = CoverageWalker(FakeFSM(), seed=1234)
+        walker.run(max_steps=25)
+        traces.append([(entry["source"], entry["trigger"], entry["reason"]) for entry in walker.trace])
+    assert traces[0] == traces[1]
+
+
+def test_new_coverage_per_second_prefers_cheap_transitions(fake_fsm):
+    fake_fsm.state = 'STANDBY_MODE'
+    fake_fsm.transition_costs.record('STANDBY_MODE', 'unlock_admin', 30.0)
+    fake_fsm.transition_costs.record('STANDBY_MODE', 'admin_mode_login', 3.0)
+    fake_fsm.transition_costs.record('STANDBY_MODE', 'power_off', 0.5)
+    walker = CoverageWalker(fake_fsm, seed=3)
+
+    assert walker.step()["trigger"] == "power_off"
+    assert walker.step()["trigger"] == "power_on"
+    assert walker.step()["trigger"] == "admin_mode_login"
+
+
+def test_routes_towards_uncovered_state(fake_fsm):
+    walker = CoverageWalker(fake_fsm, seed=5)
+    walker.transition_counts = {
+        ('OFF', 'power_on', 'STANDBY_MODE'): 1,
+        ('STANDBY_MODE', 'power_off', 'OFF'): 1,
+        ('STANDBY_MODE', 'admin_mode_login', 'ADMIN_MODE'): 1,
+        ('ADMIN_MODE', 'lock_admin', 'STANDBY_MODE'): 1,
+        ('ADMIN_MODE', 'toggle_read_only', 'ADMIN_MODE'): 1,
+        ('ADMIN_MODE', 'power_off', 'OFF'): 1,
+    }
+    walker.state_pair_counts = {(s, d): 1 for s, _, d in walker.transition_counts}
+    fake_fsm.state = 'ADMIN_MODE'
+
+    entry = walker.step()
+    assert (entry["trigger"], entry["reason"]) == ("lock_admin", "route")
+    assert walker.step()["trigger"] == "unlock_admin"
+
+
+def test_failures_are_traced_and_stop_counting_as_uncovered(fake_fsm):
+    fake_fsm.state = 'STANDBY_MODE'
+    fake_fsm.failing = {'unlock_admin'}
+    for trigger in ('admin_mode_login', 'power_off'):
+        fake_fsm.transition_costs.record('STANDBY_MODE', trigger, 100.0)
+    walker = CoverageWalker(fake_fsm, seed=9)
+
+    first = walker.step()
+    second = walker.step()
+    assert first["trigger"] == second["trigger"] == "unlock_admin"
+    assert first["ok"] is False and "unlock_admin failed" in first["error"]
+    assert walker.step()["trigger"] != "unlock_admin"
+
+
+def test_pin_enrollment_uses_seeded_pin_generator(fake_fsm):
+    fake_fsm.state = 'ADMIN_MODE'
+    fake_fsm.transition_config.append({'trigger': 'enroll_pin', 'source': 'ADMIN_MODE', 'dest': 'ADMIN_MODE'})
+    pins = []
+    for _ in range(2):
+        walker = CoverageWalker(fake_fsm, pin_generator=PINGenerator(fake_fsm.dut), seed=11)
+        pins.append(walker._trigger_kwargs("enroll_pin")["new_pin"])
+    assert pins[0] == pins[1] and len(pins[0]) == 8
+
+    assert CoverageWalker(fake_fsm, seed=11)._trigger_kwargs("enroll_pin") is None
+    fake_fsm.dut.user_pin[2] = ['key5', 'unlock']
+    assert CoverageWalker(fake_fsm, seed=11)._trigger_kwargs("unlock_user") == {"user_id": 2}
+
+
+def test_write_trace(fake_fsm, tmp_path):
+    walker = CoverageWalker(fake_fsm, seed=42, usb3=MagicMock(return_value=False))
+    walker.run(max_steps=3)
+    path = walker.write_trace(str(tmp_path / "walk.json"))
+
+    data = json.loads(open(path).read())
+    assert data["seed"] == 42
+    assert [step["step"] for step in data["steps"]] == [1, 2, 3]
+    assert data["steps"][0]["kwargs"] == {"usb3": False}
+    assert data["coverage"]["transitions_covered"] == 2  # power_on, power_off, then power_on again
+
+
+def test_run_needs_a_limit(fake_fsm):
+    with pytest.raises(ValueError):
+        CoverageWalker(fake_fsm, seed=1).run()
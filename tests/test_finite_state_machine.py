@@ -1,3 +1,7 @@
+import gc
+import json
+import sys
+import weakref
 import pytest
 from unittest.mock import MagicMock
 
@@ -6,7 +10,12 @@ from controllers.finite_state_machine import (
     DeviceUnderTest,
     TestSession,
     CallableCondition,
+    USER_RESET_HOLD_SEC,
 )
+from controllers.clock import SimulatedClock, set_clock
+from controllers.fio_results import FioDirectionResult, FioJobResult
+from controllers.speed_baseline import SpeedBaselineStore
+from controllers.transition_profiler import TransitionProfiler, set_profiler
 
 
 # Minimal, up-to-date tests aligned with the refactored FSM
@@ -27,8 +36,10 @@ def dut_instance(mock_at):
 
 
 @pytest.fixture
-def session_instance(mock_at, dut_instance):
-    return TestSession(at_controller=mock_at, dut_instance=dut_instance)
+def session_instance(mock_at, dut_instance, tmp_path):
+    session = TestSession(at_controller=mock_at, dut_instance=dut_instance)
+    session.speed_baseline = SpeedBaselineStore(db_path=str(tmp_path / "speed_baselines.sqlite3"))
+    return session
 
 
 @pytest.fixture
@@ -137,3 +148,545 @@ def test_release_valve_allows_transition_on_success(fsm, session_instance, mock_
     mock_at.sequence.assert_called_once()
     mock_at.await_and_confirm_led_pattern.assert_called_once()
     mock_at.confirm_drive_enum.assert_called_once()
+
+
+def test_session_enum_latency_summary_per_block(session_instance):
+    session_instance.start_new_block(block_name="latency", current_test_block=1)
+    for usb in (1.0, 2.0, 3.0, 4.0):
+        session_instance.log_enum_latency("unlock_admin", {"usb": usb, "block": usb + 0.5, "mount": None})
+    session_instance.start_new_block(block_name="latency2", current_test_block=2)
+    session_instance.log_enum_latency("power_on", {"usb": 0.7})
+
+    summary = session_instance.get_enum_latency_summary()
+    assert summary[1]["unlock_admin"]["usb"] == {"count": 4, "p50": 2.0, "p95": 4.0, "max": 4.0}
+    assert summary[1]["unlock_admin"]["block"]["p50"] == 2.5
+    assert "mount" not in summary[1]["unlock_admin"]
+    assert summary[2]["power_on"]["usb"]["count"] == 1
+    session_instance.generate_summary_report()
+
+
+def test_fsm_records_enum_latency_from_last_actuation(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="latency", current_test_block=1)
+    mock_at.last_actuation.return_value = (100.0, "unlock", False)
+    mock_at.last_enum_result = {"first_seen_time": 101.25, "block_device_seen_time": 101.5}
+    mock_at.wait_for_mount_ready.return_value = 102.0
+    event_data = MagicMock()
+    event_data.event.name = "unlock_admin"
+
+    fsm.enum_latency_mode = False
+    fsm._record_enum_latency(event_data, MagicMock(), measure_mount=True)
+    mock_at.wait_for_mount_ready.assert_not_called()
+
+    fsm.enum_latency_mode = True
+    fsm._record_enum_latency(event_data, MagicMock(), measure_mount=True)
+    samples = session_instance.enum_latency_samples[1]["unlock_admin"]
+    assert samples["usb"] == [1.25, 1.25]
+    assert samples["block"] == [1.5, 1.5]
+    assert samples["mount"] == [2.0]
+
+    # A device that was already enumerated before the actuation yields no sample.
+    mock_at.last_enum_result = {"first_seen_time": 99.0, "block_device_seen_time": None}
+    fsm._record_enum_latency(event_data, MagicMock())
+    assert samples["usb"] == [1.25, 1.25]
+
+
+def _job(name, direction, bw, p99, errors=0):
+    return FioJobResult(name=name, total_errors=errors, **{direction: FioDirectionResult(
+        bw_mbps=bw, iops=bw * 4, io_bytes=1, runtime_s=10.0, clat_p50_ms=p99 / 2, clat_p99_ms=p99, clat_p999_ms=None)})
+
+
+def test_session_speed_test_results_are_per_job(session_instance, caplog):
+    session_instance.start_new_block(block_name="speed", current_test_block=3)
+    session_instance.add_speed_test_result({"W-SEQ-1M-Q32": _job("W-SEQ-1M-Q32", "write", 150.0, 2.0),
+                                            "R-SEQ-1M-Q32": _job("R-SEQ-1M-Q32", "read", 250.0, 1.0)})
+    session_instance.add_speed_test_result({"W-SEQ-1M-Q32": _job("W-SEQ-1M-Q32", "write", 170.0, 6.0, errors=1)})
+
+    assert session_instance.speed_test_results[0]["block"] == 3
+    summary = session_instance.get_speed_test_summary()
+    write_bw = summary["W-SEQ-1M-Q32"]["write"]["bw_mbps"]
+    assert (write_bw["count"], write_bw["min"], write_bw["max"], write_bw["mean"]) == (2, 150.0, 170.0, 160.0)
+    assert write_bw["stdev"] == pytest.approx(14.142, abs=1e-3)
+    assert summary["W-SEQ-1M-Q32"]["write"]["clat_p99_ms"]["p99"] == 6.0
+    assert "clat_p999_ms" not in summary["W-SEQ-1M-Q32"]["write"]
+    assert summary["R-SEQ-1M-Q32"]["read"]["bw_mbps"]["stdev"] == 0.0
+    assert session_instance.get_speed_test_error_total() == 1
+
+    with caplog.at_level("INFO"):
+        session_instance.generate_summary_report()
+    assert "W-SEQ-1M-Q32 (Write, 2 run(s)):" in caplog.text
+    assert "Min: 150.0 MB/s, Max: 170.0 MB/s, Avg: 160.0 MB/s" in caplog.text
+    assert "I/O errors reported by fio: 1" in caplog.text
+
+
+def test_speed_regression_against_baseline_is_a_block_warning(session_instance, caplog):
+    session_instance.start_new_block(block_name="speed", current_test_block=2)
+    session_instance.dut.usb3 = True
+    for bw in (200.0, 202.0, 198.0, 201.0, 199.0):
+        session_instance.add_speed_test_result({"W": _job("W", "write", bw, 2.0)})
+    assert session_instance.block_warning_count[2] == 0
+
+    session_instance.add_speed_test_result({"W": _job("W", "write", 180.0, 2.0)})
+    assert session_instance.block_warning_count[2] == 2  # bw_mbps and iops
+    assert "W write bw_mbps 180.0 vs. median 200.0 (-10.0%)" in session_instance.warning_block[2][0]
+    regression = session_instance.speed_regressions[0]
+    assert regression["block"] == 2 and regression["metric"] == "bw_mbps"
+    assert session_instance.speed_baseline_profile()[3] == "USB3"
+
+    with caplog.at_level("INFO"):
+        session_instance.generate_summary_report()
+    assert "Regressions vs. stored baseline: 2" in caplog.text
+
+
+def test_format_operation_records_phases_and_read_only_outcome(fsm, session_instance, mock_at, caplog):
+    session_instance.start_new_block(block_name="read-only", current_test_block=4)
+    fsm.dut.disk_path = "/dev/sdb"
+
+    mock_at._format_disk.return_value = True
+    mock_at.last_format_result = {"passed": True, "phases": {"detect": 0.01, "mkfs": 1.5}, "total_s": 1.6}
+    fsm.format_operation()
+    assert session_instance.block_failure_count[4] == 0
+
+    fsm.dut.read_only_enabled = True
+    mock_at._format_disk.return_value = False
+    mock_at.last_format_result = {"passed": False, "read_only": True, "failed_phase": "read_only",
+                                  "phases": {"detect": 0.01}, "total_s": 0.01}
+    fsm.format_operation()
+    assert session_instance.block_failure_count[4] == 0
+
+    mock_at._format_disk.return_value = True
+    mock_at.last_format_result = {"passed": True, "phases": {"detect": 0.01, "mkfs": 2.5}, "total_s": 2.6}
+    fsm.format_operation()
+    assert session_instance.failure_block[4] == ["Format succeeded while Read-Only mode is enabled"]
+
+    assert [r["block"] for r in session_instance.format_results] == [4, 4, 4]
+    latency = session_instance.get_format_latency_summary()
+    assert latency["mkfs"]["count"] == 2 and latency["mkfs"]["max"] == 2.5
+    assert latency["total"]["p50"] == 1.6
+    with caplog.at_level("INFO"):
+        session_instance.generate_summary_report()
+    assert "Format: 2 passed, 1 refused (read-only), 0 failed" in caplog.text
+
+
+def test_format_operation_failure_names_phase(fsm, session_instance, mock_at, monkeypatch):
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    session_instance.start_new_block(block_name="format", current_test_block=1)
+    fsm.dut.disk_path = "/dev/sdb"
+    mock_at._format_disk.return_value = False
+    mock_at.last_format_result = {"passed": False, "failed_phase": "mkfs", "error": "mkfs.vfat exited with 1",
+                                  "phases": {"detect": 0.01, "mkfs": 0.2}, "total_s": 0.3}
+    fsm.format_operation()
+    assert session_instance.failure_block[1] == ["DUT format failed in phase 'mkfs': mkfs.vfat exited with 1"]
+
+
+def test_format_operation_failure_elsewhere_is_not_a_session_failure(fsm, session_instance, mock_at, monkeypatch):
+    monkeypatch.setattr(sys, 'platform', 'darwin')
+    session_instance.start_new_block(block_name="format", current_test_block=1)
+    fsm.dut.disk_path = "/dev/disk4s1"
+    mock_at._format_disk.return_value = False
+    mock_at.last_format_result = {"passed": False, "failed_phase": "format", "error": "diskutil exited with 1",
+                                  "phases": {"format": 0.2}, "total_s": 0.2}
+    fsm.format_operation()
+    assert session_instance.block_failure_count[1] == 0
+    assert [r["failed_phase"] for r in session_instance.format_results] == ["format"]
+
+
+def test_speed_test_stores_timeseries_and_abort(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="speed", current_test_block=4)
+    fsm.dut.disk_path = "/dev/sdb"
+    mock_at.run_fio_tests.return_value = None
+    mock_at.last_fio_timeseries = [{"t": 1.0, "interval_s": 1.0, "job": "W", "bw_mbps": 0.0, "iops": 0.0, "ios": 0}]
+    mock_at.last_fio_abort_reason = "no I/O completed for 3.0s (job W)"
+
+    assert fsm.speed_test() is None
+    run = session_instance.speed_test_timeseries[0]
+    assert run["block"] == 4 and run["aborted"] == mock_at.last_fio_abort_reason
+    assert len(run["samples"]) == 1
+    assert session_instance.block_failure_count[4] == 1
+
+
+def test_integrity_write_then_verify_uses_session_seed(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="integrity", current_test_block=5)
+    fsm.dut.disk_path = "/dev/sdb"
+    assert fsm.integrity_verify() is None  # Nothing written yet.
+
+    mock_at.run_data_integrity.return_value = {"operation": "write", "passed": True}
+    fsm.integrity_write(seed=42)
+    assert session_instance.integrity_seed == 42
+
+    mock_at.run_data_integrity.return_value = {
+        "operation": "verify", "passed": False, "mismatched_blocks": 1, "mismatched_bytes": 4,
+        "mismatches": [{"offset": 4096}],
+    }
+    fsm.integrity_verify()
+    mock_at.run_data_integrity.assert_called_with(disk_path="/dev/sdb", operation="verify", seed=42)
+    assert [r["block"] for r in session_instance.integrity_results] == [5, 5]
+    assert "first at offset 4096" in session_instance.failure_block[5][0]
+    session_instance.generate_summary_report()
+
+
+@pytest.fixture
+def simulated_clock():
+    clock = SimulatedClock(start=1000.0)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+def test_session_wait_summary(session_instance):
+    session_instance.start_new_block(block_name="waits", current_test_block=1)
+    session_instance.log_wait("user_reset_hold", 7.0, 10, True)
+    session_instance.log_wait("user_reset_hold", 9.0, 10, True)
+    session_instance.log_wait("unlock_settle", 10.0, 10, False)
+
+    summary = session_instance.get_wait_summary()
+    assert summary["user_reset_hold"] == {"count": 2, "p50": 7.0, "max": 9.0, "max_wait": 10, "saved": 4.0, "timeouts": 0}
+    assert summary["unlock_settle"]["timeouts"] == 1
+    assert session_instance.wait_samples[0]["block"] == 1
+    session_instance.generate_summary_report()
+
+
+def test_unlock_waits_for_settled_led_state(fsm, session_instance, mock_at, simulated_clock):
+    session_instance.start_new_block(block_name="waits", current_test_block=1)
+    fsm.machine.set_state("STANDBY_MODE")
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm.dut.read_only_enabled = True
+    fsm.dut.lock_override = False
+    mock_at.await_led_state.side_effect = lambda *args, **kwargs: simulated_clock.advance(2.5) or True
+    mock_at.await_and_confirm_led_pattern.return_value = False
+
+    fsm.unlock_admin()
+
+    assert mock_at.await_led_state.call_args.args[0] == {'red': 0, 'green': 1, 'blue': 0}
+    assert session_instance.wait_samples == [
+        {"block": 1, "name": "unlock_settle", "waited_s": 2.5, "max_wait_s": 10, "met": True}]
+
+    # The legacy pattern has no warm-up, so there is nothing to wait for.
+    fsm.dut.read_only_enabled = False
+    fsm.unlock_admin()
+    assert len(session_instance.wait_samples) == 1
+
+
+def test_user_reset_holds_keys_only_for_remaining_minimum(fsm, session_instance, mock_at, simulated_clock):
+    session_instance.start_new_block(block_name="waits", current_test_block=1)
+    fsm.machine.set_state("STANDBY_MODE")
+    fsm.dut.battery = False
+    mock_at.await_and_confirm_led_pattern.side_effect = lambda *args, **kwargs: simulated_clock.advance(3.0) or True
+    mock_at.confirm_led_solid.return_value = True
+    mock_at.confirm_device_enum.return_value = (True, MagicMock())
+
+    fsm.user_reset()
+
+    hold = session_instance.wait_samples[0]
+    assert hold["name"] == "user_reset_hold" and hold["met"] is True
+    assert hold["waited_s"] == pytest.approx(USER_RESET_HOLD_SEC - 3.0)
+    mock_at.off.assert_any_call("lock", "unlock", "key2")
+
+
+def test_orient_retry_waits_for_idle_device(fsm, session_instance, mock_at, simulated_clock):
+    session_instance.start_new_block(block_name="waits", current_test_block=1)
+    fsm.dut.provision_lock = False
+    fsm.user_reset = MagicMock(side_effect=[False, True])
+    mock_at.current_led_state.side_effect = [
+        {'red': 1, 'green': 1, 'blue': 0}, {'red': 1, 'green': 1, 'blue': 0}, {'red': 0, 'green': 1, 'blue': 1}]
+
+    fsm.orient_for_block(retry_attempts=1, retry_delay_sec=3.0)
+
+    assert fsm.user_reset.call_count == 2
+    retry = session_instance.wait_samples[0]
+    assert retry["name"] == "orient_retry" and retry["met"] is True
+    assert retry["waited_s"] == pytest.approx(0.2)
+
+
+def test_orient_navigates_without_reset(fsm, session_instance, mock_at, simulated_clock):
+    session_instance.start_new_block(block_name="navigate", current_test_block=2)
+    fsm.machine.set_state("UNLOCKED_ADMIN")
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm.user_reset = MagicMock()
+    mock_at.press.side_effect = lambda *args, **kwargs: simulated_clock.advance(1.5)
+
+    fsm.orient_for_block(target_state=["STANDBY_MODE", "OOB_MODE"])
+
+    assert fsm.state == "STANDBY_MODE"
+    fsm.user_reset.assert_not_called()
+    mock_at.press.assert_called_once_with("lock")
+    assert fsm.transition_costs.cost("UNLOCKED_ADMIN", "lock_admin") == pytest.approx(1.5)
+    assert fsm.dut.needs_block_orientation is False and fsm.orienting is False
+
+
+def test_orient_falls_back_to_reset_when_no_path(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="navigate", current_test_block=2)
+    fsm.machine.set_state("STANDBY_MODE")
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm.dut.provision_lock = False
+    fsm.user_reset = MagicMock(side_effect=lambda: fsm.machine.set_state("OOB_MODE") or True)
+
+    assert fsm.navigator.plan("STANDBY_MODE", ["OOB_MODE"]) is None
+    assert fsm.orient_for_block(target_state="OOB_MODE") is True
+
+    fsm.user_reset.assert_called_once()
+    assert fsm.state == "OOB_MODE"
+
+
+def test_orient_resets_when_navigation_logged_a_failure(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="navigate", current_test_block=2)
+    fsm.machine.set_state("STANDBY_MODE")
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm.dut.provision_lock = False
+    navigate_to = fsm.navigate_to
+
+    def navigate_with_failed_check(target, usb3=True):
+        # The model reaches the target, but an on_enter check on the way did not see the device do so.
+        if fsm.navigate_to.call_count == 1:
+            session_instance.log_failure("Failed to confirm Standby Mode LED pattern")
+        return navigate_to(target, usb3=usb3)
+
+    fsm.navigate_to = MagicMock(side_effect=navigate_with_failed_check)
+    fsm.user_reset = MagicMock(side_effect=lambda: fsm.machine.set_state("OOB_MODE") or True)
+
+    assert fsm.orient_for_block(target_state=["STANDBY_MODE", "OOB_MODE"]) is True
+    fsm.user_reset.assert_called_once()
+    assert fsm.state == "OOB_MODE"
+
+
+def test_orient_reports_target_unreachable_after_reset(fsm, session_instance, mock_at):
+    session_instance.start_new_block(block_name="navigate", current_test_block=2)
+    fsm.machine.set_state("OFF")
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm.dut.provision_lock = False
+    # The reset-free path fails (say power_on saw no POST), so orientation falls back to a reset.
+    navigate_to = fsm.navigate_to
+    fsm.navigate_to = MagicMock(side_effect=lambda target, usb3=True: fsm.navigate_to.call_count > 1 and navigate_to(target, usb3=usb3))
+
+    def reset():
+        fsm.dut.admin_pin = []
+        fsm.machine.set_state("OOB_MODE")
+        return True
+
+    fsm.user_reset = MagicMock(side_effect=reset)
+
+    # STANDBY_MODE needs the admin PIN the reset cleared: stop in OOB_MODE instead of ending the session.
+    assert fsm.orient_for_block(target_state="STANDBY_MODE", retry_attempts=2) is False
+
+    fsm.user_reset.assert_called_once()
+    assert fsm.state == "OOB_MODE"
+    assert fsm.orienting is False and fsm.dut.needs_block_orientation is False
+
+
+def test_navigator_uses_dut_model_for_power_on(fsm):
+    fsm.dut.battery = False
+    fsm.dut.completed_cmfr = True
+    fsm.dut.brute_force_counter_current = fsm.dut.brute_force_counter = 10
+    fsm.dut.user_forced_enrollment = False
+    fsm.dut.admin_pin = []
+    assert fsm.navigator.plan("OFF", ["OOB_MODE"]) == [("power_on", "OOB_MODE")]
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    assert fsm.navigator.plan("OFF", ["OOB_MODE"]) is None
+    assert fsm.navigator.plan("UNLOCKED_ADMIN", ["ADMIN_MODE"]) == [
+        ("lock_admin", "STANDBY_MODE"), ("admin_mode_login", "ADMIN_MODE")]
+
+
+def test_profiler_times_unlock_phases_and_reports(mock_at, dut_instance, session_instance, simulated_clock, caplog):
+    profiler = TransitionProfiler()
+    previous = set_profiler(profiler)
+    try:
+        fsm = ApricornDeviceFSM(at_controller=mock_at, session_instance=session_instance, dut_instance=dut_instance)
+        session_instance.start_new_block(block_name="profile", current_test_block=1)
+        fsm.machine.set_state("STANDBY_MODE")
+        fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+        mock_at.confirm_drive_enum.return_value = (True, MagicMock())
+        mock_at.await_and_confirm_led_pattern.side_effect = lambda *args, **kwargs: simulated_clock.advance(4.0) or True
+        fsm.unlock_admin()
+
+        summary = profiler.summary()
+        assert summary["unlock_admin"]["trigger"]["total"] == pytest.approx(4.0)
+        # _enter_admin_pin runs as a release-valve condition, which is where the time went.
+        assert summary["unlock_admin"]["release_valve"]["total"] == pytest.approx(4.0)
+        assert summary["unlock_admin"]["on_enter"]["count"] == 1
+        assert any(event["name"] == "_enter_admin_pin release valve" for event in profiler.events)
+        with caplog.at_level("INFO"):
+            session_instance.generate_summary_report()
+        assert "Transition Latency (s):" in caplog.text
+    finally:
+        set_profiler(previous)
+
+
+def _second_fsm(mock_at):
+    dut = DeviceUnderTest(at_controller=mock_at)
+    session = TestSession(at_controller=mock_at, dut_instance=dut)
+    return ApricornDeviceFSM(at_controller=mock_at, session_instance=session, dut_instance=dut)
+
+
+def test_fsms_share_one_machine_with_independent_state(fsm, mock_at):
+    other = _second_fsm(mock_at)
+    assert other.machine.shared is fsm.machine.shared and fsm in fsm.machine.models and other in fsm.machine.models
+    assert other.transition_config is fsm.transition_config
+
+    # Setting a state without a model moves only the FSM whose machine it was called on.
+    fsm.machine.set_state("STANDBY_MODE")
+    assert fsm.state == "STANDBY_MODE" and other.state == "OFF"
+    other.set_state("OOB_MODE")
+    assert fsm.state == "STANDBY_MODE" and other.state == "OOB_MODE"
+    other.set_state("OFF")
+
+    # Conditions read each FSM's own DUT model.
+    for machine_fsm in (fsm, other):
+        machine_fsm.dut.battery = False
+        machine_fsm.dut.completed_cmfr = True
+        machine_fsm.dut.brute_force_counter_current = machine_fsm.dut.brute_force_counter = 10
+        machine_fsm.dut.user_forced_enrollment = False
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    other.dut.admin_pin = []
+    assert fsm.navigator.plan("OFF", ["OOB_MODE"]) is None
+    assert other.navigator.plan("OFF", ["OOB_MODE"]) == [("power_on", "OOB_MODE")]
+
+    other.release()
+    assert other not in fsm.machine.models and fsm in fsm.machine.models
+    other.release()  # already released: nothing to do
+
+
+def test_unused_fsms_leave_the_shared_machine(fsm, mock_at):
+    machine = fsm.machine.shared
+    other = _second_fsm(mock_at)
+    collected = weakref.ref(other)
+    assert other in machine.models
+    del other
+    gc.collect()
+    assert collected() is None and fsm in machine.models
+
+
+def test_release_valves_and_listeners_are_per_fsm(fsm, mock_at):
+    other = _second_fsm(mock_at)
+    for machine_fsm in (fsm, other):
+        machine_fsm.session.start_new_block(block_name="shared", current_test_block=1)
+        machine_fsm.machine.set_state("STANDBY_MODE")
+        machine_fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    fsm_events, other_events = [], []
+    fsm.add_transition_listener(fsm_events.append)
+    other.add_transition_listener(other_events.append)
+
+    # Patching one FSM's release valve leaves the other's untouched.
+    fsm._enter_admin_pin = MagicMock(return_value=False)
+    other._enter_admin_pin = MagicMock(return_value=True)
+    mock_at.confirm_drive_enum.return_value = (True, MagicMock())
+    fsm.unlock_admin()
+    other.unlock_admin()
+
+    assert fsm.state == "STANDBY_MODE" and other.state == "UNLOCKED_ADMIN"
+    assert [event.model for event in fsm_events] == [fsm]
+    assert [event.model for event in other_events] == [other]
+    assert fsm_events[0].result is False and other_events[0].result is True
+
+
+def test_session_journal_rebuilds_the_summary(fsm, session_instance, mock_at, tmp_path, caplog):
+    path = str(tmp_path / "session_journal.jsonl")
+    session_instance.open_journal(path, flush_interval_sec=60, fsync_interval_sec=60)
+    session_instance.script_title = "Journal"
+    session_instance.start_new_block(block_name="journal", current_test_block=0)
+    fsm.dut.admin_pin = ['key1', 'key2', 'unlock']
+    mock_at.confirm_drive_enum.return_value = (True, MagicMock())
+    mock_at.await_and_confirm_led_pattern.return_value = True
+    fsm.machine.set_state("STANDBY_MODE")
+    fsm.unlock_admin()
+    session_instance.log_led_run({'state': {'green': 1}, 'duration_s': 1.5, 'final': False})
+    session_instance.log_wait("user_reset_hold", 4.0, 10.0, True)
+    session_instance.log_phidget_detach({'scripts': ['key1'], 'duration_s': 0.2})
+    session_instance.log_enum_latency("unlock_admin", {'usb': 0.4, 'mount': None})
+    session_instance.start_new_block(block_name="speed", current_test_block=1)
+    session_instance.add_speed_test_result({'W': _job('W', 'write', 95.0, 2.0)})
+    session_instance.add_speed_test_timeseries([{'t': 1.0, 'bw_mbps': 95.0, 'ios': 10}], abort_reason="stalled")
+    session_instance.add_integrity_result({'operation': 'verify', 'passed': False, 'mismatched_blocks': 1,
+                                           'mismatched_bytes': 4, 'mismatches': [{'offset': 4096}]})
+    session_instance.add_format_result({'passed': True, 'phases': {'mkfs': 1.0}, 'total_s': 1.5})
+    session_instance.log_warning("speed", "slow", "details")
+    session_instance.end_block()
+    session_instance.close_journal()
+
+    kinds = [json.loads(line)['kind'] for line in open(path)]
+    assert kinds[0] == "session_start" and {"transition", "key_press", "led_run", "enumeration"} <= set(kinds)
+    transition = next(json.loads(line) for line in open(path) if '"transition"' in line)
+    assert transition['trigger'] == 'unlock_admin' and transition['dest'] == 'UNLOCKED_ADMIN' and transition['ok'] is True
+
+    rebuilt = TestSession(at_controller=mock_at, dut_instance=fsm.dut)
+    rebuilt.speed_baseline = None
+    assert rebuilt.rebuild_from_journal(path) == len(kinds)
+    fields = [name for name in TestSession.CHECKPOINT_FIELDS if name not in ('speed_test_results', 'integrity_seed',
+                                                                               'usb3_fail_count')]
+    for name in fields:
+        assert getattr(rebuilt, name) == getattr(session_instance, name), name
+    assert rebuilt.speed_test_results[0]['jobs']['W'] == session_instance.speed_test_results[0]['jobs']['W']
+
+    # A checkpoint restore is journaled whole, so a resumed run's new journal starts from it.
+    resumed = TestSession(at_controller=mock_at, dut_instance=fsm.dut)
+    resumed.open_journal(str(tmp_path / "resumed.jsonl"))
+    resumed.restore_checkpoint_state(json.loads(json.dumps(session_instance.checkpoint_state())))
+    resumed.log_key_press("lock")
+    resumed.close_journal()
+    with caplog.at_level("INFO"):
+        rebuilt.generate_summary_report(journal_path=str(tmp_path / "resumed.jsonl"))
+    assert rebuilt.failure_block == session_instance.failure_block
+    assert rebuilt.key_press_totals == dict(session_instance.key_press_totals, lock=session_instance.key_press_totals.get('lock', 0) + 1)
+    assert "Journal Script Details:" in caplog.text and "Data integrity verify failed" in caplog.text
+
+
+def test_metrics_snapshot_counts_iterations_and_transition_latency(session_instance, mock_at):
+    mock_at.camera_stats.return_value = {'frames_captured': 10, 'frames_dropped': 1, 'fps': 15.0}
+    session_instance.start_new_block(block_name="power", current_test_block=0)
+    for duration_s in (0.1, 0.2, 0.3):
+        session_instance.log_transition("power_on", "OFF", "STANDBY_MODE", True, duration_s)
+        session_instance.log_iteration()
+    session_instance.log_failure("device did not enumerate")
+    session_instance.log_iteration()
+    session_instance.log_iteration()
+    session_instance.log_transition("unlock_admin", "STANDBY_MODE", "STANDBY_MODE", False, 0.5)
+
+    snapshot = session_instance.metrics_snapshot()
+    assert json.loads(json.dumps(snapshot))["blocks"]["0"]["name"] == "power"
+    assert snapshot['iterations'] == 5 and snapshot['current_block'] == 0
+    assert snapshot['blocks'][0]['iterations_passed'] == 4 and snapshot['blocks'][0]['iterations_failed'] == 1
+    assert snapshot['blocks'][0]['failures'] == 1
+    power_on = snapshot['transitions']['power_on']
+    assert power_on['ok'] == 3 and power_on['failed'] == 0 and power_on['count'] == 3
+    assert power_on['p50'] == pytest.approx(0.2) and power_on['max'] == pytest.approx(0.3)
+    assert snapshot['transitions']['unlock_admin'] == {'ok': 0, 'failed': 1, 'count': 1, 'p50': 0.5, 'p95': 0.5, 'max': 0.5}
+    assert snapshot['camera']['fps'] == 15.0 and snapshot['last_speed_test'] is None
+
+
+def test_metrics_snapshot_and_counter_writes_share_a_lock(session_instance, mock_at):
+    held = []
+    real_apply_transition = session_instance._apply_transition
+    real_build = session_instance._build_metrics_snapshot
+
+    def apply_transition(record):
+        held.append(session_instance._metrics_lock.locked())
+        real_apply_transition(record)
+
+    def build():
+        held.append(session_instance._metrics_lock.locked())
+        return real_build()
+
+    session_instance._apply_transition = apply_transition
+    session_instance._build_metrics_snapshot = build
+    session_instance.start_new_block(block_name="power", current_test_block=0)
+    session_instance.log_transition("power_on", "OFF", "STANDBY_MODE", True, 0.1)
+    snapshot = session_instance.metrics_snapshot()
+    assert held == [True, True]
+    assert snapshot['transitions']['power_on']['ok'] == 1
+    assert not session_instance._metrics_lock.locked()
+
+
+def test_rebuild_from_journal_keeps_the_metrics_lock(session_instance, tmp_path):
+    session_instance.open_journal(str(tmp_path / "session.jsonl"))
+    session_instance.start_new_block(block_name="power", current_test_block=0)
+    session_instance.log_transition("power_on", "OFF", "STANDBY_MODE", True, 0.1)
+    lock = session_instance._metrics_lock
+    held = []
+    real_apply_transition = session_instance._apply_transition
+
+    def apply_transition(record):
+        held.append(lock.locked())
+        real_apply_transition(record)
+
+    session_instance._apply_transition = apply_transition
+    assert session_instance.rebuild_from_journal(str(tmp_path / "session.jsonl")) > 0
+    assert session_instance._metrics_lock is lock and held == [True] and not lock.locked()
+    assert session_instance.metrics_snapshot()['transitions']['power_on']['ok'] == 1
@@ -0,0 +1,66 @@
+# Directory: tests/
+# Filename: test_fio_results.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/fio_results.py.
+##
+## Run this test with the following command:
+## pytest tests/test_fio_results.py --cov=controllers.fio_results --cov-report term-missing
+##
+#############################################################
+
+import pytest
+
+from controllers.fio_results import FioDirectionResult, FioJobResult, percentile, summarize_values
+
+
+class TestFioJobResult:
+
+    def test_from_fio_json_with_legacy_usec_clat(self):
+        job = FioJobResult.from_fio_json({
+            "jobname": "W-SEQ-1M-Q32",
+            "write": {"io_bytes": 1, "bw_bytes": 150000000, "iops": 143.05, "runtime": 9000,
+                      "clat": {"percentile": {"50.000000": 2000, "99.000000": 8000, "99.900000": 12500}}},
+            "read": {"io_bytes": 0, "bw_bytes": 0},
+        })
+        assert job.read is None
+        assert job.write.bw_mbps == 150.0 and job.write.iops == 143.1
+        assert (job.write.clat_p50_ms, job.write.clat_p99_ms, job.write.clat_p999_ms) == (2.0, 8.0, 12.5)
+        assert job.runtime_s == 9.0  # No job_runtime: falls back to the longest direction.
+        assert job.bandwidth == {"write": 150.0}
+        assert "Write: 150.0 MB/s, 143 IOPS" in job.summary()
+
+    def test_job_without_io_or_name(self):
+        job = FioJobResult.from_fio_json({"read": {"io_bytes": 0}}, default_name="job2")
+        assert job.name == "job2"
+        assert not job.has_io
+        assert job.summary() == "no I/O"
+        assert job.to_dict()["read"] is None
+
+    def test_dict_round_trip(self):
+        job = FioJobResult(name="W", write=FioDirectionResult(bw_mbps=150.0, iops=143.1, io_bytes=1, runtime_s=9.0,
+                                                               clat_p99_ms=8.0), total_errors=2)
+        assert FioJobResult.from_dict(job.to_dict()) == job
+
+    def test_from_samples(self):
+        result = FioDirectionResult.from_samples(io_bytes=4_000_000, elapsed_s=2.0, latencies_s=[0.001] * 99 + [0.1])
+        assert (result.bw_mbps, result.iops) == (2.0, 50.0)
+        assert (result.clat_p50_ms, result.clat_p99_ms, result.clat_p999_ms) == (1.0, 1.0, 100.0)
+        assert FioDirectionResult.from_samples(0, 0.0, []).bw_mbps == 0.0
+
+
+class TestAggregation:
+
+    def test_percentile_nearest_rank(self):
+        assert percentile([5, 1, 3, 2, 4], 50) == 3
+        assert percentile([5, 1, 3, 2, 4], 99) == 5
+        assert percentile([7], 1) == 7
+
+    def test_summarize_values(self):
+        stats = summarize_values([1.0, 2.0, 3.0, 4.0])
+        assert (stats["count"], stats["min"], stats["max"], stats["mean"]) == (4, 1.0, 4.0, 2.5)
+        assert stats["stdev"] == pytest.approx(1.291, abs=1e-3)
+        assert (stats["p50"], stats["p99"]) == (2.0, 4.0)
+        assert summarize_values([3.0])["stdev"] == 0.0
@@ -0,0 +1,101 @@
+# Directory: tests/
+# Filename: test_fio_stream.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/fio_stream.py.
+##
+## Run this test with the following command:
+## pytest tests/test_fio_stream.py --cov=controllers.fio_stream --cov-report term-missing
+##
+#############################################################
+
+import json
+import pytest
+
+import controllers.fio_stream as fio_stream_module
+from controllers.fio_stream import FioStatusParser, MinThroughputPolicy, StallPolicy, default_abort_policies
+
+
+def _doc(jobs, timestamp_ms=None):
+    document = {"jobs": [
+        {"jobname": name, "read": {"io_bytes": read_bytes, "total_ios": read_bytes // 1_000_000},
+         "write": {"io_bytes": write_bytes, "total_ios": write_bytes // 1_000_000}}
+        for name, read_bytes, write_bytes in jobs
+    ]}
+    if timestamp_ms is not None:
+        document["timestamp_ms"] = timestamp_ms
+    return json.dumps(document, indent=2)
+
+
+def _sample(t, bw_mbps, ios, interval_s=1.0):
+    return {"t": t, "interval_s": interval_s, "job": "W", "bw_mbps": bw_mbps, "ios": ios}
+
+
+class TestFioStatusParser:
+
+    def test_split_documents_and_interval_deltas(self):
+        parser = FioStatusParser(start_time=0.0)
+        stream = ("fio: note: something\n" + _doc([("W", 0, 200_000_000), ("R", 0, 0)])
+                  + _doc([("W", 0, 400_000_000), ("R", 0, 0)]) + _doc([("W", 0, 400_000_000), ("R", 300_000_000, 0)]))
+        # Feed in small chunks to exercise partial documents.
+        samples = []
+        for i, now in zip(range(0, len(stream), 7), range(1, 10_000)):
+            samples.extend(parser.feed(stream[i:i + 7], now=float(now)))
+        assert len(samples) == 3
+        assert [s["job"] for s in samples] == ["W", "W", "R"]
+        assert [s["write_mbps"] * s["interval_s"] for s in samples][:2] == pytest.approx([200.0, 200.0], rel=1e-2)
+        assert samples[2]["read_mbps"] * samples[2]["interval_s"] == pytest.approx(300.0, rel=1e-2)
+        assert samples[2]["ios"] == 300
+        assert json.loads(parser.last_document)["jobs"][1]["read"]["io_bytes"] == 300_000_000
+
+    def test_uses_fio_timestamps_and_skips_duplicate_reports(self):
+        parser = FioStatusParser(start_time=0.0)
+        first = parser.feed(_doc([("W", 0, 100_000_000)], timestamp_ms=50_000), now=1.0)[0]
+        second = parser.feed(_doc([("W", 0, 300_000_000)], timestamp_ms=52_000), now=1.1)[0]
+        assert (first["t"], second["t"], second["interval_s"]) == (1.0, 3.0, 2.0)
+        assert second["bw_mbps"] == 100.0
+        assert parser.feed(_doc([("W", 0, 300_000_000)], timestamp_ms=52_000), now=1.2) == []
+
+    def test_idle_interval_keeps_last_active_job(self):
+        parser = FioStatusParser(start_time=0.0)
+        parser.feed(_doc([("W", 0, 100_000_000), ("R", 0, 0)]), now=1.0)
+        idle = parser.feed(_doc([("W", 0, 100_000_000), ("R", 0, 0)]), now=2.0)[0]
+        assert (idle["job"], idle["bw_mbps"], idle["ios"]) == ("W", 0.0, 0)
+
+
+class TestAbortPolicies:
+
+    def test_stall_policy_needs_full_window(self):
+        policy = StallPolicy(window_s=3)
+        series = [_sample(1.0, 100.0, 100), _sample(2.0, 0.0, 0), _sample(3.0, 0.0, 0)]
+        assert policy(series[-1], series) is None
+        series.append(_sample(4.0, 0.0, 0))
+        assert "no I/O completed for 3.0s" in policy(series[-1], series)
+
+    def test_stall_policy_ignores_slow_start(self):
+        policy = StallPolicy(window_s=3)
+        # fio laying out the file: no I/O for longer than the window.
+        series = [_sample(float(t), 0.0, 0) for t in range(1, 11)]
+        assert policy(series[-1], series) is None
+        series += [_sample(11.0, 100.0, 100)] + [_sample(float(t), 0.0, 0) for t in range(12, 15)]
+        assert "no I/O completed for 3.0s" in policy(series[-1], series)
+
+    def test_min_throughput_policy_resets_on_recovery(self):
+        policy = MinThroughputPolicy(min_mbps=100.0, window_s=2)
+        series = [_sample(1.0, 40.0, 40), _sample(2.0, 300.0, 300), _sample(3.0, 40.0, 40)]
+        assert policy(series[-1], series) is None
+        series.append(_sample(4.0, 35.0, 35))
+        assert "below 100.0 MB/s for 2.0s" in policy(series[-1], series)
+
+    def test_default_policies_follow_configuration(self, monkeypatch):
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_STALL_SEC", 0.0)
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_MIN_MBPS", 0.0)
+        assert default_abort_policies() == []
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_STALL_SEC", 3.0)
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_MIN_MBPS", 0.0)
+        assert [type(p) for p in default_abort_policies()] == [StallPolicy]
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_STALL_SEC", 0.0)
+        monkeypatch.setattr(fio_stream_module, "FIO_ABORT_MIN_MBPS", 50.0)
+        assert [type(p) for p in default_abort_policies()] == [MinThroughputPolicy]
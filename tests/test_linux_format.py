@@ -0,0 +1,197 @@
+# Directory: tests/
+# Filename: test_linux_format.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/linux_format.py.
+##
+## Run this test with the following command:
+## pytest tests/test_linux_format.py --cov=controllers.linux_format --cov-report term-missing
+##
+#############################################################
+
+import os
+import subprocess
+from unittest.mock import MagicMock
+
+import pytest
+
+from controllers.linux_format import BlockUeventListener, FormatPhaseError, LinuxFormatPipeline
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """/sys/class/block with sdb (GPT, one partition at sector 2048) and an unpartitioned sdc."""
+    devices = tmp_path / "devices"
+    _write(devices / "sdb" / "queue" / "logical_block_size", "4096\n")
+    _write(devices / "sdb" / "size", "1000000\n")
+    _write(devices / "sdb" / "ro", "0\n")
+    _write(devices / "sdb" / "sdb1" / "partition", "1\n")
+    _write(devices / "sdb" / "sdb1" / "start", "2048\n")
+    _write(devices / "sdb" / "sdb1" / "size", "997952\n")
+    _write(devices / "sdb" / "sdb1" / "ro", "0\n")
+    _write(devices / "sdc" / "queue" / "logical_block_size", "512\n")
+    _write(devices / "sdc" / "size", "4096\n")
+    _write(devices / "sdc" / "ro", "1\n")
+    block = tmp_path / "class" / "block"
+    block.mkdir(parents=True)
+    for name, target in (("sdb", devices / "sdb"), ("sdb1", devices / "sdb" / "sdb1"), ("sdc", devices / "sdc")):
+        os.symlink(target, block / name)
+    mounts = tmp_path / "mounts"
+    mounts.write_text("/dev/sdb1 /media/user/DUT\\040VOL vfat rw 0 0\n/dev/sda1 / ext4 rw 0 0\n")
+    return {"block": str(block), "mounts": str(mounts)}
+
+
+class _Listener:
+    def __init__(self, name, available=True, waited=0.05):
+        self.device_name = name
+        self.available = available
+        self.waited = waited
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def wait(self, timeout):
+        return self.waited
+
+
+def _runner(calls, fail=None):
+    def run(command, **kwargs):
+        calls.append(command)
+        if command[0] == "blkid":
+            return subprocess.CompletedProcess(command, 0, stdout="gpt\n", stderr="")
+        if fail and command[0] == fail:
+            raise subprocess.CalledProcessError(1, command, stderr="boom")
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+    return run
+
+
+def _pipeline(sysfs, device, calls, fail=None, listener=None, **kwargs):
+    return LinuxFormatPipeline(device, sysfs_block_dir=sysfs["block"], mounts_path=sysfs["mounts"],
+                               runner=_runner(calls, fail), verify=False,
+                               listener_factory=listener or (lambda name: _Listener(name)), **kwargs)
+
+
+class TestDetect:
+    def test_whole_disk_formats_first_partition(self, sysfs):
+        layout = _pipeline(sysfs, "/dev/sdb", []).detect()
+        assert layout == {
+            "disk": "sdb", "target": "sdb1", "partitions": ["sdb1"], "partition_table": "gpt",
+            "read_only": False, "logical_block_size": 4096, "start_sector": 2048, "size_bytes": 997952 * 512,
+        }
+
+    def test_partition_path_resolves_parent_disk(self, sysfs):
+        layout = _pipeline(sysfs, "/dev/sdb1", []).detect()
+        assert (layout["disk"], layout["target"]) == ("sdb", "sdb1")
+
+    def test_superfloppy_and_read_only(self, sysfs):
+        layout = _pipeline(sysfs, "/dev/sdc", []).detect()
+        assert (layout["target"], layout["partitions"], layout["read_only"]) == ("sdc", [], True)
+
+    def test_missing_device(self, sysfs):
+        with pytest.raises(FormatPhaseError) as excinfo:
+            _pipeline(sysfs, "/dev/sdz", []).detect()
+        assert excinfo.value.phase == "detect"
+
+
+class TestMkfsCommand:
+    def test_vfat_geometry(self, sysfs):
+        pipeline = _pipeline(sysfs, "/dev/sdb", [], label="my volume label")
+        command = pipeline.mkfs_command(pipeline.detect())
+        assert command == ["mkfs.vfat", "-F", "32", "-n", "MY VOLUME L", "-S", "4096", "-s", "8", "-h", "2048", "/dev/sdb1"]
+
+    def test_vfat_cluster_rounds_to_power_of_two(self, sysfs):
+        pipeline = _pipeline(sysfs, "/dev/sdc", [], cluster_kb=48)
+        assert pipeline.mkfs_command(pipeline.detect())[8] == "64"
+
+    def test_exfat(self, sysfs):
+        pipeline = _pipeline(sysfs, "/dev/sdb", [], fs_type="exfat")
+        assert pipeline.mkfs_command(pipeline.detect()) == ["mkfs.exfat", "-L", "DUT", "-c", "32K", "/dev/sdb1"]
+
+    def test_unsupported_fs(self):
+        with pytest.raises(ValueError):
+            LinuxFormatPipeline("/dev/sdb", fs_type="ntfs")
+
+
+class TestRun:
+    def test_successful_run_times_every_phase(self, sysfs):
+        calls = []
+        result = _pipeline(sysfs, "/dev/sdb", calls).run()
+        assert result["passed"] is True
+        assert result["target"] == "/dev/sdb1"
+        assert result["reread_source"] == "uevent"
+        assert list(result["phases"]) == ["detect", "unmount", "mkfs", "reread"]
+        assert ["umount", "/media/user/DUT VOL"] in calls
+        assert calls[-1][0] == "mkfs.vfat"
+
+    def test_read_only_fails_before_mkfs(self, sysfs):
+        calls = []
+        result = _pipeline(sysfs, "/dev/sdc", calls).run()
+        assert (result["passed"], result["read_only"], result["failed_phase"]) == (False, True, "read_only")
+        assert list(result["phases"]) == ["detect"]
+        assert not any(command[0].startswith("mkfs") for command in calls)
+
+    def test_mkfs_failure_names_phase(self, sysfs):
+        result = _pipeline(sysfs, "/dev/sdb", [], fail="mkfs.vfat").run()
+        assert (result["passed"], result["failed_phase"]) == (False, "mkfs")
+        assert "boom" in result["error"]
+
+    def test_reread_falls_back_to_udevadm(self, sysfs):
+        calls = []
+        pipeline = _pipeline(sysfs, "/dev/sdb", calls, listener=lambda name: _Listener(name, waited=None))
+        assert pipeline.run()["reread_source"] == "udevadm"
+        assert calls[-1][:2] == ["udevadm", "settle"]
+
+    def test_reread_without_uevents_or_udevadm(self, sysfs):
+        pipeline = _pipeline(sysfs, "/dev/sdb", [], fail="udevadm", listener=lambda name: _Listener(name, available=False))
+        result = pipeline.run()
+        assert (result["passed"], result["reread_source"]) == (True, "none")
+
+    def test_quick_verify_mounts_writes_and_unmounts(self, sysfs, monkeypatch, tmp_path):
+        calls = []
+        mount_dir = tmp_path / "mnt"
+        mount_dir.mkdir()
+        monkeypatch.setattr("controllers.linux_format.tempfile.mkdtemp", lambda prefix: str(mount_dir))
+        pipeline = _pipeline(sysfs, "/dev/sdb", calls, verify_bytes=4096)
+        pipeline.quick_verify("sdb1")
+        assert calls[0] == ["mount", "-t", "vfat", "/dev/sdb1", str(mount_dir)]
+        assert calls[-1] == ["umount", str(mount_dir)]
+        assert not mount_dir.exists()
+
+    def test_quick_verify_mount_failure(self, sysfs):
+        with pytest.raises(FormatPhaseError) as excinfo:
+            _pipeline(sysfs, "/dev/sdb", [], fail="mount").quick_verify("sdb1")
+        assert excinfo.value.phase == "verify"
+
+
+class TestBlockUeventListener:
+    def test_matches_change_for_device(self):
+        listener = BlockUeventListener("sdb1")
+        payload = b"change@/devices/x/block/sdb/sdb1\0ACTION=change\0SUBSYSTEM=block\0DEVNAME=sdb1\0"
+        assert listener.matches(payload)
+        assert not BlockUeventListener("sdb").matches(payload)
+        assert not listener.matches(payload.replace(b"ACTION=change", b"ACTION=remove"))
+
+    def test_wait_without_socket(self):
+        listener = BlockUeventListener("sdb1")
+        assert listener.available is False
+        assert listener.wait(0.01) is None
+
+    def test_wait_returns_on_matching_event(self):
+        listener = BlockUeventListener("sdb1")
+        sock = MagicMock()
+        sock.recv.side_effect = [b"add@/x\0ACTION=add\0SUBSYSTEM=usb\0",
+                                 b"change@/x\0ACTION=change\0SUBSYSTEM=block\0DEVNAME=/dev/sdb1\0"]
+        listener._sock = sock
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("controllers.linux_format.select.select", lambda r, w, x, t: (r, [], []))
+            assert listener.wait(1.0) is not None
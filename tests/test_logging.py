@@ -13,12 +13,29 @@
 
 import pytest
 import logging
+import logging.handlers
 import os
+import threading
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch, MagicMock
 
 # Import the function to be tested
-from controllers.logging import setup_logging
+from controllers import logging as logging_config
+from controllers.logging import LazyMessage, setup_logging, stop_logging, trace_logger
+
+
+@pytest.fixture
+def restore_root_logger():
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+    yield root_logger
+    stop_logging()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root_logger.addHandler(handler)
+    root_logger.setLevel(level)
 
 class TestLoggingConfig:
     """Tests for the setup_logging function in controllers/logging.py"""
@@ -149,9 +166,66 @@ class TestLoggingConfig:
             # Check that setFormatter was called on the created handler instance
             mock_file_handler_instance.setFormatter.assert_called_once()
             
-            # Check that addHandler was called on the root logger with the handler instance
-            # Use assert_any_call because the console handler might also be added.
-            mock_root_logger.addHandler.assert_any_call(mock_file_handler_instance)
+            # Check that the handler is owned by the queue listener, and that the
+            # root logger only gets the handler that enqueues records for it.
+            assert mock_file_handler_instance in logging_config._queue_listener.handlers
+            assert isinstance(mock_root_logger.addHandler.call_args[0][0], logging.handlers.QueueHandler)
+            assert call(mock_file_handler_instance) not in mock_root_logger.addHandler.call_args_list
+            stop_logging()
             
             # And makedirs should not have been called since exists() returned True
-            mock_makedirs.assert_not_called()
\ No newline at end of file
+            mock_makedirs.assert_not_called()
+
+    def test_setup_logging_formats_and_writes_on_the_listener_thread(self, tmp_path, restore_root_logger):
+        """
+        Tests that records are formatted and written by the listener thread, and
+        that stop_logging() writes out the queue and hands the handlers back to root.
+        """
+        log_file = tmp_path / "main.log"
+        setup_logging(log_to_console=False, log_file_path=str(log_file), log_format="%(message)s")
+        root_handlers = restore_root_logger.handlers
+        assert len(root_handlers) == 1 and isinstance(root_handlers[0], logging.handlers.QueueHandler)
+
+        logging.getLogger("test.queue").info("formatted by %s", LazyMessage(lambda: threading.current_thread().name))
+        stop_logging()
+        stop_logging()  # already stopped: nothing to do
+        lines = log_file.read_text().splitlines()
+        assert lines[-1] != f"formatted by {threading.current_thread().name}"
+        assert lines[-1].startswith("formatted by ")
+
+        # After stop_logging the file handler is on the root logger and writes synchronously.
+        assert any(isinstance(handler, logging.FileHandler) for handler in restore_root_logger.handlers)
+        logging.getLogger("test.queue").info("after stop")
+        assert log_file.read_text().splitlines()[-1] == "after stop"
+
+    def test_setup_logging_without_queue_and_with_rotation(self, tmp_path, restore_root_logger):
+        """
+        Tests that use_queue=False attaches the handlers to the root logger, and
+        that a positive log_file_max_bytes rotates the file.
+        """
+        log_file = tmp_path / "main.log"
+        setup_logging(log_to_console=False, log_file_path=str(log_file), log_file_max_bytes=200,
+                      log_file_backup_count=2, use_queue=False)
+        assert logging_config._queue_listener is None
+        handler = restore_root_logger.handlers[0]
+        assert isinstance(handler, logging.handlers.RotatingFileHandler) and handler.backupCount == 2
+        for index in range(20):
+            logging.getLogger("test.rotation").info("line %d of the rotation test", index)
+        assert (tmp_path / "main.log.1").exists() and (tmp_path / "main.log.2").exists()
+        assert not (tmp_path / "main.log.3").exists()
+
+    def test_trace_logger_is_a_separate_channel(self, restore_root_logger):
+        """
+        Tests that the trace channel is off by default, whatever the level of the
+        module's own logger, and that LazyMessage defers its function.
+        """
+        setup_logging(log_to_console=False, log_level_overrides={"test.module": logging.DEBUG})
+        trace = trace_logger("test.module")
+        assert trace.name == "trace.test.module"
+        assert not trace.isEnabledFor(logging.DEBUG)
+        assert logging.getLogger("test.module").isEnabledFor(logging.DEBUG)
+
+        calls = []
+        trace.debug("state %s", LazyMessage(calls.append, "built"))
+        assert calls == []
+        assert str(LazyMessage("{}-{}".format, 1, 2)) == "1-2"
@@ -1136,6 +1136,38 @@ class TestLogitechLedCheckerMethods:
         # 3. No logging should occur on the first call.
         mock_logger.info.assert_not_called()
 
+    def test_led_run_listeners_receive_logged_runs(self, checker, mock_logger):
+        """
+        Tests that every logged LED state is passed to the LED run listeners, and
+        that a failing listener is logged without stopping the others.
+        """
+        runs = []
+        checker.add_led_run_listener(MagicMock(side_effect=RuntimeError("listener broke")))
+        checker.add_led_run_listener(runs.append)
+        last_state_info = [{"red": 1, "green": 0}, 1000.0]
+
+        assert checker._handle_state_change_logging({"red": 0, "green": 1}, 1002.5, last_state_info) is True
+        checker._handle_state_change_logging({"red": 0, "green": 0}, 1002.505, last_state_info)  # too short to log
+        checker._log_final_state(last_state_info, 1003.0, reason_suffix=", timeout")
+
+        assert runs == [
+            {"state": {"red": 1, "green": 0}, "duration_s": 2.5, "final": False},
+            {"state": {"red": 0, "green": 0}, "duration_s": pytest.approx(0.495), "final": True},
+        ]
+        assert mock_logger.error.call_count == 2
+
+    def test_camera_stats_reports_counters_and_buffer_fps(self, checker):
+        """
+        Tests that camera_stats returns the frame counters and the capture rate
+        over the replay buffer, and 0 fps before two frames were buffered.
+        """
+        checker.replay_buffer.clear()
+        checker.frames_captured, checker.frames_dropped = 41, 2
+        assert checker.camera_stats() == {"frames_captured": 41, "frames_dropped": 2, "fps": 0.0}
+        for index in range(4):
+            checker.replay_buffer.append((100.0 + index * 0.5, None, {}))
+        assert checker.camera_stats()["fps"] == pytest.approx(2.0)
+
     def test_process_pattern_step_handles_empty_frames(self, checker, mock_logger):
         """
         Tests that _process_pattern_step handles empty frames gracefully in both
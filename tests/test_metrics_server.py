@@ -0,0 +1,87 @@
+# Directory: tests/
+# Filename: test_metrics_server.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/metrics_server.py.
+##
+## Run this test with the following command:
+## pytest tests/test_metrics_server.py --cov=controllers.metrics_server --cov-report term-missing
+##
+#############################################################
+
+import json
+import logging
+import urllib.error
+import urllib.request
+
+import pytest
+
+from controllers.metrics_server import MetricsServer, render_prometheus
+
+
+def _snapshot():
+    return {
+        "time": 1000.0, "uptime_s": 3600.0, "script_title": "Stress", "current_block": 1,
+        "iterations": 12, "iterations_per_hour": 12.0,
+        "blocks": {1: {"name": 'Stress "loop"', "iterations_passed": 11, "iterations_failed": 1,
+                       "failures": 1, "warnings": 2, "enumerations": {"admin": 12}}},
+        "transitions": {"power_on": {"ok": 12, "failed": 0, "count": 12, "p50": 0.25, "p95": 0.5, "max": 0.75},
+                        "lock_admin": {"ok": 0, "failed": 1}},
+        "enum_latency": {1: {"unlock_admin": {"usb": {"count": 12, "p50": 1.0, "p95": 1.5, "max": 2.0}}}},
+        "camera": {"frames_captured": 900, "frames_dropped": 3, "fps": 14.5},
+        "last_speed_test": {"block": 1, "jobs": {"seq": {"write": {"bw_mbps": 95.0, "iops": 380.0, "clat_p99_ms": 2.5}}}},
+    }
+
+
+def _get(server, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}", timeout=5) as response:
+        return response.headers["Content-Type"], response.read().decode("utf-8")
+
+
+def test_render_prometheus_families_and_labels():
+    text = render_prometheus(_snapshot(), {"station": "A"})
+    lines = text.splitlines()
+    assert lines[:3] == ["# HELP flight_control_uptime_seconds Seconds since the session started.",
+                         "# TYPE flight_control_uptime_seconds gauge",
+                         'flight_control_uptime_seconds{station="A"} 3600.0']
+    assert 'flight_control_block_iterations_total{station="A",result="failed",block="1",block_name="Stress \\"loop\\""} 1' in lines
+    assert 'flight_control_transition_latency_seconds{station="A",trigger="power_on",quantile="0.95"} 0.5' in lines
+    assert 'flight_control_transitions_total{station="A",trigger="lock_admin",result="failed"} 1' in lines
+    assert not any(line.startswith('flight_control_transition_latency_seconds{station="A",trigger="lock_admin"') for line in lines)
+    assert 'flight_control_camera_dropped_frames_total{station="A"} 3' in lines
+    assert 'flight_control_speed_test_bandwidth_mbps{station="A",block="1",job="seq",direction="write"} 95.0' in lines
+    assert text.count("# TYPE flight_control_transitions_total counter") == 1
+
+    bare = render_prometheus(dict(_snapshot(), camera=None, last_speed_test=None))
+    assert "flight_control_iterations_total 12" in bare and "camera" not in bare and "speed_test" not in bare
+
+
+def test_server_serves_text_json_and_404():
+    server = MetricsServer(_snapshot, host="127.0.0.1", port=0, labels={"station": "B"}).start()
+    try:
+        assert server.port != 0 and server.start() is server
+        content_type, body = _get(server, "/metrics")
+        assert content_type.startswith("text/plain; version=0.0.4")
+        assert 'flight_control_iterations_total{station="B"} 12' in body
+        content_type, body = _get(server, "/metrics.json?pretty=0")
+        assert content_type == "application/json"
+        assert json.loads(body)["labels"] == {"station": "B"} and json.loads(body)["iterations"] == 12
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _get(server, "/")
+        assert error.value.code == 404
+    finally:
+        server.stop()
+        server.stop()  # already stopped: nothing to do
+
+
+def test_failing_snapshot_answers_500(caplog):
+    server = MetricsServer(lambda: {}, host="127.0.0.1", port=0).start()
+    try:
+        with caplog.at_level(logging.ERROR):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                _get(server, "/metrics")
+        assert error.value.code == 500 and "Metrics snapshot failed" in caplog.text
+    finally:
+        server.stop()
@@ -0,0 +1,205 @@
+# Directory: tests/
+# Filename: test_orchestrator.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/orchestrator.py.
+##
+## Run this test with the following command:
+## pytest tests/test_orchestrator.py --cov=controllers.orchestrator --cov-report term-missing
+##
+#############################################################
+
+import os
+import time
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+from controllers.finite_state_machine import ApricornDeviceFSM, DeviceUnderTest, TestSession
+from controllers.orchestrator import (
+    EVENT_DONE,
+    EVENT_ERROR,
+    EVENT_PROGRESS,
+    EVENT_READY,
+    EVENT_TRANSITION,
+    STATUS_CRASHED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_TIMEOUT,
+    Station,
+    StationOrchestrator,
+    resolve_script,
+    station_config,
+)
+
+
+# --- Worker entry points; module level so that spawned workers can import them ---
+
+def _fake_worker(config, script, script_kwargs, connection, output_dir):
+    """Plays the event sequence the station's id asks for, without any hardware."""
+    station_id = config["station_id"]
+
+    def send(kind, **payload):
+        connection.send(dict(payload, station=station_id, kind=kind, time=0.0))
+
+    if station_id == "crash":
+        os._exit(3)
+    send(EVENT_READY, device="dev", dut_serial=config["dut_serial"], state="OFF")
+    if station_id == "hang":
+        time.sleep(60)
+    send(EVENT_TRANSITION, trigger="power_on", source="OFF", dest="OOB_MODE", ok=True)
+    send(EVENT_TRANSITION, trigger="unlock_admin", source="OOB_MODE", dest="OOB_MODE", ok=False)
+    send(EVENT_PROGRESS, fields={"block": 0, "iteration": script_kwargs["iterations"]})
+    if station_id == "fail":
+        send(EVENT_ERROR, error="AssertionError: boom", traceback="", failures=1)
+    else:
+        send(EVENT_DONE, result={"script": script}, state="OOB_MODE", failures=0)
+    connection.close()
+
+
+def power_cycle_script(station, cycles=1):
+    """A station script: power cycles the device and reports each cycle."""
+    station.session.start_new_block(block_name="Power Cycle", current_test_block=0)
+    for cycle in range(cycles):
+        station.fsm.power_on()
+        station.report(cycle=cycle + 1)
+        station.fsm.power_off()
+    return {"cycles": cycles}
+
+
+def _rig():
+    at = MagicMock()
+    at.scan_barcode.return_value = "TEST_SERIAL_123"
+    at.confirm_device_enum.return_value = (True, MagicMock(iSerial="TEST_SERIAL_123"))
+    dut = DeviceUnderTest(at_controller=at)
+    session = TestSession(at_controller=at, dut_instance=dut)
+    fsm = ApricornDeviceFSM(at_controller=at, session_instance=session, dut_instance=dut)
+    return at, dut, session, fsm
+
+
+def test_station_config_defaults_and_validation():
+    config = station_config({"station_id": 3, "camera_id": 1})
+    assert config == {"station_id": "3", "camera_id": 1, "phidget_serial": None, "dut_serial": None, "virtual_dut": None,
+                      "metrics_port": None}
+    with pytest.raises(ValueError, match="station_id"):
+        station_config({"camera_id": 1})
+    with pytest.raises(ValueError, match="Unknown"):
+        station_config({"station_id": "A", "camera": 1})
+
+
+def test_resolve_script():
+    assert resolve_script("test_orchestrator:power_cycle_script") is power_cycle_script
+    with pytest.raises(ValueError, match="module:function"):
+        resolve_script("test_orchestrator")
+    with pytest.raises(ValueError, match="does not name a function"):
+        resolve_script("test_orchestrator:EVENT_DONE")
+
+
+def test_stations_must_not_share_hardware():
+    with pytest.raises(ValueError, match="station_id"):
+        StationOrchestrator([{"station_id": "A"}, {"station_id": "A"}], "m:f")
+    with pytest.raises(ValueError, match="camera_id"):
+        StationOrchestrator([{"station_id": "A"}, {"station_id": "B"}], "m:f")
+    with pytest.raises(ValueError, match="phidget_serial"):
+        StationOrchestrator([{"station_id": "A", "camera_id": 0, "phidget_serial": 1},
+                             {"station_id": "B", "camera_id": 1, "phidget_serial": 1}], "m:f")
+    # Virtual stations render their own frames: the camera id does not matter.
+    StationOrchestrator([{"station_id": "A", "virtual_dut": True}, {"station_id": "B", "virtual_dut": True}], "m:f")
+    with pytest.raises(ValueError, match="metrics_port"):
+        StationOrchestrator([{"station_id": "A", "virtual_dut": True, "metrics_port": 9400},
+                             {"station_id": "B", "virtual_dut": True, "metrics_port": 9400}], "m:f")
+
+
+def test_station_streams_transitions_and_progress():
+    at, dut, session, fsm = _rig()
+    events = []
+    station = Station("A", at, dut, session, fsm, event_sink=events.append)
+    station.forward_transitions()
+
+    assert power_cycle_script(station) == {"cycles": 1}
+    with pytest.raises(Exception):
+        fsm.lock_admin()  # not valid in OFF: no transition, no event
+
+    kinds = [(event["kind"], event.get("trigger")) for event in events]
+    assert kinds[0] == (EVENT_TRANSITION, "power_on")
+    assert (EVENT_PROGRESS, None) in kinds and kinds[-1] == (EVENT_TRANSITION, "power_off")
+    assert all(event["station"] == "A" for event in events)
+    assert events[0]["source"] == "OFF" and events[0]["ok"] is True
+    assert station.failure_count() == 0
+    station.close()
+    at.close.assert_called_once()
+
+
+def test_station_serves_labelled_metrics_until_closed():
+    at, dut, session, fsm = _rig()
+    station = Station("A", at, dut, session, fsm)
+    power_cycle_script(station)
+    server = station.serve_metrics(0)
+    assert station.serve_metrics(0) is server
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+        body = response.read().decode("utf-8")
+    assert 'flight_control_transitions_total{station="A",trigger="power_on",result="ok"} 1' in body
+    station.close()
+    assert station.metrics_server is None
+    with pytest.raises(OSError):
+        urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=1)
+
+
+def test_station_without_orchestrator_and_broken_pipe():
+    at, dut, session, fsm = _rig()
+    Station("A", at, dut, session, fsm).report(block=0)  # no sink: nothing to do
+
+    sink = MagicMock(side_effect=BrokenPipeError("closed"))
+    station = Station("A", at, dut, session, fsm, event_sink=sink)
+    station.report(block=0)  # logged, not raised
+    sink.assert_called_once()
+
+
+def test_orchestrator_aggregates_worker_outcomes(tmp_path):
+    received = []
+    orchestrator = StationOrchestrator(
+        [{"station_id": "ok", "virtual_dut": True, "dut_serial": "S1"},
+         {"station_id": "fail", "virtual_dut": True, "dut_serial": "S2"},
+         {"station_id": "crash", "virtual_dut": True, "dut_serial": "S3"}],
+        "test_orchestrator:power_cycle_script", script_kwargs={"iterations": 5},
+        output_dir=str(tmp_path), on_event=received.append, worker=_fake_worker)
+    results = orchestrator.run(timeout_sec=120)
+
+    assert results["ok"]["status"] == STATUS_DONE and results["ok"]["exitcode"] == 0
+    assert results["ok"]["result"] == {"script": "test_orchestrator:power_cycle_script"}
+    assert results["ok"]["transitions"] == 2 and results["ok"]["failed_transitions"] == 1
+    assert results["ok"]["progress"] == {"block": 0, "iteration": 5} and results["ok"]["state"] == "OOB_MODE"
+    assert results["fail"]["status"] == STATUS_FAILED and results["fail"]["error"] == "AssertionError: boom"
+    assert results["crash"]["status"] == STATUS_CRASHED and results["crash"]["exitcode"] == 3
+    assert orchestrator.totals() == {"stations": 3, "by_status": {STATUS_DONE: 1, STATUS_FAILED: 1, STATUS_CRASHED: 1},
+                                     "transitions": 4, "failed_transitions": 2, "failures": 1}
+    assert len(received) == 10
+    assert orchestrator.station_dir("ok") == os.path.join(str(tmp_path), "station_ok")
+
+
+def test_orchestrator_terminates_stations_at_timeout(tmp_path):
+    orchestrator = StationOrchestrator([{"station_id": "hang", "virtual_dut": True}], "m:f",
+                                       script_kwargs={"iterations": 1}, output_dir=str(tmp_path),
+                                       worker=_fake_worker)
+    results = orchestrator.run(timeout_sec=5)
+    assert results["hang"]["status"] == STATUS_TIMEOUT
+    assert results["hang"]["state"] == "OFF"
+    orchestrator._handle({"station": "unknown", "kind": EVENT_DONE})  # ignored
+
+
+def test_station_worker_runs_script_on_a_virtual_dut(tmp_path, monkeypatch):
+    monkeypatch.setenv("SIMULATED_CLOCK_ENABLED", "true")
+    orchestrator = StationOrchestrator(
+        [{"station_id": "V1", "virtual_dut": True, "dut_serial": "VIRTUAL00000011"}],
+        "test_orchestrator:power_cycle_script", script_kwargs={"cycles": 2}, output_dir=str(tmp_path))
+    results = orchestrator.run(timeout_sec=300)
+
+    station = results["V1"]
+    assert station["status"] == STATUS_DONE, station["error"]
+    assert station["result"] == {"cycles": 2} and station["failures"] == 0
+    assert station["transitions"] >= 4 and station["failed_transitions"] == 0
+    assert station["progress"] == {"cycle": 2} and station["state"] == "OFF"
+    assert os.path.exists(os.path.join(orchestrator.station_dir("V1"), "main.log"))
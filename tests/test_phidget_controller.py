@@ -36,6 +36,15 @@ class MockPhidgetChannel:
         self.getDeviceName = MagicMock(return_value="Mock Phidget")
         self.getChannel = MagicMock(return_value=0)
         self.getHubPort = MagicMock(return_value=0)
+        self._attach_handler = None; self._detach_handler = None
+    def setOnAttachHandler(self, handler): self._attach_handler = handler
+    def setOnDetachHandler(self, handler): self._detach_handler = handler
+    def simulate_detach(self):
+        self._attached = False
+        if self._detach_handler: self._detach_handler(self)
+    def simulate_attach(self):
+        self._attached = True
+        if self._attach_handler: self._attach_handler(self)
     def _set_serial(self, num): self._serial_number = num
     def _get_serial(self): return self._serial_number
     def openWaitForAttachment(self, timeout): self._attached = True
@@ -378,4 +387,60 @@ class TestPhidgetController(unittest.TestCase):
             controller.on('out1'); controller.close_all()
             self.assertFalse(out1_ch.getState())
             spy_close.assert_called_once()
-            self.assertEqual(len(controller.channels), 0)
\ No newline at end of file
+            self.assertEqual(len(controller.channels), 0)
+
+    @patch('time.sleep')
+    def test_actuation_timeline_records_output_changes(self, mock_sleep):
+        with PhidgetController(TEST_SCRIPT_MAP_CONFIG, TEST_DEVICE_CONFIGS) as controller:
+            self.assertIsNone(controller.last_actuation())
+            controller.sequence(['out1', 'out2'], press_ms=10, pause_ms=10)
+            self.assertEqual([(name, state) for _, name, state in controller.actuation_timeline],
+                             [('out1', True), ('out1', False), ('out2', True), ('out2', False)])
+            released_at, name, state = controller.last_actuation()
+            self.assertEqual((name, state), ('out2', False))
+            self.assertGreaterEqual(released_at, controller.actuation_timeline[0][0])
+
+    @patch('time.monotonic', side_effect=[50.0, 50.004])
+    def test_reattach_replays_intended_output_state(self, mock_monotonic):
+        with PhidgetController(TEST_SCRIPT_MAP_CONFIG, TEST_DEVICE_CONFIGS, logger_instance=self.mock_logger) as controller:
+            listener = MagicMock()
+            controller.add_detach_listener(listener)
+            out1_ch = controller.channels['out1']
+            controller.on('out1')
+
+            out1_ch.simulate_detach()
+            out1_ch._state = False  # Board lost its output latch while off the bus.
+            self.assertEqual(controller.get_detach_stats()['currently_detached'], ['out1'])
+            out1_ch.simulate_attach()
+
+            self.assertTrue(out1_ch.getState())
+            self.assertEqual(len(controller.detach_events), 1)
+            event = controller.detach_events[0]
+            self.assertEqual(event['scripts'], ['out1'])
+            self.assertTrue(event['restored_state'])
+            self.assertAlmostEqual(event['duration_s'], 0.004)
+            listener.assert_called_once_with(event)
+            stats = controller.get_detach_stats()
+            self.assertEqual(stats['count'], 1)
+            self.assertAlmostEqual(stats['max_s'], 0.004)
+            self.assertEqual(stats['currently_detached'], [])
+
+    def test_intent_recorded_while_detached_is_applied_on_reattach(self):
+        with PhidgetController(TEST_SCRIPT_MAP_CONFIG, TEST_DEVICE_CONFIGS, logger_instance=self.mock_logger) as controller:
+            out1_ch = controller.channels['out1']
+            controller.on('out1')
+            out1_ch.simulate_detach()
+            # The release fails while detached, but the intended OFF state must still win.
+            with self.assertRaises(PhidgetException): controller.off('out1')
+            out1_ch.simulate_attach()
+            self.assertFalse(out1_ch.getState())
+            self.assertFalse(controller.detach_events[0]['restored_state'])
+
+    def test_initial_attach_and_close_do_not_record_events(self):
+        controller = PhidgetController(TEST_SCRIPT_MAP_CONFIG, TEST_DEVICE_CONFIGS, logger_instance=self.mock_logger)
+        out1_ch = controller.channels['out1']
+        out1_ch.simulate_attach()
+        controller.close_all()
+        out1_ch.simulate_detach()
+        self.assertEqual(controller.detach_events, [])
+        self.assertEqual(controller.get_detach_stats()['count'], 0)
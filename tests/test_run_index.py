@@ -0,0 +1,163 @@
+# Directory: tests/
+# Filename: test_run_index.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/run_index.py.
+##
+## Run this test with the following command:
+## pytest tests/test_run_index.py --cov=controllers.run_index --cov-report term-missing
+##
+#############################################################
+
+import json
+import logging
+import os
+from unittest.mock import patch
+
+import pytest
+
+from controllers import run_index
+from controllers.run_index import RunIndex, failure_reason, find_run_dirs
+
+
+def _write_run(run_dir, bridge_fw="0503", serial="151234567890", bw=95.0, failures=("Did not observe ACCEPT_PATTERN",),
+               extra=()):
+    os.makedirs(run_dir, exist_ok=True)
+    records = [
+        {"kind": "session_start", "block": -1, "wall": 1000.0, "t": 10.0, "device": "ASK3-NX",
+         "bridge_fw": bridge_fw, "mcu_fw": "1.7", "serial": serial},
+        {"kind": "block_start", "block": 0, "name": "Loop", "script_title": "Stress", "t": 10.0},
+        {"kind": "transition", "block": 0, "trigger": "unlock_admin", "ok": True, "duration_s": 2.0, "t": 12.0},
+        {"kind": "iteration", "block": 0, "t": 12.0},
+        {"kind": "transition", "block": 0, "trigger": "unlock_admin", "ok": False, "duration_s": 5.0, "t": 17.0},
+    ]
+    records += [{"kind": "failure", "block": 0, "message": message, "t": 17.0} for message in failures]
+    records += [
+        {"kind": "iteration", "block": 0, "t": 18.0},
+        {"kind": "warning", "block": 0, "summary": "Speed regression", "details": "", "t": 19.0},
+        {"kind": "speed_result", "block": 0, "t": 20.0, "usb_mode": "USB3", "jobs": {"seq": {
+            "name": "seq", "read": None,
+            "write": {"bw_mbps": bw, "iops": 380.0, "io_bytes": 1, "runtime_s": 1.0, "clat_p99_ms": None}}}},
+    ]
+    records += list(extra)
+    with open(os.path.join(run_dir, "session_journal.jsonl"), "w", encoding="utf-8") as handle:
+        handle.writelines(json.dumps(record) + "\n" for record in records)
+    with open(os.path.join(run_dir, "main.log"), "w", encoding="utf-8") as handle:
+        handle.write("log\n")
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = RunIndex(db_path=str(tmp_path / "index" / "run_index.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_failure_reason_and_run_discovery(tmp_path):
+    assert failure_reason("Device with serial 151234567890 did not enumerate after 4.5 s in OOB_MODE.") == \
+        "Device with serial # did not enumerate after # s in OOB_MODE."
+    assert failure_reason("key1 stuck") == "key1 stuck"
+
+    _write_run(str(tmp_path / "logs" / "2026-01-01_10-00-00"))
+    _write_run(str(tmp_path / "logs" / "2026-01-02_10-00-00" / "station_1"))
+    (tmp_path / "logs" / "2026-01-02_10-00-00" / "orchestrator.log").write_text("")
+    (tmp_path / "logs" / "empty").mkdir()
+    found = [os.path.relpath(path, tmp_path / "logs") for path in find_run_dirs(str(tmp_path / "logs"))]
+    assert found == ["2026-01-01_10-00-00", os.path.join("2026-01-02_10-00-00", "station_1")]
+
+
+def test_ingest_aggregates_a_run(tmp_path, index):
+    run_dir = tmp_path / "logs" / "2026-01-01_10-00-00"
+    _write_run(str(run_dir))
+    (run_dir / "replay_10-00-05_await_and_confirm_led_pattern.mp4").write_bytes(b"1234")
+    (run_dir / "notes.txt").write_text("ignored")
+
+    assert index.ingest(str(tmp_path / "logs")) == {"scanned": 1, "ingested": 1, "unchanged": 0, "failed": 0}
+    run = index.runs()[0]
+    assert run["path"] == "2026-01-01_10-00-00" and run["started_at"] == 1000.0
+    assert (run["device_name"], run["bridge_fw"], run["serial"]) == ("ASK3-NX", "0503", "151234567890")
+    assert (run["iterations"], run["failures"], run["warnings"], run["records"]) == (2, 1, 1, 9)
+
+    connection = index._connect()
+    block = dict(connection.execute("SELECT * FROM run_blocks").fetchone())
+    assert (block["name"], block["iterations_passed"], block["iterations_failed"]) == ("Loop", 1, 1)
+    transition = dict(connection.execute("SELECT * FROM run_transitions").fetchone())
+    assert (transition["ok"], transition["failed"], transition["total_s"], transition["max_s"]) == (1, 1, 7.0, 5.0)
+    event = dict(connection.execute("SELECT * FROM run_events WHERE kind = 'failure'").fetchone())
+    assert event["recorded_at"] == 1007.0 and event["block_name"] == "Loop"
+    speed = [tuple(row) for row in connection.execute("SELECT usb_mode, job, direction, metric, value FROM run_speed")]
+    assert speed == [("USB3", "seq", "write", "bw_mbps", 95.0), ("USB3", "seq", "write", "iops", 380.0)]
+    replay = tuple(connection.execute("SELECT filename, method, size_bytes FROM run_replays").fetchone())
+    assert replay == ("replay_10-00-05_await_and_confirm_led_pattern.mp4", "await_and_confirm_led_pattern", 4)
+
+
+def test_ingest_is_incremental(tmp_path, index):
+    logs = tmp_path / "logs"
+    _write_run(str(logs / "a"))
+    _write_run(str(logs / "b"))
+    assert index.ingest(str(logs))["ingested"] == 2
+    assert index.ingest(str(logs)) == {"scanned": 2, "ingested": 0, "unchanged": 2, "failed": 0}
+
+    # Same content, new mtime: checksummed but not re-ingested.
+    os.utime(logs / "a" / "session_journal.jsonl", ns=(1, 1))
+    assert index.ingest(str(logs))["unchanged"] == 2
+    # A run that grew is re-ingested in place.
+    _write_run(str(logs / "b"), extra=[{"kind": "failure", "block": 0, "message": "Second", "t": 30.0}])
+    assert index.ingest(str(logs))["ingested"] == 1
+    assert sorted(run["failures"] for run in index.runs()) == [1, 2]
+    assert index._connect().execute("SELECT COUNT(*) FROM run_blocks").fetchone()[0] == 2
+    assert index.ingest(str(logs), force=True)["ingested"] == 2
+
+
+def test_run_without_journal_has_no_counts(tmp_path, index):
+    logs = tmp_path / "logs"
+    _write_run(str(logs / "a"))
+    (logs / "old").mkdir()
+    (logs / "old" / "main.log").write_text("2025-06-01 10:00:00.000  ERROR     Failed Admin unlock LED pattern\n")
+    assert index.ingest(str(logs))["ingested"] == 2
+
+    old_run = next(run for run in index.runs() if run["path"] == "old")
+    assert (old_run["records"], old_run["iterations"], old_run["failures"], old_run["warnings"]) == (None,) * 4
+    totals = index._connect().execute("SELECT COUNT(failures), SUM(failures) FROM runs").fetchone()
+    assert tuple(totals) == (1, 1)
+
+
+def test_canned_queries_group_by_firmware(tmp_path, index):
+    logs = tmp_path / "logs"
+    _write_run(str(logs / "a"), bridge_fw="0503", bw=95.0,
+               failures=("Did not observe ACCEPT_PATTERN after 3 s", "Did not observe ACCEPT_PATTERN after 4 s"))
+    _write_run(str(logs / "b"), bridge_fw="0503", bw=97.0, failures=("Did not observe ACCEPT_PATTERN after 9 s",))
+    _write_run(str(logs / "c"), bridge_fw="0504", bw=80.0, failures=("Failed Admin unlock LED pattern",))
+    index.ingest(str(logs))
+
+    histogram = index.failure_histogram(match="ACCEPT_PATTERN")
+    assert histogram == [{"device_name": "ASK3-NX", "bridge_fw": "0503", "mcu_fw": "1.7",
+                          "reason": "Did not observe ACCEPT_PATTERN after # s", "count": 3, "runs": 2}]
+    warnings = index.failure_histogram(kind="warning")
+    assert [(row["bridge_fw"], row["reason"], row["count"]) for row in warnings] == [
+        ("0503", "Speed regression", 2), ("0504", "Speed regression", 1)]
+    assert index.failure_histogram(device="other") == []
+
+    trend = index.throughput_trend(metric="bw_mbps", job="seq")
+    assert [(row["bridge_fw"], row["runs"], row["mean"], row["min"]) for row in trend] == [
+        ("0503", 2, 96.0, 95.0), ("0504", 1, 80.0, 80.0)]
+    assert len(index.runs(limit=2)) == 2 and index.runs(device="other") == []
+
+
+def test_unreadable_runs_and_records_are_skipped(tmp_path, index, caplog):
+    logs = tmp_path / "logs"
+    _write_run(str(logs / "a"), extra=[{"kind": "speed_result", "block": 0, "t": 21.0, "jobs": {"seq": {"bad": 1}}}])
+    _write_run(str(logs / "b"))
+    real_read_journal = run_index.read_journal
+
+    def read_journal(path, **kwargs):
+        if os.sep + "b" + os.sep in path:
+            raise OSError("I/O error")
+        return real_read_journal(path, **kwargs)
+
+    with caplog.at_level(logging.WARNING), patch("controllers.run_index.read_journal", side_effect=read_journal):
+        counts = index.ingest(str(logs))
+    assert counts == {"scanned": 2, "ingested": 1, "unchanged": 0, "failed": 1}
+    assert "Skipping malformed 'speed_result' record" in caplog.text and "Could not index run" in caplog.text
@@ -0,0 +1,100 @@
+# Directory: tests/
+# Filename: test_session_journal.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/session_journal.py.
+##
+## Run this test with the following command:
+## pytest tests/test_session_journal.py --cov=controllers.session_journal --cov-report term-missing
+##
+#############################################################
+
+import json
+import logging
+import time
+from unittest.mock import patch
+
+import pytest
+
+from controllers.clock import SimulatedClock, set_clock
+from controllers.session_journal import RECORD_FAILURE, RECORD_KEY_PRESS, SessionJournal, read_journal
+
+
+@pytest.fixture
+def clock():
+    simulated = SimulatedClock(start=1000.0)
+    previous = set_clock(simulated)
+    yield simulated
+    set_clock(previous)
+
+
+def _lines(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_records_are_stamped_and_written_in_order(tmp_path, clock):
+    path = str(tmp_path / "run" / "journal.jsonl")
+    journal = SessionJournal(path, flush_interval_sec=60, fsync_interval_sec=60)
+    journal.record({"kind": RECORD_KEY_PRESS, "block": 0, "key": "key1"})
+    clock.advance(2.5)
+    journal.record({"kind": RECORD_FAILURE, "block": 0, "message": "boom"})
+    assert journal.flush() is True
+
+    records = _lines(path)
+    assert [(record["seq"], record["kind"], record["t"]) for record in records] == [
+        (1, RECORD_KEY_PRESS, 0.0), (2, RECORD_FAILURE, 2.5)]
+    assert journal.written == 2 and journal.fsyncs == 1
+    journal.close()
+    journal.close()  # already closed: nothing to do
+
+
+def test_background_writer_flushes_on_its_own(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = SessionJournal(path, flush_interval_sec=0.01, fsync_interval_sec=0.01)
+    journal.record({"kind": RECORD_KEY_PRESS, "block": 0, "key": "lock"})
+    for _ in range(200):
+        if journal.fsyncs:
+            break
+        time.sleep(0.01)
+    assert journal.fsyncs >= 1 and _lines(path)[0]["key"] == "lock"
+    journal.close()
+
+
+def test_close_writes_everything_and_appends_across_runs(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    for run in range(2):
+        journal = SessionJournal(path, flush_interval_sec=60, fsync_interval_sec=60, queue_size=2)
+        for index in range(50):
+            journal.record({"kind": RECORD_KEY_PRESS, "block": run, "key": f"key{index % 10}"})
+        journal.close()
+        # Records after close() are dropped, and flush() has nothing to wait for.
+        journal.record({"kind": RECORD_KEY_PRESS, "block": run, "key": "late"})
+        assert journal.flush() is True
+
+    records = _lines(path)
+    assert len(records) == 100 and all(record["key"] != "late" for record in records)
+    assert [record["seq"] for record in records[:3]] == [1, 2, 3] and records[50]["seq"] == 1
+
+
+def test_write_errors_are_counted_not_raised(tmp_path, caplog):
+    journal = SessionJournal(str(tmp_path / "journal.jsonl"), flush_interval_sec=60, fsync_interval_sec=60)
+    with patch.object(journal._handle, "write", side_effect=OSError("disk full")), \
+         patch("controllers.session_journal.os.fsync", side_effect=OSError("disk full")):
+        with caplog.at_level(logging.ERROR):
+            journal.record({"kind": RECORD_KEY_PRESS, "block": 0, "key": "key1"})
+            assert journal.flush() is True
+    assert journal.errors == 2 and journal.written == 0
+    assert "Session journal write failed" in caplog.text
+    journal.close()
+
+
+def test_read_journal_skips_truncated_lines(tmp_path, caplog):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"kind":"key_press","key":"key1"}\n\n[1, 2]\n{"kind":"failure","mess')
+    with caplog.at_level(logging.WARNING):
+        records = list(read_journal(str(path)))
+    assert records == [{"kind": "key_press", "key": "key1"}]
+    assert "line 3" in caplog.text and "line 4" in caplog.text
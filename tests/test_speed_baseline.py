@@ -0,0 +1,103 @@
+# Directory: tests/
+# Filename: test_speed_baseline.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/speed_baseline.py.
+##
+## Run this test with the following command:
+## pytest tests/test_speed_baseline.py --cov=controllers.speed_baseline --cov-report term-missing
+##
+#############################################################
+
+import pytest
+
+from controllers.fio_results import FioDirectionResult, FioJobResult
+from controllers.speed_baseline import SpeedBaselineStore, median, robust_score
+
+PROFILE = ("ASK3-NX", "0508", "1.2.3", "USB3")
+
+
+def _result(bw, p99=2.0, job="W-SEQ-1M-Q32"):
+    return {job: FioJobResult(name=job, write=FioDirectionResult(
+        bw_mbps=bw, iops=bw * 4, io_bytes=1, runtime_s=10.0, clat_p50_ms=p99 / 2, clat_p99_ms=p99))}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SpeedBaselineStore(db_path=str(tmp_path / "baseline" / "speed.sqlite3"), min_samples=5)
+    yield store
+    store.close()
+
+
+class TestRobustScore:
+    def test_median_even_and_odd(self):
+        assert median([3.0, 1.0, 2.0]) == 2.0
+        assert median([4.0, 1.0, 2.0, 3.0]) == 2.5
+
+    def test_zero_mad_has_no_z_score(self):
+        assert robust_score(5.0, [1.0, 1.0, 1.0]) == (1.0, 0.0, None)
+
+    def test_z_score_scales_mad(self):
+        center, mad, z_score = robust_score(90.0, [98.0, 100.0, 102.0])
+        assert (center, mad) == (100.0, 2.0)
+        assert z_score == pytest.approx(-10.0 / (1.4826 * 2.0))
+
+
+class TestSpeedBaselineStore:
+    def test_construction_does_not_touch_disk(self, tmp_path):
+        SpeedBaselineStore(db_path=str(tmp_path / "missing" / "speed.sqlite3"))
+        assert not (tmp_path / "missing").exists()
+
+    def test_record_and_history_newest_first(self, store):
+        assert store.record(PROFILE, _result(100.0), serial="SN1", recorded_at=1.0) == 3  # bw, iops, p99
+        store.record(PROFILE, _result(110.0), recorded_at=2.0)
+        assert store.history(PROFILE, "W-SEQ-1M-Q32", "write", "bw_mbps") == [110.0, 100.0]
+        other = PROFILE[:3] + ("USB2",)
+        assert store.history(other, "W-SEQ-1M-Q32", "write", "bw_mbps") == []
+
+    def test_no_check_until_min_samples(self, store):
+        for bw in (200.0, 201.0, 199.0, 200.0):
+            store.record(PROFILE, _result(bw))
+        assert store.check(PROFILE, _result(100.0)) == []
+
+    def test_throughput_drop_is_flagged(self, store):
+        for bw in (200.0, 202.0, 198.0, 201.0, 199.0):
+            store.record(PROFILE, _result(bw))
+        regressions = store.check(PROFILE, _result(185.0))
+        flagged = {r["metric"]: r for r in regressions}
+        assert set(flagged) == {"bw_mbps", "iops"}
+        assert flagged["bw_mbps"]["change_pct"] == -7.5
+        assert flagged["bw_mbps"]["robust_z"] < -3.5
+        assert flagged["bw_mbps"]["samples"] == 5
+
+    def test_improvement_and_noise_are_not_flagged(self, store):
+        for bw in (200.0, 210.0, 190.0, 205.0, 195.0):
+            store.record(PROFILE, _result(bw))
+        assert store.check(PROFILE, _result(260.0)) == []
+        # 4% below the median but well inside the run-to-run spread.
+        assert store.check(PROFILE, _result(192.0)) == []
+
+    def test_latency_increase_is_flagged(self, store):
+        for _ in range(5):
+            store.record(PROFILE, _result(200.0, p99=2.0))
+        regressions = store.check(PROFILE, _result(200.0, p99=2.5))
+        assert [(r["metric"], r["robust_z"], r["change_pct"]) for r in regressions] == [("clat_p99_ms", None, 25.0)]
+
+    def test_min_change_pct_gates_flat_baselines(self, store):
+        for _ in range(5):
+            store.record(PROFILE, _result(200.0))
+        assert store.check(PROFILE, _result(197.0)) == []
+
+    def test_check_and_record_appends(self, store):
+        assert store.check_and_record(PROFILE, _result(200.0)) == []
+        assert store.history(PROFILE, "W-SEQ-1M-Q32", "write", "iops") == [800.0]
+
+    def test_window_limits_baseline(self, tmp_path):
+        store = SpeedBaselineStore(db_path=str(tmp_path / "speed.sqlite3"), window=3, min_samples=3)
+        for bw in (100.0, 100.0, 100.0, 200.0, 200.0, 200.0):
+            store.record(PROFILE, _result(bw))
+        assert store.history(PROFILE, "W-SEQ-1M-Q32", "write", "bw_mbps") == [200.0, 200.0, 200.0]
+        assert store.check(PROFILE, _result(150.0))
+        store.close()
@@ -0,0 +1,114 @@
+# Directory: tests/
+# Filename: test_state_navigator.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/state_navigator.py.
+##
+## Run this test with the following command:
+## pytest tests/test_state_navigator.py --cov=controllers.state_navigator --cov-report term-missing
+##
+#############################################################
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from controllers.finite_state_machine import CallableCondition, ModelCondition
+from controllers.state_navigator import (
+    DEFAULT_COST_SEC,
+    DEFAULT_TRANSITION_COST_SEC,
+    StateNavigator,
+    TransitionCostModel,
+)
+
+STATES = ['OFF', 'POWER_ON_SELF_TEST', 'OOB_MODE', 'STANDBY_MODE', 'ADMIN_MODE', 'UNLOCKED_ADMIN']
+
+
+@pytest.fixture
+def model():
+    return {"admin_pin": True}
+
+
+@pytest.fixture
+def config(model):
+    return [
+        {'trigger': 'power_on', 'source': 'OFF', 'dest': 'POWER_ON_SELF_TEST'},
+        {'trigger': 'power_off', 'source': '*', 'dest': 'OFF'},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'OOB_MODE',
+         'conditions': [CallableCondition(lambda _: not model["admin_pin"], "admin_pin not enrolled")]},
+        {'trigger': 'post_pass', 'source': 'POWER_ON_SELF_TEST', 'dest': 'STANDBY_MODE',
+         'conditions': [CallableCondition(lambda _: model["admin_pin"], "admin_pin enrolled")]},
+        {'trigger': 'user_reset', 'source': ['STANDBY_MODE', 'ADMIN_MODE'], 'dest': 'OOB_MODE'},
+        {'trigger': 'admin_mode_login', 'source': 'STANDBY_MODE', 'dest': 'ADMIN_MODE'},
+        {'trigger': 'lock_admin', 'source': 'ADMIN_MODE', 'dest': 'STANDBY_MODE'},
+        {'trigger': 'unlock_admin', 'source': 'STANDBY_MODE', 'dest': 'UNLOCKED_ADMIN'},
+        {'trigger': 'lock_admin', 'source': 'UNLOCKED_ADMIN', 'dest': 'STANDBY_MODE'},
+    ]
+
+
+@pytest.fixture
+def navigator(config):
+    return StateNavigator(config, STATES)
+
+
+class TestTransitionCostModel:
+    def test_defaults_until_measured(self):
+        costs = TransitionCostModel()
+        assert costs.cost('STANDBY_MODE', 'unlock_admin') == DEFAULT_TRANSITION_COST_SEC['unlock_admin']
+        assert costs.cost('STANDBY_MODE', 'unknown_trigger') == DEFAULT_COST_SEC
+        assert costs.measured() == {}
+
+    def test_median_of_recent_window(self):
+        costs = TransitionCostModel(window=3)
+        for duration in (100.0, 4.0, 5.0, 6.0):
+            costs.record('STANDBY_MODE', 'unlock_admin', duration)
+        assert costs.cost('STANDBY_MODE', 'unlock_admin') == 5.0
+        assert costs.measured() == {('STANDBY_MODE', 'unlock_admin'): {"count": 3, "median": 5.0}}
+
+
+class TestStateNavigator:
+    def test_already_at_target(self, navigator):
+        assert navigator.plan('STANDBY_MODE', ['STANDBY_MODE', 'OOB_MODE']) == []
+
+    def test_single_lock_press(self, navigator):
+        assert navigator.plan('UNLOCKED_ADMIN', ['STANDBY_MODE']) == [('lock_admin', 'STANDBY_MODE')]
+
+    def test_automatic_post_follows_the_model(self, navigator, model):
+        assert navigator.plan('OFF', ['STANDBY_MODE']) == [('power_on', 'STANDBY_MODE')]
+        model["admin_pin"] = False
+        assert navigator.plan('OFF', ['OOB_MODE']) == [('power_on', 'OOB_MODE')]
+        assert navigator.plan('OFF', ['STANDBY_MODE']) is None
+
+    def test_resets_are_not_steps(self, navigator):
+        assert navigator.plan('ADMIN_MODE', ['OOB_MODE']) is None
+        assert navigator.sources_for('user_reset') == ['STANDBY_MODE', 'ADMIN_MODE']
+
+    def test_measured_costs_pick_the_cheaper_route(self, navigator):
+        # ADMIN_MODE -> UNLOCKED_ADMIN: lock then unlock, or power-cycle then unlock.
+        assert [step[0] for step in navigator.plan('ADMIN_MODE', ['UNLOCKED_ADMIN'])] == ['lock_admin', 'unlock_admin']
+        navigator.cost_model.record('ADMIN_MODE', 'lock_admin', 60.0)
+        assert [step[0] for step in navigator.plan('ADMIN_MODE', ['UNLOCKED_ADMIN'])] == ['power_off', 'power_on', 'unlock_admin']
+        assert navigator.path_cost('ADMIN_MODE', navigator.plan('ADMIN_MODE', ['UNLOCKED_ADMIN'])) == pytest.approx(
+            DEFAULT_TRANSITION_COST_SEC['power_off'] + DEFAULT_TRANSITION_COST_SEC['power_on'] + DEFAULT_TRANSITION_COST_SEC['unlock_admin'])
+
+    def test_release_valves_are_not_called(self, config):
+        action = MagicMock(return_value=False)
+        config.append({'trigger': 'lock_reset', 'source': 'ADMIN_MODE', 'dest': 'OOB_MODE',
+                       'conditions': [CallableCondition(action, "_press_lock_button release valve", release_valve=True)]})
+        navigator = StateNavigator(config, STATES)
+        assert navigator.plan('ADMIN_MODE', ['OOB_MODE']) == [('lock_reset', 'OOB_MODE')]
+        action.assert_not_called()
+
+    def test_failing_condition_removes_edge(self, config):
+        config.append({'trigger': 'lock_reset', 'source': 'ADMIN_MODE', 'dest': 'OOB_MODE',
+                       'conditions': [CallableCondition(lambda _: 1 / 0, "broken")]})
+        assert StateNavigator(config, STATES).plan('ADMIN_MODE', ['OOB_MODE']) is None
+
+    def test_model_conditions_read_the_navigators_model(self, config):
+        config.append({'trigger': 'lock_reset', 'source': 'ADMIN_MODE', 'dest': 'OOB_MODE',
+                       'conditions': [ModelCondition(lambda fsm: fsm["reset_allowed"], "reset allowed")]})
+        assert StateNavigator(config, STATES, model={"reset_allowed": True}).plan('ADMIN_MODE', ['OOB_MODE']) == [
+            ('lock_reset', 'OOB_MODE')]
+        assert StateNavigator(config, STATES, model={"reset_allowed": False}).plan('ADMIN_MODE', ['OOB_MODE']) is None
@@ -0,0 +1,176 @@
+# Directory: tests/
+# Filename: test_transition_profiler.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/transition_profiler.py.
+##
+## Run this test with the following command:
+## pytest tests/test_transition_profiler.py --cov=controllers.transition_profiler --cov-report term-missing
+##
+#############################################################
+
+import json
+
+import pytest
+from transitions import Machine
+
+from controllers.clock import SimulatedClock, set_clock
+from controllers.finite_state_machine import CallableCondition
+from controllers.transition_profiler import (
+    NO_TRIGGER,
+    TransitionProfiler,
+    get_profiler,
+    profiled_wait,
+    set_profiler,
+)
+
+
+@pytest.fixture
+def clock():
+    clock = SimulatedClock(start=100.0)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+class Model:
+    """A small model whose callbacks advance the simulated clock by known amounts."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.valve_ok = True
+
+    def _press(self, event_data):
+        self.clock.advance(2.0)
+
+    def _valve(self, event_data):
+        self.clock.advance(0.5)
+        return self.valve_ok
+
+    def on_enter_ON(self, event_data):
+        self.clock.advance(1.0)
+        self.wait_for_led()
+        self.settle()
+
+    @profiled_wait
+    def wait_for_led(self):
+        self.clock.advance(3.0)
+
+    def _settle(self, event_data):
+        self.clock.advance(0.25)
+
+
+@pytest.fixture
+def model(clock):
+    model = Model(clock)
+    valve = CallableCondition(model._valve, "_valve release valve", release_valve=True)
+    machine = Machine(model=model, states=['OFF', 'ON', 'SETTLED'], initial='OFF', send_event=True,
+                      auto_transitions=False, transitions=[
+                          {'trigger': 'power_on', 'source': 'OFF', 'dest': 'ON', 'before': '_press', 'conditions': [valve]},
+                          {'trigger': 'settle', 'source': 'ON', 'dest': 'SETTLED', 'before': '_settle'},
+                          {'trigger': 'power_off', 'source': ['ON', 'SETTLED'], 'dest': 'OFF'},
+                      ])
+    model.machine = machine
+    return model
+
+
+@pytest.fixture
+def profiler(clock):
+    profiler = TransitionProfiler()
+    previous = set_profiler(profiler)
+    yield profiler
+    set_profiler(previous)
+
+
+def test_phases_are_timed_per_trigger(model, profiler):
+    profiler.instrument(model.machine)
+    model.power_on()
+
+    summary = profiler.summary()
+    assert summary["power_on"]["trigger"]["total"] == pytest.approx(6.75)
+    assert summary["power_on"]["release_valve"]["total"] == pytest.approx(0.5)
+    assert summary["power_on"]["before"]["total"] == pytest.approx(2.0)
+    assert summary["power_on"]["on_enter"]["total"] == pytest.approx(4.25)
+    assert summary["power_on"]["wait:wait_for_led"]["total"] == pytest.approx(3.0)
+    # settle was fired from on_enter_ON: its own spans belong to it, not to power_on.
+    assert set(summary["settle"]) == {"trigger", "before"}
+    assert summary["settle"]["before"]["max"] == pytest.approx(0.25)
+
+
+def test_failed_trigger_is_recorded_and_invalid_trigger_ignored(model, profiler):
+    profiler.instrument(model.machine)
+    profiler.instrument(model.machine)  # a second call is a no-op
+    model.valve_ok = False
+    assert model.power_on() is False
+    with pytest.raises(Exception):
+        model.settle()  # not valid in OFF: finalize runs without prepare
+
+    trigger_events = [event for event in profiler.events if event["cat"] == "trigger"]
+    assert len(trigger_events) == 1
+    assert trigger_events[0]["args"] == {"source": "OFF", "ok": False, "trigger": "power_on"}
+    assert profiler.summary()["power_on"]["release_valve"]["count"] == 1
+
+
+def test_histogram_buckets(profiler, clock):
+    profiler.buckets = (1.0, 5.0)
+    for duration in (0.5, 1.0, 3.0, 9.0):
+        with profiler.span("op", "wait"):
+            clock.advance(duration)
+    assert profiler.histogram() == {NO_TRIGGER: {"wait:op": {"<=1.0": 2, "<=5.0": 1, ">5.0": 1}}}
+    stats = profiler.summary()[NO_TRIGGER]["wait:op"]
+    assert (stats["p50"], stats["p95"]) == (pytest.approx(1.0), pytest.approx(9.0))
+
+
+def test_chrome_trace_export(model, profiler, tmp_path):
+    profiler.instrument(model.machine)
+    model.power_on()
+    path = profiler.export_chrome_trace(str(tmp_path / "trace.json"))
+
+    trace = json.loads(open(path).read())
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    power_on = next(event for event in spans if event["name"] == "power_on")
+    wait = next(event for event in spans if event["name"] == "wait_for_led")
+    assert power_on["dur"] == pytest.approx(6.75e6)
+    assert power_on["ts"] <= wait["ts"] and wait["ts"] + wait["dur"] <= power_on["ts"] + power_on["dur"]
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in trace["traceEvents"])
+    assert trace["otherData"] == {"dropped_events": 0, "simulated_clock": True}
+
+
+def test_event_limit_keeps_histograms(profiler):
+    profiler.max_events = 1
+    for _ in range(3):
+        with profiler.span("op", "wait"):
+            pass
+    assert len(profiler.events) == 1 and profiler.dropped_events == 2
+    assert profiler.summary()[NO_TRIGGER]["wait:op"]["count"] == 3
+    profiler.reset()
+    assert profiler.events == [] and profiler.summary() == {}
+
+
+def test_disabled_profiler_does_nothing(model, clock):
+    previous = set_profiler(None)
+    try:
+        disabled = get_profiler()
+        assert disabled.enabled is False
+        disabled.instrument(model.machine)
+        model.power_on()
+        assert disabled.events == [] and disabled.summary() == {}
+        assert not hasattr(model.machine, "_transition_profiler")
+    finally:
+        set_profiler(previous)
+
+
+def test_machine_moves_to_the_current_profiler(model, profiler):
+    profiler.instrument(model.machine)
+    successor = TransitionProfiler()
+    successor.instrument(model.machine)
+    model.power_on()
+    assert "power_on" not in profiler.summary() and "power_on" in successor.summary()
+    assert model.machine._transition_profiler is successor
+
+    successor.uninstrument(model.machine)
+    successor.uninstrument(model.machine)  # no longer instrumented: nothing to do
+    model.power_off()
+    assert "power_off" not in successor.summary() and not hasattr(model.machine, "_transition_profiler")
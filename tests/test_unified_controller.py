@@ -12,15 +12,28 @@
 #############################################################
 
 import pytest
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock, call, mock_open
 import sys
 import logging
 import json
 import subprocess
 import os
 import importlib
+import textwrap
 from controllers.unified_controller import UnifiedController
 import controllers.unified_controller as unified_controller_module
+from controllers.clock import SimulatedClock, set_clock
+from controllers.fio_stream import StallPolicy
+from controllers.direct_io import is_device
+
+def _fio_run_capturing_job_file(stdout, captured):
+    """_run_fio_process side effect that records the generated fio job file before it is deleted."""
+    def _run(command, **kwargs):
+        with open(command[-1]) as job_file:
+            captured.append(job_file.read())
+        return MagicMock(stdout=stdout, stderr='')
+    return _run
+
 
 @pytest.fixture
 def mock_dependencies():
@@ -134,7 +147,8 @@ class TestUnifiedController:
             replay_output_dir=ANY,
             enable_instant_replay=ANY,
             keypad_layout=expected_default_layout,
-            camera_hw_settings=ANY # <-- ADD THIS LINE
+            camera_hw_settings=ANY, # <-- ADD THIS LINE
+            frame_source=None
         )
 
     def test_initialization_skips_barcode_scan(self, mock_dependencies, caplog):
@@ -561,7 +575,8 @@ class TestUnifiedController:
             replay_output_dir=ANY,
             enable_instant_replay=ANY,
             keypad_layout=expected_layout,
-            camera_hw_settings=ANY
+            camera_hw_settings=ANY,
+            frame_source=None
         )
 
     def test_run_fio_tests_path_formatting(self, mock_dependencies, monkeypatch):
@@ -570,66 +585,36 @@ class TestUnifiedController:
         """
         controller = UnifiedController(scan_retry_delay_sec=0)
 
-        mock_write_json = '{"jobs": [{"write": {"io_bytes": 1, "bw_bytes": 150000000}}]}'
-        mock_read_json = '{"jobs": [{"read": {"io_bytes": 1, "bw_bytes": 250000000}}]}'
-
-        mock_write_result = MagicMock(stdout=mock_write_json)
-        mock_read_result = MagicMock(stdout=mock_read_json)
+        mock_json = ('{"jobs": [{"jobname": "W-SEQ-1M-Q32", "write": {"io_bytes": 1, "bw_bytes": 150000000}},'
+                     ' {"jobname": "R-SEQ-1M-Q32", "read": {"io_bytes": 1, "bw_bytes": 250000000}}]}')
+        expected_results = {'W-SEQ-1M-Q32': {'write': 150.0}, 'R-SEQ-1M-Q32': {'read': 250.0}}
+        job_files = []
 
-        with patch.object(unified_controller_module, 'subprocess') as mock_subprocess, \
+        with patch.object(controller, '_run_fio_process') as mock_run_fio, \
              patch.object(controller, '_get_fio_path', return_value='mock_fio_path'), \
              patch.object(controller, '_has_admin_privileges', return_value=True), \
              patch.object(unified_controller_module.os.path, 'isdir', return_value=True), \
              patch.object(unified_controller_module.os.path, 'exists', return_value=False), \
              patch.object(unified_controller_module.os, 'remove'):
-            mock_subprocess.run.side_effect = [mock_write_result, mock_read_result]
+            mock_run_fio.side_effect = _fio_run_capturing_job_file(mock_json, job_files)
 
             monkeypatch.setattr(sys, 'platform', 'win32')
             final_results_win = controller.run_fio_tests(disk_path="3", drive_letter="E:")
 
-            fio_command_args_win = mock_subprocess.run.call_args_list[0].args[0]
+            mock_run_fio.assert_called_once()
             expected_path = os.path.normpath(os.path.join('E:\\', 'apricorn_fio_benchmark.bin'))
-            assert any(arg == f'--filename={expected_path}' for arg in fio_command_args_win)
-            assert final_results_win == {'write': 150.0, 'read': 250.0}
+            assert 'filename=' + expected_path.replace(':', '\\:') in job_files[0].splitlines()
+            assert 'ioengine=windowsaio' in job_files[0].splitlines()
+            assert {name: job.bandwidth for name, job in final_results_win.items()} == expected_results
 
-            mock_subprocess.run.reset_mock()
-            mock_subprocess.run.side_effect = [mock_write_result, mock_read_result]
+            mock_run_fio.reset_mock()
             monkeypatch.setattr(sys, 'platform', 'linux')
 
             final_results_linux = controller.run_fio_tests(disk_path='/dev/sdb')
 
-            fio_command_args_linux = mock_subprocess.run.call_args_list[0].args[0]
-            assert any(arg.endswith('/dev/sdb') for arg in fio_command_args_linux)
-            assert final_results_linux == {'write': 150.0, 'read': 250.0}
-
-    def test_parse_fio_json_output(self, mock_dependencies):
-        controller = UnifiedController(scan_retry_delay_sec=0)
-        
-        # Test case with both read and write results
-        sample_json_rw = '{"jobs": [{"read": {"io_bytes": 1, "bw_bytes": 250000000}, "write": {"io_bytes": 1, "bw_bytes": 150000000}}]}'
-        result_rw = controller._parse_fio_json_output(sample_json_rw)
-        assert result_rw == {'read': 250.0, 'write': 150.0}
-
-        # Test case with only read results (write bytes are 0)
-        sample_json_r = '{"jobs": [{"read": {"io_bytes": 1, "bw_bytes": 300000000}, "write": {"io_bytes": 0}}]}'
-        result_r = controller._parse_fio_json_output(sample_json_r)
-        assert result_r == {'read': 300.0}
-
-        # Test case where no operations happened (io_bytes are 0)
-        sample_json_empty_job = '{"jobs": [{"read": {"io_bytes": 0}, "write": {"io_bytes": 0}}]}'
-        result_empty = controller._parse_fio_json_output(sample_json_empty_job)
-        # CORRECTED ASSERTION: The function returns None when the results dict is empty.
-        assert result_empty is None
-
-        # Test case with missing 'jobs' key
-        sample_json_no_jobs = '{"other_key": "value"}'
-        result_no_jobs = controller._parse_fio_json_output(sample_json_no_jobs)
-        assert result_no_jobs is None
-
-        # Test case with invalid JSON
-        sample_invalid_json = '{"jobs": [}'
-        result_invalid = controller._parse_fio_json_output(sample_invalid_json)
-        assert result_invalid is None
+            mock_run_fio.assert_called_once()
+            assert 'filename=/dev/sdb' in job_files[1].splitlines()
+            assert {name: job.bandwidth for name, job in final_results_linux.items()} == expected_results
 
     def test_confirm_led_solid_strict_delegation(self, mock_dependencies, caplog):
         """
@@ -848,6 +833,39 @@ class TestUnifiedController:
         mock_camera_instance.release_camera.assert_called_once()
         mock_phidget_instance.close_all.assert_not_called()
 
+    def test_usb_watcher_serves_lookups_from_index(self, mock_dependencies, tmp_path):
+        """Once the watcher is running, lookups are served from its index without re-running the tool."""
+        find_device_mock = mock_dependencies["find_device"]
+        device = MockApricornDevice("WATCHED_SN", "1000 GB")
+        find_device_mock.return_value = [device]
+        controller = UnifiedController(scan_retry_delay_sec=0)
+        (tmp_path / "usb").mkdir()
+
+        watcher = controller.start_usb_watcher(use_uevents=False, poll_interval_sec=60, resync_interval_sec=3600,
+                                               sysfs_usb_dir=str(tmp_path / "usb"), sysfs_block_dir=str(tmp_path / "block"))
+        try:
+            assert watcher is not None and watcher.is_running
+            calls_after_start = find_device_mock.call_count
+            assert controller.get_usb_device("WATCHED_SN") is device
+            assert controller._enumerate_apricorn_devices() == [device]
+            assert find_device_mock.call_count == calls_after_start
+        finally:
+            controller.close()
+        assert controller._usb_watcher is None
+        assert controller.get_usb_device("WATCHED_SN") is device  # Falls back to a direct tool call.
+
+    def test_usb_watcher_not_started_without_sysfs(self, mock_dependencies, tmp_path):
+        """Without sysfs (Windows, macOS) the watcher could only poll the tool, so lookups stay on demand."""
+        find_device_mock = mock_dependencies["find_device"]
+        find_device_mock.return_value = [MockApricornDevice("WATCHED_SN", "1000 GB")]
+        controller = UnifiedController(scan_retry_delay_sec=0)
+
+        assert controller.start_usb_watcher(use_uevents=False, sysfs_usb_dir=str(tmp_path / "missing")) is None
+        assert controller._usb_watcher is None
+        assert find_device_mock.call_count == 0
+        assert controller.get_usb_device("WATCHED_SN").iSerial == "WATCHED_SN"
+        assert find_device_mock.call_count == 1
+
 
 # New class to test module-level setup logic
 class TestModuleSetup:
@@ -993,12 +1011,54 @@ class ConfirmEnumBaseTests:
     def test_enum_success(self, controller_and_mocks, caplog):
         controller, find_device_mock = controller_and_mocks
         mock_device = MockApricornDevice(self.SERIAL_NUM, self.GOOD_DRIVE_STATE)
-        find_device_mock.side_effect = [[mock_device], [mock_device]]
+        find_device_mock.return_value = [mock_device]
         with caplog.at_level(logging.INFO):
             is_stable, dev_info = self._call_method(controller, self.SERIAL_NUM)
         assert is_stable is True
         assert dev_info is mock_device
         assert "confirmed stable" in caplog.text
+        assert controller.last_enum_result['success'] is True
+        assert controller.last_enum_result['time_to_first_enum_s'] == 1
+        assert controller.last_enum_result['flap_count'] == 0
+
+    def test_enum_without_watcher_samples_at_window_edges(self, controller_and_mocks):
+        controller, find_device_mock = controller_and_mocks
+        mock_device = MockApricornDevice(self.SERIAL_NUM, self.GOOD_DRIVE_STATE)
+        find_device_mock.return_value = [mock_device]
+        previous = set_clock(SimulatedClock(start=1000.0))
+        try:
+            is_stable, dev_info = self._call_method(controller, self.SERIAL_NUM, stable_min=5, timeout=15)
+        finally:
+            set_clock(previous)
+        assert is_stable is True and dev_info is mock_device
+        assert find_device_mock.call_count == 2
+        assert controller.last_enum_result['stable_after_s'] == 5
+
+    def test_enum_flap_restarts_window_when_not_failing_fast(self, controller_and_mocks, caplog):
+        controller, find_device_mock = controller_and_mocks
+        mock_device = MockApricornDevice(self.SERIAL_NUM, self.GOOD_DRIVE_STATE)
+        samples = iter([[mock_device], []])
+        find_device_mock.side_effect = lambda: next(samples, [mock_device])
+        with caplog.at_level(logging.WARNING):
+            is_stable, dev_info = self._call_method(controller, self.SERIAL_NUM, fail_on_flap=False, timeout=60)
+        assert is_stable is True and dev_info is mock_device
+        assert controller.last_enum_result['flap_count'] == 1
+        assert "Restarting stability window" in caplog.text
+
+    def test_enum_detects_reenumeration_between_samples_via_watcher(self, controller_and_mocks, caplog):
+        controller, find_device_mock = controller_and_mocks
+        mock_device = MockApricornDevice(self.SERIAL_NUM, self.GOOD_DRIVE_STATE)
+        watcher = MagicMock(is_running=True, generation=0)
+        watcher.devices.return_value = [mock_device]
+        # The device was removed and re-added between the first and second sample.
+        watcher.first_seen.side_effect = [100.0, 100.0, 105.0]
+        controller._usb_watcher = watcher
+        with caplog.at_level(logging.WARNING):
+            is_stable, dev_info = self._call_method(controller, self.SERIAL_NUM)
+        assert is_stable is False and dev_info is None
+        assert "re-enumerated during stability wait" in caplog.text
+        assert controller.last_enum_result['flap_count'] == 1
+        find_device_mock.assert_not_called()
 
     def test_enum_fails_initial_device_not_found(self, controller_and_mocks, caplog):
         controller, find_device_mock = controller_and_mocks
@@ -1007,6 +1067,9 @@ class ConfirmEnumBaseTests:
             is_stable, dev_info = self._call_method(controller, self.SERIAL_NUM)
         assert is_stable is False and dev_info is None
         assert "No device found" in caplog.text
+        # Never seen at the first check: no waiting out the timeout.
+        assert find_device_mock.call_count == 1
+        assert controller.last_enum_result['failure_reason'] == 'not_found'
 
     def test_enum_fails_no_matching_serial(self, controller_and_mocks, caplog):
         controller, find_device_mock = controller_and_mocks
@@ -1032,7 +1095,6 @@ class ConfirmEnumBaseTests:
         def time_advancer(*args, **kwargs):
             nonlocal call_count; call_count += 1
             if call_count <= 2: return 0
-            elif call_count == 3: return 1
             else: return 16
         mock_time.side_effect = time_advancer
         with caplog.at_level(logging.WARNING):
@@ -1186,6 +1248,35 @@ class TestFioHelpers:
         # Verify the correct log message was generated before re-raising
         assert f"Cannot run FIO tests: {error_message}" in caplog.text
 
+    def test_run_fio_tests_falls_back_to_direct_io_when_binary_missing(self, controller, monkeypatch, tmp_path):
+        """A missing fio binary routes the speed test through the built-in engine."""
+        monkeypatch.setattr(sys, 'platform', 'linux')
+        monkeypatch.setattr(unified_controller_module, 'SPEED_TEST_ENGINE', 'auto')
+        target = tmp_path / "loop.img"
+        with open(target, "wb") as handle:
+            handle.truncate(2 * 1024 * 1024)
+
+        with patch.object(controller, '_get_fio_path', side_effect=FileNotFoundError("fio-linux missing")), \
+             patch.object(controller, '_run_fio_process') as mock_run_fio:
+            results = controller.run_fio_tests(disk_path=str(target), duration=5)
+
+        mock_run_fio.assert_not_called()
+        assert set(results) == {'W-SEQ-1M-Q32', 'R-SEQ-1M-Q32'}
+        assert results['W-SEQ-1M-Q32'].write.bw_mbps > 0 and results['R-SEQ-1M-Q32'].read.bw_mbps > 0
+
+    def test_run_fio_tests_missing_binary_raises_when_fio_forced(self, controller, monkeypatch):
+        monkeypatch.setattr(unified_controller_module, 'SPEED_TEST_ENGINE', 'fio')
+        with patch.object(controller, '_get_fio_path', side_effect=FileNotFoundError("fio-linux missing")), \
+             patch.object(controller, 'run_direct_io_tests') as mock_native:
+            with pytest.raises(FileNotFoundError):
+                controller.run_fio_tests(disk_path="/dev/sdb")
+        mock_native.assert_not_called()
+
+    def test_run_direct_io_tests_reports_open_failure(self, controller, caplog, tmp_path):
+        with caplog.at_level(logging.ERROR):
+            assert controller.run_direct_io_tests(str(tmp_path / "missing" / "dev"), duration=1) is None
+        assert "Direct I/O speed test" in caplog.text
+
     def test_run_fio_tests_windows_non_digit_path(self, controller, monkeypatch):
         """
         Tests the 'else' branch for Windows path handling where the path is
@@ -1193,25 +1284,23 @@ class TestFioHelpers:
         """
         # --- ARRANGE ---
         monkeypatch.setattr(sys, 'platform', 'win32')
+        job_files = []
         with patch.object(controller, '_get_fio_path', return_value='fio.exe'), \
-             patch.object(unified_controller_module, 'subprocess') as mock_subprocess, \
+             patch.object(controller, '_run_fio_process') as mock_run_fio, \
              patch.object(controller, '_has_admin_privileges', return_value=True), \
              patch.object(unified_controller_module.os.path, 'isdir', return_value=True), \
              patch.object(unified_controller_module.os.path, 'exists', return_value=False), \
              patch.object(unified_controller_module.os, 'remove'):
-            
-            # THE FIX: Configure the mock to return a valid result object.
-            # This prevents the TypeError inside json.loads().
-            mock_result = MagicMock(stdout='{"jobs": [{"read": {"io_bytes": 1, "bw_bytes": 1000}}]}')
-            mock_subprocess.run.return_value = mock_result
-            
+
+            mock_run_fio.side_effect = _fio_run_capturing_job_file(
+                '{"jobs": [{"jobname": "R-SEQ-1M-Q32", "read": {"io_bytes": 1, "bw_bytes": 1000}}]}', job_files)
+
             # --- ACT ---
             controller.run_fio_tests(disk_path="PhysicalDrive1", drive_letter="E:")
 
         # --- ASSERT ---
-        called_args = mock_subprocess.run.call_args.args[0]
         expected_path = os.path.normpath(os.path.join('E:\\', 'apricorn_fio_benchmark.bin'))
-        assert any(arg == f'--filename={expected_path}' for arg in called_args)
+        assert 'filename=' + expected_path.replace(':', '\\:') in job_files[0].splitlines()
 
     @pytest.mark.parametrize(
         "exception_to_raise, expected_log_msg",
@@ -1230,17 +1319,17 @@ class TestFioHelpers:
     )
     def test_run_fio_handles_subprocess_exceptions(self, controller, caplog, exception_to_raise, expected_log_msg):
         """
-        Tests that exceptions raised by subprocess.run are caught and logged correctly.
+        Tests that exceptions raised by the fio process are caught and logged correctly.
         """
         # --- ARRANGE ---
         # Mock _get_fio_path to prevent its own logic from running
-        # Patch subprocess.run directly within the module where it's imported (unified_controller_module).
+        # Patch the controller's fio process runner.
         with patch.object(controller, '_get_fio_path', return_value='fio'), \
              patch.object(controller, '_has_admin_privileges', return_value=True), \
-             patch.object(unified_controller_module.subprocess, 'run') as mock_subprocess_run:
+             patch.object(controller, '_run_fio_process') as mock_run_fio:
             
-            # Configure the mocked run method to raise the exception for this test case
-            mock_subprocess_run.side_effect = exception_to_raise
+            # Configure the mocked runner to raise the exception for this test case
+            mock_run_fio.side_effect = exception_to_raise
 
             # --- ACT ---
             with caplog.at_level(logging.ERROR):
@@ -1252,22 +1341,21 @@ class TestFioHelpers:
 
     def test_run_fio_handles_file_not_found_from_subprocess(self, controller, caplog, monkeypatch):
         """
-        Tests that a FileNotFoundError from subprocess.run is caught, logged, and re-raised.
+        Tests that a FileNotFoundError from starting the fio process is caught, logged, and re-raised.
         This simulates a race condition where the file disappears after being checked.
         """
         # --- ARRANGE ---
-        # We need _get_fio_path to succeed, but subprocess.run to fail.
+        # We need _get_fio_path to succeed, but starting the fio process to fail.
         fio_path = 'path/to/nonexistent/fio'
         monkeypatch.setattr(controller, '_get_fio_path', lambda: fio_path)
 
-        # Patch the specific `run` function within the module's `subprocess` object
-        # FIX: Use patch.object on the module's subprocess.run for precise control.
+        # Patch the controller's fio process runner for precise control.
         with patch.object(controller, '_has_admin_privileges', return_value=True), \
-             patch.object(unified_controller_module.subprocess, 'run') as mock_subprocess_run:
-            # Configure subprocess.run to raise the FileNotFoundError
+             patch.object(controller, '_run_fio_process') as mock_run_fio:
+            # Configure the fio runner to raise the FileNotFoundError
             # FIX: Raise the FileNotFoundError instance. The exact message is OS-dependent,
             # but the type is consistent.
-            mock_subprocess_run.side_effect = FileNotFoundError("Simulated FNF error")
+            mock_run_fio.side_effect = FileNotFoundError("Simulated FNF error")
 
             # Determine an OS-appropriate disk path, though the mock prevents actual execution.
             if sys.platform == 'win32':
@@ -1287,7 +1375,7 @@ class TestFioHelpers:
             
             # Assert that our specific log message was generated by the except block
             assert f"FIO command not found at '{fio_path}'" in caplog.text
-            mock_subprocess_run.assert_called_once()
+            mock_run_fio.assert_called_once()
 
     def test_run_fio_fails_on_parse_error(self, controller, caplog):
         """Tests that a failure to parse FIO's JSON output is handled correctly."""
@@ -1295,11 +1383,11 @@ class TestFioHelpers:
         # Mock all dependencies to isolate the parsing logic.
         with patch.object(controller, '_get_fio_path', return_value='fio'), \
              patch.object(controller, '_has_admin_privileges', return_value=True), \
-             patch.object(unified_controller_module, 'subprocess') as mock_subprocess, \
-             patch.object(controller, '_parse_fio_json_output', return_value=None) as mock_parse:
+             patch.object(controller, '_run_fio_process') as mock_run_fio, \
+             patch.object(controller, '_parse_fio_job_results', return_value=None) as mock_parse:
             
-            # Ensure subprocess.run() 'succeeds' so we can test the parsing failure.
-            mock_subprocess.run.return_value = MagicMock(stdout='{}') # Content doesn't matter
+            # Ensure the fio run 'succeeds' so we can test the parsing failure.
+            mock_run_fio.return_value = MagicMock(stdout='{}') # Content doesn't matter
             
             # --- ACT ---
             with caplog.at_level(logging.ERROR):
@@ -1312,30 +1400,240 @@ class TestFioHelpers:
 
     def test_run_fio_tests_windows_fallback_to_file_when_not_admin(self, controller, monkeypatch):
         monkeypatch.setattr(sys, 'platform', 'win32')
+        job_files = []
         with patch.object(controller, '_get_fio_path', return_value='fio.exe'), \
              patch.object(controller, '_has_admin_privileges', return_value=False), \
-             patch.object(unified_controller_module, 'subprocess') as mock_subprocess, \
+             patch.object(controller, '_run_fio_process') as mock_run_fio, \
              patch.object(unified_controller_module.os.path, 'isdir', return_value=True), \
              patch.object(unified_controller_module.os.path, 'exists') as mock_exists, \
              patch.object(unified_controller_module.os, 'remove') as mock_remove:
-            mock_write_result = MagicMock(
-                stdout='{"jobs": [{"write": {"io_bytes": 1, "bw_bytes": 125000000}}]}'
+            mock_run_fio.side_effect = _fio_run_capturing_job_file(
+                '{"jobs": [{"jobname": "W-SEQ-1M-Q32", "write": {"io_bytes": 1, "bw_bytes": 125000000}},'
+                ' {"jobname": "R-SEQ-1M-Q32", "read": {"io_bytes": 1, "bw_bytes": 150000000}}]}',
+                job_files,
             )
-            mock_read_result = MagicMock(
-                stdout='{"jobs": [{"read": {"io_bytes": 1, "bw_bytes": 150000000}}]}'
-            )
-            mock_subprocess.run.side_effect = [mock_write_result, mock_read_result]
 
             exist_calls = iter([False, True])
             mock_exists.side_effect = lambda _path: next(exist_calls, True)
 
             result = controller.run_fio_tests(disk_path='3', drive_letter='E:')
 
-            assert result == {'write': 125.0, 'read': 150.0}
-            fio_args = mock_subprocess.run.call_args_list[0].args[0]
+            assert {name: job.bandwidth for name, job in result.items()} == {
+                'W-SEQ-1M-Q32': {'write': 125.0}, 'R-SEQ-1M-Q32': {'read': 150.0},
+            }
             expected_path = os.path.normpath(os.path.join('E:\\', 'apricorn_fio_benchmark.bin'))
-            assert any(arg == f'--filename={expected_path}' for arg in fio_args)
+            job_lines = job_files[0].splitlines()
+            assert 'filename=' + expected_path.replace(':', '\\:') in job_lines
+            assert f"size={unified_controller_module.DEFAULT_FIO_FALLBACK_FILE_SIZE}" in job_lines
             mock_remove.assert_called_with(expected_path)
+
+    def _status_script(self, documents, delay=0.05, repeat_last=False):
+        """Python one-liner that prints fio-style status documents like fio --status-interval."""
+        return [sys.executable, '-c', textwrap.dedent(f"""
+            import json, sys, time
+            docs = {documents!r}
+            for doc in docs:
+                print(json.dumps(doc, indent=2), flush=True)
+                time.sleep({delay})
+            while {repeat_last!r}:
+                docs[-1]["timestamp_ms"] += 1000
+                print(json.dumps(docs[-1]), flush=True)
+                time.sleep({delay})
+        """)]
+
+    @staticmethod
+    def _status_doc(timestamp_ms, job, io_bytes, total_ios):
+        return {"timestamp_ms": timestamp_ms, "jobs": [
+            {"jobname": job, "read": {"io_bytes": io_bytes, "total_ios": total_ios, "bw_bytes": 0},
+             "write": {"io_bytes": 0, "total_ios": 0}},
+        ]}
+
+    def test_run_fio_process_streams_interval_samples(self, controller):
+        documents = [self._status_doc(1000 * i, "R-SEQ", 100_000_000 * i, 100 * i) for i in range(1, 4)]
+        result = controller._run_fio_process(self._status_script(documents), abort_policies=[])
+
+        assert result.returncode == 0
+        assert json.loads(result.stdout)["timestamp_ms"] == 3000
+        samples = controller.last_fio_timeseries
+        assert [s["t"] - samples[0]["t"] for s in samples] == pytest.approx([0.0, 1.0, 2.0], abs=1e-3)
+        assert [s["bw_mbps"] for s in samples[1:]] == [100.0, 100.0]
+        assert [s["iops"] for s in samples[1:]] == [100.0, 100.0]
+        assert controller.last_fio_abort_reason is None
+
+    def test_run_fio_process_aborts_stalled_run(self, controller):
+        documents = [self._status_doc(1000, "W-SEQ", 50_000_000, 50)]
+        policies = [StallPolicy(window_s=3)]
+        result = controller._run_fio_process(self._status_script(documents, repeat_last=True), abort_policies=policies)
+
+        assert "no I/O completed" in controller.last_fio_abort_reason
+        assert result.returncode != 0
+        assert all(sample["ios"] == 0 for sample in controller.last_fio_timeseries[1:])
+
+    def test_run_fio_process_raises_on_failure(self, controller):
+        with pytest.raises(subprocess.CalledProcessError) as excinfo:
+            controller._run_fio_process([sys.executable, '-c', 'import sys; sys.stderr.write("boom"); sys.exit(3)'],
+                                        abort_policies=[])
+        assert excinfo.value.returncode == 3 and excinfo.value.stderr == "boom"
+
+    def test_run_fio_tests_returns_none_when_aborted(self, controller, caplog):
+        def aborted_run(command, **kwargs):
+            controller.last_fio_abort_reason = "no I/O completed for 3.0s (job W-SEQ-1M-Q32)"
+            return subprocess.CompletedProcess(command, -15, stdout='', stderr='')
+
+        with patch.object(controller, '_get_fio_path', return_value='fio'), \
+             patch.object(controller, '_run_fio_process', side_effect=aborted_run), \
+             caplog.at_level(logging.ERROR):
+            assert controller.run_fio_tests(disk_path='/dev/sdb') is None
+        assert "aborted early: no I/O completed" in caplog.text
+
+    def test_write_fio_job_file_separates_jobs_with_stonewall(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'linux')
+        tests = [
+            {'name': 'W-SEQ-1M-Q32', 'rw': 'write', 'bs': '1m', 'iodepth': 32},
+            {'name': 'R-RND-4K-Q1', 'rw': 'randread', 'bs': '4k', 'iodepth': 1, 'size': '1g'},
+        ]
+        job_file_path = controller._write_fio_job_file('/dev/sdb', 10, tests)
+        try:
+            with open(job_file_path) as job_file:
+                content = job_file.read()
+        finally:
+            os.remove(job_file_path)
+
+        global_section, write_job, read_job = content.split('\n\n')
+        assert global_section.splitlines() == [
+            '[global]', 'ioengine=libaio', 'direct=1', 'random_generator=tausworthe64',
+            'filename=/dev/sdb', 'runtime=10',
+        ]
+        assert write_job.splitlines() == ['[W-SEQ-1M-Q32]', 'stonewall', 'rw=write', 'bs=1m', 'iodepth=32']
+        assert read_job.splitlines() == ['[R-RND-4K-Q1]', 'stonewall', 'rw=randread', 'bs=4k', 'iodepth=1', 'size=1g']
+
+    def test_parse_fio_job_results_reads_latency_iops_and_errors(self, controller, caplog):
+        output = json.dumps({"jobs": [{
+            "jobname": "R-RND-4K-Q1", "error": 5, "total_err": 2, "job_runtime": 10012,
+            "read": {
+                "io_bytes": 409600, "bw_bytes": 40960000, "iops": 10000.4, "runtime": 10000,
+                "clat_ns": {"percentile": {"50.000000": 95232, "99.000000": 158720, "99.900000": 2703360}},
+            },
+            "write": {"io_bytes": 0, "bw_bytes": 0},
+        }]})
+        with caplog.at_level(logging.WARNING):
+            job = controller._parse_fio_job_results(output)['R-RND-4K-Q1']
+        assert job.write is None
+        assert (job.read.bw_mbps, job.read.iops, job.read.runtime_s) == (40.96, 10000.4, 10.0)
+        assert (job.read.clat_p50_ms, job.read.clat_p99_ms, job.read.clat_p999_ms) == (0.095, 0.159, 2.703)
+        assert (job.runtime_s, job.error, job.total_errors) == (10.012, 5, 2)
+        assert "reported 2 I/O error(s)" in caplog.text
+
+    def test_parse_fio_job_results_keys_by_job_name(self, controller):
+        output = ('note: both iodepth >= 1 and synchronous I/O engine are selected\n'
+                  '{"jobs": [{"jobname": "W", "write": {"io_bytes": 1, "bw_bytes": 100000000}, "read": {"io_bytes": 0}},'
+                  ' {"jobname": "R", "read": {"io_bytes": 1, "bw_bytes": 200000000}, "write": {"io_bytes": 0}},'
+                  ' {"jobname": "IDLE", "read": {"io_bytes": 0}, "write": {"io_bytes": 0}}]}')
+        results = controller._parse_fio_job_results(output)
+        assert {name: job.bandwidth for name, job in results.items()} == {
+            'W': {'write': 100.0}, 'R': {'read': 200.0}, 'IDLE': {},
+        }
+        assert controller._parse_fio_job_results('{"jobs": [{"jobname": "IDLE", "read": {"io_bytes": 0}}]}') is None
+        assert controller._parse_fio_job_results('{"jobs": []}') is None
+        assert controller._parse_fio_job_results('no json here') is None
+
+class TestDataIntegrity:
+
+    @pytest.fixture
+    def controller(self, mock_dependencies):
+        return UnifiedController()
+
+    def test_write_and_verify_round_trip(self, controller, tmp_path):
+        target = str(tmp_path / "loop.img")
+        written = controller.run_data_integrity(target, 'write', seed=99, size='8m')
+        assert written['bytes'] == 8 * 1024 * 1024
+        assert controller.run_data_integrity(target, 'verify', seed=99, size='8m')['passed'] is True
+        assert controller.run_data_integrity(target, 'verify', seed=98, size='8m')['passed'] is False
+
+    def test_failure_to_open_returns_none(self, controller, tmp_path, caplog):
+        with caplog.at_level(logging.ERROR):
+            assert controller.run_data_integrity(str(tmp_path / "missing" / "dev"), 'verify', seed=1, size='1m') is None
+        assert "Data-integrity verify" in caplog.text
+
+    def test_unknown_operation_raises(self, controller):
+        with pytest.raises(ValueError):
+            controller.run_data_integrity('/dev/sdb', 'erase', seed=1)
+
+    def test_windows_runs_without_positional_io(self, controller, monkeypatch, tmp_path):
+        """Windows has no os.pwritev/os.preadv; the pass still runs instead of failing the session."""
+        monkeypatch.setattr("controllers.data_integrity.is_supported", lambda: False)
+        target = str(tmp_path / "loop.img")
+        assert controller.run_data_integrity(target, 'write', seed=5, size='8m')['bytes'] == 8 * 1024 * 1024
+        assert controller.run_data_integrity(target, 'verify', seed=5, size='8m')['passed'] is True
+
+        monkeypatch.setattr(sys, 'platform', 'win32')
+        assert controller._direct_io_target('1') == '\\\\.\\PhysicalDrive1'
+        assert controller._direct_io_target('PhysicalDrive2') == '\\\\.\\PhysicalDrive2'
+        assert is_device('\\\\.\\PhysicalDrive2')
+
+
+class TestIsMounted:
+
+    @pytest.fixture
+    def controller(self, mock_dependencies):
+        return UnifiedController()
+
+    @pytest.mark.parametrize("block_device, mounted", [
+        ("sdb", False), ("sda", True), ("sdc", True), ("nvme0n1", True), ("nvme0n12", False),
+    ])
+    def test_linux_matches_device_or_its_partitions(self, controller, monkeypatch, block_device, mounted):
+        monkeypatch.setattr(sys, 'platform', 'linux')
+        proc_mounts = ("/dev/sda1 / ext4 rw 0 0\n/dev/sdba1 /media/other vfat rw 0 0\n"
+                       "/dev/sdc /media/dut vfat rw 0 0\n/dev/nvme0n1p2 /home ext4 rw 0 0\n")
+        with patch('builtins.open', mock_open(read_data=proc_mounts)):
+            assert controller._is_mounted(MagicMock(blockDevice=block_device)) is mounted
+
+    def test_macos_matches_device_or_its_slices(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'darwin')
+        mount_output = "/dev/disk1s1 on / (apfs, local)\n/dev/disk41s1 on /Volumes/OTHER (msdos)\n"
+        with patch('subprocess.run', return_value=subprocess.CompletedProcess(['mount'], 0, stdout=mount_output)):
+            assert controller._is_mounted(MagicMock(blockDevice='disk1')) is True
+            assert controller._is_mounted(MagicMock(blockDevice='disk4')) is False
+
+
+class TestFormatDisk:
+
+    @pytest.fixture
+    def controller(self, mock_dependencies):
+        return UnifiedController()
+
+    def test_linux_uses_format_pipeline(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'linux')
+        pipeline_result = {"passed": True, "phases": {"detect": 0.01, "mkfs": 1.2}, "total_s": 1.25}
+        with patch.object(unified_controller_module, 'LinuxFormatPipeline') as mock_pipeline:
+            mock_pipeline.return_value.run.return_value = pipeline_result
+            assert controller._format_disk("/dev/sdb", label="DUT") is True
+        mock_pipeline.assert_called_once_with("/dev/sdb", label="DUT", logger_instance=controller.logger)
+        assert controller.last_format_result is pipeline_result
+
+    def test_linux_pipeline_failure_returns_false(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'linux')
+        with patch.object(unified_controller_module, 'LinuxFormatPipeline') as mock_pipeline:
+            mock_pipeline.return_value.run.return_value = {"passed": False, "failed_phase": "read_only"}
+            assert controller._format_disk("/dev/sdb") is False
+        assert controller.last_format_result["failed_phase"] == "read_only"
+
+    def test_macos_records_single_phase(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'darwin')
+        with patch('subprocess.run') as mock_run:
+            assert controller._format_disk("/dev/disk4s1") is True
+        mock_run.assert_called_once_with(["diskutil", "eraseVolume", "FAT32", "DUT", "/dev/disk4s1"], check=True)
+        assert controller.last_format_result["passed"] is True
+        assert set(controller.last_format_result["phases"]) == {"format"}
+
+    def test_macos_failure_records_error(self, controller, monkeypatch):
+        monkeypatch.setattr(sys, 'platform', 'darwin')
+        with patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, 'diskutil')):
+            assert controller._format_disk("/dev/disk4s1") is False
+        assert controller.last_format_result["failed_phase"] == "format"
+        assert "diskutil" in controller.last_format_result["error"]
+
+
 class TestFsmEventHandlers:
     """Tests for high-level FSM event handling callbacks."""
 
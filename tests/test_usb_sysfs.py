@@ -0,0 +1,143 @@
+# Directory: tests/
+# Filename: test_usb_sysfs.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/usb_sysfs.py.
+##
+## Run this test with the following command:
+## pytest tests/test_usb_sysfs.py --cov=controllers.usb_sysfs --cov-report term-missing
+##
+#############################################################
+
+import os
+import pytest
+from unittest.mock import patch
+
+import controllers.unified_controller as unified_controller_module
+from controllers.usb_sysfs import SysfsUsbBackend, OOB_DRIVE_SIZE
+
+
+class FakeSysfs:
+    """Builds a minimal sysfs tree: /devices, /bus/usb/devices links and /block links."""
+
+    def __init__(self, root):
+        self.root = root
+        self.usb_links = root / "bus" / "usb" / "devices"
+        self.block_links = root / "block"
+        self.usb_links.mkdir(parents=True)
+        self.block_links.mkdir(parents=True)
+
+    def _write_attrs(self, directory, attrs):
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, value in attrs.items():
+            (directory / name).write_text(f"{value}\n")
+
+    def add_usb_device(self, name, serial, vendor="0984", product_id="1407", devnum=5,
+                       bcd_device="0463", version=" 3.20", product="Secure Key 3.0"):
+        device_dir = self.root / "devices" / "pci0000:00" / "usb2" / name
+        self._write_attrs(device_dir, {
+            "idVendor": vendor, "idProduct": product_id, "bcdDevice": bcd_device, "version": version,
+            "serial": serial, "product": product, "manufacturer": "Apricorn", "busnum": 2, "devnum": devnum,
+        })
+        link = self.usb_links / name
+        if link.is_symlink():
+            link.unlink()
+        link.symlink_to(device_dir)
+        # Interface node, as present in real sysfs; carries no idVendor.
+        (self.usb_links / f"{name}:1.0").mkdir(exist_ok=True)
+        return device_dir
+
+    def add_block_device(self, usb_name, block, sectors, read_only=False):
+        block_dir = (self.root / "devices" / "pci0000:00" / "usb2" / usb_name / f"{usb_name}:1.0"
+                     / "host3" / "target3:0:0" / "3:0:0:0" / "block" / block)
+        self._write_attrs(block_dir, {"size": sectors, "ro": 1 if read_only else 0})
+        (self.block_links / block).symlink_to(block_dir)
+
+    def remove_block_device(self, block):
+        (self.block_links / block).unlink()
+
+
+@pytest.fixture
+def fake_sysfs(tmp_path):
+    return FakeSysfs(tmp_path / "sys")
+
+
+class TestSysfsUsbBackend:
+
+    def test_oob_device_without_block_device(self, fake_sysfs):
+        fake_sysfs.add_usb_device("2-1", "112233445566")
+        records = SysfsUsbBackend(sysfs_root=str(fake_sysfs.root)).enumerate()
+        assert len(records) == 1
+        record = records[0]
+        assert record["iSerial"] == "112233445566"
+        assert record["idVendor"] == "0984" and record["idProduct"] == "1407"
+        assert record["bcdDevice"] == "0463" and record["bcdUSB"] == "3.20"
+        assert record["driveSizeGB"] == OOB_DRIVE_SIZE
+        assert record["blockDevice"] == "N/A"
+
+    def test_exposed_drive_reports_block_device_and_size(self, fake_sysfs):
+        fake_sysfs.add_usb_device("2-1", "112233445566")
+        fake_sysfs.add_block_device("2-1", "sdb", 1953525168, read_only=True)
+        fake_sysfs.add_block_device("2-9", "sda", 500118192)  # Not under the Apricorn device.
+        record = SysfsUsbBackend(sysfs_root=str(fake_sysfs.root)).enumerate()[0]
+        assert record["blockDevice"] == "/dev/sdb"
+        assert record["driveSizeGB"] == 1000
+        assert record["readOnly"] is True
+
+    def test_zero_size_block_device_is_oob(self, fake_sysfs):
+        fake_sysfs.add_usb_device("2-1", "112233445566")
+        fake_sysfs.add_block_device("2-1", "sdb", 0)
+        record = SysfsUsbBackend(sysfs_root=str(fake_sysfs.root)).enumerate()[0]
+        assert record["driveSizeGB"] == OOB_DRIVE_SIZE
+
+    def test_other_vendors_are_ignored(self, fake_sysfs):
+        fake_sysfs.add_usb_device("2-2", "LOGITECH", vendor="046d")
+        assert SysfsUsbBackend(sysfs_root=str(fake_sysfs.root)).enumerate() == []
+
+    def test_descriptor_cache_reused_until_reenumeration(self, fake_sysfs):
+        fake_sysfs.add_usb_device("2-1", "112233445566", devnum=5)
+        backend = SysfsUsbBackend(sysfs_root=str(fake_sysfs.root))
+        backend.enumerate()
+        fake_sysfs.add_block_device("2-1", "sdb", 1953525168)
+        assert backend.enumerate()[0]["blockDevice"] == "/dev/sdb"
+        assert (backend.cache_hits, backend.cache_misses) == (1, 1)
+
+        # A re-enumeration gets a new device address, which invalidates the cached descriptor.
+        fake_sysfs.add_usb_device("2-1", "112233445566", devnum=6, bcd_device="0464")
+        assert backend.enumerate()[0]["bcdDevice"] == "0464"
+        assert backend.cache_misses == 2
+        assert len(backend._descriptor_cache) == 1
+
+    def test_missing_sysfs_returns_empty(self, tmp_path):
+        assert not SysfsUsbBackend.is_available(str(tmp_path))
+        assert SysfsUsbBackend(sysfs_root=str(tmp_path)).enumerate() == []
+
+
+class TestFindApricornDeviceBackendSelection:
+
+    def test_sysfs_backend_used_and_wrapped(self, fake_sysfs, monkeypatch):
+        fake_sysfs.add_usb_device("2-1", "112233445566")
+        monkeypatch.setattr(unified_controller_module, "APRICORN_USB_BACKEND", "sysfs")
+        monkeypatch.setattr(unified_controller_module, "_sysfs_backend", SysfsUsbBackend(sysfs_root=str(fake_sysfs.root)))
+        with patch.object(unified_controller_module, "_run_apricorn_usb_tool") as mock_tool:
+            devices = unified_controller_module.find_apricorn_device()
+        mock_tool.assert_not_called()
+        assert devices[0].iSerial == "112233445566"
+        assert isinstance(devices[0], unified_controller_module.ApricornUSBDevice)
+
+    def test_tool_backend_forced(self, monkeypatch):
+        monkeypatch.setattr(unified_controller_module, "APRICORN_USB_BACKEND", "tool")
+        with patch.object(unified_controller_module, "_run_apricorn_usb_tool", return_value=[]) as mock_tool:
+            assert unified_controller_module.find_apricorn_device() == []
+        mock_tool.assert_called_once()
+
+    def test_sysfs_failure_falls_back_to_tool(self, monkeypatch):
+        failing = SysfsUsbBackend(sysfs_root="/nonexistent")
+        monkeypatch.setattr(failing, "enumerate", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+        monkeypatch.setattr(unified_controller_module, "APRICORN_USB_BACKEND", "sysfs")
+        monkeypatch.setattr(unified_controller_module, "_sysfs_backend", failing)
+        with patch.object(unified_controller_module, "_run_apricorn_usb_tool", return_value=[]) as mock_tool:
+            assert unified_controller_module.find_apricorn_device() == []
+        mock_tool.assert_called_once()
@@ -0,0 +1,143 @@
+# Directory: tests/
+# Filename: test_usb_watcher.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/usb_watcher.py.
+##
+## Run this test with the following command:
+## pytest tests/test_usb_watcher.py --cov=controllers.usb_watcher --cov-report term-missing
+##
+#############################################################
+
+import pytest
+from unittest.mock import MagicMock
+
+from controllers.clock import SimulatedClock, set_clock
+from controllers.unified_controller import ApricornUSBDevice
+from controllers.usb_watcher import UsbDeviceWatcher
+
+
+def _device(serial, size="N/A (OOB Mode)"):
+    return ApricornUSBDevice({"iSerial": serial, "driveSizeGB": size, "idVendor": "0984"})
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def fake_sysfs(tmp_path):
+    usb_dir = tmp_path / "bus" / "usb" / "devices"
+    block_dir = tmp_path / "block"
+    _write(usb_dir / "1-1" / "idVendor", "0984\n")
+    _write(usb_dir / "1-2" / "idVendor", "046d\n")
+    block_dir.mkdir(parents=True)
+    return usb_dir, block_dir
+
+
+@pytest.fixture
+def simulated_clock():
+    clock = SimulatedClock(start=1000.0)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+class TestUsbDeviceWatcher:
+
+    def test_refresh_emits_add_change_remove_events(self):
+        backend = MagicMock(side_effect=[
+            [_device("SN1")],
+            [_device("SN1", "1000 GB")],
+            [],
+        ])
+        watcher = UsbDeviceWatcher(enumerate_fn=backend, use_uevents=False)
+        listener = MagicMock()
+        watcher.add_listener(listener)
+
+        assert [e["type"] for e in watcher.refresh()] == ["add"]
+        assert watcher.get("SN1").driveSizeGB == "N/A (OOB Mode)"
+        first_seen = watcher.first_seen("SN1")
+
+        change = watcher.refresh()
+        assert [e["type"] for e in change] == ["change"]
+        assert change[0]["previous"].driveSizeGB == "N/A (OOB Mode)"
+        assert watcher.get("SN1").driveSizeGB == "1000 GB"
+        assert watcher.first_seen("SN1") == first_seen
+
+        assert [e["type"] for e in watcher.refresh()] == ["remove"]
+        assert watcher.get("SN1") is None
+        assert watcher.devices() == []
+        assert watcher.generation == 3
+        assert listener.call_count == 3
+        assert [e["type"] for e in watcher.events] == ["add", "change", "remove"]
+
+    def test_refresh_without_changes_keeps_generation(self):
+        watcher = UsbDeviceWatcher(enumerate_fn=lambda: [_device("SN1")], use_uevents=False)
+        watcher.refresh()
+        assert watcher.refresh() == []
+        assert watcher.generation == 1
+
+    def test_backend_failure_is_logged_and_index_kept(self):
+        logger = MagicMock()
+        backend = MagicMock(side_effect=[[_device("SN1")], RuntimeError("tool crashed")])
+        watcher = UsbDeviceWatcher(enumerate_fn=backend, use_uevents=False, logger_instance=logger)
+        watcher.refresh()
+        assert watcher.refresh() == []
+        assert watcher.get("SN1") is not None
+        assert logger.error.called
+
+    def test_poll_once_only_enumerates_on_sysfs_change(self, fake_sysfs):
+        usb_dir, block_dir = fake_sysfs
+        backend = MagicMock(return_value=[_device("SN1")])
+        watcher = UsbDeviceWatcher(enumerate_fn=backend, use_uevents=False,
+                                   sysfs_usb_dir=str(usb_dir), sysfs_block_dir=str(block_dir))
+        watcher.poll_once()
+        watcher.poll_once()
+        assert backend.call_count == 1
+
+        # A new block device appearing (drive unlocked) changes the signature.
+        _write(block_dir / "sdb" / "size", "1953525168\n")
+        watcher.poll_once()
+        assert backend.call_count == 2
+
+        # Non-Apricorn USB devices are not part of the signature.
+        _write(usb_dir / "1-3" / "idVendor", "046d\n")
+        watcher.poll_once()
+        assert backend.call_count == 2
+
+        watcher.poll_once(force=True)
+        assert backend.call_count == 3
+
+    def test_poll_once_without_sysfs_only_resyncs(self, tmp_path, simulated_clock):
+        backend = MagicMock(return_value=[])
+        watcher = UsbDeviceWatcher(enumerate_fn=backend, use_uevents=False, resync_interval_sec=30,
+                                   sysfs_usb_dir=str(tmp_path / "missing"))
+        assert not watcher.has_sysfs
+        watcher.poll_once()
+        assert backend.call_count == 1
+        simulated_clock.advance(10)
+        watcher.poll_once()
+        watcher.poll_once()
+        assert backend.call_count == 1
+        watcher.poll_once(force=True)
+        simulated_clock.advance(30)
+        watcher.poll_once()
+        assert backend.call_count == 3
+
+    def test_start_stop_and_wait_for_change(self, fake_sysfs):
+        usb_dir, block_dir = fake_sysfs
+        devices = []
+        watcher = UsbDeviceWatcher(enumerate_fn=lambda: list(devices), use_uevents=False, poll_interval_sec=0.01,
+                                   sysfs_usb_dir=str(usb_dir), sysfs_block_dir=str(block_dir))
+        with watcher:
+            assert watcher.is_running
+            generation = watcher.generation
+            devices.append(_device("SN1"))
+            _write(usb_dir / "1-4" / "idVendor", "0984\n")
+            assert watcher.wait_for_change(generation, timeout=2.0) != generation
+            assert watcher.get("SN1") is not None
+        assert not watcher.is_running
@@ -0,0 +1,413 @@
+# Directory: tests/
+# Filename: test_virtual_dut.py
+
+#############################################################
+##
+## This test file is designed to systematically cover every function
+## in controllers/virtual_dut.py.
+##
+## Run this test with the following command:
+## pytest tests/test_virtual_dut.py --cov=controllers.virtual_dut --cov-report term-missing
+##
+#############################################################
+
+import pytest
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+
+import controllers.virtual_dut as virtual_dut_module
+from controllers.virtual_dut import (
+    VirtualApricornDevice, VirtualLedCamera, SimulatedPhidgetController, _LedProgram,
+    KEYPAD_KEYS, LAST_TRY_PIN, KEY_GENERATION_SEC, VIRTUAL_DUT_ENUM_DELAY_SEC,
+)
+from controllers.logitech_webcam import LogitechLedChecker, PRIMARY_LED_CONFIGURATIONS
+from controllers.usb_sysfs import OOB_DRIVE_SIZE
+
+ADMIN_PIN = ["key1", "key2", "key3", "key4", "key5", "key6", "key7", "key8"]
+USER_PIN = ["key2", "key2", "key3", "key4", "key5", "key6", "key7", "key8"]
+WRONG_PIN = ["key9", "key9", "key9", "key9", "key9", "key9", "key9", "key9"]
+
+RED = {"red": 1, "green": 0, "blue": 0}
+GREEN = {"red": 0, "green": 1, "blue": 0}
+BLUE = {"red": 0, "green": 0, "blue": 1}
+GREEN_BLUE = {"red": 0, "green": 1, "blue": 1}
+KEY_GENERATION = {"red": 1, "green": 1, "blue": 0}
+OFF = {"red": 0, "green": 0, "blue": 0}
+
+
+class FakeClock:
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_device(clock, battery=False):
+    return VirtualApricornDevice(device_name="ask3nx-3861f", battery=battery, clock=clock)
+
+
+def press(device, clock, *keys, hold=0.1, pause=0.1):
+    for key in keys:
+        device.set_output(key, True)
+    clock.advance(hold)
+    for key in keys:
+        device.set_output(key, False)
+    clock.advance(pause)
+
+
+def enter(device, clock, pin):
+    for key in pin + ["unlock"]:
+        press(device, clock, key)
+
+
+def settle(device, clock, seconds=8.0):
+    clock.advance(seconds)
+    device.led_state()
+
+
+@pytest.fixture
+def oob_device(clock):
+    device = make_device(clock, battery=True)
+    device.set_output("connect", True)
+    settle(device, clock, 2)
+    return device
+
+
+@pytest.fixture
+def standby_device(clock, oob_device):
+    press(oob_device, clock, "unlock", "key9")
+    enter(oob_device, clock, ADMIN_PIN)
+    settle(oob_device, clock, 4)
+    enter(oob_device, clock, ADMIN_PIN)
+    settle(oob_device, clock, 3)
+    press(oob_device, clock, "lock")
+    settle(oob_device, clock, 1)
+    assert oob_device.mode == "STANDBY_MODE"
+    return oob_device
+
+
+class TestLedProgram:
+    def test_plays_once_then_loops(self):
+        program = _LedProgram(10.0, [(RED, 1.0)], [(GREEN, 0.5), (OFF, 0.5)])
+        assert program.state_at(10.5) == RED
+        assert program.state_at(11.2) == GREEN
+        assert program.state_at(11.7) == OFF
+        assert program.state_at(13.2) == GREEN
+
+    def test_empty_loop_is_off(self):
+        assert _LedProgram(0.0, [(RED, 1.0)], []).state_at(5.0) == OFF
+
+
+class TestPowerAndEnumeration:
+    def test_power_on_self_test_then_oob(self, clock):
+        device = make_device(clock, battery=False)
+        device.set_output("connect", True)
+        assert device.mode == "POWER_ON_SELF_TEST"
+        assert device.led_state() == RED
+        settle(device, clock, 10)
+        assert device.mode == "OOB_MODE"
+        assert device.led_state() == GREEN_BLUE
+        record, = device.enumerate()
+        assert record["iSerial"] == device.serial_number
+        assert record["driveSizeGB"] == OOB_DRIVE_SIZE
+        assert record["idProduct"] == "1410"
+
+    def test_enumeration_is_delayed(self, clock):
+        device = make_device(clock, battery=True)
+        device.set_output("connect", True)
+        assert device.mode == "OOB_MODE"
+        assert device.enumerate() == []
+        clock.advance(VIRTUAL_DUT_ENUM_DELAY_SEC)
+        assert len(device.enumerate()) == 1
+
+    def test_usb3_relay_sets_bcd_usb(self, oob_device):
+        assert oob_device.enumerate()[0]["bcdUSB"] == "2.10"
+        oob_device.set_output("usb3", True)
+        assert oob_device.enumerate()[0]["bcdUSB"] == "3.20"
+
+    def test_disconnect_turns_off_and_disappears(self, clock, oob_device):
+        listener = MagicMock()
+        oob_device.add_enumeration_listener(listener)
+        oob_device.set_output("connect", False)
+        assert oob_device.mode == "OFF"
+        assert oob_device.led_state() == OFF
+        assert oob_device.enumerate() == []
+        listener.assert_called_once_with([])
+
+    def test_keys_ignored_without_power(self, clock):
+        device = make_device(clock, battery=False)
+        press(device, clock, "key1")
+        assert device.mode == "OFF"
+
+    def test_battery_device_wakes_and_sleeps(self, clock):
+        device = make_device(clock, battery=True)
+        press(device, clock, "key1")
+        assert device.mode == "OOB_MODE"
+        assert device.enumerate() == []
+        settle(device, clock, virtual_dut_module.BATTERY_WAKE_SEC + 1)
+        assert device.mode == "OFF"
+
+    def test_read_input(self, oob_device):
+        assert oob_device.read_input("power_on") is True
+        assert oob_device.read_input("prod_inserted") is True
+
+
+class TestEnrollmentAndUnlock:
+    def test_admin_enrollment_from_oob(self, clock, oob_device):
+        press(oob_device, clock, "unlock", "key9")
+        assert oob_device.mode == "PIN_ENROLLMENT"
+        enter(oob_device, clock, ADMIN_PIN)
+        assert oob_device.led_state() == OFF  # ACCEPT_PATTERN starts dark
+        settle(oob_device, clock, 4)
+        enter(oob_device, clock, ADMIN_PIN)
+        assert oob_device.led_state() == GREEN
+        settle(oob_device, clock, 2)
+        assert oob_device.mode == "ADMIN_MODE"
+        assert oob_device.led_state() == BLUE
+        assert oob_device.admin_pin == ADMIN_PIN
+
+    def test_mismatched_confirmation_is_rejected(self, clock, oob_device):
+        press(oob_device, clock, "unlock", "key9")
+        enter(oob_device, clock, ADMIN_PIN)
+        settle(oob_device, clock, 4)
+        enter(oob_device, clock, USER_PIN)
+        assert oob_device.mode == "OOB_MODE"
+        assert oob_device.admin_pin is None
+
+    def test_short_pin_is_rejected(self, clock, oob_device):
+        press(oob_device, clock, "unlock", "key9")
+        enter(oob_device, clock, ADMIN_PIN[:3])
+        assert oob_device.mode == "OOB_MODE"
+
+    def test_enrollment_times_out(self, clock, oob_device):
+        press(oob_device, clock, "unlock", "key9")
+        press(oob_device, clock, "key1")
+        settle(oob_device, clock, virtual_dut_module.ENTRY_TIMEOUT_SEC + 1)
+        assert oob_device.mode == "OOB_MODE"
+
+    def test_unlock_exposes_drive(self, clock, standby_device):
+        assert standby_device.enumerate() == []
+        enter(standby_device, clock, ADMIN_PIN)
+        assert standby_device.mode == "UNLOCKED"
+        assert standby_device.unlocked_as == "admin"
+        settle(standby_device, clock, 2)
+        record, = standby_device.enumerate()
+        assert record["driveSizeGB"] == virtual_dut_module.VIRTUAL_DUT_DRIVE_SIZE_GB
+        assert record["readOnly"] is False
+        press(standby_device, clock, "lock")
+        assert standby_device.mode == "STANDBY_MODE"
+        assert standby_device.enumerate() == []
+
+    def test_user_enrollment_and_unlock(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        assert standby_device.mode == "ADMIN_LOGIN"
+        enter(standby_device, clock, ADMIN_PIN)
+        assert standby_device.mode == "ADMIN_MODE"
+        press(standby_device, clock, "unlock", "key1")
+        enter(standby_device, clock, USER_PIN)
+        settle(standby_device, clock, 4)
+        enter(standby_device, clock, USER_PIN)
+        assert standby_device.user_pins[1] == USER_PIN
+        press(standby_device, clock, "unlock", "key1")
+        assert standby_device.mode == "ADMIN_MODE"  # single user slot is full
+        press(standby_device, clock, "lock")
+        enter(standby_device, clock, USER_PIN)
+        assert standby_device.unlocked_as == "user"
+
+    def test_read_only_toggle_changes_unlock_pattern(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        enter(standby_device, clock, ADMIN_PIN)
+        press(standby_device, clock, "key6", "key7")
+        assert standby_device.read_only is True
+        settle(standby_device, clock, 4)
+        press(standby_device, clock, "lock")
+        enter(standby_device, clock, ADMIN_PIN)
+        assert standby_device.led_state() == KEY_GENERATION  # yellow: red + green
+        settle(standby_device, clock, 2)
+        assert standby_device.enumerate()[0]["readOnly"] is True
+
+    def test_toggle_conflicts_are_rejected(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        enter(standby_device, clock, ADMIN_PIN)
+        press(standby_device, clock, "key4", "key7")
+        assert standby_device.self_destruct_enabled is True
+        press(standby_device, clock, "key2", "key5")
+        assert standby_device.provision_lock is False
+
+
+class TestBruteForce:
+    def test_wrong_pin_decrements_counter(self, clock, standby_device):
+        enter(standby_device, clock, WRONG_PIN)
+        assert standby_device.brute_force_remaining == 19
+        assert standby_device.led_state() == OFF  # REJECT starts dark
+        settle(standby_device, clock, 4)
+        assert standby_device.mode == "STANDBY_MODE"
+
+    def test_half_point_last_try_and_lockout(self, clock, standby_device):
+        for _ in range(10):
+            enter(standby_device, clock, WRONG_PIN)
+        assert standby_device.mode == "BRUTE_FORCE"
+        enter(standby_device, clock, ADMIN_PIN)
+        assert standby_device.mode == "BRUTE_FORCE"
+        press(standby_device, clock, "key5", "unlock", hold=6)
+        assert standby_device.mode == "LAST_TRY_LOGIN"
+        enter(standby_device, clock, LAST_TRY_PIN)
+        assert standby_device.mode == "STANDBY_MODE"
+        for _ in range(10):
+            enter(standby_device, clock, WRONG_PIN)
+        assert standby_device.brute_force_remaining == 0
+        assert standby_device.mode == "BRUTE_FORCE"
+        standby_device.set_output("connect", False)
+        standby_device.set_output("connect", True)
+        assert standby_device.mode == "BRUTE_FORCE"
+
+    def test_successful_unlock_resets_counter(self, clock, standby_device):
+        enter(standby_device, clock, WRONG_PIN)
+        enter(standby_device, clock, ADMIN_PIN)
+        assert standby_device.brute_force_remaining == standby_device.brute_force_counter
+
+
+class TestResets:
+    def test_user_reset_hold(self, clock, standby_device):
+        for key in ("lock", "unlock", "key2"):
+            standby_device.set_output(key, True)
+        settle(standby_device, clock, 2)
+        assert standby_device.mode == "USER_RESET"
+        settle(standby_device, clock, 10)
+        for key in ("lock", "unlock", "key2"):
+            standby_device.set_output(key, False)
+        assert standby_device.led_state() == KEY_GENERATION
+        assert standby_device.admin_pin is None
+        settle(standby_device, clock, KEY_GENERATION_SEC)
+        assert standby_device.mode == "OOB_MODE"
+
+    def test_user_reset_released_early_is_ignored(self, clock, standby_device):
+        press(standby_device, clock, "lock", "unlock", "key2", hold=3)
+        assert standby_device.mode == "STANDBY_MODE"
+        assert standby_device.admin_pin == ADMIN_PIN
+
+    def test_user_reset_from_admin_mode(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        enter(standby_device, clock, ADMIN_PIN)
+        press(standby_device, clock, "lock", "unlock", "key2")
+        assert standby_device.mode == "USER_RESET"
+        settle(standby_device, clock, virtual_dut_module.ADMIN_USER_RESET_WARNING_SEC)
+        assert standby_device.mode == "KEY_GENERATION"
+        settle(standby_device, clock, KEY_GENERATION_SEC)
+        assert standby_device.mode == "OOB_MODE"
+
+    def test_manufacturer_reset_and_keypad_test(self, clock, standby_device):
+        press(standby_device, clock, "lock", "key2")
+        press(standby_device, clock, "key3")
+        press(standby_device, clock, "key8")
+        press(standby_device, clock, "lock", hold=6)
+        assert standby_device.mode == "RESET_READY"
+        assert standby_device.led_state() == RED  # RED_GREEN_BLUE
+        settle(standby_device, clock, 5)
+        assert standby_device.led_state() == BLUE
+        for key in [k for k in KEYPAD_KEYS if k != "unlock"] + ["unlock"]:
+            standby_device.set_output(key, True)
+            clock.advance(0.2)
+            assert standby_device.led_state() == GREEN
+            standby_device.set_output(key, False)
+            if key != "unlock":
+                assert standby_device.led_state() == OFF
+        assert standby_device.mode == "KEY_GENERATION"
+        settle(standby_device, clock, KEY_GENERATION_SEC + 2)
+        assert standby_device.mode == "UNLOCKED"
+        assert standby_device.unlocked_as == "reset"
+        assert standby_device.enumerate()[0]["driveSizeGB"] == virtual_dut_module.VIRTUAL_DUT_DRIVE_SIZE_GB
+        press(standby_device, clock, "lock")
+        assert standby_device.mode == "OOB_MODE"
+
+
+class TestCounterEnrollment:
+    def test_brute_force_counter(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        enter(standby_device, clock, ADMIN_PIN)
+        press(standby_device, clock, "unlock", "key5", hold=6)
+        assert standby_device.mode == "COUNTER_ENROLLMENT"
+        press(standby_device, clock, "key0")
+        press(standby_device, clock, "key5")
+        assert standby_device.mode == "ADMIN_MODE"
+        assert standby_device.brute_force_counter == 5
+
+    def test_invalid_min_pin_is_rejected(self, clock, standby_device):
+        press(standby_device, clock, "key0", "unlock", hold=6)
+        enter(standby_device, clock, ADMIN_PIN)
+        press(standby_device, clock, "unlock", "key4", hold=6)
+        press(standby_device, clock, "key2")
+        press(standby_device, clock, "key0")
+        assert standby_device.minimum_pin_length == 8
+
+
+class TestVirtualLedCamera:
+    @pytest.mark.parametrize("state", [RED, GREEN, BLUE, GREEN_BLUE, KEY_GENERATION, OFF])
+    def test_rendered_frames_are_detected(self, clock, state):
+        camera = VirtualLedCamera(make_device(clock), PRIMARY_LED_CONFIGURATIONS)
+        frame = camera.render(state)
+        checker = LogitechLedChecker.__new__(LogitechLedChecker)
+        detected = {key: int(checker._check_roi_for_color(frame, config))
+                    for key, config in PRIMARY_LED_CONFIGURATIONS.items()}
+        assert detected == state
+
+    def test_capture_interface(self, clock, oob_device):
+        camera = VirtualLedCamera(oob_device, PRIMARY_LED_CONFIGURATIONS, fps=1000)
+        assert camera.isOpened()
+        assert camera.set(cv2.CAP_PROP_EXPOSURE, -6)
+        assert camera.get(cv2.CAP_PROP_EXPOSURE) == -6
+        ok, frame = camera.read()
+        assert ok and frame.shape == (480, 640, 3)
+        x, y, _, _ = PRIMARY_LED_CONFIGURATIONS["green"]["roi"]
+        assert tuple(frame[y, x]) == virtual_dut_module.VIRTUAL_LED_ON_BGR["green"]
+        camera.release()
+        assert camera.read() == (False, None)
+
+
+class TestSimulatedPhidgetController:
+    def test_outputs_drive_device(self, clock):
+        device = make_device(clock, battery=True)
+        phidget = SimulatedPhidgetController(device)
+        phidget.on("connect")
+        assert device.connected
+        assert phidget.read_input("power_on") is True
+        assert phidget.last_actuation()[1:] == ("connect", True)
+        phidget.close_all()
+        assert not device.connected
+
+    def test_unknown_channel(self, clock):
+        phidget = SimulatedPhidgetController(make_device(clock))
+        with pytest.raises(NameError):
+            phidget.on("missing")
+
+
+class TestUnifiedControllerVirtualMode:
+    def test_wires_virtual_device(self, clock):
+        from controllers.unified_controller import UnifiedController, ApricornUSBDevice
+        device = make_device(clock, battery=True)
+        at = UnifiedController(virtual_dut=device, enable_instant_replay=False)
+        try:
+            assert isinstance(at._phidget_controller, SimulatedPhidgetController)
+            assert at.dut.scanned_serial_number == device.serial_number
+            assert at.is_camera_ready
+            at.on("connect")
+            clock.advance(VIRTUAL_DUT_ENUM_DELAY_SEC)
+            found = at.get_usb_device(device.serial_number)
+            assert isinstance(found, ApricornUSBDevice)
+            watcher = at.start_usb_watcher(poll_interval_sec=60, resync_interval_sec=3600)
+            assert watcher.get(device.serial_number) is not None
+            at.off("connect")
+            assert watcher.get(device.serial_number) is None
+        finally:
+            at.close()
@@ -0,0 +1,75 @@
+# Directory: tools
+# Filename: benchmark_usb_enumeration.py
+
+# Compares the in-process sysfs enumeration backend against the apricorn_usb_tool
+# subprocess path. Run on the Linux test host with a DUT attached:
+#
+#   python tools/benchmark_usb_enumeration.py --iterations 200
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+# --- Path Setup ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from controllers.unified_controller import _run_apricorn_usb_tool, _apricorn_usb_tool_path
+from controllers.usb_sysfs import SysfsUsbBackend
+
+
+def time_backend(enumerate_fn: Callable[[], List], iterations: int) -> Dict[str, float]:
+    """Runs enumerate_fn `iterations` times and returns latency statistics in milliseconds."""
+    samples = []
+    device_count = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        device_count = len(enumerate_fn())
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "devices": device_count,
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1],
+    }
+
+
+def print_result(name: str, result: Dict[str, float]):
+    print(f"{name:<8} devices={result['devices']:<3} mean={result['mean_ms']:8.3f}ms  "
+          f"p50={result['p50_ms']:8.3f}ms  p95={result['p95_ms']:8.3f}ms  max={result['max_ms']:8.3f}ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Apricorn USB enumeration backends.")
+    parser.add_argument("--iterations", type=int, default=100, help="Enumerations per backend (default: 100).")
+    parser.add_argument("--sysfs-root", default="/sys", help="sysfs mount point (default: /sys).")
+    args = parser.parse_args()
+
+    if not SysfsUsbBackend.is_available(args.sysfs_root):
+        print(f"sysfs not available at {args.sysfs_root}; the native backend only runs on Linux.")
+        return 1
+
+    backend = SysfsUsbBackend(sysfs_root=args.sysfs_root)
+    sysfs_result = time_backend(backend.enumerate, args.iterations)
+    print_result("sysfs", sysfs_result)
+    print(f"         descriptor cache: {backend.cache_hits} hits / {backend.cache_misses} misses")
+
+    if _apricorn_usb_tool_path():
+        tool_result = time_backend(_run_apricorn_usb_tool, args.iterations)
+        print_result("tool", tool_result)
+        if sysfs_result["mean_ms"] > 0:
+            print(f"Speedup (mean): {tool_result['mean_ms'] / sysfs_result['mean_ms']:.1f}x")
+    else:
+        print("apricorn_usb_tool binary not found; skipping subprocess benchmark.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,13 +23,16 @@ class PINGenerator:
     A class to generate valid and specific types of invalid PINs for testing.
     It holds a reference to the DUT model to ensure checks are always up-to-date.
     """
-    def __init__(self, dut_model: Any):
+    def __init__(self, dut_model: Any, rng: Optional[random.Random] = None):
         """
         Initializes the generator with a reference to the device-under-test model.
+        A seeded `rng` makes the generated PINs reproducible; by default the
+        module-level random functions are used.
         """
         if not hasattr(dut_model, 'self_destruct_pin'):
             raise TypeError("The provided dut_model must have a 'self_destruct_pin' attribute.")
         self.dut_model = dut_model
+        self.rng = rng if rng is not None else random
         self._digit_usage = collections.Counter({digit: 0 for digit in string.digits})
 
     def _is_pin_invalid(self, pin_string: str) -> Tuple[bool, str]:
@@ -77,7 +80,7 @@ class PINGenerator:
                 digit for digit, count in self._digit_usage.items()
                 if count == min_usage
             ]
-            selected_digit = random.choice(eligible_digits)
+            selected_digit = self.rng.choice(eligible_digits)
             candidate_digits.append(selected_digit)
             self._digit_usage[selected_digit] += 1
 
@@ -107,7 +110,7 @@ class PINGenerator:
         """
         pin_str = ''
         if invalid_type == "repeating":
-            digit = str(random.randint(0, 9))
+            digit = str(self.rng.randint(0, 9))
             pin_str = digit * length
 
         elif invalid_type == "sequential":
@@ -117,16 +120,16 @@ class PINGenerator:
             if 'reverse' in kwargs:
                 is_reverse = kwargs['reverse']
             else:
-                is_reverse = random.choice([True, False])
+                is_reverse = self.rng.choice([True, False])
 
             if not is_reverse:
                 max_start_digit = 10 - length
-                start_digit = random.randint(0, max_start_digit)
+                start_digit = self.rng.randint(0, max_start_digit)
                 pin_list = [str(start_digit + i) for i in range(length)]
                 pin_str = ''.join(pin_list)
             else:
                 min_start_digit = length - 1
-                start_digit = random.randint(min_start_digit, 9)
+                start_digit = self.rng.randint(min_start_digit, 9)
                 pin_list = [str(start_digit - i) for i in range(length)]
                 pin_str = ''.join(pin_list)
 